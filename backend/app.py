@@ -2,7 +2,7 @@
 主应用模块，提供REST API服务
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request
 from flask_cors import CORS
 import logging
 import os
@@ -15,14 +15,23 @@ import sqlite3
 from modules.db_utils import get_db_connection, dict_factory
 from modules.wordcloud import get_wordcloud
 from modules.rankings import get_post_ranking, get_author_ranking, get_thread_history, get_author_history
-from modules.trends import get_post_trend, get_update_trend, get_view_trend, get_data_trends, get_new_posts
-from create_missing_tables import create_thread_follow_table
+from modules.trends import get_post_trend, get_update_trend, get_view_trend, get_data_trends, get_new_posts, get_post_date_range
+from modules.car_search import search_cars, DEFAULT_PAGE_SIZE
+from modules.follows import (
+    follow_status_for, list_follows, follow_threads, unfollow_threads,
+    delete_follow, get_follow_states, MAX_BATCH_SIZE
+)
+from modules.thread_ids import canonical_thread_id, thread_key_expr
+from modules.action_logs import get_action_logs
+from modules.author_posts import get_author_posts
+from modules.batch_lookup import batch_lookup
+from modules.responses import jsonify, init_app as init_responses, request_fields
+from modules.bootstrap import configure_logging, bootstrap_database
+from modules.metrics import get_metrics, init_app as init_metrics
+from modules.health import liveness, readiness
+from modules.dashboard import get_dashboard_bundle
 
 # 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-)
 logger = logging.getLogger("app")
 
 # 数据库路径
@@ -32,32 +41,54 @@ DB_PATH = os.path.join(DB_DIR, 'forum_data.db')
 # 创建应用
 app = Flask(__name__, static_folder='../frontend/build', static_url_path='/')
 CORS(app)  # 启用CORS以允许前端访问
+init_responses(app)  # orjson序列化和gzip/brotli压缩
+init_metrics(app)  # 请求耗时和SQL统计
 
 # API前缀
 API_PREFIX = '/api'
 
+# 批量帖子排行接口返回的列
+POST_RANK_BATCH_COLUMNS = [
+    'thread_id', 'url', 'title', 'author', 'author_link',
+    'repost_count', 'reply_count', 'delete_reply_count', 'daysold', 'last_active'
+]
+
 # 健康检查接口
 @app.route(f'{API_PREFIX}/health', methods=['GET'])
 def health_check():
-    """健康检查接口"""
-    try:
-        # 检查数据库连接
-        conn = get_db_connection()
-        conn.execute("SELECT 1").fetchone()
-        conn.close()
-        
+    """健康检查接口（使用缓存的就绪检查结果）"""
+    result = readiness()
+    if result['status'] == 'ok':
         return jsonify({
             'status': 'ok',
             'message': '服务运行正常',
             'timestamp': datetime.now().isoformat()
         })
-    except Exception as e:
-        logger.error(f"健康检查失败: {str(e)}")
-        return jsonify({
-            'status': 'error',
-            'message': f'服务异常: {str(e)}',
-            'timestamp': datetime.now().isoformat()
-        }), 500
+    logger.error(f"健康检查失败: {result.get('message')}")
+    return jsonify({
+        'status': 'error',
+        'message': f"服务异常: {result.get('message')}",
+        'timestamp': datetime.now().isoformat()
+    }), 500
+
+# 存活检查接口: 只读取内存，不访问数据库
+@app.route(f'{API_PREFIX}/health/live', methods=['GET'])
+def health_live():
+    """存活检查接口"""
+    return jsonify(liveness())
+
+# 就绪检查接口: 数据库不可用时返回503
+@app.route(f'{API_PREFIX}/health/ready', methods=['GET'])
+def health_ready():
+    """就绪检查接口，返回数据版本、数据库文件修改时间、距上次更新的时间和缓存命中率"""
+    result = readiness()
+    return jsonify(result), (200 if result['status'] == 'ok' else 503)
+
+# 性能统计接口
+@app.route(f'{API_PREFIX}/metrics', methods=['GET'])
+def metrics():
+    """各接口的请求耗时、SQL语句数和耗时直方图，以及最近的慢查询（当前进程）"""
+    return jsonify(get_metrics())
 
 # 词云API
 @app.route(f'{API_PREFIX}/title-wordcloud', methods=['GET'])
@@ -90,6 +121,18 @@ def title_wordcloud():
             {"text": "交易", "value": 50}
         ])
 
+# 仪表盘数据包API
+@app.route(f'{API_PREFIX}/dashboard', methods=['GET'])
+def dashboard():
+    """首页默认视图的数据包（排行榜第一页、各粒度趋势、词云、最新新帖、日期范围），数据更新后预先生成"""
+    try:
+        payload = get_dashboard_bundle()
+        # 已经是序列化好的JSON，直接返回（仍会经过压缩）
+        return app.response_class(payload, mimetype='application/json')
+    except Exception as e:
+        logger.error(f"获取仪表盘数据包失败: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 # 帖子排行API
 @app.route(f'{API_PREFIX}/post-rank', methods=['GET'])
 def post_rank():
@@ -101,7 +144,7 @@ def post_rank():
         sort_order = request.args.get('sort_order', 'desc')
         
         # 记录请求参数
-        logger.info(f"接收到帖子排行请求: page={page}, limit={limit}, sort_field={sort_field}, sort_order={sort_order}")
+        logger.debug(f"接收到帖子排行请求: page={page}, limit={limit}, sort_field={sort_field}, sort_order={sort_order}")
         
         # 检查参数有效性
         if page < 1:
@@ -118,7 +161,7 @@ def post_rank():
         if isinstance(ranking_data, dict) and 'data' in ranking_data:
             data_count = len(ranking_data['data']) if ranking_data['data'] else 0
             total_count = ranking_data.get('total', 0)
-            logger.info(f"返回帖子排行数据: {data_count}条记录, 总计{total_count}条")
+            logger.debug(f"返回帖子排行数据: {data_count}条记录, 总计{total_count}条")
         else:
             logger.warning(f"排行榜返回格式不正确: {type(ranking_data)}")
             
@@ -147,7 +190,7 @@ def author_rank():
         sort_order = request.args.get('sort_order', 'desc')
         
         # 记录请求参数
-        logger.info(f"接收到作者排行请求: page={page}, limit={limit}, sort_field={sort_field}, sort_order={sort_order}")
+        logger.debug(f"接收到作者排行请求: page={page}, limit={limit}, sort_field={sort_field}, sort_order={sort_order}")
         
         # 检查参数有效性
         if page < 1:
@@ -164,7 +207,7 @@ def author_rank():
         if isinstance(ranking_data, dict) and 'data' in ranking_data:
             data_count = len(ranking_data['data']) if ranking_data['data'] else 0
             total_count = ranking_data.get('total', 0)
-            logger.info(f"返回作者排行数据: {data_count}条记录, 总计{total_count}条")
+            logger.debug(f"返回作者排行数据: {data_count}条记录, 总计{total_count}条")
         else:
             logger.warning(f"排行榜返回格式不正确: {type(ranking_data)}")
             
@@ -394,46 +437,7 @@ def user_activity():
 def post_date_range():
     """帖子日期范围（兼容旧API）"""
     try:
-        # 尝试从数据库中获取真实的日期范围
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 首先检查posts表是否存在
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='posts'")
-        if not cursor.fetchone():
-            logger.warning("posts表不存在，返回空日期范围")
-            return jsonify({
-                "start_date": None,
-                "end_date": None,
-                "min_date": None,
-                "max_date": None
-            })
-        
-        # 获取最早和最晚的帖子日期
-        cursor.execute("""
-            SELECT MIN(post_time) as start_date, MAX(post_time) as end_date 
-            FROM posts 
-            WHERE post_time IS NOT NULL
-        """)
-        
-        date_range = cursor.fetchone()
-        conn.close()
-        
-        if date_range and date_range['start_date'] and date_range['end_date']:
-            return jsonify({
-                "start_date": date_range['start_date'],
-                "end_date": date_range['end_date'],
-                "min_date": date_range['start_date'],  # 添加前端需要的字段
-                "max_date": date_range['end_date']     # 添加前端需要的字段
-            })
-        else:
-            # 如果没有数据，返回空日期
-            return jsonify({
-                "start_date": None,
-                "end_date": None,
-                "min_date": None,  # 添加前端需要的字段
-                "max_date": None   # 添加前端需要的字段
-            })
+        return jsonify(get_post_date_range())
     except Exception as e:
         logger.error(f"获取帖子日期范围失败: {str(e)}")
         return jsonify({"error": str(e), "start_date": None, "end_date": None, "min_date": None, "max_date": None}), 500
@@ -454,40 +458,13 @@ def thread_follows():
     try:
         if request.method == 'GET':
             follow_type = request.args.get('type', 'my_follow')
+            status = follow_status_for(follow_type)
             
             conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # 根据类型查询不同状态的数据
-            status = 'followed' if follow_type == 'my_follow' else 'my_thread'
-            
-            # 修改查询语句，关联post_ranking表获取完整数据
-            query = """
-                SELECT 
-                    tf.id,
-                    tf.thread_id, 
-                    tf.url, 
-                    tf.title, 
-                    tf.author, 
-                    tf.author_link,
-                    COALESCE(pr.repost_count, 0) as repost_count,
-                    COALESCE(pr.reply_count, 0) as reply_count,
-                    COALESCE(pr.delete_reply_count, 0) as delete_reply_count,
-                    COALESCE(pr.daysold, 0) as days_old,
-                    COALESCE(pr.last_active, 0) as last_active,
-                    tf.follow_status, 
-                    tf.created_at, 
-                    tf.updated_at
-                FROM thread_follow tf
-                LEFT JOIN post_ranking pr ON tf.thread_id = pr.thread_id OR tf.url = pr.url
-                WHERE tf.follow_status = ?
-                ORDER BY tf.created_at DESC
-            """
-            
-            cursor.execute(query, (status,))
-            rows = cursor.fetchall()
-            
-            conn.close()
+            try:
+                rows = list_follows(conn, status)
+            finally:
+                conn.close()
             
             return jsonify({
                 "data": rows,
@@ -498,69 +475,16 @@ def thread_follows():
             data = request.get_json()
             if not data or 'thread_id' not in data or 'type' not in data:
                 return jsonify({"error": "缺少必要参数"}), 400
-                
-            thread_id = data['thread_id']
-            follow_type = data['type']
-            
-            conn = get_db_connection()
-            cursor = conn.cursor()
             
-            # 更新关注状态
-            status = 'followed' if follow_type == 'my_follow' else 'my_thread'
-            now = datetime.now().isoformat()
+            if canonical_thread_id(data['thread_id']) is None:
+                return jsonify({"error": f"无效的thread_id: {data['thread_id']}"}), 400
             
-            # 检查是否已存在
-            cursor.execute("""
-                SELECT id FROM thread_follow 
-                WHERE thread_id = ?
-            """, (thread_id,))
-            
-            existing = cursor.fetchone()
-            
-            if existing:
-                # 更新状态
-                cursor.execute("""
-                    UPDATE thread_follow 
-                    SET follow_status = ?, updated_at = ?
-                    WHERE thread_id = ?
-                """, (status, now, thread_id))
-            else:
-                # 从post_ranking获取帖子信息
-                cursor.execute("""
-                    SELECT url, title, author, author_link
-                    FROM post_ranking
-                    WHERE thread_id = ?
-                """, (thread_id,))
-                
-                post_info = cursor.fetchone()
-                
-                if post_info:
-                    # 插入新记录
-                    cursor.execute("""
-                        INSERT INTO thread_follow (
-                            thread_id, url, title, author, author_link,
-                            follow_status, created_at, updated_at
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        thread_id,
-                        post_info['url'],  # 使用键名而不是索引
-                        post_info['title'],
-                        post_info['author'],
-                        post_info['author_link'],
-                        status,
-                        now,
-                        now
-                    ))
-                else:
-                    # 如果在post_ranking中找不到，使用基本信息创建
-                    cursor.execute("""
-                        INSERT INTO thread_follow (
-                            thread_id, follow_status, created_at, updated_at
-                        ) VALUES (?, ?, ?, ?)
-                    """, (thread_id, status, now, now))
-            
-            conn.commit()
-            conn.close()
+            status = follow_status_for(data['type'])
+            conn = get_db_connection()
+            try:
+                follow_threads(conn, [data['thread_id']], status)
+            finally:
+                conn.close()
             
             return jsonify({
                 "message": "关注成功",
@@ -575,57 +499,25 @@ def thread_follows():
             thread_id = data.get('thread_id')
             title = data.get('title')
             url = data.get('url')
-            follow_type = data.get('type', 'my_follow')
+            status = follow_status_for(data.get('type', 'my_follow'))
             
             # 至少需要提供一个标识符
             if not thread_id and not title and not url:
                 return jsonify({"error": "缺少必要参数，请提供thread_id, title或url"}), 400
-                
-            conn = get_db_connection()
-            cursor = conn.cursor()
             
-            # 根据类型确定状态
-            status = 'followed' if follow_type == 'my_follow' else 'my_thread'
-            
-            # 构建查询条件
-            where_clause = "follow_status = ?"
-            params = [status]
-            
-            if thread_id:
-                # 同时匹配数字形式和字符串形式的thread_id
-                where_clause += " AND (thread_id = ? OR thread_id LIKE ?)" 
-                params.extend([thread_id, f"%{thread_id}%"])
-            
-            if title:
-                where_clause += " AND title LIKE ?"
-                params.append(f"%{title}%")
-                
-            if url:
-                where_clause += " AND url LIKE ?"
-                params.append(f"%{url}%")
-            
-            # 获取要删除的记录ID
-            query = f"SELECT id FROM thread_follow WHERE {where_clause}"
-            logger.info(f"查询语句: {query}, 参数: {params}")
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
+            conn = get_db_connection()
+            try:
+                affected_rows = delete_follow(conn, status, thread_id=thread_id, url=url, title=title)
+            finally:
+                conn.close()
             
-            if rows:
-                ids = [row['id'] for row in rows]
-                placeholders = ', '.join(['?' for _ in ids])
-                # 删除符合条件的记录
-                cursor.execute(f"DELETE FROM thread_follow WHERE id IN ({placeholders})", ids)
-                conn.commit()
-                affected_rows = conn.total_changes
+            if affected_rows:
                 logger.info(f"已删除{affected_rows}条关注记录")
-                
-                conn.close()
                 return jsonify({
                     "message": f"成功取消关注，共删除{affected_rows}条记录",
                     "affected_rows": affected_rows
                 })
             else:
-                conn.close()
                 logger.warning(f"未找到符合条件的关注记录: thread_id={thread_id}, title={title}, url={url}, status={status}")
                 return jsonify({
                     "message": "未找到符合条件的关注记录",
@@ -636,127 +528,91 @@ def thread_follows():
         logger.error(f"处理关注请求失败: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route(f'{API_PREFIX}/thread-follows/batch', methods=['POST'])
+def thread_follows_batch():
+    """批量关注或取消关注，所有帖子在一个事务中处理"""
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('thread_ids'), list):
+            return jsonify({"error": "缺少必要参数thread_ids"}), 400
+        
+        action = data.get('action', 'follow')
+        if action not in ('follow', 'unfollow'):
+            return jsonify({"error": f"不支持的操作: {action}"}), 400
+        
+        thread_ids = data['thread_ids']
+        if len(thread_ids) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"单次最多处理{MAX_BATCH_SIZE}个帖子"}), 400
+        
+        status = follow_status_for(data.get('type', 'my_follow'))
+        conn = get_db_connection()
+        try:
+            if action == 'follow':
+                result = follow_threads(conn, thread_ids, status)
+            else:
+                result = unfollow_threads(conn, thread_ids, status)
+        finally:
+            conn.close()
+        
+        result.update({"action": action, "status": status})
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"批量处理关注请求失败: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route(f'{API_PREFIX}/thread-follows/state', methods=['GET', 'POST'])
+def thread_follows_state():
+    """批量查询帖子的关注状态，GET使用逗号分隔的thread_ids，POST使用JSON数组"""
+    try:
+        if request.method == 'POST':
+            thread_ids = (request.get_json() or {}).get('thread_ids') or []
+        else:
+            thread_ids = [t for t in request.args.get('thread_ids', '').split(',') if t]
+        
+        if len(thread_ids) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"单次最多查询{MAX_BATCH_SIZE}个帖子"}), 400
+        
+        conn = get_db_connection()
+        try:
+            states = get_follow_states(conn, thread_ids)
+        finally:
+            conn.close()
+        
+        return jsonify({"data": states, "total": len(states)})
+    except Exception as e:
+        logger.error(f"查询关注状态失败: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route(f'{API_PREFIX}/action-logs', methods=['GET'])
 def action_logs():
-    """操作日志（兼容旧API）"""
+    """操作日志（兼容旧API），支持页码分页和 cursor 游标分页"""
     try:
         # 获取请求参数
         thread_id = request.args.get('thread_id')
         url = request.args.get('url')
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 10, type=int)
+        cursor = request.args.get('cursor')
         
         # 至少需要提供thread_id或url参数之一
         if not thread_id and not url:
             return jsonify({"error": "请提供thread_id或url参数"}), 400
         
-        # 调试日志
-        logger.info(f"接收到action_logs请求: thread_id={thread_id}, url={url}, page={page}, limit={limit}")
+        logger.debug(f"接收到action_logs请求: thread_id={thread_id}, url={url}, page={page}, limit={limit}, cursor={cursor}")
         
-        # 优先使用thread_id，如果有的话
-        conn = get_db_connection()
-        # 使用dict_factory确保输出为字典
-        conn.row_factory = dict_factory
-        cursor = conn.cursor()
+        # thread_id和url都转换为整数thread_key，走 (thread_key, action_time) 组合索引
+        thread_key = canonical_thread_id(thread_id)
+        if thread_key is None:
+            thread_key = canonical_thread_id(url)
         
+        conn = get_db_connection()
         try:
-            # 先检查post_history表是否存在
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='post_history'")
-            if not cursor.fetchone():
-                logger.warning("post_history表不存在")
-                return jsonify({"data": [], "total": 0, "page": page, "limit": limit})
-            
-            # 构建查询条件 - 优先使用thread_id
-            params = []
-            if thread_id:
-                # 使用字符串匹配，因为数据库中thread_id是TEXT类型
-                where_str = "thread_id = ?"
-                params.append(str(thread_id))
-                
-                # 检查是否有匹配的记录
-                cursor.execute(f"SELECT COUNT(*) as count FROM post_history WHERE {where_str}", params)
-                result = cursor.fetchone()
-                count = result['count'] if result else 0
-                
-                # 如果没有记录，尝试模糊匹配URL
-                if count == 0 and url:
-                    params = []
-                    where_str = "url LIKE ?"
-                    params.append(f"%{url}%")
-                    
-                    # 再次检查是否有匹配记录
-                    cursor.execute(f"SELECT COUNT(*) as count FROM post_history WHERE {where_str}", params)
-                    result = cursor.fetchone()
-                    count = result['count'] if result else 0
-                    
-                    if count == 0:
-                        # 如果仍然没有找到记录，返回空结果
-                        logger.warning(f"未找到thread_id={thread_id}或url包含{url}的记录")
-                        return jsonify({"data": [], "total": 0, "page": page, "limit": limit})
-            else:
-                # URL可能是完整URL或部分URL
-                where_str = "url LIKE ?"
-                params.append(f"%{url}%")
-            
-            # 查询总记录数
-            count_sql = f"SELECT COUNT(*) as count FROM post_history WHERE {where_str}"
-            cursor.execute(count_sql, params)
-            result = cursor.fetchone()
-            total = result['count'] if result else 0
-            
-            logger.info(f"找到 {total} 条与条件匹配的记录")
-            
-            # 计算分页
-            offset = (page - 1) * limit
-            
-            # 查询数据
-            data_sql = f"""
-            SELECT * FROM post_history 
-            WHERE {where_str}
-            ORDER BY action_time DESC
-            LIMIT ? OFFSET ?
-            """
-            
-            # 使用列表拼接参数
-            all_params = params + [limit, offset]
-            logger.info(f"执行查询: {data_sql}, 参数: {all_params}")
-            
-            cursor.execute(data_sql, all_params)
-            rows = cursor.fetchall()
-            
-            # 处理结果
-            result = []
-            for row in rows:
-                # row是字典，直接添加
-                item = dict(row)
-                
-                # 将'action'映射为'event_type'以兼容前端
-                if 'action' in item:
-                    item['event_type'] = item['action']
-                if 'action_time' in item:
-                    item['event_time'] = item['action_time']
-                
-                result.append(item)
-            
-            # 调试日志
-            logger.info(f"查询到 {len(result)} 条帖子历史记录, 总计 {total} 条")
-            
-            # 关闭连接
-            conn.close()
-            
-            # 返回标准格式数据
-            return jsonify({
-                "data": result,
-                "total": total,
-                "page": page,
-                "limit": limit
-            })
-            
+            result = get_action_logs(conn, thread_key=thread_key, url=url or thread_id,
+                                     page=page, limit=limit, cursor=cursor, fields=request_fields())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             logger.error(f"查询action_logs出错: {str(e)}")
-            if conn:
-                conn.close()
-            
             # 返回空数据而不是500错误，保证前端能正常显示
             return jsonify({
                 "data": [],
@@ -765,6 +621,11 @@ def action_logs():
                 "limit": limit,
                 "error": f"数据库查询错误: {str(e)}"
             })
+        finally:
+            conn.close()
+        
+        logger.debug(f"查询到 {len(result['data'])} 条帖子历史记录, 总计 {result['total']} 条")
+        return jsonify(result)
             
     except Exception as e:
         logger.error(f"获取操作日志失败: {str(e)}")
@@ -779,95 +640,22 @@ def action_logs():
 
 @app.route(f'{API_PREFIX}/author-post-history', methods=['GET'])
 def author_post_history():
-    """获取作者的发帖历史"""
+    """获取作者的发帖历史（预先计算的 author_posts 表），支持页码分页和 cursor 游标分页"""
     try:
         author = request.args.get('author')
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 10, type=int)
+        cursor = request.args.get('cursor')
         
         if not author:
             return jsonify({"error": "请提供作者参数"}), 400
         
         conn = get_db_connection()
-        cursor = conn.cursor()
         
         try:
-            # 1. 获取所有帖子 (从posts表中作者的所有帖子)
-            cursor.execute("""
-                SELECT url, title, post_time 
-                FROM posts 
-                WHERE author = ? 
-                GROUP BY url
-            """, (author,))
-            all_posts = cursor.fetchall()
-            
-            # 将所有帖子转换为字典
-            all_posts_dict = {}
-            for post in all_posts:
-                url = post['url']
-                all_posts_dict[url] = {
-                    'url': url,
-                    'title': post['title'] or '无标题',
-                    'post_time': post['post_time'],
-                    'is_active': False  # 初始设置为非活跃
-                }
-            
-            # 2. 获取活跃帖子 (在list表最新抓取日期中存在的帖子)
-            # 首先获取最新的scraping_time_R
-            cursor.execute("SELECT MAX(scraping_time_R) as latest_time FROM list")
-            latest_time_result = cursor.fetchone()
-            latest_time = latest_time_result['latest_time'] if latest_time_result else None
-            print(f"最新抓取时间(scraping_time_R): {latest_time}")
-            
-            cursor.execute("""
-                SELECT DISTINCT url FROM list 
-                WHERE author = ? AND scraping_time_R = (
-                    SELECT MAX(scraping_time_R) FROM list
-                )
-            """, (author,))
-            active_posts = cursor.fetchall()
-            
-            # 记录调试信息
-            print(f"作者 {author} 的活跃帖子数量: {len(active_posts)}")
-            if active_posts:
-                print(f"活跃帖子URL示例: {active_posts[0]['url'] if len(active_posts) > 0 else 'None'}")
-            
-            # 标记活跃帖子
-            for post in active_posts:
-                if post['url'] in all_posts_dict:
-                    all_posts_dict[post['url']]['is_active'] = True
-            
-            # 将字典转换回列表并按post_time倒序排序
-            result_posts = list(all_posts_dict.values())
-            result_posts.sort(key=lambda x: x['post_time'] if x['post_time'] else '', reverse=True)
-            
-            # 计算总数量
-            total_count = len(result_posts)
-            
-            # 分页处理
-            start_idx = (page - 1) * limit
-            end_idx = start_idx + limit
-            paged_posts = result_posts[start_idx:end_idx] if start_idx < total_count else []
-            
-            # 格式化返回数据
-            response_data = {
-                "data": paged_posts,
-                "total": total_count,
-                "page": page,
-                "limit": limit
-            }
-            
-            # 添加调试信息
-            # 统计不活跃帖子数量
-            inactive_posts = sum(1 for post in result_posts if not post['is_active'])
-            response_data["debug"] = {
-                "total_posts": total_count,
-                "active_posts": total_count - inactive_posts,
-                "inactive_posts": inactive_posts
-            }
-            
-            return jsonify(response_data)
-        
+            return jsonify(get_author_posts(conn, author, page=page, limit=limit, cursor=cursor))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             logger.error(f"查询作者发帖历史出错: {str(e)}")
             return jsonify({
@@ -893,50 +681,30 @@ def author_post_history():
 
 @app.route(f'{API_PREFIX}/post-rank/batch', methods=['POST'])
 def post_rank_batch():
-    """批量获取帖子排行数据"""
+    """批量获取帖子排行数据（thread_ids 可混合帖子ID和URL），按输入顺序返回并列出未找到的标识"""
     try:
         data = request.get_json()
         if not data or 'thread_ids' not in data:
             return jsonify({"error": "请提供thread_ids参数"}), 400
             
         thread_ids = data['thread_ids']
+        if not isinstance(thread_ids, list):
+            return jsonify({"error": "thread_ids必须是数组"}), 400
         if not thread_ids:
-            return jsonify({"data": [], "total": 0})
-            
-        # 构建查询条件
-        placeholders = ','.join(['?' for _ in thread_ids])
-        query = f"""
-            SELECT thread_id, url, title, author, author_link, 
-                   repost_count, reply_count, delete_reply_count,
-                   daysold, last_active
-            FROM post_ranking 
-            WHERE thread_id IN ({placeholders})
-            OR url IN ({placeholders})
-        """
+            return jsonify({"data": [], "total": 0, "missing": []})
         
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 执行查询，参数需要传递两次因为有两个IN条件
-        cursor.execute(query, thread_ids + thread_ids)
-        rows = cursor.fetchall()
-        
-        # 获取列名
-        columns = [description[0] for description in cursor.description]
-        
-        # 转换为字典列表
-        result = []
-        for row in rows:
-            item = {}
-            for i, column in enumerate(columns):
-                item[column] = row[i]
-            result.append(item)
-            
-        conn.close()
+        try:
+            result = batch_lookup(conn, 'post_ranking', thread_ids, POST_RANK_BATCH_COLUMNS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        finally:
+            conn.close()
         
         return jsonify({
-            "data": result,
-            "total": len(result)
+            "data": result['data'],
+            "total": len(result['data']),
+            "missing": result['missing']
         })
         
     except Exception as e:
@@ -946,94 +714,30 @@ def post_rank_batch():
 # 汽车信息API
 @app.route(f'{API_PREFIX}/cars', methods=['GET'])
 def get_cars():
-    """获取汽车信息列表"""
+    """获取汽车信息列表（分页、关键词全文检索、数值范围过滤）"""
     try:
-        # 获取请求参数
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 5000, type=int)  # 默认值改为5000
-        offset = (page - 1) * limit
-        
-        # 搜索参数
-        make = request.args.get('make', '')
-        model = request.args.get('model', '')
-        year_min = request.args.get('year_min', '')
-        year_max = request.args.get('year_max', '')
-        price_min = request.args.get('price_min', '')
-        price_max = request.args.get('price_max', '')
-        sort_field = request.args.get('sort_field', 'id')
-        sort_order = request.args.get('sort_order', 'desc')
-        
-        # 连接数据库
         conn = get_db_connection()
-        conn.row_factory = dict_factory
-        cursor = conn.cursor()
-        
-        # 构建SQL条件
-        conditions = []
-        params = []
-        
-        if make:
-            conditions.append("make LIKE ?")
-            params.append(f"%{make}%")
-        
-        if model:
-            conditions.append("model LIKE ?")
-            params.append(f"%{model}%")
-        
-        if year_min:
-            conditions.append("year >= ?")
-            params.append(year_min)
-        
-        if year_max:
-            conditions.append("year <= ?")
-            params.append(year_max)
-        
-        if price_min:
-            conditions.append("price >= ?")
-            params.append(price_min)
-        
-        if price_max:
-            conditions.append("price <= ?")
-            params.append(price_max)
-        
-        # 构建WHERE子句
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-        
-        # 获取总记录数
-        cursor.execute(f"SELECT COUNT(*) as total FROM car_info WHERE {where_clause}", params)
-        total = cursor.fetchone()['total']
-        
-        # 获取分页数据
-        query = f"""
-        SELECT * FROM car_info 
-        WHERE {where_clause} 
-        ORDER BY {sort_field} {sort_order} 
-        LIMIT ? OFFSET ?
-        """
-        cursor.execute(query, params + [limit, offset])
-        cars = cursor.fetchall()
-        
-        # 获取所有可用品牌和型号（用于过滤）
-        cursor.execute("SELECT DISTINCT make FROM car_info WHERE make IS NOT NULL AND make != '-' ORDER BY make")
-        makes = [row['make'] for row in cursor.fetchall()]
-        
-        cursor.execute("SELECT DISTINCT model FROM car_info WHERE model IS NOT NULL AND model != '-' ORDER BY model")
-        models = [row['model'] for row in cursor.fetchall()]
-        
-        conn.close()
-        
-        # 组装返回数据
-        response = {
-            'data': cars,
-            'meta': {
-                'total': total,
-                'page': page,
-                'limit': limit,
-                'pages': (total + limit - 1) // limit,
-                'makes': makes,
-                'models': models
-            }
-        }
+        try:
+            response = search_cars(
+                conn,
+                keyword=request.args.get('q', ''),
+                make=request.args.get('make', ''),
+                model=request.args.get('model', ''),
+                trade_type=request.args.get('trade_type', ''),
+                year_min=request.args.get('year_min', type=int),
+                year_max=request.args.get('year_max', type=int),
+                price_min=request.args.get('price_min', type=float),
+                price_max=request.args.get('price_max', type=float),
+                miles_min=request.args.get('miles_min', type=float),
+                miles_max=request.args.get('miles_max', type=float),
+                sort_field=request.args.get('sort_field', 'id'),
+                sort_order=request.args.get('sort_order', 'desc'),
+                page=request.args.get('page', 1, type=int),
+                limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+                fields=request_fields(),
+            )
+        finally:
+            conn.close()
         
         return jsonify(response)
     except Exception as e:
@@ -1066,13 +770,14 @@ def get_car_detail(car_id):
         if not car:
             return jsonify({'error': f'找不到ID为{car_id}的汽车信息'}), 404
         
-        # 查询相关帖子
-        cursor.execute("""
+        # 查询相关帖子（按整数thread_key关联）
+        thread_key = car.get('thread_key') or canonical_thread_id(car.get('thread_id')) or canonical_thread_id(car['url'])
+        cursor.execute(f"""
         SELECT p.*, a.name as author_name 
         FROM posts p
         LEFT JOIN authors a ON p.author_id = a.id
-        WHERE p.url = ?
-        """, (car['url'],))
+        WHERE {thread_key_expr(conn, 'posts', 'p')} = ?
+        """, (thread_key,))
         post = cursor.fetchone()
         
         conn.close()
@@ -1088,14 +793,15 @@ def get_car_detail(car_id):
         logger.error(f"获取汽车详情失败: {str(e)}")
         return jsonify({'error': f'获取汽车详情失败: {str(e)}'}), 500
 
-# 启动服务
-    # 确保thread_follow表存在
-    create_thread_follow_table()
+# 启动开发服务器（生产环境使用 serve.py）
 if __name__ == '__main__':
+    configure_logging()
+    bootstrap_database()
+    
     # 从环境变量获取主机和端口
     host = os.environ.get('FLASK_HOST', '0.0.0.0')
     port = int(os.environ.get('FLASK_PORT', 5000))
-    debug = os.environ.get('FLASK_DEBUG', 'True').lower() in ('true', '1', 't')
+    debug = os.environ.get('FLASK_DEBUG', 'False').lower() in ('true', '1', 't')
     
-    logger.info(f"启动服务，监听: {host}:{port}, 调试模式: {debug}")
-    app.run(host=host, port=port, debug=debug) 
\ No newline at end of file
+    logger.info(f"启动开发服务器，监听: {host}:{port}, 调试模式: {debug}")
+    app.run(host=host, port=port, debug=debug, threaded=True) 
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+作者排名增量更新性能测试脚本
+
+在临时数据库中生成 post/post_ranking/author_ranking（默认10万个作者），模拟一次增量更新
+（部分帖子有新快照、新增一批帖子），对比 sql/incremental_update.sql 中作者排名部分的:
+1. 旧实现: 按 (author, author_link) 分组全部帖子，每个作者两次相关子查询取最新帖子的URL和标题
+2. 新实现: 只重新计算本次有变化的作者，ROW_NUMBER() 窗口函数一次选出每个作者的最新帖子
+
+并检查两种实现得到的作者排名相同。
+
+用法: python benchmark_author_ranking.py [--authors 100000] [--posts-per-author 3] [--changed 0.01] [--new-posts 2000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from modules.sql_runner import format_report, run_sql_script, split_sql_statements
+
+SQL_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql', 'incremental_update.sql')
+
+# 新实现用到的临时表，用于从脚本中挑出作者排名相关的语句
+AUTHOR_STEP_MARKERS = ('touched_authors', 'author_latest_post', 'author_stats', 'author_ranking_refresh')
+
+# 改写前 incremental_update.sql 的作者排名部分
+LEGACY_AUTHOR_RANKING_SQL = """
+INSERT OR REPLACE INTO author_ranking (
+    author, author_link, url, title, days_old, last_active,
+    active_posts, repost_count, reply_count, delete_count,
+    created_at, updated_at
+)
+SELECT
+    p.author,
+    p.author_link,
+    (SELECT url FROM post_ranking WHERE author = p.author ORDER BY last_active DESC LIMIT 1),
+    (SELECT title FROM post_ranking WHERE author = p.author ORDER BY last_active DESC LIMIT 1),
+    MIN(CAST(JULIANDAY('now') - JULIANDAY(p.post_time) AS INTEGER)) as days_old,
+    MAX(CAST(JULIANDAY(p.scraping_time) - JULIANDAY('1970-01-01') AS INTEGER)) as last_active,
+    COUNT(DISTINCT p.url) as active_posts,
+    COALESCE(ar.repost_count, 0) as repost_count,
+    SUM(p.reply_count) as reply_count,
+    COALESCE(ar.delete_count, 0) as delete_count,
+    COALESCE(ar.created_at, DATETIME('now')) as created_at,
+    DATETIME('now') as updated_at
+FROM post p
+LEFT JOIN author_ranking ar ON p.author = ar.author
+GROUP BY p.author, p.author_link;
+"""
+
+COMPARE_COLUMNS = ('author', 'author_link', 'url', 'title', 'days_old', 'last_active',
+                   'active_posts', 'repost_count', 'reply_count', 'delete_count')
+
+SCHEMA = """
+CREATE TABLE post (
+    url TEXT, title TEXT, author TEXT, author_link TEXT,
+    post_time TEXT, scraping_time TEXT, read_count INTEGER, reply_count INTEGER
+);
+CREATE TABLE post_ranking (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL, title TEXT NOT NULL, author TEXT NOT NULL, author_link TEXT, thread_id INTEGER,
+    days_old INTEGER NOT NULL DEFAULT 0, last_active INTEGER NOT NULL DEFAULT 0,
+    read_count INTEGER NOT NULL DEFAULT 0, reply_count INTEGER NOT NULL DEFAULT 0,
+    repost_count INTEGER NOT NULL DEFAULT 0, delete_count INTEGER NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE author_ranking (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    author TEXT NOT NULL, author_link TEXT, url TEXT, title TEXT,
+    days_old INTEGER NOT NULL DEFAULT 0, last_active INTEGER NOT NULL DEFAULT 0,
+    active_posts INTEGER NOT NULL DEFAULT 0, repost_count INTEGER NOT NULL DEFAULT 0,
+    reply_count INTEGER NOT NULL DEFAULT 0, delete_count INTEGER NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_post_ranking_url ON post_ranking(url);
+CREATE INDEX idx_post_ranking_author ON post_ranking(author);
+-- 旧实现依赖 INSERT OR REPLACE 按作者替换
+CREATE UNIQUE INDEX idx_author_ranking_author_unique ON author_ranking(author);
+"""
+
+
+def post_row(author_index, post_index, scraping_day):
+    url = f"https://www.chineseinla.com/f/page_viewtopic/t_{author_index * 100 + post_index}.html"
+    return (
+        url, f"帖子 {author_index}-{post_index}", f"author{author_index}",
+        f"https://www.chineseinla.com/user/id_{author_index}.html",
+        f"2025-01-{1 + (author_index + post_index) % 28:02d} 10:00:00",
+        f"2025-{scraping_day} {post_index % 24:02d}:{author_index % 60:02d}:00",
+        random.randint(0, 1000), random.randint(0, 50),
+    )
+
+
+def create_database(db_path, authors, posts_per_author, changed, new_posts):
+    """生成上一次更新后的状态，再写入本次抓取的新快照和新帖子"""
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO post VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (
+        post_row(a, p, '02-28') for a in range(authors) for p in range(posts_per_author)
+    ))
+    # 上一次更新的结果: post_ranking 的 updated_at 晚于当时的抓取时间
+    conn.execute("""
+        INSERT INTO post_ranking (url, title, author, author_link, days_old, last_active, read_count, reply_count,
+                                  created_at, updated_at)
+        SELECT url, title, author, author_link,
+               CAST(JULIANDAY('now') - JULIANDAY(post_time) AS INTEGER),
+               CAST(JULIANDAY(scraping_time) - JULIANDAY('1970-01-01') AS INTEGER) * 100 + rowid % 100,
+               read_count, reply_count, '2025-03-01 00:00:00', '2025-03-01 00:00:00'
+        FROM post
+    """)
+    conn.execute(LEGACY_AUTHOR_RANKING_SQL)
+    conn.execute("UPDATE author_ranking SET repost_count = id % 7, delete_count = id % 3")
+
+    # 本次抓取: 部分帖子有新快照，新增一批帖子（一半属于新作者）
+    conn.execute("UPDATE post SET scraping_time = '2025-03-02 08:00:00', reply_count = reply_count + 1 "
+                 "WHERE abs(random()) % ? = 0", (max(int(1 / changed), 1),))
+    conn.executemany("INSERT INTO post VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (
+        post_row(random.randrange(authors) if i % 2 else authors + i, posts_per_author + i, '03-02')
+        for i in range(new_posts)
+    ))
+    conn.commit()
+    conn.close()
+
+
+def author_statements():
+    """incremental_update.sql 中作者排名相关的语句（第0步和第3步）"""
+    with open(SQL_FILE, 'r', encoding='utf-8') as f:
+        statements = split_sql_statements(f.read())
+    return [
+        statement for statement in statements
+        if any(marker in statement for marker in AUTHOR_STEP_MARKERS) or 'CREATE INDEX' in statement.upper()
+    ]
+
+
+def snapshot(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(f"SELECT {', '.join(COMPARE_COLUMNS)} FROM author_ranking ORDER BY author").fetchall()
+    conn.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='作者排名增量更新性能测试')
+    parser.add_argument('--authors', type=int, default=100000, help='作者数')
+    parser.add_argument('--posts-per-author', type=int, default=3, help='每个作者的帖子数')
+    parser.add_argument('--changed', type=float, default=0.01, help='有新快照的帖子比例')
+    parser.add_argument('--new-posts', type=int, default=2000, help='新增帖子数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='author_ranking_')
+    try:
+        base_path = os.path.join(workdir, 'base.db')
+        started = time.perf_counter()
+        create_database(base_path, args.authors, args.posts_per_author, args.changed, args.new_posts)
+        print(f"生成测试数据库: {args.authors} 个作者, 每人 {args.posts_per_author} 帖, "
+              f"{args.changed:.0%} 帖子有新快照, 新增 {args.new_posts} 帖, 耗时 {time.perf_counter() - started:.1f} 秒\n")
+
+        legacy_path = os.path.join(workdir, 'legacy.db')
+        new_path = os.path.join(workdir, 'new.db')
+        shutil.copyfile(base_path, legacy_path)
+        shutil.copyfile(base_path, new_path)
+
+        conn = sqlite3.connect(legacy_path)
+        started = time.perf_counter()
+        conn.execute(LEGACY_AUTHOR_RANKING_SQL)
+        conn.commit()
+        legacy_seconds = time.perf_counter() - started
+        conn.close()
+
+        statements = author_statements()
+        index_sql = '\n'.join(s for s in statements if 'CREATE INDEX' in s.upper())
+        refresh_sql = '\n'.join(s for s in statements if 'CREATE INDEX' not in s.upper())
+        conn = sqlite3.connect(new_path)
+        index_report = run_sql_script(conn, index_sql, '支撑索引（只在首次运行时创建）')
+        report = run_sql_script(conn, refresh_sql, '新实现', stop_on_error=True,
+                                explain_tables=['post', 'post_ranking', 'author_ranking'])
+        touched = sum(entry['rows'] for entry in report['statements'] if entry['sql'].startswith('INSERT INTO author_ranking'))
+        conn.close()
+
+        print(f"旧实现: {legacy_seconds:.3f} 秒（重新计算全部作者）")
+        print(f"新实现: {report['seconds']:.3f} 秒（重新计算 {touched} 个作者）, 加速 {legacy_seconds / max(report['seconds'], 1e-9):.1f} 倍")
+        print(f"创建支撑索引: {index_report['seconds']:.3f} 秒\n")
+        print(format_report(report, top=10))
+
+        same = snapshot(legacy_path) == snapshot(new_path)
+        print(f"\n结果一致: {'是' if same else '否'}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
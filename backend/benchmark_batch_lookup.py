@@ -0,0 +1,120 @@
+"""
+批量帖子排行查询性能测试脚本
+
+在临时数据库中生成 post_ranking，对比:
+1. 旧实现: thread_id IN (...) OR url IN (...)，所有标识作为变量传入（超过变量上限时直接失败）
+2. 新实现: 标识写入临时表后分块连接查询，thread_key 和 url 都走索引（部分URL无法解析出帖子ID，按 url 查询）
+
+并检查新实现的耗时随标识数量线性增长。
+
+用法: python benchmark_batch_lookup.py [--posts 100000] [--sizes 1000,10000,50000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from modules.batch_lookup import batch_lookup
+from modules.db_utils import dict_factory
+from modules.thread_ids import backfill_thread_keys
+
+THREAD_BASE = 2800000
+
+COLUMNS = ['thread_id', 'url', 'title', 'author', 'author_link',
+           'repost_count', 'reply_count', 'delete_reply_count', 'daysold', 'last_active']
+
+
+def thread_url(thread_id):
+    """帖子URL；每10个帖子有一个使用无法解析出帖子ID的旧格式，批量查询时走 url 分支"""
+    if thread_id % 10 == 0:
+        return f"https://www.chineseinla.com/f/page_viewpost/p_{thread_id}.html"
+    return f"https://www.chineseinla.com/f/page_viewtopic/t_{thread_id}.html"
+
+
+def create_ranking(db_path, posts):
+    """生成与 import_csv_to_temp 导入结果相同结构的 post_ranking（TEXT列，带 thread_key 索引）"""
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"CREATE TABLE post_ranking ({', '.join(f'{c} TEXT' for c in COLUMNS)})")
+    rows = []
+    for i in range(posts):
+        thread_id = THREAD_BASE + i
+        rows.append((
+            str(thread_id),
+            thread_url(thread_id),
+            f"帖子 {thread_id}", f"author{i % 500}", f"https://www.chineseinla.com/user/id_{i % 500}.html",
+            str(random.randint(0, 100)), str(random.randint(0, 50)), "0",
+            str(random.randint(0, 365)), str(random.randint(0, 30)),
+        ))
+    conn.executemany(f"INSERT INTO post_ranking VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+    backfill_thread_keys(conn, ['post_ranking'])
+    conn.commit()
+    conn.close()
+
+
+def make_identifiers(size, posts):
+    """一半帖子ID、一半URL（其中约十分之一无法解析出帖子ID，按 url 查询），另加约1%不存在的帖子"""
+    identifiers = []
+    for i in range(size):
+        thread_id = THREAD_BASE + random.randrange(int(posts * 1.01))
+        if i % 2:
+            identifiers.append(str(thread_id))
+        else:
+            identifiers.append(thread_url(thread_id))
+    return identifiers
+
+
+def legacy_lookup(conn, identifiers):
+    """旧接口的查询方式"""
+    placeholders = ','.join('?' for _ in identifiers)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(f"""
+        SELECT {', '.join(COLUMNS)} FROM post_ranking
+        WHERE thread_id IN ({placeholders}) OR url IN ({placeholders})
+    """, identifiers + identifiers)
+    columns = [description[0] for description in cursor.description]
+    return [{column: row[i] for i, column in enumerate(columns)} for row in cursor.fetchall()]
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量帖子排行查询性能测试')
+    parser.add_argument('--posts', type=int, default=100000, help='post_ranking 行数')
+    parser.add_argument('--sizes', default='1000,10000,50000', help='每次查询的标识数量')
+    args = parser.parse_args()
+
+    random.seed(42)
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'ranking.db')
+        create_ranking(db_path, args.posts)
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = dict_factory
+        print(f"post_ranking: {args.posts} 行\n")
+        print(f"{'标识数':>8} {'旧实现(ms)':>12} {'新实现(ms)':>12} {'每千个(ms)':>12} {'找到':>8} {'缺失':>6}")
+
+        for size in sizes:
+            identifiers = make_identifiers(size, args.posts)
+            try:
+                _, legacy_ms = timed(lambda: legacy_lookup(conn, identifiers))
+                legacy_text = f"{legacy_ms:12.1f}"
+            except sqlite3.OperationalError as e:
+                legacy_text = f"{'失败':>10}"
+                print(f"  旧实现失败: {e}")
+            result, new_ms = timed(lambda: batch_lookup(conn, 'post_ranking', identifiers, COLUMNS))
+            print(f"{size:>8} {legacy_text} {new_ms:12.1f} {new_ms / size * 1000:12.2f} "
+                  f"{len(result['data']):>8} {len(result['missing']):>6}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+list 表按月分区和降采样的空间和查询性能测试脚本
+
+把数据库复制到临时目录两份，一份保持原样，另一份按保留策略分区（modules.partitions），比较:
+1. 空间: 原 list 表 与 分区后原表加各月分区 占用的页面大小（dbstat）
+2. 查询: 几个按时间聚合的查询分别在原 list 表和 list_all 视图上的耗时，并检查结果相同
+3. 最新抓取时间: MAX(scraping_time_R) 扫描 与 latest_time()（原表索引加分区元信息）
+
+用法: python benchmark_partitions.py [--db-path db/forum_data.db] [--repeat 3] [--raw-days 7] [--hourly-days 30]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from modules.partitions import (DEFAULT_HOURLY_DAYS, DEFAULT_RAW_DAYS, latest_time, partition_names, partition_table,
+                                pruned_source, view_name)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db', 'forum_data.db')
+
+# (名称, 查询模板)，{source} 分别替换为原 list 表和 list_all 视图，两边结果应相同
+QUERIES = [
+    ("每天各更新原因的次数",
+     """SELECT DATE(list_time), update_reason, COUNT(*) FROM {source}
+        WHERE update_reason IN ('重发', '回帖', '删回帖') GROUP BY 1, 2 ORDER BY 1, 2"""),
+    ("每个帖子每天的最大浏览量",
+     """SELECT DATE(list_time), url, MAX(read_count) FROM {source}
+        WHERE list_time IS NOT NULL GROUP BY 1, 2 ORDER BY 1, 2"""),
+    ("每个帖子出现过的日期数",
+     """SELECT thread_key, COUNT(DISTINCT SUBSTR(scraping_time_R, 1, 10)) FROM {source}
+        WHERE thread_key IS NOT NULL GROUP BY 1 ORDER BY 1"""),
+]
+
+
+def table_sizes(conn):
+    """各表（含索引）占用的字节数"""
+    sizes = {}
+    rows = conn.execute("""
+        SELECT COALESCE(m.tbl_name, d.name), SUM(d.pgsize)
+        FROM dbstat d LEFT JOIN sqlite_master m ON m.name = d.name
+        GROUP BY 1
+    """).fetchall()
+    for table, size in rows:
+        sizes[table] = size
+    return sizes
+
+
+def best_of(repeat, func):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='list 表按月分区性能测试')
+    parser.add_argument('--db-path', default=DEFAULT_DB_PATH, help='包含 list 表的数据库')
+    parser.add_argument('--repeat', type=int, default=3, help='每条查询计时的次数（取最快一次）')
+    parser.add_argument('--raw-days', type=int, default=DEFAULT_RAW_DAYS, help='保留15分钟快照的天数')
+    parser.add_argument('--hourly-days', type=int, default=DEFAULT_HOURLY_DAYS, help='按小时降采样的天数')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_path):
+        print(f"数据库文件不存在: {args.db_path}")
+        return
+
+    workdir = tempfile.mkdtemp(prefix='partitions_')
+    try:
+        source = sqlite3.connect(args.db_path)
+        plain = sqlite3.connect(os.path.join(workdir, 'plain.db'))
+        conn = sqlite3.connect(os.path.join(workdir, 'partitioned.db'))
+        source.backup(plain)
+        source.backup(conn)
+        source.close()
+
+        started = time.perf_counter()
+        result = partition_table(conn, 'list', raw_days=args.raw_days, hourly_days=args.hourly_days)
+        conn.commit()
+        if not result:
+            print("list 表不存在或缺少必要的列")
+            return
+        print(f"分区: {time.perf_counter() - started:.2f} 秒, 移出 {result['moved']} 行到 {result['partitions']} 个月分区, "
+              f"降采样删除 {result['removed']} 行")
+        started = time.perf_counter()
+        partition_table(conn, 'list', raw_days=args.raw_days, hourly_days=args.hourly_days)
+        conn.commit()
+        print(f"重复执行: {time.perf_counter() - started:.2f} 秒")
+
+        before = plain.execute("SELECT COUNT(*) FROM list").fetchone()[0]
+        hot = conn.execute("SELECT COUNT(*) FROM list").fetchone()[0]
+        total = conn.execute(f"SELECT COUNT(*) FROM {view_name('list')}").fetchone()[0]
+        print(f"行数: list {before} -> 原表 {hot} + 分区 {total - hot} = {total}\n")
+
+        try:
+            plain_sizes, sizes = table_sizes(plain), table_sizes(conn)
+        except sqlite3.OperationalError:
+            print("SQLite 未编译 dbstat，跳过空间统计\n")
+        else:
+            tables = ['list'] + partition_names(conn, 'list')
+            for table in tables:
+                print(f"  {table:<14} {sizes.get(table, 0) / (1024 * 1024):8.2f} MB")
+            after_size = sum(sizes.get(table, 0) for table in tables)
+            print(f"空间: list {plain_sizes.get('list', 0) / (1024 * 1024):.2f} MB -> "
+                  f"分区后 {after_size / (1024 * 1024):.2f} MB\n")
+
+        for name, sql in QUERIES:
+            plain_seconds, plain_rows = best_of(args.repeat, lambda: plain.execute(sql.format(source='list')).fetchall())
+            view_seconds, view_rows = best_of(args.repeat, lambda: conn.execute(
+                sql.format(source=view_name('list'))).fetchall())
+            print(f"{name}: list {plain_seconds * 1000:.1f} ms, list_all {view_seconds * 1000:.1f} ms, "
+                  f"加速 {plain_seconds / max(view_seconds, 1e-9):.1f} 倍, 结果一致: {'是' if plain_rows == view_rows else '否'}")
+
+        plain.execute("CREATE INDEX IF NOT EXISTS idx_list_scraping_time_R ON list(scraping_time_R)")
+        latest = latest_time(conn, 'list')
+        day = latest[:10]
+        range_sql = "SELECT COUNT(DISTINCT thread_key) FROM {source} WHERE scraping_time_R >= ? AND scraping_time_R < ?"
+        params = (f"{day} 00:00:00", f"{day} 23:59:59")
+        plain_seconds, plain_rows = best_of(args.repeat, lambda: plain.execute(
+            range_sql.format(source='list'), params).fetchall())
+        view_seconds, view_rows = best_of(args.repeat, lambda: conn.execute(
+            range_sql.format(source=pruned_source(conn, 'list', *params)), params).fetchall())
+        print(f"最新一天出现的帖子数（按时间范围裁剪分区）: list {plain_seconds * 1000:.1f} ms, "
+              f"分区 {view_seconds * 1000:.1f} ms, 结果一致: {'是' if plain_rows == view_rows else '否'}")
+
+        plain_seconds, plain_latest = best_of(args.repeat, lambda: plain.execute(
+            "SELECT MAX(scraping_time_R) FROM list").fetchone()[0])
+        view_seconds, view_latest = best_of(args.repeat, lambda: latest_time(conn, 'list'))
+        print(f"最新抓取时间: list {plain_seconds * 1000:.2f} ms, latest_time {view_seconds * 1000:.2f} ms, "
+              f"结果一致: {'是' if plain_latest == view_latest else '否'}")
+        plain.close()
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+原始抓取文件读取性能测试脚本
+
+对 data/raw 下的每日原始文件（默认三类各37天），比较:
+1. 原实现: 逐个文件、逐个工作表 pd.read_excel（py/post.py、py/update.py 的读取方式）
+2. 单进程流式读取: modules.raw_loader（calamine，未安装时用 openpyxl 只读模式）
+3. 进程池并行读取: modules.raw_loader.iter_raw_files
+
+输出每种方式的耗时和每秒文件数，并检查读取的行数相同。
+
+用法: python benchmark_raw_loader.py [--kind post_list] [--workers 4] [--engine openpyxl] [--skip-baseline]
+"""
+
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from modules.raw_loader import ENGINES, RAW_SCHEMAS, default_engine, iter_raw_files, raw_files
+
+
+def baseline(files):
+    """原实现的读取方式，返回总行数"""
+    rows = 0
+    for path in files:
+        excel_file = pd.ExcelFile(path)
+        for sheet_name in excel_file.sheet_names:
+            rows += len(pd.read_excel(excel_file, sheet_name=sheet_name))
+    return rows
+
+
+def loader(files, workers, engine):
+    rows = 0
+    for path, df in iter_raw_files(files, None, workers, engine):
+        rows += len(df)
+    return rows
+
+
+def measure(name, func, files, reference=None):
+    started = time.perf_counter()
+    rows = func()
+    seconds = time.perf_counter() - started
+    line = f"{name}: {seconds:.2f} 秒, {len(files) / seconds:.1f} 文件/秒, {rows} 行"
+    if reference is not None:
+        line += f", 加速 {reference / seconds:.1f} 倍"
+    print(line)
+    return seconds, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='原始抓取文件读取性能测试')
+    parser.add_argument('--kind', choices=list(RAW_SCHEMAS), help='只测试一类文件，默认三类全部')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='并行进程数')
+    parser.add_argument('--engine', choices=list(ENGINES), default=default_engine(), help='解析引擎')
+    parser.add_argument('--skip-baseline', action='store_true', help='不测试原实现（较慢）')
+    args = parser.parse_args()
+
+    kinds = [args.kind] if args.kind else list(RAW_SCHEMAS)
+    files = [path for kind in kinds for path in raw_files(kind)]
+    if not files:
+        print("data/raw 下没有原始文件")
+        return
+    size = sum(os.path.getsize(path) for path in files) / (1024 * 1024)
+    print(f"{len(files)} 个文件（{', '.join(kinds)}），共 {size:.1f} MB，引擎 {args.engine}，{args.workers} 个进程\n")
+
+    reference, expected = (None, None)
+    if not args.skip_baseline:
+        reference, expected = measure("原实现（逐表 pd.read_excel）", lambda: baseline(files), files)
+    _, streaming_rows = measure("单进程流式读取", lambda: loader(files, 1, args.engine), files, reference)
+    _, parallel_rows = measure(f"{args.workers} 进程并行读取", lambda: loader(files, args.workers, args.engine),
+                               files, reference)
+
+    counts = {rows for rows in (expected, streaming_rows, parallel_rows) if rows is not None}
+    print(f"\n行数一致: {'是' if len(counts) == 1 else '否'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+API响应层性能测试脚本
+
+对当前数据库（DATABASE_PATH 或 backend/db/forum_data.db）中的主要接口，比较:
+1. 响应体大小: flask.jsonify（ASCII转义） / orjson / gzip / brotli / 字段投影
+2. 序列化耗时: flask.jsonify 使用的 json.dumps vs orjson
+
+用法: python benchmark_responses.py [--repeat 20]
+"""
+
+import argparse
+import gzip
+import json
+import statistics
+import time
+
+from app import app
+from modules.db_utils import get_db_connection
+from modules.responses import dumps, brotli, orjson, GZIP_LEVEL, BROTLI_QUALITY
+
+
+def flask_dumps(payload):
+    """Flask 2.0 jsonify 的序列化方式（非调试模式: 紧凑格式、按键排序、ASCII转义）"""
+    return json.dumps(payload, ensure_ascii=True, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def median_ms(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def busiest_thread():
+    """日志最多的帖子，用于测试操作日志接口"""
+    conn = get_db_connection()
+    try:
+        row = conn.execute(
+            "SELECT thread_key FROM post_history GROUP BY thread_key ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()
+        return row['thread_key'] if row else 0
+    except Exception:
+        return 0
+    finally:
+        conn.close()
+
+
+def endpoints():
+    thread_key = busiest_thread()
+    return [
+        '/api/cars?limit=1000',
+        '/api/cars?limit=1000&fields=id,year,make,model,price,miles',
+        '/api/title-wordcloud',
+        '/api/post-rank?limit=100',
+        '/api/post-rank?limit=100&fields=thread_id,title,repost_count',
+        '/api/author-rank?limit=100',
+        f'/api/action-logs?thread_id={thread_key}&limit=100',
+        f'/api/action-logs?thread_id={thread_key}&limit=100&fields=event_type,event_time',
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API响应层性能测试')
+    parser.add_argument('--repeat', type=int, default=20, help='每个接口序列化的重复次数')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    print(f"序列化: {'orjson' if orjson else 'json'}, 压缩: {'brotli/gzip' if brotli else 'gzip'}\n")
+    header = (f"{'接口':<70} {'jsonify':>9} {'orjson':>9} {'gzip':>8} {'br':>8} "
+              f"{'jsonify ms':>11} {'orjson ms':>10} {'gzip ms':>8}")
+    print(header)
+    print('-' * len(header))
+
+    for path in endpoints():
+        response = client.get(path, headers={'Accept-Encoding': 'identity'})
+        payload = json.loads(response.get_data())
+
+        legacy_body = flask_dumps(payload)
+        body = dumps(payload)
+        gzip_body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        brotli_size = f"{len(brotli.compress(body, quality=BROTLI_QUALITY)):>8}" if brotli else f"{'-':>8}"
+
+        legacy_ms = median_ms(lambda: flask_dumps(payload), args.repeat)
+        new_ms = median_ms(lambda: dumps(payload), args.repeat)
+        gzip_ms = median_ms(lambda: gzip.compress(body, compresslevel=GZIP_LEVEL), args.repeat)
+
+        print(f"{path:<70} {len(legacy_body):>9} {len(body):>9} {len(gzip_body):>8} {brotli_size} "
+              f"{legacy_ms:>11.2f} {new_ms:>10.2f} {gzip_ms:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+list 表增量快照存储的空间和查询性能测试脚本
+
+把数据库复制到临时目录，从 list 表生成快照存储（modules.snapshot_store），比较:
+1. 空间: list 表及其索引 与 快照存储各表及索引 占用的页面大小（dbstat）
+2. 查询: 几个常用的扫描类查询分别在 list 表和快照存储上的耗时，并检查结果相同
+
+用法: python benchmark_snapshot_store.py [--db-path db/forum_data.db] [--repeat 3] [--verify-all]
+  --verify-all  逐次抓取检查重建的列表与 list 表一致（默认抽查3次抓取）
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from modules.snapshot_store import SNAPSHOT_TABLES, build_snapshot_store, resolve_scrape, state_at, verify_snapshot_store
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db', 'forum_data.db')
+
+# (名称, list 表上的查询, 快照存储上的查询)，两边结果应相同
+QUERIES = [
+    ("每个帖子的最大浏览量和回复数",
+     """SELECT thread_key, MAX(CAST(read_count AS INTEGER)), MAX(CAST(reply_count AS INTEGER))
+        FROM list WHERE thread_key IS NOT NULL GROUP BY thread_key ORDER BY thread_key""",
+     """SELECT thread_key, MAX(read_count), MAX(reply_count)
+        FROM list_changes GROUP BY thread_key ORDER BY thread_key"""),
+    ("每天各更新原因的次数",
+     """SELECT DATE(list_time), update_reason, COUNT(*) FROM list
+        WHERE update_reason IN ('重发', '回帖', '删回帖') GROUP BY 1, 2 ORDER BY 1, 2""",
+     """SELECT DATE(list_time), update_reason, COUNT(*) FROM list_activity
+        WHERE update_reason IN ('重发', '回帖', '删回帖') GROUP BY 1, 2 ORDER BY 1, 2"""),
+    ("每天出现过的帖子数",
+     """SELECT SUBSTR(scraping_time_R, 1, 10), COUNT(DISTINCT thread_key) FROM list
+        WHERE thread_key IS NOT NULL GROUP BY 1 ORDER BY 1""",
+     """WITH days AS (SELECT SUBSTR(ts, 1, 10) AS day, MIN(scrape_id) AS first_id, MAX(scrape_id) AS last_id
+                        FROM list_scrapes GROUP BY 1)
+        SELECT d.day, COUNT(DISTINCT p.thread_key)
+        FROM days d JOIN list_presence p ON p.first_scrape_id <= d.last_id AND p.last_scrape_id >= d.first_id
+        GROUP BY 1 ORDER BY 1"""),
+]
+
+
+def table_sizes(conn):
+    """各表（含索引）占用的字节数"""
+    sizes = {}
+    rows = conn.execute("""
+        SELECT COALESCE(m.tbl_name, d.name), SUM(d.pgsize)
+        FROM dbstat d LEFT JOIN sqlite_master m ON m.name = d.name
+        GROUP BY 1
+    """).fetchall()
+    for table, size in rows:
+        sizes[table] = size
+    return sizes
+
+
+def best_of(repeat, func):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='list 表增量快照存储性能测试')
+    parser.add_argument('--db-path', default=DEFAULT_DB_PATH, help='包含 list 表的数据库')
+    parser.add_argument('--repeat', type=int, default=3, help='每条查询计时的次数（取最快一次）')
+    parser.add_argument('--verify-all', action='store_true', help='检查每一次抓取的重建结果')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_path):
+        print(f"数据库文件不存在: {args.db_path}")
+        return
+
+    workdir = tempfile.mkdtemp(prefix='snapshot_store_')
+    try:
+        db_path = os.path.join(workdir, 'work.db')
+        source = sqlite3.connect(args.db_path)
+        conn = sqlite3.connect(db_path)
+        source.backup(conn)
+        source.close()
+
+        started = time.perf_counter()
+        counts = build_snapshot_store(conn)
+        conn.commit()
+        if not counts:
+            print("list 表不存在或缺少必要的列")
+            return
+        print(f"生成快照存储: {time.perf_counter() - started:.2f} 秒")
+        print(f"list {counts['list']} 行 -> 抓取 {counts['list_scrapes']} 次, 帖子 {counts['list_threads']} 个, "
+              f"出现区间 {counts['list_presence']} 个, 变化记录 {counts['list_changes']} 条, "
+              f"活动记录 {counts['list_activity']} 条, 标题 {counts['list_titles']} 条\n")
+
+        try:
+            sizes = table_sizes(conn)
+        except sqlite3.OperationalError:
+            print("SQLite 未编译 dbstat，跳过空间统计\n")
+        else:
+            list_size = sizes.get('list', 0)
+            store_size = sum(sizes.get(table, 0) for table in SNAPSHOT_TABLES)
+            for table in ('list',) + tuple(reversed(SNAPSHOT_TABLES)):
+                print(f"  {table:<14} {sizes.get(table, 0) / (1024 * 1024):8.2f} MB")
+            print(f"空间: list {list_size / (1024 * 1024):.2f} MB -> 快照存储 {store_size / (1024 * 1024):.2f} MB, "
+                  f"缩小 {list_size / max(store_size, 1):.1f} 倍")
+            print(f"（list 表仍然保留，发布的数据库中两者同时存在，list 未分区时共 {(list_size + store_size) / (1024 * 1024):.2f} MB）\n")
+
+        for name, list_sql, store_sql in QUERIES:
+            list_seconds, list_rows = best_of(args.repeat, lambda: conn.execute(list_sql).fetchall())
+            store_seconds, store_rows = best_of(args.repeat, lambda: conn.execute(store_sql).fetchall())
+            print(f"{name}: list {list_seconds * 1000:.1f} ms, 快照存储 {store_seconds * 1000:.1f} ms, "
+                  f"加速 {list_seconds / max(store_seconds, 1e-9):.1f} 倍, 结果一致: {'是' if list_rows == store_rows else '否'}")
+
+        _, latest = resolve_scrape(conn)
+        list_seconds, list_rows = best_of(args.repeat, lambda: conn.execute(
+            "SELECT * FROM list WHERE scraping_time_R = ?", (latest,)).fetchall())
+        store_seconds, store_rows = best_of(args.repeat, lambda: state_at(conn, latest))
+        print(f"最新一次抓取的列表: list {list_seconds * 1000:.1f} ms, 快照存储 {store_seconds * 1000:.1f} ms, "
+              f"加速 {list_seconds / max(store_seconds, 1e-9):.1f} 倍（{len(store_rows)} 个帖子）")
+
+        samples = None
+        if args.verify_all:
+            samples = [row[0] for row in conn.execute("SELECT ts FROM list_scrapes ORDER BY scrape_id").fetchall()]
+        started = time.perf_counter()
+        result = verify_snapshot_store(conn, samples)
+        print(f"\n重建检查: {result['checked']} 次抓取, 不一致 {len(result['mismatched'])} 次"
+              f"（{time.perf_counter() - started:.1f} 秒）")
+        for ts in result['mismatched'][:10]:
+            print(f"  不一致: {ts}")
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
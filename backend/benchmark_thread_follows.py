@@ -0,0 +1,161 @@
+"""
+关注功能性能测试脚本
+
+在临时数据库中生成 post_ranking 和 10000 条关注记录，对比:
+1. 关注列表: 旧的 OR 连接 vs 按 thread_id 的索引连接
+2. 关注: 逐条"先查询再更新/插入" vs 一个事务内的批量 UPSERT
+3. 取消关注: LIKE 模糊匹配 vs 精确匹配
+4. 批量查询关注状态
+
+用法: python benchmark_thread_follows.py [--follows 10000] [--posts 20000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+from modules.db_utils import THREAD_FOLLOW_DDL, dict_factory
+from modules.follows import (
+    migrate_thread_follow, list_follows, follow_threads, unfollow_threads,
+    delete_follow, get_follow_states
+)
+from modules.thread_ids import ensure_thread_keys
+
+THREAD_BASE = 2800000
+
+
+def create_ranking(conn, posts):
+    """生成与 import_csv_to_temp 导入结果相同结构的 post_ranking（全部为TEXT列，无索引）"""
+    conn.execute("""
+        CREATE TABLE post_ranking (
+            thread_id TEXT, url TEXT, title TEXT, author TEXT, author_link TEXT,
+            repost_count TEXT, reply_count TEXT, delete_reply_count TEXT, daysold TEXT, last_active TEXT
+        )
+    """)
+    rows = []
+    for i in range(posts):
+        thread_id = THREAD_BASE + i
+        rows.append((
+            str(thread_id),
+            f"https://www.chineseinla.com/f/page_viewtopic/t_{thread_id}.html",
+            f"帖子 {thread_id}", f"author{i % 500}", f"https://www.chineseinla.com/user/id_{i % 500}.html",
+            str(random.randint(0, 100)), str(random.randint(0, 50)), "0",
+            str(random.randint(0, 365)), str(random.randint(0, 30)),
+        ))
+    conn.executemany("INSERT INTO post_ranking VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+
+
+def timed(label, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"  {label:<40} {elapsed:10.1f} ms")
+    return result, elapsed
+
+
+def legacy_follow_one(conn, thread_id, status):
+    """旧接口的关注逻辑: 先查询，再更新或插入，每条单独提交"""
+    cursor = conn.cursor()
+    now = datetime.now().isoformat()
+    cursor.execute("SELECT id FROM thread_follow WHERE thread_id = ?", (thread_id,))
+    if cursor.fetchone():
+        cursor.execute("UPDATE thread_follow SET follow_status = ?, updated_at = ? WHERE thread_id = ?",
+                       (status, now, thread_id))
+    else:
+        cursor.execute("SELECT url, title, author, author_link FROM post_ranking WHERE thread_id = ?", (thread_id,))
+        info = cursor.fetchone()
+        cursor.execute("""
+            INSERT INTO thread_follow (thread_id, url, title, author, author_link, follow_status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (thread_id, info['url'] if info else None, info['title'] if info else None,
+              info['author'] if info else None, info['author_link'] if info else None, status, now, now))
+    conn.commit()
+
+
+LEGACY_LIST_QUERY = """
+    SELECT tf.id, tf.thread_id, tf.url, tf.title, tf.author, tf.author_link,
+           COALESCE(pr.repost_count, 0) as repost_count,
+           COALESCE(pr.reply_count, 0) as reply_count,
+           COALESCE(pr.delete_reply_count, 0) as delete_reply_count,
+           COALESCE(pr.daysold, 0) as days_old,
+           COALESCE(pr.last_active, 0) as last_active,
+           tf.follow_status, tf.created_at, tf.updated_at
+    FROM thread_follow tf
+    LEFT JOIN post_ranking pr ON tf.thread_id = pr.thread_id OR tf.url = pr.url
+    WHERE tf.follow_status = ?
+    ORDER BY tf.created_at DESC
+"""
+
+
+def run_legacy(db_path, thread_ids, delete_ids):
+    print("\n旧实现:")
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = dict_factory
+    conn.execute(THREAD_FOLLOW_DDL)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_thread_follow_thread_id ON thread_follow(thread_id)")
+    conn.commit()
+
+    timed(f"逐条关注 {len(thread_ids)} 个帖子",
+          lambda: [legacy_follow_one(conn, str(t), 'followed') for t in thread_ids])
+    rows, _ = timed("关注列表 (OR 连接)", lambda: conn.execute(LEGACY_LIST_QUERY, ('followed',)).fetchall())
+
+    def legacy_delete():
+        for t in delete_ids:
+            conn.execute("DELETE FROM thread_follow WHERE follow_status = ? AND (thread_id = ? OR thread_id LIKE ?)",
+                         ('followed', str(t), f"%{t}%"))
+            conn.commit()
+    timed(f"取消关注 {len(delete_ids)} 个帖子 (LIKE)", legacy_delete)
+    conn.close()
+    return len(rows)
+
+
+def run_new(db_path, thread_ids, delete_ids):
+    print("\n新实现:")
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = dict_factory
+    # 服务启动时的迁移: thread_key 列和关注表唯一索引
+    ensure_thread_keys(conn)
+    migrate_thread_follow(conn)
+
+    timed(f"批量关注 {len(thread_ids)} 个帖子 (一个事务)", lambda: follow_threads(conn, thread_ids, 'followed'))
+    rows, _ = timed("关注列表 (thread_id 索引连接)", lambda: list_follows(conn, 'followed'))
+    timed(f"批量查询 {len(thread_ids)} 个帖子的关注状态", lambda: get_follow_states(conn, thread_ids))
+    timed(f"取消关注 {len(delete_ids)} 个帖子 (精确匹配)",
+          lambda: [delete_follow(conn, 'followed', thread_id=t) for t in delete_ids])
+    timed(f"批量取消关注 {len(thread_ids)} 个帖子", lambda: unfollow_threads(conn, thread_ids, 'followed'))
+    conn.close()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='关注功能性能测试')
+    parser.add_argument('--follows', type=int, default=10000, help='关注数量')
+    parser.add_argument('--posts', type=int, default=20000, help='post_ranking 行数')
+    parser.add_argument('--deletes', type=int, default=200, help='逐个取消关注的数量')
+    args = parser.parse_args()
+
+    random.seed(42)
+    thread_ids = random.sample(range(THREAD_BASE, THREAD_BASE + args.posts), args.follows)
+    delete_ids = thread_ids[:args.deletes]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"post_ranking: {args.posts} 行, 关注: {args.follows} 条")
+        legacy_db = os.path.join(tmp_dir, 'legacy.db')
+        new_db = os.path.join(tmp_dir, 'new.db')
+        for path in (legacy_db, new_db):
+            conn = sqlite3.connect(path)
+            create_ranking(conn, args.posts)
+            conn.close()
+
+        legacy_rows = run_legacy(legacy_db, thread_ids, delete_ids)
+        new_rows = run_new(new_db, thread_ids, delete_ids)
+        print(f"\n关注列表行数: 旧 {legacy_rows}, 新 {new_rows}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,8 @@ import os
 import logging
 from datetime import datetime
 
+from modules.db_utils import THREAD_FOLLOW_DDL
+
 # 配置日志
 logging.basicConfig(level=logging.INFO,
                    format='%(asctime)s - %(levelname)s - %(message)s')
@@ -25,23 +27,7 @@ def create_thread_follow_table():
             logging.info("创建thread_follow表...")
             
             # 创建thread_follow表
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS thread_follow (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                thread_id TEXT NOT NULL,
-                url TEXT,
-                title TEXT,
-                author TEXT,
-                author_link TEXT,
-                days_old INTEGER,
-                last_active INTEGER,
-                read_count INTEGER,
-                reply_count INTEGER,
-                follow_status TEXT CHECK(follow_status IN ('not_followed', 'followed', 'my_thread')) DEFAULT 'not_followed',
-                created_at TEXT,
-                updated_at TEXT
-            )
-            ''')
+            cursor.execute(THREAD_FOLLOW_DDL)
             
             # 创建索引
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_thread_follow_thread_id ON thread_follow(thread_id)")
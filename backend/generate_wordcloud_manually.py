@@ -7,6 +7,8 @@ import sys
 import os
 import random
 
+from modules.partitions import history_source
+
 # 词云缓存版本常量
 WORDCLOUD_VERSION = 1
 
@@ -106,15 +108,16 @@ def generate_wordcloud():
         # 从list表获取所有标题
         cursor = conn.cursor()
         
-        # 先尝试从list表获取标题
+        # 先尝试从list表获取标题（全部历史在 list_all 视图中）
+        source = history_source(conn, 'list')
         try:
             print(f"[{datetime.now()}] 尝试从list表获取标题...")
-            cursor.execute("SELECT COUNT(*) FROM list WHERE title IS NOT NULL AND title != ''")
+            cursor.execute(f"SELECT COUNT(*) FROM {source} WHERE title IS NOT NULL AND title != ''")
             count = cursor.fetchone()[0]
             print(f"[{datetime.now()}] list表中有 {count} 个有效标题")
             
             if count > 0:
-                query = "SELECT title FROM list WHERE title IS NOT NULL AND title != ''"
+                query = f"SELECT title FROM {source} WHERE title IS NOT NULL AND title != ''"
                 titles = cursor.execute(query).fetchall()
                 print(f"[{datetime.now()}] 成功从list表获取到 {len(titles)} 个标题")
             else:
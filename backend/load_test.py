@@ -0,0 +1,115 @@
+"""
+本地压力测试脚本
+
+多个线程在指定时间内循环请求仪表盘的主要接口（每个线程一个keep-alive连接），
+统计每个接口和总体的请求数/秒、p50/p99 延迟和错误数。
+
+先启动服务（如 python serve.py --workers 4 --threads 8），再运行:
+用法: python load_test.py [--url http://127.0.0.1:5000] [--concurrency 32] [--duration 20]
+"""
+
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+# 仪表盘页面加载时请求的接口
+DASHBOARD_ENDPOINTS = [
+    '/api/data-trends',
+    '/api/post-trend',
+    '/api/update-trend',
+    '/api/view-trend',
+    '/api/title-wordcloud',
+    '/api/post-rank?page=1&limit=20',
+    '/api/author-rank?page=1&limit=20',
+    '/api/new-posts-yesterday',
+    '/api/post-date-range',
+]
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def worker(host, port, endpoints, deadline, offset, latencies, errors, lock):
+    """循环请求接口直到截止时间；offset 让各线程从不同接口开始"""
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    local_latencies = defaultdict(list)
+    local_errors = defaultdict(int)
+    i = offset
+    while time.perf_counter() < deadline:
+        path = endpoints[i % len(endpoints)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                local_errors[path] += 1
+            local_latencies[path].append((time.perf_counter() - started) * 1000)
+        except (OSError, http.client.HTTPException):
+            local_errors[path] += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+    conn.close()
+    with lock:
+        for path, samples in local_latencies.items():
+            latencies[path].extend(samples)
+        for path, count in local_errors.items():
+            errors[path] += count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API压力测试')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='服务地址')
+    parser.add_argument('--concurrency', type=int, default=32, help='并发线程数')
+    parser.add_argument('--duration', type=float, default=20, help='测试时长（秒）')
+    parser.add_argument('--warmup', type=float, default=2, help='预热时长（秒），不计入统计')
+    args = parser.parse_args()
+
+    target = urlparse(args.url)
+    host, port = target.hostname, target.port or 80
+
+    if args.warmup > 0:
+        warmup_latencies, warmup_errors = defaultdict(list), defaultdict(int)
+        worker(host, port, DASHBOARD_ENDPOINTS, time.perf_counter() + args.warmup, 0,
+               warmup_latencies, warmup_errors, threading.Lock())
+
+    latencies, errors = defaultdict(list), defaultdict(int)
+    lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(host, port, DASHBOARD_ENDPOINTS, deadline, n, latencies, errors, lock))
+        for n in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.url}  并发 {args.concurrency}, 时长 {elapsed:.1f} 秒\n")
+    print(f"{'接口':<36} {'请求数':>8} {'请求/秒':>9} {'p50 ms':>9} {'p99 ms':>9} {'错误':>6}")
+    all_samples = []
+    for path in DASHBOARD_ENDPOINTS:
+        samples = latencies.get(path, [])
+        all_samples.extend(samples)
+        print(f"{path:<36} {len(samples):>8} {len(samples) / elapsed:>9.1f} "
+              f"{percentile(samples, 0.5):>9.1f} {percentile(samples, 0.99):>9.1f} {errors.get(path, 0):>6}")
+    print(f"{'总计':<36} {len(all_samples):>8} {len(all_samples) / elapsed:>9.1f} "
+          f"{percentile(all_samples, 0.5):>9.1f} {percentile(all_samples, 0.99):>9.1f} {sum(errors.values()):>6}")
+    if all_samples:
+        print(f"\n平均延迟 {statistics.mean(all_samples):.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
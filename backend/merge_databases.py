@@ -1,12 +1,20 @@
+import argparse
 import sqlite3
 import os
 import shutil
+import time
 from datetime import datetime
 
 # 数据库路径
 SOURCE_DB_PATH = os.path.join(os.path.dirname(__file__), 'instance', 'database.db')
 TARGET_DB_PATH = os.path.join(os.path.dirname(__file__), 'db', 'forum_data.db')
 
+# ATTACH 合并时源数据库的别名
+SOURCE_ALIAS = 'src'
+
+# ATTACH 合并时每批按 rowid 复制的行数（每批输出一次进度，仍在同一个事务中）
+MERGE_BATCH_SIZE = 100000
+
 def get_db_connection(db_path):
     """获取数据库连接"""
     conn = sqlite3.connect(db_path)
@@ -144,6 +152,222 @@ def merge_databases():
     print("\n数据库合并完成")
     return True
 
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def _table_columns(conn, schema, table):
+    """表的列: [(name, type, notnull, default, pk)]"""
+    rows = conn.execute(f"PRAGMA {schema}.table_info({_quote(table)})").fetchall()
+    return [(row[1], (row[2] or '').upper(), row[3], row[4], row[5]) for row in rows]
+
+def _source_tables(conn):
+    """源数据库中要合并的表，以及跳过的虚拟表（FTS 等，连同其影子表）"""
+    rows = conn.execute(f"""
+        SELECT name, sql FROM {SOURCE_ALIAS}.sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+        ORDER BY name
+    """).fetchall()
+    virtual = [name for name, sql in rows if sql and sql.upper().startswith('CREATE VIRTUAL TABLE')]
+    tables = [
+        (name, sql) for name, sql in rows
+        if name not in virtual and not any(name.startswith(f"{v}_") for v in virtual)
+    ]
+    skipped = [name for name, _ in rows if name not in dict(tables)]
+    return tables, skipped
+
+def _unique_keys(conn, table, columns):
+    """
+    目标表的唯一键
+
+    主键为 INTEGER PRIMARY KEY（自增 id）时，id 只是两个库各自分配的代理键，相同 id 不代表同一行:
+    id 不复制、由目标库重新分配，只用其他唯一索引判断冲突；没有其他唯一键时返回空列表（源表的行全部追加）。
+    其他主键（如 thread_id TEXT）是自然键，和唯一索引一起判断冲突。
+
+    Returns:
+        (list, str): 唯一键列表（每项为列名列表），不复制的 id 列名（没有时为None）
+    """
+    keys = []
+    for row in conn.execute(f"PRAGMA main.index_list({_quote(table)})").fetchall():
+        if row[2] and row[3] != 'pk':  # 唯一索引，主键另外处理
+            names = [item[2] for item in conn.execute(f"PRAGMA main.index_info({_quote(row[1])})").fetchall()]
+            if names and all(names):  # 表达式索引无法按列比较
+                keys.append(names)
+    pk_columns = sorted((column for column in columns if column[4]), key=lambda column: column[4])
+    pk = [column[0] for column in pk_columns]
+    rowid_alias = len(pk_columns) == 1 and pk_columns[0][1] == 'INTEGER'
+    if rowid_alias:
+        return keys, pk[0]
+    return ([pk] if pk else []) + keys, None
+
+def _compatible(source_columns, target_columns):
+    """
+    源表的列都在目标表中，且目标表多出的列可以为空或有默认值
+
+    Returns:
+        (bool, str): 是否兼容和原因
+    """
+    target = {column[0]: column for column in target_columns}
+    missing = [column[0] for column in source_columns if column[0] not in target]
+    if missing:
+        return False, f"目标表缺少列: {missing}"
+    source_names = {column[0] for column in source_columns}
+    required = [name for name, _, notnull, default, pk in target_columns
+                if name not in source_names and notnull and default is None and not pk]
+    if required:
+        return False, f"目标表的非空列在源表中不存在: {required}"
+    return True, ''
+
+def _conflict_counts(conn, table, keys):
+    """用聚合查询统计源表中与目标表唯一键冲突的行数（按唯一键和合计）"""
+    conditions = []
+    for key in keys:
+        match = ' AND '.join(f"m.{_quote(c)} = s.{_quote(c)}" for c in key)
+        conditions.append(f"EXISTS (SELECT 1 FROM main.{_quote(table)} m WHERE {match})")
+    if not conditions:
+        return {}, 0
+    selects = ', '.join(f"SUM({condition})" for condition in conditions)
+    total = ' OR '.join(conditions)
+    row = conn.execute(
+        f"SELECT {selects}, SUM({total}) FROM {SOURCE_ALIAS}.{_quote(table)} s"
+    ).fetchone()
+    per_key = {', '.join(key): row[i] or 0 for i, key in enumerate(keys)}
+    return per_key, row[-1] or 0
+
+def _copy_rows(conn, table, column_list, verb, count, batch_size):
+    """按 rowid 分批 INSERT ... SELECT，返回写入的行数"""
+    has_rowid = conn.execute(
+        f"SELECT COUNT(*) FROM {SOURCE_ALIAS}.sqlite_master WHERE name = ? AND sql LIKE '%WITHOUT ROWID%'", (table,)
+    ).fetchone()[0] == 0
+    insert = f"{verb} INTO main.{_quote(table)} ({column_list}) SELECT {column_list} FROM {SOURCE_ALIAS}.{_quote(table)}"
+    before = conn.total_changes
+    if not has_rowid or count <= batch_size:
+        conn.execute(insert)
+        return conn.total_changes - before
+
+    last_rowid, copied = None, 0
+    while True:
+        bounds = conn.execute(
+            f"SELECT MAX(rowid), COUNT(*) FROM (SELECT rowid FROM {SOURCE_ALIAS}.{_quote(table)} "
+            f"WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+            (last_rowid if last_rowid is not None else -(2 ** 63), batch_size)
+        ).fetchone()
+        if not bounds[1]:
+            break
+        lower = last_rowid if last_rowid is not None else -(2 ** 63)
+        conn.execute(f"{insert} WHERE rowid > ? AND rowid <= ?", (lower, bounds[0]))
+        last_rowid = bounds[0]
+        copied += bounds[1]
+        print(f"  {table}: 已处理 {copied}/{count} 行，写入 {conn.total_changes - before} 行")
+    return conn.total_changes - before
+
+def merge_databases_attach(source_path=SOURCE_DB_PATH, target_path=TARGET_DB_PATH, conflict='ignore',
+                           dry_run=False, backup=True, batch_size=MERGE_BATCH_SIZE):
+    """
+    用 ATTACH 合并数据库: 数据由SQLite直接从源库复制到目标库，不经过Python，也不把整表读入内存
+
+    - 目标库没有的表: 用源库的建表语句（及其索引）创建后整表复制
+    - 两边都有且结构兼容的表: INSERT OR IGNORE/REPLACE INTO main.t (列...) SELECT 列... FROM src.t，
+      只复制两边共有的列；主键为自增 id 时不复制 id（由目标库重新分配），只按其他唯一索引判断冲突，
+      没有其他唯一索引的表（post_history、import 等）全部追加
+    - 结构不兼容的表和虚拟表（FTS）跳过
+    - 所有表在一个事务中合并，任何一步出错整体回滚
+
+    Args:
+        source_path: 源数据库路径
+        target_path: 目标数据库路径
+        conflict: 唯一键冲突时 'ignore' 保留目标库的行，'replace' 用源库的行覆盖
+        dry_run: 只统计每个表的行数和冲突行数，不写入
+        backup: 合并前是否备份目标数据库
+        batch_size: 每批复制的行数
+
+    Returns:
+        dict: 每个表的处理结果，出错时返回None
+    """
+    if conflict not in ('ignore', 'replace'):
+        raise ValueError(f"不支持的冲突处理方式: {conflict}")
+    for path in (source_path, target_path):
+        if not os.path.exists(path):
+            print(f"数据库不存在: {path}")
+            return None
+    if backup and not dry_run:
+        backup_database(target_path)
+
+    verb = 'INSERT OR IGNORE' if conflict == 'ignore' else 'INSERT OR REPLACE'
+    conn = sqlite3.connect(target_path)
+    conn.isolation_level = None  # 显式控制事务
+    results = {}
+    started = time.perf_counter()
+    try:
+        conn.execute(f"ATTACH DATABASE ? AS {SOURCE_ALIAS}", (source_path,))
+        tables, skipped = _source_tables(conn)
+        for name in skipped:
+            results[name] = {'action': 'skipped', 'reason': '虚拟表或其影子表'}
+        target_tables = {row[0] for row in conn.execute(
+            "SELECT name FROM main.sqlite_master WHERE type = 'table'").fetchall()}
+
+        if not dry_run:
+            conn.execute("BEGIN IMMEDIATE")
+        for table, create_sql in tables:
+            table_started = time.perf_counter()
+            count = conn.execute(f"SELECT COUNT(*) FROM {SOURCE_ALIAS}.{_quote(table)}").fetchone()[0]
+            source_columns = _table_columns(conn, SOURCE_ALIAS, table)
+            result = {'source_rows': count}
+
+            if table not in target_tables:
+                result.update(action='create', conflicts=0)
+                if not dry_run:
+                    conn.execute(create_sql)
+                    for (index_sql,) in conn.execute(
+                        f"SELECT sql FROM {SOURCE_ALIAS}.sqlite_master WHERE type = 'index' AND tbl_name = ? "
+                        f"AND sql IS NOT NULL", (table,)
+                    ).fetchall():
+                        conn.execute(index_sql)
+                    column_list = ', '.join(_quote(column[0]) for column in source_columns)
+                    result['written'] = _copy_rows(conn, table, column_list, 'INSERT', count, batch_size)
+            else:
+                target_columns = _table_columns(conn, 'main', table)
+                ok, reason = _compatible(source_columns, target_columns)
+                if not ok:
+                    results[table] = {**result, 'action': 'skipped', 'reason': reason}
+                    print(f"跳过表 {table}: {reason}")
+                    continue
+                keys, generated = _unique_keys(conn, table, target_columns)
+                per_key, conflicts = _conflict_counts(conn, table, keys)
+                result.update(action='merge', keys=per_key, conflicts=conflicts)
+                if not keys:
+                    result['reason'] = ('目标表只有自增 id，没有可判断重复的唯一键，源表的行全部追加（重新分配 id，'
+                                        '重复合并同一个源库会产生重复行）' if generated else
+                                        '目标表没有唯一键，源表的行全部追加')
+                if not dry_run and count:
+                    columns = [column[0] for column in source_columns if column[0] != generated]
+                    column_list = ', '.join(_quote(column) for column in columns)
+                    result['written'] = _copy_rows(conn, table, column_list, verb, count, batch_size)
+
+            result['seconds'] = round(time.perf_counter() - table_started, 3)
+            results[table] = result
+            written = f"，写入 {result['written']} 行" if 'written' in result else ''
+            action = '新建' if result['action'] == 'create' else '合并'
+            print(f"{action}表 {table}: 源 {count} 行，冲突 {result['conflicts']} 行{written}，耗时 {result['seconds']} 秒")
+
+        if not dry_run:
+            conn.execute("COMMIT")
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        print(f"合并数据库出错，已回滚: {e}")
+        return None
+    finally:
+        if not conn.in_transaction:
+            try:
+                conn.execute(f"DETACH DATABASE {SOURCE_ALIAS}")
+            except sqlite3.Error:
+                pass
+        conn.close()
+
+    mode = '（试运行，未写入）' if dry_run else ''
+    print(f"\n数据库合并完成{mode}，共 {len(results)} 个表，耗时 {time.perf_counter() - started:.2f} 秒")
+    return results
+
 def update_config_file():
     """更新配置文件中的数据库路径"""
     config_path = os.path.join(os.path.dirname(__file__), 'config.py')
@@ -165,8 +389,26 @@ def update_config_file():
         print(f"配置文件不存在: {config_path}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='合并数据库')
+    parser.add_argument('--attach', action='store_true',
+                        help='用 ATTACH + INSERT ... SELECT 在一个事务中合并（适合大数据库）')
+    parser.add_argument('--source', default=SOURCE_DB_PATH, help='源数据库路径（--attach）')
+    parser.add_argument('--target', default=TARGET_DB_PATH, help='目标数据库路径（--attach）')
+    parser.add_argument('--conflict', choices=['ignore', 'replace'], default='ignore',
+                        help='唯一键冲突时保留目标库的行（ignore）或用源库的行覆盖（replace）')
+    parser.add_argument('--dry-run', action='store_true', help='只统计行数和冲突行数，不写入（--attach）')
+    parser.add_argument('--no-backup', action='store_true', help='合并前不备份目标数据库（--attach）')
+    args = parser.parse_args()
+
     print("开始合并数据库...")
-    if merge_databases():
+    if args.attach:
+        results = merge_databases_attach(args.source, args.target, args.conflict, args.dry_run, not args.no_backup)
+        if results is None:
+            print("数据库合并失败")
+        elif not args.dry_run:
+            update_config_file()
+            print("数据库合并和配置更新成功完成")
+    elif merge_databases():
         # 更新配置文件
         update_config_file()
         print("数据库合并和配置更新成功完成")
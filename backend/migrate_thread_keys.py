@@ -0,0 +1,60 @@
+"""
+thread_key 回填迁移脚本
+
+为 list、posts、post_history、post_ranking、car_info、thread_follow 表添加
+INTEGER 类型的 thread_key 列，从 thread_id / url 计算规范的帖子ID并建立索引。
+可以重复执行，只回填仍为空的行。
+
+用法: python migrate_thread_keys.py [--db-path backend/db/forum_data.db]
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+
+from modules.thread_ids import THREAD_KEY_TABLES, backfill_thread_keys
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("migrate_thread_keys")
+
+# 数据库路径
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db', 'forum_data.db')
+
+
+def migrate(db_path):
+    """在一个事务中完成所有表的回填"""
+    if not os.path.exists(db_path):
+        logger.error(f"数据库文件不存在: {db_path}")
+        return False
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            results = backfill_thread_keys(conn, THREAD_KEY_TABLES)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        for table, rows in results.items():
+            missing = conn.execute(f'SELECT COUNT(*) FROM "{table}" WHERE thread_key IS NULL').fetchone()[0]
+            logger.info(f"{table}: 回填 {rows} 行, 无法识别帖子ID {missing} 行")
+        return True
+    except Exception as e:
+        logger.error(f"回填thread_key失败: {str(e)}")
+        return False
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='回填规范的整数thread_key')
+    parser.add_argument('--db-path', default=os.environ.get('DATABASE_PATH', DB_PATH), help='数据库文件路径')
+    args = parser.parse_args()
+    if migrate(args.db_path):
+        print("✅ thread_key 迁移完成")
+    else:
+        print("❌ thread_key 迁移失败")
@@ -0,0 +1,245 @@
+"""
+帖子操作日志模块，为 /api/action-logs 提供索引查询和游标分页
+
+- post_history 上建立 (thread_key, action_time) 组合索引，按帖子取日志并排序都走索引
+- 每个帖子的日志条数预先汇总到 post_history_counts，导入时刷新，请求时不再 COUNT(*)
+- 索引和条数表由更新流程和服务启动时建立，接口请求只检查；尚未建立时按 post_history 直接计数
+- 游标分页按 (action_time, rowid) 定位，翻到后面的页也不需要跳过前面的行
+"""
+
+import base64
+import json
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from .db_swap import read_version_id
+from .db_utils import main_db_file, plain_cursor, select_columns, table_columns
+from .thread_ids import table_has_thread_key, thread_key_expr
+
+# 设置日志
+logger = logging.getLogger("action_logs")
+
+# 每个帖子的日志条数表
+ACTION_COUNT_TABLE = 'post_history_counts'
+
+# 组合索引名
+ACTION_LOG_INDEX = 'idx_post_history_thread_key_time'
+
+# 每页最大记录数
+MAX_PAGE_SIZE = 500
+
+# 已检查过结构的数据库: {(db_file, version_id): {'exists': 是否存在post_history, 'counts': 索引和条数表是否已建立}}
+_schema_state: Dict[Tuple[str, Optional[str]], Dict[str, bool]] = {}
+_schema_lock = threading.Lock()
+
+
+def refresh_action_log_counts(conn: sqlite3.Connection) -> int:
+    """
+    建立 (thread_key, action_time) 组合索引并重新汇总每个帖子的日志条数
+
+    在导入 post_history 之后调用，调用方负责提交事务。
+
+    Args:
+        conn: 数据库连接（post_history 已有 thread_key 列）
+
+    Returns:
+        int: 汇总的帖子数
+    """
+    cursor = plain_cursor(conn)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {ACTION_LOG_INDEX} ON post_history(thread_key, action_time)")
+    cursor.execute(f"DROP TABLE IF EXISTS {ACTION_COUNT_TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {ACTION_COUNT_TABLE} (
+            thread_key INTEGER PRIMARY KEY,
+            event_count INTEGER NOT NULL
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO {ACTION_COUNT_TABLE} (thread_key, event_count)
+        SELECT thread_key, COUNT(*) FROM post_history
+        WHERE thread_key IS NOT NULL
+        GROUP BY thread_key
+    """)
+    threads = cursor.rowcount
+    logger.info(f"已汇总 {threads} 个帖子的操作日志条数")
+    return threads
+
+
+def ensure_action_log_schema(conn: sqlite3.Connection) -> bool:
+    """
+    确保组合索引和日志条数表存在，旧数据库中还没有时构建一次
+
+    构建会扫描整个 post_history，只在服务启动（bootstrap）时调用，接口请求使用 get_action_log_state。
+
+    Returns:
+        bool: post_history 表是否存在
+    """
+    state = get_action_log_state(conn)
+    if state['exists'] and not state['counts'] and table_has_thread_key(conn, 'post_history'):
+        cursor = plain_cursor(conn)
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            refresh_action_log_counts(conn)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        with _schema_lock:
+            _schema_state.clear()
+    return state['exists']
+
+
+def get_action_log_state(conn: sqlite3.Connection) -> Dict[str, bool]:
+    """
+    检查 post_history、组合索引和日志条数表是否存在（只读）
+
+    检查结果按数据库文件和版本缓存，不再每次请求都查询 sqlite_master。
+
+    Returns:
+        Dict[str, bool]: {'exists': post_history 是否存在, 'counts': 索引和条数表是否已建立}
+    """
+    db_file = main_db_file(conn)
+    key = (db_file, read_version_id(db_file))
+    with _schema_lock:
+        if key in _schema_state:
+            return _schema_state[key]
+
+    cursor = plain_cursor(conn)
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='post_history'"
+    ).fetchone() is not None
+    counts = exists and cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE (type='index' AND name=?) OR (type='table' AND name=?)",
+        (ACTION_LOG_INDEX, ACTION_COUNT_TABLE)
+    ).fetchone()[0] == 2
+    if exists and not counts:
+        logger.warning("操作日志索引和条数表尚未建立，按post_history直接计数（更新流程或服务启动时建立）")
+
+    state = {'exists': exists, 'counts': counts}
+    with _schema_lock:
+        _schema_state[key] = state
+    return state
+
+
+def encode_cursor(action_time: Any, rowid: int) -> str:
+    """把翻页位置编码为不透明的游标字符串"""
+    raw = json.dumps([action_time, rowid], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """
+    解析游标字符串
+
+    Raises:
+        ValueError: 游标格式不正确
+    """
+    try:
+        action_time, rowid = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return action_time, int(rowid)
+    except Exception as e:
+        raise ValueError(f"无效的游标: {cursor}") from e
+
+
+def get_action_logs(
+    conn: sqlite3.Connection,
+    thread_key: Optional[int] = None,
+    url: Optional[str] = None,
+    page: int = 1,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """
+    查询帖子的操作日志，按 action_time 倒序
+
+    传入 cursor 时使用游标分页（忽略 page），否则按页码分页；两种方式都会返回
+    next_cursor，客户端可以从任意一页切换到游标分页。
+
+    Args:
+        conn: 数据库连接（row_factory 为 dict_factory）
+        thread_key: 规范的帖子ID
+        url: 无法解析出帖子ID时按URL精确匹配
+        page: 页码
+        limit: 每页记录数，最大 MAX_PAGE_SIZE
+        cursor: 上一页返回的 next_cursor
+        fields: 只返回这些列（可以包含 event_type/event_time），默认全部列
+
+    Returns:
+        Dict[str, Any]: {'data', 'total', 'page', 'limit', 'next_cursor'}
+
+    Raises:
+        ValueError: 游标格式不正确
+    """
+    page = max(page or 1, 1)
+    limit = min(max(limit or 10, 1), MAX_PAGE_SIZE)
+    empty = {'data': [], 'total': 0, 'page': page, 'limit': limit, 'next_cursor': None}
+    position = decode_cursor(cursor) if cursor else None
+
+    state = get_action_log_state(conn)
+    if not state['exists']:
+        logger.warning("post_history表不存在")
+        return empty
+
+    if thread_key is not None:
+        where_clause, params = f"{thread_key_expr(conn, 'post_history')} = ?", [thread_key]
+        if state['counts']:
+            row = plain_cursor(conn).execute(
+                f"SELECT event_count FROM {ACTION_COUNT_TABLE} WHERE thread_key = ?", (thread_key,)
+            ).fetchone()
+            total = row[0] if row else 0
+        else:
+            total = plain_cursor(conn).execute(
+                f"SELECT COUNT(*) FROM post_history WHERE {where_clause}", params
+            ).fetchone()[0]
+    elif url:
+        where_clause, params = "url = ?", [url]
+        total = plain_cursor(conn).execute(
+            f"SELECT COUNT(*) FROM post_history WHERE {where_clause}", params
+        ).fetchone()[0]
+    else:
+        return empty
+
+    if total == 0:
+        return empty
+
+    position_clause = ""
+    offset = (page - 1) * limit
+    if position:
+        position_clause = " AND (action_time, rowid) < (?, ?)"
+        params = params + list(position)
+        offset = 0
+
+    # 别名在SQL中完成，不再逐行复制字典
+    aliases = {'event_type': 'action AS event_type', 'event_time': 'action_time AS event_time'}
+    if fields:
+        columns = table_columns(conn, 'post_history')
+        select_list = [select_columns(columns, fields)] if set(fields) & set(columns) else []
+        select_list += [aliases[field] for field in fields if field in aliases]
+    else:
+        select_list = ['post_history.*'] + list(aliases.values())
+    if not select_list:
+        select_list = ['post_history.*']
+
+    # 多取一行用于判断是否还有下一页
+    rows = conn.execute(f"""
+        SELECT {', '.join(select_list)},
+               action_time AS _cursor_time,
+               rowid AS _rowid
+        FROM post_history
+        WHERE {where_clause}{position_clause}
+        ORDER BY action_time DESC, rowid DESC
+        LIMIT ? OFFSET ?
+    """, params + [limit + 1, offset]).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['_cursor_time'], rows[-1]['_rowid'])
+    for row in rows:
+        row.pop('_cursor_time', None)
+        row.pop('_rowid', None)
+
+    return {'data': rows, 'total': total, 'page': page, 'limit': limit, 'next_cursor': next_cursor}
@@ -0,0 +1,261 @@
+"""
+作者发帖历史模块，为 /api/author-post-history 提供预先计算的结果
+
+- author_posts: 每个作者的帖子（按url去重），is_active 表示帖子是否出现在 list 表最新一次抓取中
+- 最新抓取时间保存在 data_meta 表，请求时不再对 list 表做 MAX(scraping_time_R)；list 分区后按 list_all 视图读取
+- (author, post_time) 索引按倒序扫描，按 (post_time, rowid) 游标分页
+- 表由更新流程和服务启动时构建，接口请求不构建；表还不存在时按 posts/list 直接查询（只支持页码分页）
+"""
+
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from .action_logs import encode_cursor, decode_cursor
+from .data_meta import set_meta, get_meta, LATEST_SNAPSHOT_KEY
+from .db_swap import read_version_id
+from .db_utils import main_db_file, plain_cursor, table_columns
+from .partitions import history_source, latest_time as list_latest_time
+
+# 设置日志
+logger = logging.getLogger("author_posts")
+
+# 作者发帖历史表
+AUTHOR_POSTS_TABLE = 'author_posts'
+
+# 每页最大记录数
+MAX_PAGE_SIZE = 500
+
+# 已检查过结构的数据库: {(db_file, version_id): author_posts 是否存在}
+_schema_state: Dict[Tuple[str, Optional[str]], bool] = {}
+_schema_lock = threading.Lock()
+
+
+def _post_expressions(post_columns) -> Tuple[str, str]:
+    """posts 表的标题和发帖时间表达式（缺少列时使用默认值）"""
+    title = "COALESCE(NULLIF(p.title, ''), '无标题')" if 'title' in post_columns else "'无标题'"
+    post_time = "COALESCE(p.post_time, '')" if 'post_time' in post_columns else "''"
+    return title, post_time
+
+
+def rebuild_author_posts(conn: sqlite3.Connection) -> int:
+    """
+    从 posts 和 list 表重建 author_posts，并记录 list 表的最新抓取时间
+
+    在导入 posts 和 list 之后调用，调用方负责提交事务。
+
+    Args:
+        conn: 数据库连接
+
+    Returns:
+        int: author_posts 的行数，posts 表不存在时返回 -1
+    """
+    cursor = plain_cursor(conn)
+    post_columns = set(table_columns(cursor, 'posts'))
+    if not {'author', 'url'} <= post_columns:
+        logger.warning("posts表不存在或缺少author/url列，跳过作者发帖历史")
+        return -1
+
+    # 最新抓取时间只在导入时计算一次
+    list_columns = set(table_columns(cursor, 'list'))
+    latest_time = None
+    if {'author', 'url', 'scraping_time_R'} <= list_columns:
+        latest_time = list_latest_time(conn, 'list')
+    set_meta(conn, LATEST_SNAPSHOT_KEY, latest_time)
+
+    thread_key = 'p.thread_key' if 'thread_key' in post_columns else 'NULL'
+    title, post_time = _post_expressions(post_columns)
+
+    cursor.execute(f"DROP TABLE IF EXISTS {AUTHOR_POSTS_TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {AUTHOR_POSTS_TABLE} (
+            author TEXT NOT NULL,
+            url TEXT NOT NULL,
+            title TEXT,
+            post_time TEXT NOT NULL DEFAULT '',
+            thread_key INTEGER,
+            is_active INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # 先把最新一次抓取中的 (author, url) 取出来，避免对每个帖子都查询 list
+    cursor.execute("DROP TABLE IF EXISTS temp.active_author_urls")
+    cursor.execute("CREATE TEMP TABLE active_author_urls (author TEXT, url TEXT, PRIMARY KEY (author, url)) WITHOUT ROWID")
+    if latest_time is not None:
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO temp.active_author_urls (author, url)
+            SELECT author, url FROM {history_source(conn, 'list')} WHERE scraping_time_R = ?
+        """, (latest_time,))
+    # 与原接口一致: 同一作者的同一url只保留一条
+    cursor.execute(f"""
+        INSERT INTO {AUTHOR_POSTS_TABLE} (author, url, title, post_time, thread_key, is_active)
+        SELECT p.author, p.url, {title}, {post_time}, {thread_key},
+               EXISTS (SELECT 1 FROM temp.active_author_urls a WHERE a.author = p.author AND a.url = p.url)
+        FROM posts p
+        WHERE p.author IS NOT NULL AND p.url IS NOT NULL
+        GROUP BY p.author, p.url
+    """)
+    rows = cursor.rowcount
+    cursor.execute("DROP TABLE temp.active_author_urls")
+    # 升序索引反向扫描即为 (post_time DESC, rowid DESC)，排序和游标条件都不需要额外排序
+    cursor.execute(f"""
+        CREATE INDEX idx_{AUTHOR_POSTS_TABLE}_author_time
+        ON {AUTHOR_POSTS_TABLE}(author, post_time)
+    """)
+    logger.info(f"已生成作者发帖历史 {rows} 条，最新抓取时间: {latest_time}")
+    return rows
+
+
+def ensure_author_posts(conn: sqlite3.Connection) -> bool:
+    """
+    确保 author_posts 表存在，旧数据库中还没有时构建一次
+
+    构建会扫描 posts 和 list 表，只在服务启动（bootstrap）时调用，接口请求使用 has_author_posts。
+
+    Returns:
+        bool: author_posts 是否可用
+    """
+    if has_author_posts(conn):
+        return True
+    cursor = plain_cursor(conn)
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        ready = rebuild_author_posts(conn) >= 0
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    with _schema_lock:
+        _schema_state.clear()
+    return ready
+
+
+def has_author_posts(conn: sqlite3.Connection) -> bool:
+    """检查 author_posts 表是否存在（只读，结果按数据库版本缓存）"""
+    db_file = main_db_file(conn)
+    key = (db_file, read_version_id(db_file))
+    with _schema_lock:
+        if key in _schema_state:
+            return _schema_state[key]
+
+    ready = plain_cursor(conn).execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (AUTHOR_POSTS_TABLE,)
+    ).fetchone() is not None
+    if not ready:
+        logger.warning("author_posts表尚未构建，作者发帖历史按posts/list表直接查询（更新流程或服务启动时构建）")
+
+    with _schema_lock:
+        _schema_state[key] = ready
+    return ready
+
+
+def _query_author_posts_direct(conn: sqlite3.Connection, author: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    author_posts 尚未构建时直接查询 posts 和 list（原接口的查询，不支持游标分页）
+
+    活跃帖子是 list 表最新一次抓取中出现的帖子。
+    """
+    cursor = plain_cursor(conn)
+    post_columns = set(table_columns(cursor, 'posts'))
+    if not {'author', 'url'} <= post_columns:
+        return result
+
+    latest_time = None
+    if {'author', 'url', 'scraping_time_R'} <= set(table_columns(cursor, 'list')):
+        latest_time = list_latest_time(conn, 'list')
+    title, post_time = _post_expressions(post_columns)
+    active = (f"EXISTS (SELECT 1 FROM {history_source(conn, 'list')} l WHERE l.author = p.author AND l.url = p.url AND l.scraping_time_R = ?)"
+              if latest_time is not None else "0")
+    active_params = [latest_time] if latest_time is not None else []
+
+    rows = conn.execute(f"""
+        SELECT p.url AS url, {title} AS title, {post_time} AS post_time, {active} AS is_active
+        FROM posts p
+        WHERE p.author = ? AND p.url IS NOT NULL
+        GROUP BY p.url
+        ORDER BY post_time DESC
+    """, active_params + [author]).fetchall()
+
+    total = len(rows)
+    active_count = sum(1 for row in rows if row['is_active'])
+    start = (result['page'] - 1) * result['limit']
+    for row in rows[start:start + result['limit']]:
+        row['is_active'] = bool(row['is_active'])
+        result['data'].append(row)
+    result['total'] = total
+    result['latest_time'] = latest_time
+    result['debug'] = {'total_posts': total, 'active_posts': active_count, 'inactive_posts': total - active_count}
+    return result
+
+
+def get_author_posts(
+    conn: sqlite3.Connection,
+    author: str,
+    page: int = 1,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    查询作者的发帖历史，按 post_time 倒序
+
+    传入 cursor 时使用游标分页（忽略 page），否则按页码分页，两种方式都返回 next_cursor。
+    author_posts 表尚未构建时直接查询 posts/list，只按页码分页，不返回 next_cursor。
+
+    Args:
+        conn: 数据库连接（row_factory 为 dict_factory）
+        author: 作者
+        page: 页码
+        limit: 每页记录数，最大 MAX_PAGE_SIZE
+        cursor: 上一页返回的 next_cursor
+
+    Returns:
+        Dict[str, Any]: {'data', 'total', 'page', 'limit', 'next_cursor', 'latest_time', 'debug'}
+
+    Raises:
+        ValueError: 游标格式不正确
+    """
+    page = max(page or 1, 1)
+    limit = min(max(limit or 10, 1), MAX_PAGE_SIZE)
+    position = decode_cursor(cursor) if cursor else None
+    result = {
+        'data': [], 'total': 0, 'page': page, 'limit': limit, 'next_cursor': None,
+        'latest_time': None,
+        'debug': {'total_posts': 0, 'active_posts': 0, 'inactive_posts': 0},
+    }
+
+    if not has_author_posts(conn):
+        return _query_author_posts_direct(conn, author, result)
+
+    total, active = plain_cursor(conn).execute(
+        f"SELECT COUNT(*), COALESCE(SUM(is_active), 0) FROM {AUTHOR_POSTS_TABLE} WHERE author = ?", (author,)
+    ).fetchone()
+    result['total'] = total
+    result['latest_time'] = get_meta(conn, LATEST_SNAPSHOT_KEY)
+    result['debug'] = {'total_posts': total, 'active_posts': active, 'inactive_posts': total - active}
+    if total == 0:
+        return result
+
+    params = [author]
+    position_clause = ""
+    offset = (page - 1) * limit
+    if position:
+        position_clause = " AND (post_time, rowid) < (?, ?)"
+        params += list(position)
+        offset = 0
+
+    rows = conn.execute(f"""
+        SELECT url, title, post_time, is_active, rowid AS _rowid
+        FROM {AUTHOR_POSTS_TABLE}
+        WHERE author = ?{position_clause}
+        ORDER BY post_time DESC, rowid DESC
+        LIMIT ? OFFSET ?
+    """, params + [limit + 1, offset]).fetchall()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        result['next_cursor'] = encode_cursor(rows[-1]['post_time'], rows[-1]['_rowid'])
+    for row in rows:
+        row.pop('_rowid', None)
+        row['is_active'] = bool(row['is_active'])
+    result['data'] = rows
+    return result
@@ -0,0 +1,182 @@
+"""
+批量查询模块，按帖子ID或URL批量取表中的记录
+
+- 每个标识先分类：能解析出帖子ID的按整数 thread_key 查询，其余按 url 精确匹配
+- 标识写入临时表后分块连接查询，不受SQLite变量数上限限制；两种键分开查询，不用 OR 条件，thread_key 走索引
+- 结果按输入顺序返回（重复的标识只返回一次），并列出没有找到的标识
+- url 分支按 url 等值查找，ensure_lookup_indexes 在查询的表上建立 url 索引（服务启动时和首次查询时各检查一次）
+"""
+
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .db_swap import read_version_id
+from .db_utils import main_db_file, plain_cursor, table_columns
+from .thread_ids import canonical_thread_id, table_has_thread_key, thread_url_sql
+
+# 设置日志
+logger = logging.getLogger("batch_lookup")
+
+# 每次连接查询的标识数量
+BATCH_CHUNK_SIZE = 5000
+
+# 单次调用最多的标识数量
+MAX_LOOKUP_SIZE = 50000
+
+# 批量查询使用的临时表
+_KEYS_TABLE = 'temp.batch_lookup_keys'
+
+# 支持批量查询的表（需要 url 索引）
+LOOKUP_TABLES = ('post_ranking',)
+
+# 已确认有url索引的表: {(db_file, version_id, table)}
+_indexed_tables = set()
+_indexed_lock = threading.Lock()
+
+
+def classify_identifier(value: Any) -> Optional[Tuple[str, Any]]:
+    """
+    判断标识的类型
+
+    Returns:
+        Optional[Tuple[str, Any]]: ('thread_key', int) 或 ('url', str)，无法识别时返回None
+    """
+    thread_key = canonical_thread_id(value)
+    if thread_key is not None:
+        return 'thread_key', thread_key
+    if isinstance(value, str) and value.strip().lower().startswith(('http://', 'https://')):
+        return 'url', value.strip()
+    return None
+
+
+def ensure_lookup_indexes(conn: sqlite3.Connection, tables: Iterable[str] = LOOKUP_TABLES):
+    """
+    确保批量查询的表在 url 列上有索引，否则 url 分支每一块都要全表扫描
+
+    检查结果按数据库文件和版本缓存，新版本发布后重新检查一次。
+    """
+    db_file = main_db_file(conn)
+    version_id = read_version_id(db_file)
+    cursor = plain_cursor(conn)
+    for table in tables:
+        key = (db_file, version_id, table)
+        with _indexed_lock:
+            if key in _indexed_tables:
+                continue
+        if 'url' not in table_columns(cursor, table):
+            continue
+        has_index = any(
+            [row[2] for row in cursor.execute(f'PRAGMA index_info("{index[1]}")').fetchall()][:1] == ['url']
+            for index in cursor.execute(f'PRAGMA index_list("{table}")').fetchall()
+        )
+        if not has_index:
+            logger.info(f"表 {table} 的url列没有索引，开始创建")
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_url" ON "{table}"(url)')
+            conn.commit()
+        with _indexed_lock:
+            _indexed_tables.add(key)
+
+
+def batch_lookup(
+    conn: sqlite3.Connection,
+    table: str,
+    identifiers: Sequence[Any],
+    columns: Iterable[str],
+    chunk_size: int = BATCH_CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """
+    按帖子ID或URL批量查询表中的记录
+
+    Args:
+        conn: 数据库连接（row_factory 为 dict_factory 时返回字典）
+        table: 表名（需有 thread_key 和 url 列）
+        identifiers: 帖子ID、"t_2871467" 或帖子URL，可以混合
+        columns: 返回的列
+        chunk_size: 每次连接查询的标识数量
+
+    Returns:
+        Dict[str, Any]: {'data': 按输入顺序的记录, 'missing': 没有找到的标识}
+
+    Raises:
+        ValueError: 标识数量超过 MAX_LOOKUP_SIZE
+    """
+    if len(identifiers) > MAX_LOOKUP_SIZE:
+        raise ValueError(f"单次最多查询 {MAX_LOOKUP_SIZE} 个标识")
+
+    # 分类并去重，pos 记录标识第一次出现的位置；input_positions 对应每个输入标识（无法识别为None）
+    keys: List[Tuple[int, Optional[int], Optional[str]]] = []
+    positions: Dict[Tuple[str, Any], int] = {}
+    input_positions: List[Optional[int]] = []
+    for value in identifiers:
+        identifier = classify_identifier(value)
+        if identifier is not None and identifier not in positions:
+            positions[identifier] = len(keys)
+            kind, key = identifier
+            keys.append((len(keys), key if kind == 'thread_key' else None, key if kind == 'url' else None))
+        input_positions.append(positions.get(identifier) if identifier is not None else None)
+
+    if not keys:
+        return {'data': [], 'missing': list(identifiers)}
+
+    ensure_lookup_indexes(conn, [table])
+    available = set(table_columns(conn, table))
+    select_list = ', '.join(f't."{column}"' for column in columns if column in available)
+
+    found: Dict[int, Any] = {}
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS batch_lookup_keys (
+                seq INTEGER PRIMARY KEY,
+                pos INTEGER NOT NULL,
+                thread_key INTEGER,
+                url TEXT
+            )
+        """)
+        cursor.execute(f"DELETE FROM {_KEYS_TABLE}")
+        # 按键排序写入，分块连接时按索引顺序查找，减少随机读取
+        cursor.executemany(
+            f"INSERT INTO {_KEYS_TABLE} (seq, pos, thread_key, url) VALUES (?, ?, ?, ?)",
+            ((seq, *key) for seq, key in enumerate(
+                sorted(keys, key=lambda key: (key[1] is None, key[1] or 0, key[2] or ''))
+            ))
+        )
+
+        # 同一个键在表中有多行时只取 rowid 最小的一行；尚未迁移出thread_key列的表按规范URL走url索引
+        if table_has_thread_key(conn, table):
+            key_condition = "thread_key = k.thread_key"
+        else:
+            key_condition = f"url = {thread_url_sql('k.thread_key')}"
+        query = f"""
+            SELECT k.pos AS _pos, {select_list}
+            FROM {_KEYS_TABLE} k
+            JOIN "{table}" t ON t.rowid = (
+                SELECT MIN(rowid) FROM "{table}" WHERE {key_condition}
+            )
+            WHERE k.seq BETWEEN ? AND ? AND k.thread_key IS NOT NULL
+            UNION ALL
+            SELECT k.pos AS _pos, {select_list}
+            FROM {_KEYS_TABLE} k
+            JOIN "{table}" t ON t.rowid = (
+                SELECT MIN(rowid) FROM "{table}" WHERE url = k.url
+            )
+            WHERE k.seq BETWEEN ? AND ? AND k.url IS NOT NULL
+        """
+        for start in range(0, len(keys), chunk_size):
+            end = start + chunk_size - 1
+            for row in cursor.execute(query, (start, end, start, end)):
+                if isinstance(row, dict):
+                    found[row.pop('_pos')] = row
+                else:
+                    found[row[0]] = row[1:]
+    finally:
+        cursor.execute(f"DELETE FROM {_KEYS_TABLE}")
+        conn.commit()
+
+    data = [found[pos] for pos in range(len(keys)) if pos in found]
+    missing = [value for value, pos in zip(identifiers, input_positions) if pos not in found]
+
+    logger.debug(f"批量查询 {table}: {len(keys)} 个标识, 找到 {len(data)} 条, 缺失 {len(missing)} 个")
+    return {'data': data, 'missing': missing}
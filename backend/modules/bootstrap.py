@@ -0,0 +1,80 @@
+"""
+服务启动模块: 日志配置和数据库结构初始化
+
+模块导入时不再配置日志或修改数据库，由入口（app.py 开发服务器、serve.py 生产服务器）
+在启动时各调用一次。生产模式下在主进程中预加载完成，工作进程直接复用检查结果。
+"""
+
+import logging
+import os
+
+from .action_logs import ensure_action_log_schema
+from .author_posts import ensure_author_posts
+from .batch_lookup import ensure_lookup_indexes
+from .car_search import ensure_car_search
+from .db_utils import get_db_connection, init_db
+from .follows import migrate_thread_follow
+from .thread_ids import ensure_thread_keys
+
+# 设置日志
+logger = logging.getLogger("bootstrap")
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def configure_logging(level: str = None):
+    """
+    配置根日志（只在入口调用一次）
+
+    Args:
+        level: 日志级别，默认读取环境变量 LOG_LEVEL，未设置时为 INFO
+    """
+    level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+    logging.basicConfig(level=getattr(logging, level, logging.INFO), format=LOG_FORMAT)
+
+
+def bootstrap_database(db_path: str = None) -> bool:
+    """
+    启动时初始化数据库结构: 关注表、thread_key列、操作日志索引、作者发帖历史、批量查询索引、汽车搜索表
+
+    各步骤都可以重复执行，失败时记录日志并继续。thread_key 回填、关注表迁移、操作日志汇总、作者发帖历史
+    和汽车搜索表只在这里（及更新流程）构建，接口请求缺少它们时使用较慢的查询，失败的步骤在下次启动时重试。
+    使用独立连接并在结束时关闭，避免预加载后把连接带入fork出的工作进程。
+
+    Args:
+        db_path: 数据库文件路径，默认读取环境变量 DATABASE_PATH
+
+    Returns:
+        bool: 是否全部成功
+    """
+    if db_path:
+        os.environ['DATABASE_PATH'] = db_path
+
+    try:
+        init_db()
+    except Exception as e:
+        logger.error(f"初始化数据库表失败: {str(e)}")
+        return False
+
+    steps = [
+        ('thread_key', ensure_thread_keys),
+        ('关注表', migrate_thread_follow),
+        ('操作日志索引', ensure_action_log_schema),
+        ('作者发帖历史', ensure_author_posts),
+        ('批量查询索引', ensure_lookup_indexes),
+        ('汽车搜索表', ensure_car_search),
+    ]
+    success = True
+    conn = get_db_connection()
+    try:
+        for name, step in steps:
+            try:
+                step(conn)
+            except Exception as e:
+                success = False
+                logger.error(f"初始化{name}失败: {str(e)}")
+    finally:
+        conn.close()
+
+    logger.info(f"数据库结构初始化{'完成' if success else '部分失败'}")
+    return success
@@ -0,0 +1,452 @@
+"""
+汽车信息搜索模块，为 /api/cars 提供全文检索、数值范围过滤和分面列表
+
+car_info 中年份、价格、里程都以原始文本保存（例如 "$3,900 "、"220,000 mi"），
+直接比较是字符串比较，且 LIKE '%x%' 无法使用索引。这里在导入车辆数据后
+构建三张派生表:
+
+- car_search: 每辆车一行，保存解析后的 year_num / price_num / miles_num，带组合索引
+- car_info_fts: FTS5 全文索引（trigram 分词，支持中文子串匹配）
+- car_facets: 品牌、型号、交易类型的分面列表，只在导入时刷新
+
+car_search_meta 记录构建时间，进程内的分面缓存以此判断是否失效。派生表由导入步骤
+（rebuild_car_search）和服务启动（ensure_car_search）构建，接口请求只读取，不会在请求中重建。
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .db_utils import DEFAULT_DB_PATH, dict_factory, main_db_file, plain_cursor, select_columns, table_columns
+
+# 设置日志
+logger = logging.getLogger("car_search")
+
+# 默认每页记录数
+DEFAULT_PAGE_SIZE = 50
+
+# 每页最大记录数，超过时截断
+MAX_PAGE_SIZE = 1000
+
+# trigram 分词器只能匹配不少于3个字符的词，更短的词退化为 LIKE
+FTS_MIN_TERM_LENGTH = 3
+
+# 排序字段白名单: 请求参数 -> (SQL表达式, 是否为可能为NULL的解析列)
+CAR_SORT_FIELDS = {
+    'id': ('c.id', False),
+    'year': ('s.year_num', True),
+    'price': ('s.price_num', True),
+    'miles': ('s.miles_num', True),
+    'make': ('c.make', False),
+    'model': ('c.model', False),
+    'trade_type': ('c.trade_type', False),
+    'location': ('c.location', False),
+    'post_time': ('s.post_time', False),
+    'scraping_time_R': ('c.scraping_time_R', False),
+    'updated_at': ('c.updated_at', False),
+}
+
+# 数值中的第一个数字，允许千分位逗号，例如 "50,000~100,000 mi" 取 50000
+_NUMBER_PATTERN = re.compile(r'\d[\d,]*(?:\.\d+)?')
+
+# 分面缓存: {db_path: (built_at, facets)}
+_facet_cache: Dict[str, Tuple[str, Dict[str, List[str]]]] = {}
+_facet_cache_lock = threading.Lock()
+
+
+def parse_car_number(value: Any) -> Optional[float]:
+    """把 "$3,900 "、"220,000 mi" 之类的文本解析为数字，无法解析时返回None"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    match = _NUMBER_PATTERN.search(str(value))
+    if not match:
+        return None
+    try:
+        return float(match.group(0).replace(',', ''))
+    except ValueError:
+        return None
+
+
+def parse_car_year(value: Any) -> Optional[int]:
+    """解析年份，只接受1900~2100之间的四位数"""
+    number = parse_car_number(value)
+    if number is None or not 1900 <= number <= 2100:
+        return None
+    return int(number)
+
+
+def _fts5_available(conn: sqlite3.Connection) -> bool:
+    """检查SQLite是否编译了FTS5和trigram分词器"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def rebuild_car_search(db_path: str = None) -> Dict[str, Any]:
+    """
+    根据 car_info 重建搜索派生表和分面列表，应在每次导入车辆数据后调用
+
+    所有派生表在同一个事务中重建，提交前读请求看到的仍是旧数据。
+
+    Args:
+        db_path: 数据库文件路径，默认使用DEFAULT_DB_PATH
+
+    Returns:
+        Dict[str, Any]: 构建结果 {'rows', 'fts', 'facets', 'seconds'}，
+        car_info 不存在时 rows 为0
+    """
+    if db_path is None:
+        db_path = os.environ.get('DATABASE_PATH', DEFAULT_DB_PATH)
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    try:
+        if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='car_info'"
+        ).fetchone():
+            logger.warning("car_info表不存在，跳过构建汽车搜索索引")
+            return {'rows': 0, 'fts': False, 'facets': 0, 'seconds': 0.0}
+
+        conn.create_function('parse_car_number', 1, parse_car_number, deterministic=True)
+        conn.create_function('parse_car_year', 1, parse_car_year, deterministic=True)
+        use_fts = _fts5_available(conn)
+        if not use_fts:
+            logger.warning("当前SQLite不支持FTS5 trigram分词，关键词搜索将使用LIKE")
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DROP TABLE IF EXISTS car_search")
+            conn.execute("""
+                CREATE TABLE car_search (
+                    car_id INTEGER PRIMARY KEY,
+                    make TEXT,
+                    model TEXT,
+                    trade_type TEXT,
+                    year_num INTEGER,
+                    price_num REAL,
+                    miles_num INTEGER,
+                    post_time TEXT
+                )
+            """)
+            cursor = conn.execute("""
+                INSERT INTO car_search (car_id, make, model, trade_type, year_num, price_num, miles_num, post_time)
+                SELECT id,
+                       NULLIF(make, '-'),
+                       NULLIF(model, '-'),
+                       NULLIF(trade_type, '-'),
+                       parse_car_year(year),
+                       parse_car_number(price),
+                       CAST(parse_car_number(miles) AS INTEGER),
+                       post_time
+                FROM car_info
+            """)
+            rows = cursor.rowcount
+
+            # 数据写入后再建索引
+            conn.execute("CREATE INDEX idx_car_search_make_model_year ON car_search(make, model, year_num)")
+            conn.execute("CREATE INDEX idx_car_search_make_price ON car_search(make, price_num)")
+            conn.execute("CREATE INDEX idx_car_search_year_price ON car_search(year_num, price_num)")
+            conn.execute("CREATE INDEX idx_car_search_price ON car_search(price_num)")
+            conn.execute("CREATE INDEX idx_car_search_miles ON car_search(miles_num)")
+            conn.execute("CREATE INDEX idx_car_search_trade_post_time ON car_search(trade_type, post_time)")
+            conn.execute("CREATE INDEX idx_car_search_post_time ON car_search(post_time)")
+
+            # car_info 中没有 description 列，全文索引覆盖年份、品牌、型号和标题
+            conn.execute("DROP TABLE IF EXISTS car_info_fts")
+            if use_fts:
+                conn.execute("""
+                    CREATE VIRTUAL TABLE car_info_fts USING fts5(
+                        year, make, model, title, tokenize='trigram'
+                    )
+                """)
+                conn.execute("""
+                    INSERT INTO car_info_fts (rowid, year, make, model, title)
+                    SELECT id, year, make, model, title FROM car_info
+                """)
+
+            conn.execute("DROP TABLE IF EXISTS car_facets")
+            conn.execute("""
+                CREATE TABLE car_facets (
+                    facet TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    parent TEXT NOT NULL DEFAULT '',
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (facet, parent, value)
+                )
+            """)
+            conn.execute("""
+                INSERT INTO car_facets (facet, value, parent, count)
+                SELECT 'make', make, '', COUNT(*) FROM car_search
+                WHERE make IS NOT NULL GROUP BY make
+            """)
+            conn.execute("""
+                INSERT INTO car_facets (facet, value, parent, count)
+                SELECT 'model', model, COALESCE(make, ''), COUNT(*) FROM car_search
+                WHERE model IS NOT NULL GROUP BY COALESCE(make, ''), model
+            """)
+            conn.execute("""
+                INSERT INTO car_facets (facet, value, parent, count)
+                SELECT 'trade_type', trade_type, '', COUNT(*) FROM car_search
+                WHERE trade_type IS NOT NULL GROUP BY trade_type
+            """)
+            facet_count = conn.execute("SELECT COUNT(*) FROM car_facets").fetchone()[0]
+
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS car_search_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            built_at = datetime.now().isoformat()
+            conn.executemany(
+                "INSERT OR REPLACE INTO car_search_meta (key, value) VALUES (?, ?)",
+                [('built_at', built_at), ('rows', str(rows)), ('fts', '1' if use_fts else '0')]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+    seconds = round(time.perf_counter() - started, 3)
+    logger.info(f"汽车搜索索引构建完成: {rows} 辆车, {facet_count} 个分面值, "
+                f"全文索引 {'FTS5' if use_fts else '未启用'}, 耗时 {seconds} 秒")
+    return {'rows': rows, 'fts': use_fts, 'facets': facet_count, 'seconds': seconds}
+
+
+def _read_meta(conn: sqlite3.Connection) -> Optional[Dict[str, str]]:
+    """读取 car_search_meta，未构建时返回None"""
+    if not plain_cursor(conn).execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='car_search_meta'"
+    ).fetchone():
+        return None
+    return {row[0]: row[1] for row in plain_cursor(conn).execute("SELECT key, value FROM car_search_meta").fetchall()}
+
+
+def ensure_car_search(conn: sqlite3.Connection) -> Optional[Dict[str, str]]:
+    """
+    返回搜索索引的元信息；数据库中还没有搜索索引（例如刚发布的新库）时先构建一次
+
+    重建会写整个派生表，只在服务启动（bootstrap）和更新流程中调用，接口请求使用 get_car_search_meta。
+
+    Args:
+        conn: 数据库连接
+
+    Returns:
+        Optional[Dict[str, str]]: 元信息，car_info 不存在时返回None
+    """
+    meta = _read_meta(conn)
+    if meta is None:
+        if not plain_cursor(conn).execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='car_info'"
+        ).fetchone():
+            return None
+        logger.info("汽车搜索索引不存在，开始构建")
+        rebuild_car_search(main_db_file(conn))
+        meta = _read_meta(conn)
+    return meta
+
+
+def get_car_search_meta(conn: sqlite3.Connection) -> Optional[Dict[str, str]]:
+    """
+    返回搜索索引的元信息（只读，不构建）
+
+    Args:
+        conn: 数据库连接
+
+    Returns:
+        Optional[Dict[str, str]]: 元信息，搜索索引尚未构建时返回None
+    """
+    meta = _read_meta(conn)
+    if meta is None and plain_cursor(conn).execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='car_info'"
+    ).fetchone():
+        logger.warning("汽车搜索索引尚未构建，需要在导入车辆数据或服务启动时构建")
+    return meta
+
+
+def get_car_facets(conn: sqlite3.Connection, meta: Dict[str, str] = None) -> Dict[str, List[str]]:
+    """
+    获取品牌、型号、交易类型列表，按构建时间缓存在进程内
+
+    Args:
+        conn: 数据库连接
+        meta: 已读取的搜索索引元信息
+
+    Returns:
+        Dict[str, List[str]]: {'makes', 'models', 'trade_types'}
+    """
+    meta = meta if meta is not None else get_car_search_meta(conn)
+    if meta is None:
+        return {'makes': [], 'models': [], 'trade_types': []}
+
+    db_file = main_db_file(conn)
+    built_at = meta.get('built_at')
+    with _facet_cache_lock:
+        cached = _facet_cache.get(db_file)
+        if cached and cached[0] == built_at:
+            return cached[1]
+
+    facets = {'makes': [], 'models': [], 'trade_types': []}
+    rows = plain_cursor(conn).execute(
+        "SELECT DISTINCT facet, value FROM car_facets ORDER BY facet, value"
+    ).fetchall()
+    keys = {'make': 'makes', 'model': 'models', 'trade_type': 'trade_types'}
+    for facet, value in rows:
+        if facet in keys:
+            facets[keys[facet]].append(value)
+
+    with _facet_cache_lock:
+        _facet_cache[db_file] = (built_at, facets)
+    return facets
+
+
+def _fts_condition(keyword: str, use_fts: bool) -> Tuple[str, List[Any]]:
+    """把搜索关键词转换为car_info的过滤条件"""
+    terms = keyword.split()
+    if use_fts:
+        clauses = []
+        params = []
+        match_terms = [t for t in terms if len(t) >= FTS_MIN_TERM_LENGTH]
+        if match_terms:
+            clauses.append("car_info_fts MATCH ?")
+            params.append(' AND '.join('"' + t.replace('"', '""') + '"' for t in match_terms))
+        for term in terms:
+            if len(term) < FTS_MIN_TERM_LENGTH:
+                clauses.append("(year LIKE ? OR make LIKE ? OR model LIKE ? OR title LIKE ?)")
+                params.extend([f"%{term}%"] * 4)
+        return (f"c.id IN (SELECT rowid FROM car_info_fts WHERE {' AND '.join(clauses)})", params)
+
+    clauses = []
+    params = []
+    for term in terms:
+        clauses.append("(c.year LIKE ? OR c.make LIKE ? OR c.model LIKE ? OR c.title LIKE ?)")
+        params.extend([f"%{term}%"] * 4)
+    return ' AND '.join(clauses), params
+
+
+def search_cars(
+    conn: sqlite3.Connection,
+    keyword: str = '',
+    make: str = '',
+    model: str = '',
+    trade_type: str = '',
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    miles_min: Optional[float] = None,
+    miles_max: Optional[float] = None,
+    sort_field: str = 'id',
+    sort_order: str = 'desc',
+    page: int = 1,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """
+    搜索汽车信息
+
+    Args:
+        conn: 数据库连接
+        keyword: 关键词，在年份、品牌、型号、标题中全文检索，空格分隔的多个词需同时匹配
+        make: 品牌（精确匹配，可选值见分面列表）
+        model: 型号（精确匹配）
+        trade_type: 交易类型（精确匹配）
+        year_min / year_max: 年份范围
+        price_min / price_max: 价格范围（美元）
+        miles_min / miles_max: 里程范围
+        sort_field: 排序字段，必须在 CAR_SORT_FIELDS 中，否则按id排序
+        sort_order: 排序顺序 ('asc'或'desc')
+        page: 页码
+        limit: 每页记录数，最大 MAX_PAGE_SIZE
+        fields: 只返回这些列（不存在的列被忽略），默认全部列
+
+    Returns:
+        Dict[str, Any]: {'data': [...], 'meta': {'total', 'page', 'limit', 'pages', 'makes', 'models', 'trade_types'}}
+    """
+    page = max(page or 1, 1)
+    limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    offset = (page - 1) * limit
+
+    meta = get_car_search_meta(conn)
+    if meta is None:
+        return {
+            'data': [],
+            'meta': {'total': 0, 'page': page, 'limit': limit, 'pages': 0,
+                     'makes': [], 'models': [], 'trade_types': []}
+        }
+
+    conditions = []
+    params: List[Any] = []
+
+    if keyword and keyword.strip():
+        clause, clause_params = _fts_condition(keyword.strip(), meta.get('fts') == '1')
+        conditions.append(clause)
+        params.extend(clause_params)
+
+    for column, value in (('s.make', make), ('s.model', model), ('s.trade_type', trade_type)):
+        if value:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+
+    for column, low, high in (('s.year_num', year_min, year_max),
+                              ('s.price_num', price_min, price_max),
+                              ('s.miles_num', miles_min, miles_max)):
+        if low is not None:
+            conditions.append(f"{column} >= ?")
+            params.append(low)
+        if high is not None:
+            conditions.append(f"{column} <= ?")
+            params.append(high)
+
+    where_clause = " AND ".join(conditions) if conditions else "1=1"
+
+    sort_expr, nullable = CAR_SORT_FIELDS.get(sort_field, CAR_SORT_FIELDS['id'])
+    sort_order = 'ASC' if str(sort_order).lower() == 'asc' else 'DESC'
+    # 解析列中无法解析的值（NULL）始终排在最后: 降序时NULL本来就在最后，可以直接按索引顺序读取；
+    # 只有升序需要 IS NULL 前缀
+    if nullable and sort_order == 'ASC':
+        order_by = f"{sort_expr} IS NULL, {sort_expr} {sort_order}"
+    else:
+        order_by = f"{sort_expr} {sort_order}"
+    if sort_expr != 'c.id':
+        order_by += f", c.id {sort_order}"
+
+    from_clause = "car_info c JOIN car_search s ON s.car_id = c.id"
+    total = plain_cursor(conn).execute(
+        f"SELECT COUNT(*) FROM {from_clause} WHERE {where_clause}", params
+    ).fetchone()[0]
+
+    columns = table_columns(conn, 'car_info') if fields else []
+    cursor = conn.cursor()
+    cursor.row_factory = dict_factory
+    cursor.execute(
+        f"SELECT {select_columns(columns, fields, 'c.')} FROM {from_clause} WHERE {where_clause} ORDER BY {order_by} LIMIT ? OFFSET ?",
+        params + [limit, offset]
+    )
+    cars = cursor.fetchall()
+
+    facets = get_car_facets(conn, meta)
+    return {
+        'data': cars,
+        'meta': {
+            'total': total,
+            'page': page,
+            'limit': limit,
+            'pages': (total + limit - 1) // limit,
+            'makes': facets['makes'],
+            'models': facets['models'],
+            'trade_types': facets['trade_types'],
+        }
+    }
@@ -0,0 +1,167 @@
+"""
+仪表盘数据包模块
+
+首页首次加载时要分别请求帖子排行、作者排行、数据趋势、词云、最新新帖和日期范围，每个接口都要查询数据库。
+数据更新完成后预先计算这些默认视图，序列化为一个JSON保存在 data_meta 表中（带有数据版本号），
+/api/dashboard 一次读取直接返回；版本不一致（数据已更新但还没有重新生成）时在首次请求时生成并保存。
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from .data_meta import get_meta, set_meta
+from .db_swap import read_version_id
+from .db_utils import DEFAULT_DB_PATH, get_db_connection
+from .rankings import AUTHOR_SORT_FIELDS, POST_SORT_FIELDS, get_author_ranking, get_post_ranking
+from .responses import dumps
+from .trends import get_data_trends, get_new_posts, get_post_date_range
+from .wordcloud import get_wordcloud
+
+# 设置日志
+logger = logging.getLogger("dashboard")
+
+# data_meta 中保存数据包和生成时的数据版本号的键
+DASHBOARD_BUNDLE_KEY = 'dashboard_bundle'
+DASHBOARD_VERSION_KEY = 'dashboard_version'
+
+# 预先计算的排行榜每页条数（与前端表格默认分页一致）
+DASHBOARD_PAGE_SIZE = 10
+
+# 数据趋势的时间粒度和天数
+TREND_GRANULARITIES = ('daily', 'weekly', 'monthly')
+TREND_DAYS = 30
+
+# 同一进程内同时只生成一次
+_build_lock = threading.Lock()
+
+
+def _version_key(version_id: Optional[str]) -> str:
+    return version_id or ''
+
+
+def _section(name: str, func: Callable[[], Any], default: Any) -> Any:
+    """计算数据包的一部分，失败时记录日志并返回空值（例如表还不存在），不影响其他部分"""
+    try:
+        return func()
+    except Exception as e:
+        logger.warning(f"仪表盘数据包的 {name} 计算失败，使用空值: {str(e)}")
+        return default
+
+
+def compute_dashboard_bundle() -> Dict[str, Any]:
+    """
+    计算仪表盘默认视图（读取环境变量 DATABASE_PATH 指向的数据库）
+
+    Returns:
+        Dict[str, Any]: 各部分与对应接口的返回结构相同:
+            post_rank/author_rank 按排序字段保存降序第一页，trends 按时间粒度保存 /api/data-trends 的 data；
+            计算失败的部分为空值（{} 或 []）
+    """
+    started = time.perf_counter()
+    bundle = {
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+        'page_size': DASHBOARD_PAGE_SIZE,
+        'post_rank': {
+            field: _section(f'post_rank.{field}', lambda field=field: get_post_ranking(
+                1, DASHBOARD_PAGE_SIZE, field, 'desc'), {})
+            for field in POST_SORT_FIELDS
+        },
+        'author_rank': {
+            field: _section(f'author_rank.{field}', lambda field=field: get_author_ranking(
+                1, DASHBOARD_PAGE_SIZE, field, 'desc'), {})
+            for field in AUTHOR_SORT_FIELDS
+        },
+        'trends': {
+            granularity: _section(f'trends.{granularity}', lambda granularity=granularity: get_data_trends(
+                TREND_DAYS, granularity), {})
+            for granularity in TREND_GRANULARITIES
+        },
+        'wordcloud': _section('wordcloud', get_wordcloud, []),
+        'new_posts': _section('new_posts', lambda: get_new_posts(None, 1, DASHBOARD_PAGE_SIZE), {}),
+        'date_range': _section('date_range', get_post_date_range, {}),
+    }
+    logger.info(f"仪表盘数据包计算完成，耗时 {time.perf_counter() - started:.2f} 秒")
+    return bundle
+
+
+def save_dashboard_bundle(conn: sqlite3.Connection, bundle: Dict[str, Any], version_id: Optional[str]) -> str:
+    """
+    把数据包保存到 data_meta
+
+    Returns:
+        str: 序列化后的JSON
+    """
+    payload = dumps({**bundle, 'version_id': version_id}).decode('utf-8')
+    set_meta(conn, DASHBOARD_BUNDLE_KEY, payload)
+    set_meta(conn, DASHBOARD_VERSION_KEY, _version_key(version_id))
+    conn.commit()
+    return payload
+
+
+def build_dashboard_bundle(db_path: str = None) -> bool:
+    """
+    计算并保存当前数据版本的仪表盘数据包（数据更新发布后调用）
+
+    Args:
+        db_path: 数据库文件路径，默认读取环境变量 DATABASE_PATH
+
+    Returns:
+        bool: 是否成功
+    """
+    db_path = db_path or os.environ.get('DATABASE_PATH', DEFAULT_DB_PATH)
+    try:
+        bundle = compute_dashboard_bundle()
+        conn = get_db_connection(db_path)
+        try:
+            payload = save_dashboard_bundle(conn, bundle, read_version_id(db_path))
+        finally:
+            conn.close()
+        logger.info(f"仪表盘数据包已保存，大小 {len(payload)} 字节")
+        return True
+    except Exception as e:
+        logger.error(f"生成仪表盘数据包失败: {str(e)}")
+        return False
+
+
+def _stored_bundle(conn: sqlite3.Connection, version_id: Optional[str]) -> Optional[str]:
+    if get_meta(conn, DASHBOARD_VERSION_KEY) == _version_key(version_id):
+        return get_meta(conn, DASHBOARD_BUNDLE_KEY) or None
+    return None
+
+
+def get_dashboard_bundle(db_path: str = None) -> str:
+    """
+    获取当前数据版本的仪表盘数据包JSON
+
+    保存的数据包版本与当前版本指针一致时直接返回；否则重新计算并保存（多个线程同时请求时只计算一次）。
+    使用单独的连接: 计算各部分时 execute_query 出错会关闭线程共享的连接，不能再用它保存。
+
+    Args:
+        db_path: 数据库文件路径，默认读取环境变量 DATABASE_PATH
+
+    Returns:
+        str: 序列化后的JSON
+    """
+    db_path = db_path or os.environ.get('DATABASE_PATH', DEFAULT_DB_PATH)
+    version_id = read_version_id(db_path)
+
+    conn = get_db_connection(db_path)
+    try:
+        payload = _stored_bundle(conn, version_id)
+        if payload:
+            return payload
+
+        with _build_lock:
+            # 等待期间其他线程可能已经生成
+            payload = _stored_bundle(conn, version_id)
+            if payload:
+                return payload
+            logger.info(f"仪表盘数据包不存在或已过期（数据版本 {version_id}），重新生成")
+            return save_dashboard_bundle(conn, compute_dashboard_bundle(), version_id)
+    finally:
+        conn.close()
@@ -0,0 +1,47 @@
+"""
+数据元信息模块，保存导入时计算好的全局值（如最新抓取时间），API读取时不再重新聚合
+"""
+
+import logging
+import sqlite3
+from typing import Any, Optional
+
+from .db_utils import plain_cursor
+
+# 设置日志
+logger = logging.getLogger("data_meta")
+
+# 元信息表
+DATA_META_TABLE = 'data_meta'
+
+# list 表最新一次抓取的 scraping_time_R
+LATEST_SNAPSHOT_KEY = 'latest_scraping_time'
+
+DATA_META_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {DATA_META_TABLE} (
+        key TEXT PRIMARY KEY,
+        value TEXT,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def set_meta(conn: sqlite3.Connection, key: str, value: Any):
+    """写入一条元信息（调用方负责提交事务）"""
+    cursor = plain_cursor(conn)
+    cursor.execute(DATA_META_DDL)
+    cursor.execute(f"""
+        INSERT INTO {DATA_META_TABLE} (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+    """, (key, None if value is None else str(value)))
+
+
+def get_meta(conn: sqlite3.Connection, key: str, default: Optional[str] = None) -> Optional[str]:
+    """读取一条元信息，表或记录不存在时返回default"""
+    try:
+        row = plain_cursor(conn).execute(
+            f"SELECT value FROM {DATA_META_TABLE} WHERE key = ?", (key,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return default
+    return row[0] if row else default
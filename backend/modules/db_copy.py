@@ -0,0 +1,353 @@
+"""
+数据库间表复制模块
+
+- copy_tables_attached: 通过 ATTACH 在SQLite内部完成复制（INSERT INTO ... SELECT），数据不经过Python，
+  内存占用与表大小无关；表结构和索引直接取自源库 sqlite_master，约束不会丢失
+- copy_table_keyset: 按 rowid/主键分批复制并按主键合并写入，源库只读打开，中断后可以继续
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional
+
+# 设置日志
+logger = logging.getLogger("db_copy")
+
+
+def quote_identifier(name: str) -> str:
+    """为SQLite标识符加双引号"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_table_ddl(conn: sqlite3.Connection, table: str, schema: str = 'main') -> Optional[str]:
+    """返回表的 CREATE TABLE 语句，不存在时返回None"""
+    row = conn.execute(
+        f"SELECT sql FROM {schema}.sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def get_table_objects_ddl(conn: sqlite3.Connection, table: str, schema: str = 'main') -> List[str]:
+    """返回表上显式创建的索引和触发器语句（不包括自动索引）"""
+    rows = conn.execute(
+        f"SELECT sql FROM {schema}.sqlite_master "
+        f"WHERE type IN ('index', 'trigger') AND tbl_name=? AND sql IS NOT NULL "
+        f"ORDER BY type, name",
+        (table,)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def _sync_sequence(conn: sqlite3.Connection, table: str):
+    """同步AUTOINCREMENT表在 sqlite_sequence 中的计数"""
+    has_src_sequence = conn.execute(
+        "SELECT 1 FROM src.sqlite_master WHERE name='sqlite_sequence'"
+    ).fetchone()
+    has_main_sequence = conn.execute(
+        "SELECT 1 FROM main.sqlite_master WHERE name='sqlite_sequence'"
+    ).fetchone()
+    if not has_src_sequence or not has_main_sequence:
+        return
+    conn.execute("DELETE FROM main.sqlite_sequence WHERE name=?", (table,))
+    conn.execute(
+        "INSERT INTO main.sqlite_sequence (name, seq) SELECT name, seq FROM src.sqlite_sequence WHERE name=?",
+        (table,)
+    )
+
+
+def copy_tables_attached(
+    source_db: str,
+    target_db: str,
+    tables: Iterable[str],
+) -> Dict[str, Dict[str, object]]:
+    """
+    把源库中的若干表整体复制到目标库，所有表在同一个事务中完成
+
+    - 目标库不存在该表：按源库DDL建表，导入数据后再建索引和触发器
+    - 目标表结构与源表一致：清空后导入
+    - 目标表结构不同：删除后按源库DDL重建
+
+    Args:
+        source_db: 源数据库路径
+        target_db: 目标数据库路径
+        tables: 需要复制的表名
+
+    Returns:
+        Dict[str, Dict[str, object]]: 每个表的结果 {'status', 'rows', 'seconds'}，
+        源库中不存在的表状态为 'missing'
+
+    Raises:
+        sqlite3.Error: 任意表复制失败时整个事务回滚并抛出
+    """
+    results = {}
+    conn = sqlite3.connect(target_db, isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS src", (source_db,))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in tables:
+                started = time.perf_counter()
+                src_ddl = get_table_ddl(conn, table, 'src')
+                if src_ddl is None:
+                    logger.warning(f"源数据库中不存在表 {table}，跳过")
+                    results[table] = {'status': 'missing', 'rows': 0, 'seconds': 0.0}
+                    continue
+
+                name = quote_identifier(table)
+                target_ddl = get_table_ddl(conn, table, 'main')
+                created = False
+                if target_ddl is None:
+                    conn.execute(src_ddl)
+                    created = True
+                elif target_ddl != src_ddl:
+                    logger.info(f"目标表 {table} 结构与源表不同，按源表结构重建")
+                    conn.execute(f"DROP TABLE main.{name}")
+                    conn.execute(src_ddl)
+                    created = True
+                else:
+                    conn.execute(f"DELETE FROM main.{name}")
+
+                cursor = conn.execute(f"INSERT INTO main.{name} SELECT * FROM src.{name}")
+                rows = cursor.rowcount
+
+                # 数据导入后再建索引，比逐行维护索引更快
+                if created:
+                    for ddl in get_table_objects_ddl(conn, table, 'src'):
+                        conn.execute(ddl)
+                _sync_sequence(conn, table)
+
+                seconds = round(time.perf_counter() - started, 3)
+                results[table] = {'status': 'copied', 'rows': rows, 'seconds': seconds}
+                logger.info(f"已复制表 {table}: {rows} 行, 耗时 {seconds} 秒")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("DETACH DATABASE src")
+    finally:
+        conn.close()
+    return results
+
+
+# 记录分批复制进度的表（位于目标库，复制完成后删除对应记录）
+COPY_PROGRESS_TABLE = '_copy_progress'
+
+# 每批复制的行数（每批一个事务）
+DEFAULT_COPY_BATCH_SIZE = 50000
+
+
+def get_primary_key(conn: sqlite3.Connection, table: str, schema: str = 'main') -> List[str]:
+    """返回表的主键列（按主键中的顺序），没有显式主键时返回空列表"""
+    rows = conn.execute(f"PRAGMA {schema}.table_info({quote_identifier(table)})").fetchall()
+    return [row[1] for row in sorted((row for row in rows if row[5]), key=lambda row: row[5])]
+
+
+def get_unique_keys(conn: sqlite3.Connection, table: str, schema: str = 'main') -> List[List[str]]:
+    """返回主键以外的唯一键（UNIQUE 约束和唯一索引的列），部分索引和表达式索引不包括在内"""
+    keys = []
+    for row in conn.execute(f"PRAGMA {schema}.index_list({quote_identifier(table)})").fetchall():
+        if not row[2] or row[3] == 'pk' or row[4]:
+            continue
+        columns = [item[2] for item in conn.execute(
+            f"PRAGMA {schema}.index_info({quote_identifier(row[1])})"
+        ).fetchall()]
+        if columns and all(columns):
+            keys.append(columns)
+    return keys
+
+
+def _has_rowid(conn: sqlite3.Connection, table: str) -> bool:
+    """WITHOUT ROWID 表没有 rowid"""
+    try:
+        conn.execute(f"SELECT rowid FROM {quote_identifier(table)} LIMIT 0")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _load_progress(conn: sqlite3.Connection, table: str) -> Optional[Dict[str, object]]:
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {COPY_PROGRESS_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            last_key TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    row = conn.execute(
+        f"SELECT last_key, rows FROM {COPY_PROGRESS_TABLE} WHERE table_name = ?", (table,)
+    ).fetchone()
+    return {'last_key': json.loads(row[0]), 'rows': row[1]} if row else None
+
+
+def _create_missing_objects(src_conn: sqlite3.Connection, dst_conn: sqlite3.Connection, table: str):
+    """在目标库创建源表上有而目标表上没有的索引和触发器"""
+    existing = {row[0] for row in dst_conn.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ?", (table,)
+    )}
+    for name, ddl in src_conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL "
+        "ORDER BY type, name", (table,)
+    ).fetchall():
+        if name not in existing:
+            dst_conn.execute(ddl)
+
+
+def copy_table_keyset(
+    source_db: str,
+    target_db: str,
+    table: str,
+    batch_size: int = DEFAULT_COPY_BATCH_SIZE,
+    resume: bool = True
+) -> Dict[str, object]:
+    """
+    按 rowid（WITHOUT ROWID 表按主键）分批把一个表复制到目标库，可以在中断后继续
+
+    - 源库只读打开；每批用 WHERE key > 上一批最后的key 读取，不使用 OFFSET
+    - 用 executemany 写入：有主键时 INSERT ... ON CONFLICT(主键) DO UPDATE，
+      没有主键时连同 rowid 一起 INSERT OR REPLACE，重复执行结果相同
+    - 目标表另有唯一键（如 thread_follow 的 thread_id 唯一索引）时，同一事务中先删除唯一键相同、
+      主键不同的目标行，源库的行取而代之，不会因唯一约束失败而只复制了一半
+    - 每批和进度记录在同一个事务中提交，中断后再次调用从记录的位置继续
+      （已复制的部分不会重新读取源库在此期间的修改）
+    - 目标表不存在或结构不同时按源表DDL重建，复制完成后补建索引和触发器
+
+    Args:
+        source_db: 源数据库路径
+        target_db: 目标数据库路径
+        table: 表名
+        batch_size: 每批的行数
+        resume: 是否从上次中断的位置继续；False 时从头复制
+
+    Returns:
+        Dict[str, object]: {'status', 'rows', 'seconds', 'resumed', 'conflicts'}，conflicts 为因唯一键冲突
+        删除的目标行数；源库中不存在的表状态为 'missing'
+    """
+    started = time.perf_counter()
+    src_conn = sqlite3.connect(f"file:{source_db}?mode=ro", uri=True)
+    dst_conn = sqlite3.connect(target_db, isolation_level=None)
+    try:
+        src_ddl = get_table_ddl(src_conn, table)
+        if src_ddl is None:
+            logger.warning(f"源数据库中不存在表 {table}，跳过")
+            return {'status': 'missing', 'rows': 0, 'seconds': 0.0, 'resumed': False, 'conflicts': 0}
+
+        name = quote_identifier(table)
+        progress = _load_progress(dst_conn, table)
+        target_ddl = get_table_ddl(dst_conn, table)
+        if target_ddl != src_ddl:
+            if target_ddl is not None:
+                logger.info(f"目标表 {table} 结构与源表不同，按源表结构重建")
+                dst_conn.execute(f"DROP TABLE {name}")
+            dst_conn.execute(src_ddl)
+            progress = None
+        if not resume:
+            progress = None
+
+        columns = [row[1] for row in src_conn.execute(f"PRAGMA table_info({name})").fetchall()]
+        primary_key = get_primary_key(src_conn, table)
+        column_list = ', '.join(quote_identifier(column) for column in columns)
+
+        # 分页键: 有 rowid 时用 rowid，否则（WITHOUT ROWID）用主键
+        if _has_rowid(src_conn, table):
+            key_columns = ['rowid']
+        else:
+            key_columns = [quote_identifier(column) for column in primary_key]
+        key_list = ', '.join(key_columns)
+        key_count = len(key_columns)
+        select_sql = (f"SELECT {key_list}, {column_list} FROM {name} "
+                      f"WHERE ({key_list}) > ({', '.join('?' * key_count)}) ORDER BY {key_list} LIMIT ?")
+        first_select_sql = f"SELECT {key_list}, {column_list} FROM {name} ORDER BY {key_list} LIMIT ?"
+
+        # 写入: 按表的真实主键处理冲突；没有主键时带上 rowid，保证重复执行不产生重复行
+        unique_deletes = []
+        if primary_key:
+            update_columns = [column for column in columns if column not in primary_key]
+            conflict = ', '.join(quote_identifier(column) for column in primary_key)
+            if update_columns:
+                assignments = ', '.join(f"{quote_identifier(c)} = excluded.{quote_identifier(c)}" for c in update_columns)
+                action = f"DO UPDATE SET {assignments}"
+            else:
+                action = "DO NOTHING"
+            insert_sql = (f"INSERT INTO {name} ({column_list}) VALUES ({', '.join('?' * len(columns))}) "
+                          f"ON CONFLICT ({conflict}) {action}")
+            value_offset = key_count
+
+            # 其他唯一键（目标表已有的，以及复制完成后按源表补建的）: 先删除唯一键相同但主键不同的目标行，
+            # 否则 upsert 或补建唯一索引会因唯一约束失败
+            pk_match = ' AND '.join(f"{quote_identifier(column)} IS ?" for column in primary_key)
+            pk_positions = [columns.index(column) for column in primary_key]
+            unique_keys = []
+            for unique_key in get_unique_keys(dst_conn, table) + get_unique_keys(src_conn, table):
+                if unique_key not in unique_keys and unique_key != primary_key:
+                    unique_keys.append(unique_key)
+            for unique_key in unique_keys:
+                key_match = ' AND '.join(f"{quote_identifier(column)} = ?" for column in unique_key)
+                positions = [columns.index(column) for column in unique_key] + pk_positions
+                unique_deletes.append((f"DELETE FROM {name} WHERE {key_match} AND NOT ({pk_match})", positions))
+        else:
+            insert_sql = (f"INSERT OR REPLACE INTO {name} (rowid, {column_list}) "
+                          f"VALUES ({', '.join('?' * (len(columns) + 1))})")
+            value_offset = 0
+
+        resumed = progress is not None
+        last_key = progress['last_key'] if progress else None
+        copied = progress['rows'] if progress else 0
+        conflicts = 0
+        if resumed:
+            logger.info(f"表 {table} 从上次中断的位置继续复制（已复制 {copied} 行）")
+
+        while True:
+            if last_key is None:
+                rows = src_conn.execute(first_select_sql, (batch_size,)).fetchall()
+            else:
+                rows = src_conn.execute(select_sql, (*last_key, batch_size)).fetchall()
+            if not rows:
+                break
+
+            last_key = list(rows[-1][:key_count])
+            copied += len(rows)
+            values = [row[value_offset:] for row in rows]
+            dst_conn.execute("BEGIN IMMEDIATE")
+            try:
+                for delete_sql, positions in unique_deletes:
+                    before = dst_conn.total_changes
+                    dst_conn.executemany(delete_sql, [[value[i] for i in positions] for value in values])
+                    conflicts += dst_conn.total_changes - before
+                dst_conn.executemany(insert_sql, values)
+                dst_conn.execute(f"""
+                    INSERT INTO {COPY_PROGRESS_TABLE} (table_name, last_key, rows, updated_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(table_name) DO UPDATE SET
+                        last_key = excluded.last_key, rows = excluded.rows, updated_at = excluded.updated_at
+                """, (table, json.dumps(last_key), copied))
+                dst_conn.execute("COMMIT")
+            except Exception:
+                dst_conn.execute("ROLLBACK")
+                raise
+            logger.debug(f"表 {table} 已复制 {copied} 行")
+            if len(rows) < batch_size:
+                break
+
+        # 复制完成: 补建索引和触发器，清除进度记录
+        dst_conn.execute("BEGIN IMMEDIATE")
+        try:
+            _create_missing_objects(src_conn, dst_conn, table)
+            dst_conn.execute(f"DELETE FROM {COPY_PROGRESS_TABLE} WHERE table_name = ?", (table,))
+            dst_conn.execute("COMMIT")
+        except Exception:
+            dst_conn.execute("ROLLBACK")
+            raise
+        if not dst_conn.execute(f"SELECT 1 FROM {COPY_PROGRESS_TABLE} LIMIT 1").fetchone():
+            dst_conn.execute(f"DROP TABLE {COPY_PROGRESS_TABLE}")
+
+        seconds = round(time.perf_counter() - started, 3)
+        if conflicts:
+            logger.info(f"表 {table} 有 {conflicts} 行目标数据与源数据唯一键相同，已被源数据替换")
+        logger.info(f"已复制表 {table}: {copied} 行, 耗时 {seconds} 秒")
+        return {'status': 'copied', 'rows': copied, 'seconds': seconds, 'resumed': resumed, 'conflicts': conflicts}
+    finally:
+        src_conn.close()
+        dst_conn.close()
@@ -0,0 +1,403 @@
+"""
+数据库热替换模块，基于SQLite在线备份API实现不阻塞读取的备份与原子发布
+
+- online_backup: 使用 sqlite3.Connection.backup 分页复制，步与步之间释放锁，读请求不受影响
+- publish_database: 先备份当前库，再通过在线备份API把新库写入正式库文件，并写入版本指针
+- read_version / write_version: 版本指针文件，后端连接在版本变化时重新打开
+
+正式库始终是 db_path 这一个文件。发布不重命名或删除它: Windows 下被其他进程打开的文件
+无法 os.replace，API 线程又会长期持有连接；在线备份API在文件内部以一个写事务完成替换，
+WAL 模式下读连接在提交前看到旧库、提交后看到新库。
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+# 设置日志
+logger = logging.getLogger("db_swap")
+
+# 每步复制的页数，步与步之间释放源库的共享锁
+DEFAULT_PAGES_PER_STEP = 1024
+
+# 每步之后让出的时间（秒），避免备份占满磁盘IO
+DEFAULT_STEP_SLEEP = 0.002
+
+# 版本指针文件后缀，例如 forum_data.db.version
+VERSION_POINTER_SUFFIX = '.version'
+
+# Windows下目标文件被占用时 os.replace 的重试次数
+REPLACE_RETRIES = 5
+
+# 发布时写入正式库遇到锁等待的超时（秒）
+PUBLISH_LOCK_TIMEOUT = 30
+
+# 待发布数据库附带的SQLite辅助文件
+SIDECAR_SUFFIXES = ('-wal', '-shm', '-journal')
+
+# 版本指针读取缓存: {pointer_path: (mtime_ns, data)}
+_version_cache: Dict[str, Any] = {}
+_version_cache_lock = threading.Lock()
+
+
+def version_pointer_path(db_path: str) -> str:
+    """返回数据库对应的版本指针文件路径"""
+    return f"{db_path}{VERSION_POINTER_SUFFIX}"
+
+
+def read_version(db_path: str) -> Optional[Dict[str, Any]]:
+    """
+    读取数据库的版本指针
+
+    指针文件按修改时间缓存，频繁调用只需一次 stat。
+
+    Args:
+        db_path: 数据库文件路径
+
+    Returns:
+        Optional[Dict[str, Any]]: 版本信息，不存在或无法解析时返回None
+    """
+    pointer_path = version_pointer_path(db_path)
+    try:
+        mtime_ns = os.stat(pointer_path).st_mtime_ns
+    except OSError:
+        return None
+
+    with _version_cache_lock:
+        cached = _version_cache.get(pointer_path)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+
+    try:
+        with open(pointer_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取版本指针失败 {pointer_path}: {str(e)}")
+        return None
+
+    with _version_cache_lock:
+        _version_cache[pointer_path] = (mtime_ns, data)
+    return data
+
+
+def read_version_id(db_path: str) -> Optional[str]:
+    """返回当前发布的版本ID，没有版本指针时返回None"""
+    data = read_version(db_path)
+    return data.get('version_id') if data else None
+
+
+def write_version(db_path: str, version_id: str, extra: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    原子地写入版本指针（先写临时文件再 os.replace）
+
+    Args:
+        db_path: 数据库文件路径
+        version_id: 新版本ID
+        extra: 附加信息，例如备份耗时
+
+    Returns:
+        Dict[str, Any]: 写入的版本信息
+    """
+    data = {
+        'version_id': version_id,
+        'published_at': datetime.now().isoformat(),
+        'db_path': os.path.abspath(db_path),
+    }
+    if extra:
+        data.update(extra)
+
+    pointer_path = version_pointer_path(db_path)
+    tmp_path = f"{pointer_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    _replace_with_retry(tmp_path, pointer_path)
+    return data
+
+
+class ReaderStallProbe:
+    """
+    读取停顿探针
+
+    在后台线程中以固定间隔打开连接并执行一次轻量查询，记录备份/发布期间
+    读取方遇到的最长等待时间，用来验证API在更新窗口内是否仍能正常响应。
+    """
+
+    def __init__(self, db_path: str, interval: float = 0.01,
+                 query: str = "SELECT count(*) FROM sqlite_master"):
+        self.db_path = db_path
+        self.interval = interval
+        self.query = query
+        self._stop = threading.Event()
+        self._thread = None
+        self._latencies = []
+        self._errors = 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                conn = sqlite3.connect(self.db_path, timeout=30)
+                try:
+                    conn.execute(self.query).fetchone()
+                finally:
+                    conn.close()
+                self._latencies.append(time.perf_counter() - started)
+            except sqlite3.Error:
+                self._errors += 1
+            self._stop.wait(self.interval)
+
+    def start(self) -> 'ReaderStallProbe':
+        if os.path.exists(self.db_path):
+            self._thread = threading.Thread(target=self._run, name='reader-stall-probe', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> Dict[str, Any]:
+        """停止探针并返回统计结果（毫秒）"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        latencies = sorted(self._latencies)
+        if not latencies:
+            return {'probes': 0, 'errors': self._errors, 'max_stall_ms': 0.0, 'p50_ms': 0.0}
+        return {
+            'probes': len(latencies),
+            'errors': self._errors,
+            'max_stall_ms': round(latencies[-1] * 1000, 3),
+            'p50_ms': round(latencies[len(latencies) // 2] * 1000, 3),
+        }
+
+
+def online_backup(
+    src_path: str,
+    dst_path: str,
+    pages: int = DEFAULT_PAGES_PER_STEP,
+    step_sleep: float = DEFAULT_STEP_SLEEP,
+    progress: Optional[Callable[[int, int], None]] = None,
+    probe_readers: bool = False,
+) -> Dict[str, Any]:
+    """
+    使用SQLite在线备份API复制数据库
+
+    备份先写入 dst_path.partial，完成后再原子重命名，因此任何时刻都不会出现
+    只写了一半的目标文件。源库以只读方式打开，每步只持有共享锁，其他读连接
+    不会被阻塞。
+
+    Args:
+        src_path: 源数据库路径
+        dst_path: 目标文件路径
+        pages: 每步复制的页数
+        step_sleep: 每步之后休眠的秒数
+        progress: 进度回调 progress(copied_pages, total_pages)
+        probe_readers: 是否在备份期间测量读取停顿
+
+    Returns:
+        Dict[str, Any]: 备份报告，包括耗时、页数、大小和读取停顿
+    """
+    if not os.path.exists(src_path):
+        raise FileNotFoundError(f"源数据库不存在: {src_path}")
+
+    partial_path = f"{dst_path}.partial"
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+
+    probe = ReaderStallProbe(src_path).start() if probe_readers else None
+    state = {'total': 0, 'steps': 0}
+
+    def _on_step(status, remaining, total):
+        state['total'] = total
+        state['steps'] += 1
+        if progress:
+            progress(total - remaining, total)
+        if step_sleep:
+            time.sleep(step_sleep)
+
+    started = time.perf_counter()
+    src_conn = sqlite3.connect(f"file:{src_path}?mode=ro", uri=True)
+    dst_conn = sqlite3.connect(partial_path)
+    try:
+        src_conn.backup(dst_conn, pages=pages, progress=_on_step)
+    finally:
+        dst_conn.close()
+        src_conn.close()
+    os.replace(partial_path, dst_path)
+    duration = time.perf_counter() - started
+
+    report = {
+        'src': src_path,
+        'dst': dst_path,
+        'pages': state['total'],
+        'steps': state['steps'],
+        'bytes': os.path.getsize(dst_path),
+        'seconds': round(duration, 3),
+    }
+    if probe:
+        report['reader_stall'] = probe.stop()
+
+    logger.info(f"在线备份完成: {src_path} -> {dst_path}, {report['pages']} 页, "
+                f"{report['bytes'] / (1024 * 1024):.2f} MB, 耗时 {report['seconds']} 秒")
+    return report
+
+
+def _replace_with_retry(src: str, dst: str):
+    """os.replace，Windows下目标被占用时短暂重试"""
+    for attempt in range(1, REPLACE_RETRIES + 1):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == REPLACE_RETRIES:
+                raise
+            logger.warning(f"第 {attempt} 次替换 {dst} 时文件被占用，稍后重试")
+            time.sleep(0.2 * attempt)
+
+
+def _prepare_for_publish(path: str, page_size: int = None):
+    """
+    将数据库的WAL内容合并回主文件，保证单文件即可完整表示数据库
+
+    page_size 与数据库不同时用 VACUUM 转换: 在线备份API无法写入页大小不同的WAL模式数据库。
+    """
+    conn = sqlite3.connect(path)
+    try:
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        if journal_mode.lower() == 'wal':
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if page_size and conn.execute("PRAGMA page_size").fetchone()[0] != page_size:
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.execute(f"PRAGMA page_size={int(page_size)}")
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def _open_live_for_publish(db_path: str) -> sqlite3.Connection:
+    """
+    打开正式库用于写入新版本，并尽量切换到WAL模式
+
+    WAL 模式下写入新库期间读连接继续读取提交前的快照，不会被阻塞；
+    其他连接正在使用、暂时无法切换时按原日志模式发布，读取方会在提交时短暂等待。
+    """
+    conn = sqlite3.connect(db_path, timeout=PUBLISH_LOCK_TIMEOUT)
+    if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != 'wal':
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"正式库无法切换到WAL模式，按原日志模式发布: {str(e)}")
+    return conn
+
+
+def _remove_staged(staged_path: str):
+    """删除已写入正式库的待发布文件及其辅助文件"""
+    for path in (staged_path,) + tuple(f"{staged_path}{suffix}" for suffix in SIDECAR_SUFFIXES):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"删除待发布数据库文件失败 {path}: {str(e)}")
+
+
+def validate_database(path: str) -> bool:
+    """检查数据库文件可以打开、包含表且通过 quick_check"""
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            table_count = conn.execute("SELECT count(*) FROM sqlite_master WHERE type='table'").fetchone()[0]
+            if table_count == 0:
+                logger.error(f"数据库无效，不包含任何表: {path}")
+                return False
+            result = conn.execute("PRAGMA quick_check").fetchone()[0]
+            if result != 'ok':
+                logger.error(f"数据库 quick_check 未通过: {path}: {result}")
+                return False
+            return True
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.error(f"数据库无效，无法连接或查询 {path}: {str(e)}")
+        return False
+
+
+def publish_database(
+    staged_path: str,
+    db_path: str,
+    version_id: str,
+    backup_path: str = None,
+    pages: int = DEFAULT_PAGES_PER_STEP,
+    probe_readers: bool = True,
+) -> Dict[str, Any]:
+    """
+    发布新数据库: 在线备份当前库 -> 把新库写入正式库文件 -> 写入版本指针
+
+    新库通过在线备份API写入 db_path 本身，整个替换在一个写事务中提交，因此即使API进程
+    正持有正式库的连接（Windows 下无法替换被占用的文件）也能发布，所有按 db_path 打开
+    数据库的脚本都读到新版本，读连接不会看到半写状态的数据库。正式库不存在时直接重命名。
+    发布完成后删除 staged_path。
+
+    Args:
+        staged_path: 已准备好的新数据库（例如临时库）
+        db_path: 正式数据库路径
+        version_id: 新版本ID
+        backup_path: 备份文件路径，为None时不备份
+        pages: 在线备份每步页数
+        probe_readers: 是否测量读取停顿
+
+    Returns:
+        Dict[str, Any]: 发布报告
+
+    Raises:
+        ValueError: 待发布的数据库无效
+    """
+    if not validate_database(staged_path):
+        raise ValueError(f"待发布的数据库无效: {staged_path}")
+
+    probe = ReaderStallProbe(db_path).start() if probe_readers else None
+    report = {'version_id': version_id, 'db_path': db_path, 'backup': None}
+
+    started = time.perf_counter()
+    if backup_path and os.path.exists(db_path):
+        report['backup'] = online_backup(db_path, backup_path, pages=pages)
+
+    swap_started = time.perf_counter()
+    if os.path.exists(db_path):
+        live_conn = _open_live_for_publish(db_path)
+        try:
+            _prepare_for_publish(staged_path, live_conn.execute("PRAGMA page_size").fetchone()[0])
+            staged_conn = sqlite3.connect(f"file:{staged_path}?mode=ro", uri=True)
+            try:
+                staged_conn.backup(live_conn, pages=pages)
+            finally:
+                staged_conn.close()
+            # 新版本已提交；WAL 中的页由检查点逐步写回主文件，不等待仍在读取旧快照的连接
+            live_conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        finally:
+            live_conn.close()
+        _remove_staged(staged_path)
+    else:
+        _prepare_for_publish(staged_path)
+        _replace_with_retry(staged_path, db_path)
+    report['swap_seconds'] = round(time.perf_counter() - swap_started, 4)
+    report['total_seconds'] = round(time.perf_counter() - started, 3)
+
+    if probe:
+        report['reader_stall'] = probe.stop()
+
+    write_version(db_path, version_id, {
+        'backup_path': backup_path if report['backup'] else None,
+        'backup_seconds': report['backup']['seconds'] if report['backup'] else 0,
+        'swap_seconds': report['swap_seconds'],
+    })
+
+    stall = report.get('reader_stall', {})
+    logger.info(f"数据库已发布版本 {version_id}: 备份 "
+                f"{report['backup']['seconds'] if report['backup'] else 0} 秒, "
+                f"替换 {report['swap_seconds']} 秒, 读取最长停顿 {stall.get('max_stall_ms', 0)} 毫秒")
+    return report
@@ -7,13 +7,14 @@ import os
 import logging
 from typing import List, Dict, Any, Optional, Tuple, Union
 import time
+import threading
 from datetime import datetime
 
+from .db_copy import quote_identifier
+from .db_swap import read_version_id
+from .metrics import InstrumentedConnection
+
 # 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-)
 logger = logging.getLogger("db_utils")
 
 # 数据库默认配置
@@ -22,6 +23,32 @@ DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'db',
 # 最大重试次数
 MAX_RETRIES = 3
 
+# 可以通过重试（重新打开连接）解决的错误: 数据库被锁定、连接已关闭或文件暂时无法打开（发布新版本时）
+TRANSIENT_ERROR_MESSAGES = ('locked', 'busy', 'closed', 'unable to open', 'disk i/o')
+
+# 关注表结构（init_db 和关注模块共用这一份定义）
+THREAD_FOLLOW_DDL = """
+    CREATE TABLE IF NOT EXISTS thread_follow (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        thread_id TEXT NOT NULL,
+        url TEXT NOT NULL,
+        title TEXT,
+        author TEXT,
+        author_link TEXT,
+        days_old INTEGER DEFAULT 0,
+        last_active INTEGER DEFAULT 0,
+        read_count INTEGER DEFAULT 0,
+        reply_count INTEGER DEFAULT 0,
+        follow_status TEXT CHECK(follow_status IN ('followed', 'my_thread', 'not_followed')) DEFAULT 'not_followed',
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        thread_key INTEGER
+    )
+"""
+
+# 已确认存在的数据库目录，避免每次连接都调用 os.makedirs
+_ensured_dirs = set()
+
 def dict_factory(cursor, row):
     """
     将SQLite查询结果转换为字典
@@ -38,6 +65,24 @@ def dict_factory(cursor, row):
         result[col[0]] = row[idx]
     return result
 
+def plain_cursor(conn: sqlite3.Connection) -> sqlite3.Cursor:
+    """返回按元组返回行的游标，不受连接上设置的 row_factory 影响"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor
+
+def table_columns(conn: Union[sqlite3.Connection, sqlite3.Cursor], table: str) -> List[str]:
+    """返回表的列名（按定义顺序），表不存在时返回空列表"""
+    cursor = plain_cursor(conn) if isinstance(conn, sqlite3.Connection) else conn
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({quote_identifier(table)})").fetchall()]
+
+def main_db_file(conn: sqlite3.Connection) -> str:
+    """返回连接对应的主数据库文件路径（内存库返回空字符串）"""
+    for _, name, path in plain_cursor(conn).execute("PRAGMA database_list").fetchall():
+        if name == 'main':
+            return path
+    return ''
+
 def get_db_connection(db_path: str = None) -> sqlite3.Connection:
     """
     获取数据库连接
@@ -52,11 +97,14 @@ def get_db_connection(db_path: str = None) -> sqlite3.Connection:
     if db_path is None:
         db_path = os.environ.get('DATABASE_PATH', DEFAULT_DB_PATH)
     
-    # 确保目录存在
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    # 确保目录存在（每个目录只检查一次）
+    db_dir = os.path.dirname(db_path)
+    if db_dir not in _ensured_dirs:
+        os.makedirs(db_dir, exist_ok=True)
+        _ensured_dirs.add(db_dir)
     
-    # 连接数据库
-    conn = sqlite3.connect(db_path)
+    # 连接数据库（每条SQL计时，计入请求统计和慢查询记录）
+    conn = sqlite3.connect(db_path, factory=InstrumentedConnection)
     
     # 设置行工厂，返回字典类型结果
     conn.row_factory = dict_factory
@@ -66,6 +114,59 @@ def get_db_connection(db_path: str = None) -> sqlite3.Connection:
     
     return conn
 
+# 线程内复用的连接: {db_path: (connection, version_id)}
+_local = threading.local()
+
+def get_shared_connection(db_path: str = None) -> sqlite3.Connection:
+    """
+    获取当前线程复用的数据库连接
+    
+    连接按数据库路径缓存在线程本地存储中；当版本指针显示数据库已被替换时，
+    关闭旧连接并重新打开，从而读取新发布的数据库文件。
+    
+    Args:
+        db_path: 数据库文件路径，默认使用DEFAULT_DB_PATH
+        
+    Returns:
+        sqlite3.Connection: 数据库连接对象
+    """
+    if db_path is None:
+        db_path = os.environ.get('DATABASE_PATH', DEFAULT_DB_PATH)
+    
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    
+    version_id = read_version_id(db_path)
+    cached = connections.get(db_path)
+    if cached is not None:
+        conn, opened_version = cached
+        if opened_version == version_id:
+            return conn
+        logger.info(f"数据库版本已变化 ({opened_version} -> {version_id})，重新打开连接")
+        conn.close()
+    
+    conn = get_db_connection(db_path)
+    connections[db_path] = (conn, version_id)
+    return conn
+
+def close_shared_connection(db_path: str = None):
+    """关闭并丢弃当前线程缓存的连接"""
+    if db_path is None:
+        db_path = os.environ.get('DATABASE_PATH', DEFAULT_DB_PATH)
+    connections = getattr(_local, 'connections', None) or {}
+    cached = connections.pop(db_path, None)
+    if cached is not None:
+        try:
+            cached[0].close()
+        except sqlite3.Error:
+            pass
+
+def _is_transient(error: sqlite3.Error) -> bool:
+    """表不存在、语法错误等重试也不会成功的错误返回 False"""
+    message = str(error).lower()
+    return any(text in message for text in TRANSIENT_ERROR_MESSAGES)
+
 def execute_query(query: str, params: tuple = None, db_path: str = None) -> List[Dict[str, Any]]:
     """
     执行查询并返回结果
@@ -83,7 +184,7 @@ def execute_query(query: str, params: tuple = None, db_path: str = None) -> List
     
     while retries < MAX_RETRIES:
         try:
-            conn = get_db_connection(db_path)
+            conn = get_shared_connection(db_path)
             cursor = conn.cursor()
             
             if params:
@@ -92,19 +193,21 @@ def execute_query(query: str, params: tuple = None, db_path: str = None) -> List
                 cursor.execute(query)
                 
             result = [dict(row) for row in cursor.fetchall()]
-            conn.close()
+            cursor.close()
             return result
         except sqlite3.Error as e:
+            if not _is_transient(e):
+                logger.error(f"数据库查询出错: {str(e)}")
+                raise
             logger.error(f"数据库查询出错 (尝试 {retries+1}/{MAX_RETRIES}): {str(e)}")
+            # 丢弃可能已失效的连接，下次重新打开
+            close_shared_connection(db_path)
             retries += 1
             if retries < MAX_RETRIES:
                 time.sleep(1)  # 重试前等待
             else:
                 logger.error(f"查询失败，已达到最大重试次数: {query}")
                 raise
-        finally:
-            if 'conn' in locals() and conn:
-                conn.close()
     
     return result
 
@@ -125,7 +228,7 @@ def execute_update(query: str, params: tuple = None, db_path: str = None) -> int
     
     while retries < MAX_RETRIES:
         try:
-            conn = get_db_connection(db_path)
+            conn = get_shared_connection(db_path)
             cursor = conn.cursor()
             
             if params:
@@ -135,19 +238,22 @@ def execute_update(query: str, params: tuple = None, db_path: str = None) -> int
                 
             affected_rows = cursor.rowcount
             conn.commit()
-            conn.close()
+            cursor.close()
             return affected_rows
         except sqlite3.Error as e:
+            if not _is_transient(e):
+                logger.error(f"数据库更新出错: {str(e)}")
+                # 丢弃连接，避免未提交的事务留在共享连接上
+                close_shared_connection(db_path)
+                raise
             logger.error(f"数据库更新出错 (尝试 {retries+1}/{MAX_RETRIES}): {str(e)}")
+            close_shared_connection(db_path)
             retries += 1
             if retries < MAX_RETRIES:
                 time.sleep(1)  # 重试前等待
             else:
                 logger.error(f"更新失败，已达到最大重试次数: {query}")
                 raise
-        finally:
-            if 'conn' in locals() and conn:
-                conn.close()
     
     return affected_rows
 
@@ -201,6 +307,25 @@ def get_all_tables(db_path: str = None) -> List[str]:
     result = execute_query(query, db_path=db_path)
     return [row['name'] for row in result]
 
+def select_columns(available, fields=None, prefix: str = '') -> str:
+    """
+    按字段投影生成SELECT列表，只保留表中存在的列（防止SQL注入）
+    
+    Args:
+        available: 表中的列
+        fields: 客户端请求的字段，为空或没有有效字段时返回全部列
+        prefix: 表别名，如 'c.'
+        
+    Returns:
+        str: SELECT列表
+    """
+    if fields:
+        available = set(available)
+        columns = [field for field in fields if field in available]
+        if columns:
+            return ', '.join(f'{prefix}"{column}"' for column in columns)
+    return f'{prefix}*'
+
 def init_db():
     """初始化数据库表"""
     try:
@@ -208,23 +333,7 @@ def init_db():
         cursor = conn.cursor()
 
         # 创建thread_follow表
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS thread_follow (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            thread_id TEXT NOT NULL,
-            url TEXT NOT NULL,
-            title TEXT,
-            author TEXT,
-            author_link TEXT,
-            days_old INTEGER DEFAULT 0,
-            last_active INTEGER DEFAULT 0,
-            read_count INTEGER DEFAULT 0,
-            reply_count INTEGER DEFAULT 0,
-            follow_status TEXT CHECK(follow_status IN ('followed', 'my_thread', 'not_followed')) DEFAULT 'not_followed',
-            created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL
-        )
-        """)
+        cursor.execute(THREAD_FOLLOW_DDL)
 
         # 创建索引
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_thread_follow_thread_id ON thread_follow(thread_id)")
@@ -242,7 +351,3 @@ def insert_test_data():
     """此功能已禁用，不再生成测试数据"""
     print("系统已禁用测试数据生成功能")
     return True
-
-# 在模块导入时初始化数据库
-init_db()
-insert_test_data() 
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+处理结果的Excel导出模块
+
+py/post.py、py/update.py 原来先用 to_excel 写出 post.xlsx / update.xlsx，再用 openpyxl 重新加载，
+逐个单元格设置字体、边框和对齐（最多1万行）后再保存一次，样式处理和第二次读写占了导出的一半以上时间。
+这里在一次流式写入中完成:
+
+- 安装了 xlsxwriter 时用列格式（字体、边框、居中）和表头格式，数据单元格不再单独设置样式
+- 否则用 openpyxl 的 write_only 模式逐行写出，所有单元格共用同一个命名样式
+- 列宽按表头和前100行的内容计算（与原实现相同）
+- 先写到临时文件再替换，导出失败时不会留下写了一半的文件
+"""
+
+import logging
+import os
+from typing import List, Optional
+
+import pandas as pd
+
+# 设置日志
+logger = logging.getLogger("excel_export")
+
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+ENGINES = ('xlsxwriter', 'openpyxl')
+
+# 样式：苹果平方字体、表头黄色背景加粗、黑色细边框、居中
+FONT_NAME = 'PingFang SC'
+FONT_SIZE = 11
+HEADER_COLOR = 'FFFF00'
+BORDER_COLOR = '000000'
+DATETIME_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+# 列宽按表头和前若干行计算，最大宽度50
+WIDTH_SAMPLE_ROWS = 100
+MAX_COLUMN_WIDTH = 50
+
+
+def default_engine() -> str:
+    return 'xlsxwriter' if XLSXWRITER_AVAILABLE else 'openpyxl'
+
+
+def column_widths(df: pd.DataFrame) -> List[float]:
+    """按表头和前 WIDTH_SAMPLE_ROWS 行内容的最大长度计算列宽"""
+    sample = df.head(WIDTH_SAMPLE_ROWS)
+    widths = []
+    # 按位置取列（处理结果中可能有同名列）
+    for index, column in enumerate(df.columns):
+        values = sample.iloc[:, index]
+        lengths = [len(str(column))] + [len(str(value)) for value in values if pd.notna(value) and value != '']
+        widths.append(min((max(lengths) + 2) * 1.2, MAX_COLUMN_WIDTH))
+    return widths
+
+
+def _datetime_columns(df: pd.DataFrame) -> List[bool]:
+    return [pd.api.types.is_datetime64_any_dtype(dtype) for dtype in df.dtypes]
+
+
+def _rows(df: pd.DataFrame):
+    """逐行返回可直接写入的Python值，空值为None"""
+    values = df.astype(object).where(df.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+
+def _write_xlsxwriter(df: pd.DataFrame, path: str):
+    # 与 to_excel 相同，字符串原样写入，不转换为公式或超链接
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'strings_to_formulas': False,
+                                         'strings_to_urls': False})
+    try:
+        worksheet = workbook.add_worksheet()
+        base = {'font_name': FONT_NAME, 'font_size': FONT_SIZE, 'border': 1, 'border_color': f'#{BORDER_COLOR}',
+                'align': 'center', 'valign': 'vcenter'}
+        header_format = workbook.add_format({**base, 'bold': True, 'bg_color': f'#{HEADER_COLOR}', 'text_wrap': True})
+        cell_format = workbook.add_format(base)
+        datetime_format = workbook.add_format({**base, 'num_format': DATETIME_FORMAT})
+
+        # 列格式作用于没有单独设置格式的单元格；日期时间列需要数字格式，单独传入
+        writers = []
+        for index, (is_datetime, width) in enumerate(zip(_datetime_columns(df), column_widths(df))):
+            worksheet.set_column(index, index, width, datetime_format if is_datetime else cell_format)
+            if is_datetime:
+                writers.append((worksheet.write_datetime, datetime_format))
+            elif pd.api.types.is_numeric_dtype(df.dtypes.iloc[index]):
+                writers.append((worksheet.write_number, None))
+            else:
+                writers.append((worksheet.write, None))
+
+        worksheet.write_row(0, 0, [str(column) for column in df.columns], header_format)
+        for row_index, row in enumerate(_rows(df), start=1):
+            for col_index, value in enumerate(row):
+                if value is not None:
+                    write, cell_format = writers[col_index]
+                    write(row_index, col_index, value, cell_format)
+    finally:
+        workbook.close()
+
+
+def _write_openpyxl(df: pd.DataFrame, path: str):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    side = Side(style='thin', color=BORDER_COLOR)
+    border = Border(left=side, right=side, top=side, bottom=side)
+
+    header_style = NamedStyle(name='export_header', font=Font(name=FONT_NAME, size=FONT_SIZE, bold=True),
+                              fill=PatternFill(start_color=HEADER_COLOR, end_color=HEADER_COLOR, fill_type='solid'),
+                              border=border, alignment=Alignment(horizontal='center', vertical='center', wrap_text=True))
+    cell_style = NamedStyle(name='export_cell', font=Font(name=FONT_NAME, size=FONT_SIZE), border=border,
+                            alignment=Alignment(horizontal='center', vertical='center'))
+    datetime_style = NamedStyle(name='export_datetime', font=Font(name=FONT_NAME, size=FONT_SIZE), border=border,
+                                alignment=Alignment(horizontal='center', vertical='center'),
+                                number_format=DATETIME_FORMAT)
+    for style in (header_style, cell_style, datetime_style):
+        workbook.add_named_style(style)
+
+    # write_only 模式下列宽必须在写入第一行之前设置
+    for index, width in enumerate(column_widths(df), start=1):
+        worksheet.column_dimensions[get_column_letter(index)].width = width
+    styles = ['export_datetime' if is_datetime else 'export_cell' for is_datetime in _datetime_columns(df)]
+
+    def styled(value, style):
+        cell = WriteOnlyCell(worksheet, value)
+        cell.style = style
+        return cell
+
+    worksheet.append([styled(str(column), 'export_header') for column in df.columns])
+    for row in _rows(df):
+        worksheet.append([styled(value, style) for value, style in zip(row, styles)])
+    workbook.save(path)
+
+
+def export_styled_excel(df: pd.DataFrame, path, engine: Optional[str] = None) -> str:
+    """
+    一次写出带样式的Excel文件（不写索引）
+
+    Args:
+        df: 要导出的数据
+        path: 输出文件路径
+        engine: 'xlsxwriter' 或 'openpyxl'，默认安装了 xlsxwriter 时使用 xlsxwriter
+
+    Returns:
+        str: 输出文件路径
+    """
+    engine = engine or default_engine()
+    if engine not in ENGINES:
+        raise ValueError(f"不支持的导出引擎: {engine}")
+    if engine == 'xlsxwriter' and not XLSXWRITER_AVAILABLE:
+        raise ImportError("未安装 xlsxwriter")
+
+    path = str(path)
+    temp_path = f"{path}.tmp"
+    try:
+        if engine == 'xlsxwriter':
+            _write_xlsxwriter(df, temp_path)
+        else:
+            _write_openpyxl(df, temp_path)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    logger.info(f"已导出 {len(df)} 行到 {path}（{engine}）")
+    return path
+
@@ -0,0 +1,390 @@
+"""
+帖子关注模块，thread_follow 表以规范的thread_id为唯一键
+
+- 关注列表通过整数 thread_key 等值连接 post_ranking（两侧都有索引）
+- 批量关注/取消关注在一个事务中完成，使用 UPSERT 代替先查询再更新/插入
+- 取消关注只做精确匹配，走索引
+- thread_id 唯一索引由 migrate_thread_follow 在服务启动时建立，接口请求只检查不迁移
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .db_swap import read_version_id
+from .db_utils import THREAD_FOLLOW_DDL, main_db_file, plain_cursor
+from .thread_ids import canonical_thread_id, table_has_thread_key, thread_url_sql
+
+# 设置日志
+logger = logging.getLogger("follows")
+
+# 前端关注类型 -> thread_follow.follow_status
+FOLLOW_STATUS = {
+    'my_follow': 'followed',
+    'my_thread': 'my_thread',
+}
+
+# 单次批量操作允许的最大ID数
+MAX_BATCH_SIZE = 10000
+
+# thread_id 唯一索引（批量关注的 UPSERT 依赖它）
+UNIQUE_INDEX = 'idx_thread_follow_thread_id_unique'
+
+# 已检查过结构的数据库: {(db_file, version_id): {'ready': bool, 'post_ranking': bool}}
+_schema_state: Dict[Tuple[str, Optional[str]], Dict[str, bool]] = {}
+_schema_lock = threading.Lock()
+
+
+def follow_status_for(follow_type: str) -> str:
+    """把前端的关注类型转换为 follow_status"""
+    return FOLLOW_STATUS.get(follow_type, 'my_thread')
+
+
+def normalize_thread_ids(values: Iterable[Any]) -> Tuple[List[int], List[Any]]:
+    """
+    规范化并去重一组thread_id（保持原有顺序）
+
+    Returns:
+        Tuple[List[int], List[Any]]: (规范的thread_id列表, 无法识别的原始值列表)
+    """
+    ids = []
+    invalid = []
+    seen = set()
+    for value in values:
+        thread_id = canonical_thread_id(value)
+        if thread_id is None:
+            invalid.append(value)
+        elif thread_id not in seen:
+            seen.add(thread_id)
+            ids.append(thread_id)
+    return ids, invalid
+
+
+def _has_index(cursor: sqlite3.Cursor, name: str) -> bool:
+    return cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='index' AND name=?", (name,)
+    ).fetchone() is not None
+
+
+def _backup_dir(db_file: str) -> str:
+    """关注数据备份目录，与 backup_follows.py 相同（数据库目录旁的 backups/follows）"""
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(db_file))), 'backups', 'follows')
+
+
+def _backup_follows(cursor: sqlite3.Cursor, backup_dir: str) -> str:
+    """把整张关注表导出为JSON（与 backup_follows.py 格式相同，可用 restore_follows.py 恢复）"""
+    cursor.execute("SELECT * FROM thread_follow")
+    columns = [column[0] for column in cursor.description]
+    rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    os.makedirs(backup_dir, exist_ok=True)
+    backup_file = os.path.join(backup_dir, f"follows_backup_{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+    with open(backup_file, 'w', encoding='utf-8') as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+    return backup_file
+
+
+def migrate_thread_follow(conn: sqlite3.Connection, backup_dir: str = None) -> Dict[str, Any]:
+    """
+    关注表迁移: 规范化thread_id、删除同一帖子的重复记录，然后建立thread_id唯一索引
+
+    由服务启动（bootstrap）执行，接口请求不会调用。需要修改或删除记录时先把整张表备份为JSON，
+    删除的每条记录都写入日志；已有唯一索引时只补建缺少的索引。
+
+    Args:
+        conn: 数据库连接
+        backup_dir: 备份目录，默认数据库目录旁的 backups/follows
+
+    Returns:
+        Dict[str, Any]: {'normalized': 规范化的行数, 'deleted': 删除的行数, 'backup': 备份文件或None}
+    """
+    result = {'normalized': 0, 'deleted': 0, 'backup': None}
+    cursor = plain_cursor(conn)
+    try:
+        cursor.execute(THREAD_FOLLOW_DDL)
+        if not _has_index(cursor, UNIQUE_INDEX):
+            cursor.execute("BEGIN IMMEDIATE")
+            rows = cursor.execute("SELECT id, thread_id, url FROM thread_follow").fetchall()
+            updates = []
+            for row_id, thread_id, url in rows:
+                canonical = canonical_thread_id(thread_id)
+                if canonical is None:
+                    canonical = canonical_thread_id(url)
+                if canonical is not None and thread_id != str(canonical):
+                    updates.append((str(canonical), row_id))
+
+            # 同一帖子（规范化之后）只保留最近更新的一条
+            canonical_ids = dict((row_id, thread_id) for thread_id, row_id in updates)
+            latest = {}
+            duplicates = []
+            for row_id, thread_id, follow_status, updated_at in cursor.execute(
+                "SELECT id, thread_id, follow_status, updated_at FROM thread_follow ORDER BY updated_at DESC, id DESC"
+            ).fetchall():
+                thread_id = canonical_ids.get(row_id, thread_id)
+                if thread_id in latest:
+                    duplicates.append((row_id, thread_id, follow_status, updated_at, latest[thread_id]))
+                else:
+                    latest[thread_id] = row_id
+
+            if updates or duplicates:
+                db_file = main_db_file(conn)
+                result['backup'] = _backup_follows(cursor, backup_dir or _backup_dir(db_file))
+                logger.info(f"关注表迁移前已备份: {result['backup']}")
+            for row_id, thread_id, follow_status, updated_at, kept_id in duplicates:
+                logger.warning(f"删除重复的关注记录 id={row_id} thread_id={thread_id} "
+                               f"follow_status={follow_status} updated_at={updated_at}（保留 id={kept_id}）")
+            cursor.executemany("DELETE FROM thread_follow WHERE id = ?", [(row[0],) for row in duplicates])
+            cursor.executemany("UPDATE thread_follow SET thread_id = ? WHERE id = ?", updates)
+            cursor.execute(f"CREATE UNIQUE INDEX {UNIQUE_INDEX} ON thread_follow(thread_id)")
+            result['normalized'] = len(updates)
+            result['deleted'] = len(duplicates)
+            logger.info(f"关注表迁移完成: 规范化 {len(updates)} 条thread_id, 删除 {len(duplicates)} 条重复记录")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_thread_follow_status_created ON thread_follow(follow_status, created_at)")
+        conn.commit()
+    except (sqlite3.Error, OSError):
+        conn.rollback()
+        raise
+
+    with _schema_lock:
+        _schema_state.clear()
+    return result
+
+
+def ensure_follow_schema(conn: sqlite3.Connection) -> Dict[str, bool]:
+    """
+    检查关注表的结构（只读，迁移见 migrate_thread_follow）
+
+    检查结果按数据库文件和版本缓存，数据库发布新版本（post_ranking 被替换）后重新检查。
+
+    Args:
+        conn: 数据库连接
+
+    Returns:
+        Dict[str, bool]: {'ready': 是否已有thread_id唯一索引, 'post_ranking': post_ranking表是否可用于连接}
+    """
+    key = (main_db_file(conn), read_version_id(main_db_file(conn)))
+    with _schema_lock:
+        state = _schema_state.get(key)
+    if state is not None:
+        return state
+
+    ready = _has_index(plain_cursor(conn), UNIQUE_INDEX)
+    if not ready:
+        logger.warning("关注表还没有thread_id唯一索引，需要重启服务执行启动迁移后才能关注帖子")
+    # post_ranking 还没有 thread_key 列（迁移在服务启动时执行）时关注列表不关联排行数据
+    state = {'ready': ready, 'post_ranking': table_has_thread_key(conn, 'post_ranking')}
+    with _schema_lock:
+        _schema_state[key] = state
+    return state
+
+
+def list_follows(conn: sqlite3.Connection, status: str) -> List[Dict[str, Any]]:
+    """
+    获取指定状态的关注列表，并附带排行数据
+
+    Args:
+        conn: 数据库连接（row_factory 为 dict_factory）
+        status: follow_status
+
+    Returns:
+        List[Dict[str, Any]]: 关注记录，按关注时间倒序
+    """
+    state = ensure_follow_schema(conn)
+    if state['post_ranking']:
+        query = """
+            SELECT
+                tf.id,
+                tf.thread_id,
+                COALESCE(tf.url, pr.url) AS url,
+                COALESCE(tf.title, pr.title) AS title,
+                COALESCE(tf.author, pr.author) AS author,
+                COALESCE(tf.author_link, pr.author_link) AS author_link,
+                COALESCE(pr.repost_count, 0) AS repost_count,
+                COALESCE(pr.reply_count, 0) AS reply_count,
+                COALESCE(pr.delete_reply_count, 0) AS delete_reply_count,
+                COALESCE(pr.daysold, 0) AS days_old,
+                COALESCE(pr.last_active, 0) AS last_active,
+                tf.follow_status,
+                tf.created_at,
+                tf.updated_at
+            FROM thread_follow tf
+            LEFT JOIN post_ranking pr ON pr.thread_key = tf.thread_key
+            WHERE tf.follow_status = ?
+            ORDER BY tf.created_at DESC
+        """
+    else:
+        query = """
+            SELECT
+                id, thread_id, url, title, author, author_link,
+                0 AS repost_count, 0 AS reply_count, 0 AS delete_reply_count,
+                0 AS days_old, 0 AS last_active,
+                follow_status, created_at, updated_at
+            FROM thread_follow
+            WHERE follow_status = ?
+            ORDER BY created_at DESC
+        """
+    return conn.execute(query, (status,)).fetchall()
+
+
+def follow_threads(conn: sqlite3.Connection, thread_ids: Iterable[Any], status: str) -> Dict[str, Any]:
+    """
+    批量关注帖子（新帖子插入，已有记录更新状态），在一个事务中完成
+
+    帖子信息从 post_ranking 补全；找不到时URL由thread_id生成（init_db 建立的表中 url 为 NOT NULL），其他信息为空。
+
+    Args:
+        conn: 数据库连接
+        thread_ids: thread_id、帖子URL等，会先规范化
+        status: follow_status
+
+    Returns:
+        Dict[str, Any]: {'requested', 'affected_rows', 'invalid'}
+    """
+    state = ensure_follow_schema(conn)
+    if not state['ready']:
+        raise RuntimeError("关注表尚未迁移（缺少thread_id唯一索引），请重启服务执行启动迁移")
+    ids, invalid = normalize_thread_ids(thread_ids)
+    if not ids:
+        return {'requested': 0, 'affected_rows': 0, 'invalid': invalid}
+
+    now = datetime.now().isoformat()
+    if state['post_ranking']:
+        # 同一帖子在 post_ranking 中有多行时只取一行
+        source = """
+            SELECT CAST(ids.value AS TEXT), ids.value, COALESCE(pr.url, {url}), pr.title, pr.author, pr.author_link,
+                ?, ?, ?
+            FROM json_each(?) ids
+            LEFT JOIN post_ranking pr ON pr.rowid = (
+                SELECT rowid FROM post_ranking WHERE thread_key = ids.value LIMIT 1
+            )
+            WHERE 1
+        """
+    else:
+        source = """
+            SELECT CAST(ids.value AS TEXT), ids.value, {url}, NULL, NULL, NULL, ?, ?, ?
+            FROM json_each(?) ids
+            WHERE 1
+        """
+
+    source = source.format(url=thread_url_sql('ids.value'))
+
+    cursor = plain_cursor(conn)
+    try:
+        cursor.execute(f"""
+            INSERT INTO thread_follow (
+                thread_id, thread_key, url, title, author, author_link,
+                follow_status, created_at, updated_at
+            )
+            {source}
+            ON CONFLICT(thread_id) DO UPDATE SET
+                thread_key = excluded.thread_key,
+                follow_status = excluded.follow_status,
+                updated_at = excluded.updated_at
+        """, (status, now, now, json.dumps(ids)))
+        affected_rows = cursor.rowcount
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+    logger.info(f"批量关注完成: 请求 {len(ids)} 个帖子, 状态 {status}, 影响 {affected_rows} 行")
+    return {'requested': len(ids), 'affected_rows': affected_rows, 'invalid': invalid}
+
+
+def unfollow_threads(conn: sqlite3.Connection, thread_ids: Iterable[Any], status: str) -> Dict[str, Any]:
+    """
+    批量取消关注，按thread_id精确匹配
+
+    Args:
+        conn: 数据库连接
+        thread_ids: thread_id、帖子URL等，会先规范化
+        status: follow_status
+
+    Returns:
+        Dict[str, Any]: {'requested', 'affected_rows', 'invalid'}
+    """
+    ids, invalid = normalize_thread_ids(thread_ids)
+    if not ids:
+        return {'requested': 0, 'affected_rows': 0, 'invalid': invalid}
+
+    cursor = plain_cursor(conn)
+    try:
+        cursor.execute("""
+            DELETE FROM thread_follow
+            WHERE follow_status = ?
+              AND thread_key IN (SELECT value FROM json_each(?))
+        """, (status, json.dumps(ids)))
+        affected_rows = cursor.rowcount
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+    logger.info(f"批量取消关注完成: 请求 {len(ids)} 个帖子, 状态 {status}, 删除 {affected_rows} 行")
+    return {'requested': len(ids), 'affected_rows': affected_rows, 'invalid': invalid}
+
+
+def delete_follow(
+    conn: sqlite3.Connection,
+    status: str,
+    thread_id: Any = None,
+    url: str = None,
+    title: str = None,
+) -> int:
+    """
+    取消单个关注
+
+    优先使用thread_id（或从URL中提取的thread_id）精确匹配；都没有时按标题精确匹配。
+
+    Returns:
+        int: 删除的行数
+    """
+    canonical = canonical_thread_id(thread_id)
+    if canonical is None:
+        canonical = canonical_thread_id(url)
+
+    if canonical is not None:
+        where_clause, params = "thread_key = ?", [canonical]
+    elif thread_id:
+        where_clause, params = "thread_id = ?", [str(thread_id)]
+    elif url:
+        where_clause, params = "url = ?", [url]
+    else:
+        where_clause, params = "title = ?", [title]
+
+    cursor = plain_cursor(conn)
+    try:
+        cursor.execute(
+            f"DELETE FROM thread_follow WHERE follow_status = ? AND {where_clause}",
+            [status] + params
+        )
+        affected_rows = cursor.rowcount
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return affected_rows
+
+
+def get_follow_states(conn: sqlite3.Connection, thread_ids: Iterable[Any]) -> Dict[str, str]:
+    """
+    批量查询帖子的关注状态
+
+    Args:
+        conn: 数据库连接
+        thread_ids: thread_id、帖子URL等
+
+    Returns:
+        Dict[str, str]: {thread_id: follow_status}，未关注的帖子不出现在结果中
+    """
+    ids, _ = normalize_thread_ids(thread_ids)
+    if not ids:
+        return {}
+    rows = plain_cursor(conn).execute("""
+        SELECT thread_key, follow_status FROM thread_follow
+        WHERE thread_key IN (SELECT value FROM json_each(?))
+    """, (json.dumps(ids),)).fetchall()
+    return {str(thread_key): follow_status for thread_key, follow_status in rows}
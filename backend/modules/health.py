@@ -0,0 +1,121 @@
+"""
+健康检查模块，供负载均衡探测使用
+
+- 存活检查（liveness）: 只读取内存，不访问数据库
+- 就绪检查（readiness）: 复用线程内的共享连接执行 SELECT 1，报告数据版本、数据库文件修改时间、
+  距上次成功更新的时间；结果缓存 HEALTH_CACHE_SECONDS 秒，缓存刷新时其他探测直接返回旧结果，不排队等待
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from .db_swap import read_version
+from .db_utils import DEFAULT_DB_PATH, get_shared_connection
+
+# 设置日志
+logger = logging.getLogger("health")
+
+# 就绪检查结果的缓存时间（秒）
+HEALTH_CACHE_SECONDS = float(os.environ.get('HEALTH_CACHE_SECONDS', 5))
+
+_started_at = time.time()
+_refresh_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_cached: Optional[Dict[str, Any]] = None
+_cached_at = 0.0
+_hits = 0
+_misses = 0
+
+
+def liveness() -> Dict[str, Any]:
+    """存活检查: 进程能响应即为存活"""
+    return {
+        'status': 'ok',
+        'pid': os.getpid(),
+        'uptime_seconds': round(time.time() - _started_at, 1),
+    }
+
+
+def _iso_age(timestamp: Optional[str]) -> Optional[float]:
+    if not timestamp:
+        return None
+    try:
+        return round((datetime.now() - datetime.fromisoformat(timestamp)).total_seconds(), 1)
+    except ValueError:
+        return None
+
+
+def _check(db_path: str) -> Dict[str, Any]:
+    """实际执行一次就绪检查"""
+    result = {
+        'status': 'ok',
+        'checked_at': datetime.now().isoformat(timespec='seconds'),
+        'db_path': db_path,
+    }
+    try:
+        stat = os.stat(db_path)
+        result['db_mtime'] = datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds')
+        result['db_size'] = stat.st_size
+    except OSError:
+        result.update(status='error', message='数据库文件不存在')
+        return result
+
+    version = read_version(db_path) or {}
+    result['version_id'] = version.get('version_id')
+    result['published_at'] = version.get('published_at')
+    # 没有版本指针（从未通过更新流程发布）时，以数据库文件修改时间作为上次更新时间
+    result['last_update_age_seconds'] = _iso_age(version.get('published_at')) if version \
+        else round(time.time() - stat.st_mtime, 1)
+
+    try:
+        cursor = get_shared_connection(db_path).cursor()
+        cursor.row_factory = None
+        cursor.execute("SELECT 1").fetchone()
+    except Exception as e:
+        result.update(status='error', message=f'数据库不可用: {e}')
+    return result
+
+
+def readiness() -> Dict[str, Any]:
+    """
+    就绪检查（带缓存）
+
+    Returns:
+        Dict[str, Any]: 检查结果，status 为 'ok' 或 'error'，附带缓存命中率
+    """
+    global _cached, _cached_at, _hits, _misses
+
+    db_path = os.environ.get('DATABASE_PATH', DEFAULT_DB_PATH)
+    now = time.monotonic()
+    result = _cached
+    fresh = result is not None and result.get('db_path') == db_path and now - _cached_at < HEALTH_CACHE_SECONDS
+
+    if not fresh:
+        # 已有其他线程在刷新时直接返回旧结果；还没有任何结果时等待刷新完成
+        if _refresh_lock.acquire(blocking=result is None):
+            try:
+                if _cached is result:
+                    result = _check(db_path)
+                    _cached, _cached_at = result, time.monotonic()
+                    fresh = False
+                else:
+                    # 等待期间其他线程已刷新
+                    result, fresh = _cached, True
+            finally:
+                _refresh_lock.release()
+        else:
+            fresh = True
+
+    with _stats_lock:
+        if fresh:
+            _hits += 1
+        else:
+            _misses += 1
+        total = _hits + _misses
+        cache = {'hits': _hits, 'misses': _misses, 'hit_rate': round(_hits / total, 4) if total else 0.0}
+
+    return {**result, 'cache_age_seconds': round(time.monotonic() - _cached_at, 2), 'cache': cache}
@@ -0,0 +1,594 @@
+"""
+索引分析模块
+
+用 Flask 测试客户端请求主要接口（帖子/作者排行、数据趋势、新帖、操作日志、作者发帖历史等），
+通过 metrics.capture_queries 收集接口实际执行的查询及参数，在当前数据库上回放:
+
+1. EXPLAIN QUERY PLAN: 标记全表扫描（SCAN 表且没有使用索引）和临时B树排序（USE TEMP B-TREE）
+2. 为有问题的单表查询生成候选索引: 等值条件列 → GROUP BY/ORDER BY 表达式（或范围条件列）→ 查询用到的其他列（覆盖索引）
+3. 在工作副本上逐个创建候选索引，重新获取查询计划并计时，只保留有效的索引
+4. 可选把保留的索引创建到正式数据库
+
+所有分析都在数据库的临时副本上进行，不会修改正式数据库（除非指定应用索引）。
+"""
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from .db_swap import online_backup
+from .db_utils import DEFAULT_DB_PATH
+from .metrics import capture_queries
+from .rankings import AUTHOR_SORT_FIELDS, POST_SORT_FIELDS
+
+# 设置日志
+logger = logging.getLogger("index_advisor")
+
+# 每条查询计时的次数（取中位数）
+DEFAULT_REPEAT = 5
+
+# 候选索引至少要让查询快这么多（比例）才保留；查询计划问题减少时不要求
+MIN_GAIN = 0.1
+
+# 索引列数超过该值时不再追加覆盖列
+MAX_INDEX_COLUMNS = 8
+
+# 平均长度超过该值（字节）的列不作为覆盖列（如词云JSON、帖子内容）
+MAX_COVERING_BYTES = 64
+
+# 候选索引名前缀
+INDEX_PREFIX = 'idx_advice'
+
+# 报告中保存的语句长度
+MAX_SQL_LENGTH = 300
+
+_COMMENT = re.compile(r'--[^\n]*|/\*.*?\*/', re.DOTALL)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SCAN = re.compile(r'^SCAN (\S+)(?: USING (?:COVERING )?INDEX (\S+))?')
+_TEMP_BTREE = re.compile(r'USE TEMP B-TREE FOR (.+)$')
+_CLAUSE_END = r'(?=\bGROUP\s+BY\b|\bHAVING\b|\bORDER\s+BY\b|\bLIMIT\b|$)'
+_VALUE = r"(?:\?|:\w+|'(?:[^']|'')*'|-?\d+(?:\.\d+)?|NULL)"
+# 等值条件: col = 值、col IS 值、col IN (...)，col 也可以是单列函数如 DATE(post_time)
+_EQUALITY = re.compile(rf"((?:\w+\(\s*)?(?:\w+\.)?\w+(?:\s*\))?)\s*(?:==?|\bIS\b(?!\s+NOT))\s*{_VALUE}|"
+                       rf"((?:\w+\(\s*)?(?:\w+\.)?\w+(?:\s*\))?)\s+IN\s*\(", re.IGNORECASE)
+_RANGE = re.compile(r'((?:\w+\.)?\w+)\s*(?:>=|<=|>|<|\bBETWEEN\b|\bLIKE\b)', re.IGNORECASE)
+_AGGREGATE = re.compile(r'\b(COUNT|SUM|MIN|MAX|AVG|TOTAL|GROUP_CONCAT)\s*\(', re.IGNORECASE)
+
+
+def default_workload(db_path: str) -> List[str]:
+    """
+    要回放的接口路径，与前端实际请求的参数一致
+
+    Args:
+        db_path: 数据库文件路径，用于挑选有数据的帖子和作者作为参数
+    """
+    paths = [f'/api/post-rank?page=1&limit=20&sort_field={field}&sort_order=desc' for field in POST_SORT_FIELDS]
+    paths += [f'/api/author-rank?page=1&limit=20&sort_field={field}&sort_order=desc' for field in AUTHOR_SORT_FIELDS]
+    paths += [f'/api/data-trends?days=30&granularity={granularity}' for granularity in ('daily', 'weekly', 'monthly')]
+    paths += [f'/api/{name}?type={granularity}'
+              for name in ('post-trend', 'update-trend', 'view-trend') for granularity in ('daily', 'monthly')]
+    paths += ['/api/new-posts-yesterday?page=1&limit=10', '/api/post-date-range', '/api/title-wordcloud',
+              '/api/thread-follows?type=my_follow']
+
+    thread_key, author = _sample_keys(db_path)
+    if thread_key is not None:
+        paths += [f'/api/action-logs?thread_id={thread_key}&limit=10', f'/api/thread-history/{thread_key}']
+    if author is not None:
+        paths += [f'/api/author-post-history?author={author}&limit=10', f'/api/author-history/{author}']
+    return paths
+
+
+def _sample_keys(db_path: str):
+    """日志最多的帖子和帖子最多的作者"""
+    conn = sqlite3.connect(db_path)
+    thread_key = author = None
+    try:
+        try:
+            row = conn.execute("SELECT thread_key FROM post_history WHERE thread_key IS NOT NULL "
+                               "GROUP BY thread_key ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+            thread_key = row[0] if row else None
+        except sqlite3.Error:
+            pass
+        try:
+            row = conn.execute("SELECT author FROM post_ranking WHERE author IS NOT NULL "
+                               "GROUP BY author ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+            author = row[0] if row else None
+        except sqlite3.Error:
+            pass
+    finally:
+        conn.close()
+    return thread_key, author
+
+
+def _normalize(sql: str) -> str:
+    return ' '.join(_COMMENT.sub(' ', sql).split()).rstrip(';').strip()
+
+
+def _summary(sql: str) -> str:
+    return sql if len(sql) <= MAX_SQL_LENGTH else sql[:MAX_SQL_LENGTH] + '...'
+
+
+def collect_workload(client, paths: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    请求接口并收集执行的只读查询
+
+    Args:
+        client: Flask 测试客户端（app.test_client()）
+        paths: 接口路径
+
+    Returns:
+        List[Dict[str, Any]]: 去重后的查询，每项包含 sql、parameters 和触发它的 endpoints
+    """
+    queries = {}
+    for path in paths:
+        with capture_queries() as captured:
+            response = client.get(path)
+        if response.status_code >= 400:
+            logger.warning(f"{path} 返回 {response.status_code}")
+        for item in captured:
+            sql = _normalize(item['sql'])
+            upper = sql.upper()
+            if not upper.startswith(('SELECT', 'WITH')) or 'SQLITE_MASTER' in upper or 'PRAGMA' in upper:
+                continue
+            parameters = item['parameters']
+            key = (sql, repr(parameters))
+            if key not in queries:
+                queries[key] = {'sql': sql, 'parameters': parameters, 'endpoints': []}
+            if path not in queries[key]['endpoints']:
+                queries[key]['endpoints'].append(path)
+    return list(queries.values())
+
+
+def explain(conn: sqlite3.Connection, sql: str, parameters=()) -> List[str]:
+    """获取查询计划的每一步"""
+    try:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()]
+    except sqlite3.Error as e:
+        return [f"无法获取查询计划: {e}"]
+
+
+def _tables(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """数据库中的表及其列"""
+    tables = {}
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+        tables[name] = [row[1] for row in conn.execute(f'PRAGMA table_info("{name}")').fetchall()]
+    return tables
+
+
+def _aliases(sql: str) -> Dict[str, str]:
+    """FROM/JOIN 中的表别名 -> 表名"""
+    aliases = {}
+    for table, alias in re.findall(r'\b(?:FROM|JOIN)\s+["`]?(\w+)["`]?(?:\s+(?:AS\s+)?(\w+))?', sql, re.IGNORECASE):
+        aliases[table] = table
+        if alias and alias.upper() not in ('WHERE', 'ORDER', 'GROUP', 'LIMIT', 'JOIN', 'LEFT', 'INNER', 'ON',
+                                           'CROSS', 'UNION', 'HAVING'):
+            aliases[alias] = table
+    return aliases
+
+
+def plan_issues(plan: List[str], sql: str, tables: Iterable[str]) -> List[Dict[str, str]]:
+    """
+    从查询计划中找出全表扫描和临时B树排序
+
+    只标记实际存在的表（子查询、CTE 的扫描不算）；SCAN ... USING INDEX 按索引顺序扫描，不算全表扫描。
+    """
+    tables = set(tables)
+    aliases = _aliases(sql)
+    issues = []
+    for step in plan:
+        match = _SCAN.match(step)
+        if match and match.group(2) is None:
+            table = aliases.get(match.group(1), match.group(1))
+            if table in tables:
+                issues.append({'type': 'full_scan', 'table': table, 'detail': step})
+            continue
+        match = _TEMP_BTREE.search(step)
+        if match:
+            issues.append({'type': 'temp_btree', 'table': None, 'detail': step})
+    return issues
+
+
+def _split_top_level(text: str, separator: str = ',') -> List[str]:
+    """按不在括号和字符串中的分隔符拆分"""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    parts.append(text[start:].strip())
+    return [part for part in parts if part]
+
+
+def _clause(sql: str, keyword: str) -> str:
+    match = re.search(rf'\b{keyword}\b(.*?){_CLAUSE_END}', sql, re.IGNORECASE)
+    return match.group(1).strip() if match else ''
+
+
+def _select_aliases(sql: str) -> Dict[str, str]:
+    """SELECT 列表中的 表达式 AS 别名"""
+    match = re.search(r'^SELECT\s+(?:DISTINCT\s+)?(.*?)\s+FROM\b', sql, re.IGNORECASE)
+    aliases = {}
+    for item in _split_top_level(match.group(1)) if match else []:
+        alias = re.match(r'^(.*\S)\s+AS\s+(\w+)$', item, re.IGNORECASE)
+        if alias:
+            aliases[alias.group(2).lower()] = alias.group(1)
+    return aliases
+
+
+def _order_terms(clause: str, aliases: Dict[str, str]) -> List[str]:
+    """GROUP BY/ORDER BY 的每一项（别名替换为表达式，保留排序方向）"""
+    terms = []
+    for term in _split_top_level(clause):
+        match = re.match(r'^(.*?)(?:\s+(ASC|DESC))?$', term, re.IGNORECASE | re.DOTALL)
+        expression, direction = match.group(1).strip(), (match.group(2) or '').upper()
+        expression = aliases.get(expression.lower(), expression)
+        if _AGGREGATE.search(expression) or '?' in expression or expression.isdigit():
+            continue
+        terms.append(f"{expression} {direction}".strip())
+    return terms
+
+
+def _strip_direction(term: str) -> str:
+    return re.sub(r'\s+(ASC|DESC)$', '', term, flags=re.IGNORECASE).lower()
+
+
+def propose_index(conn: sqlite3.Connection, sql: str, tables: Dict[str, List[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    为单表查询生成候选索引
+
+    索引列依次为: 等值条件列 → GROUP BY 表达式（没有时为 ORDER BY 表达式，再没有时为第一个范围条件列）
+    → 查询用到的其他列（列数不超过 MAX_INDEX_COLUMNS 时，使查询只读索引即可）。
+    联表查询和子查询不生成候选（只在报告中标记问题）。
+
+    Returns:
+        Optional[Dict[str, Any]]: {'table', 'columns', 'name', 'ddl'}，无法生成时返回None
+    """
+    tables = tables or _tables(conn)
+    text = sql
+    bare = _STRING.sub("''", sql)
+    if len(re.findall(r'\bSELECT\b', bare, re.IGNORECASE)) != 1 or re.search(r'\bJOIN\b', bare, re.IGNORECASE):
+        return None
+    match = re.search(r'\bFROM\s+["`]?(\w+)["`]?', text, re.IGNORECASE)
+    if not match or match.group(1) not in tables:
+        return None
+    table = match.group(1)
+    columns = {column.lower(): column for column in tables[table]}
+
+    def _is_column_expression(expression):
+        names = re.findall(r'\b([A-Za-z_]\w*)\b(?!\s*\()', _STRING.sub("''", expression))
+        return any(name.lower() in columns for name in names)
+
+    key = []
+
+    def _add(term):
+        if _strip_direction(term) not in [_strip_direction(existing) for existing in key]:
+            key.append(term)
+
+    where = _clause(text, 'WHERE')
+    for left, left_in in _EQUALITY.findall(where):
+        expression = re.sub(r'^\w+\.', '', left or left_in)
+        if _is_column_expression(expression):
+            _add(columns.get(expression.lower(), expression))
+
+    aliases = _select_aliases(text)
+    ordering = _order_terms(_clause(text, r'GROUP\s+BY'), aliases) or _order_terms(_clause(text, r'ORDER\s+BY'), aliases)
+    ordering = [term for term in ordering if _is_column_expression(term)]
+    if ordering:
+        for term in ordering:
+            _add(term)
+    else:
+        for name in _RANGE.findall(where):
+            name = name.split('.')[-1]
+            if name.lower() in columns:
+                _add(columns[name.lower()])
+                break
+    if not key:
+        return None
+
+    # 排序方向一致时不写方向（索引可以反向扫描，同一个索引同时支持升序和降序）
+    if len({term.upper().endswith(' DESC') for term in ordering}) <= 1:
+        key = [re.sub(r'\s+(ASC|DESC)$', '', term, flags=re.IGNORECASE) for term in key]
+
+    # 覆盖列: 查询中出现的其他列（SELECT * 时无法覆盖；长文本列不放进索引）
+    if not re.search(r'^SELECT\s+(?:DISTINCT\s+)?\*', text, re.IGNORECASE):
+        used = []
+        for name in re.findall(r'\b([A-Za-z_]\w*)\b', _STRING.sub("''", text)):
+            column = columns.get(name.lower())
+            if column and column not in used and _strip_direction(column) not in [_strip_direction(k) for k in key]:
+                used.append(column)
+        if used and len(key) + len(used) <= MAX_INDEX_COLUMNS and _narrow(conn, table, used):
+            key += used
+
+    column_sql = ', '.join(key)
+    name = f"{INDEX_PREFIX}_{table}_{hashlib.sha1(column_sql.encode('utf-8')).hexdigest()[:8]}"
+    return {
+        'table': table,
+        'columns': key,
+        'name': name,
+        'ddl': f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({column_sql})',
+    }
+
+
+def _narrow(conn: sqlite3.Connection, table: str, columns: List[str]) -> bool:
+    """这些列的平均长度都不超过 MAX_COVERING_BYTES"""
+    lengths = ', '.join(f'AVG(LENGTH("{column}"))' for column in columns)
+    try:
+        row = conn.execute(f'SELECT {lengths} FROM "{table}"').fetchone()
+    except sqlite3.Error:
+        return False
+    return all((length or 0) <= MAX_COVERING_BYTES for length in row)
+
+
+def _existing_index(conn: sqlite3.Connection, candidate: Dict[str, Any]) -> Optional[str]:
+    """已有索引的前几列与候选相同（候选是其前缀）时返回其名称"""
+    wanted = [' '.join(_strip_direction(column).split()) for column in candidate['columns']]
+    for name, sql in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? "
+                                  "AND sql IS NOT NULL", (candidate['table'],)).fetchall():
+        match = re.search(r'\bON\s+["`]?\w+["`]?\s*\((.*)\)\s*$', ' '.join(sql.split()), re.IGNORECASE)
+        existing = [' '.join(_strip_direction(c).split()) for c in _split_top_level(match.group(1))] if match else []
+        if existing[:len(wanted)] == wanted:
+            return name
+    return None
+
+
+def time_query(conn: sqlite3.Connection, sql: str, parameters=(), repeat: int = DEFAULT_REPEAT) -> Optional[float]:
+    """执行查询并取完全部结果，返回多次执行的耗时中位数（毫秒），执行出错时返回None"""
+    samples = []
+    try:
+        conn.execute(sql, parameters).fetchall()  # 预热页缓存
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(sql, parameters).fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+    except sqlite3.Error as e:
+        logger.warning(f"查询执行出错: {e}: {_summary(sql)}")
+        return None
+    return round(statistics.median(samples), 3)
+
+
+def _measure(conn, query, tables, repeat):
+    plan = explain(conn, query['sql'], query['parameters'])
+    return {
+        'plan': plan,
+        'issues': plan_issues(plan, query['sql'], tables),
+        'ms': time_query(conn, query['sql'], query['parameters'], repeat),
+    }
+
+
+def _improved(before: Dict[str, Any], after: Dict[str, Any], min_gain: float) -> bool:
+    if before['ms'] is None or after['ms'] is None:
+        return False
+    if len(after['issues']) < len(before['issues']) and after['ms'] <= before['ms'] * (1 + min_gain):
+        return True
+    return after['ms'] <= before['ms'] * (1 - min_gain)
+
+
+def advise(
+    conn: sqlite3.Connection,
+    queries: List[Dict[str, Any]],
+    evaluate: bool = True,
+    repeat: int = DEFAULT_REPEAT,
+    min_gain: float = MIN_GAIN
+) -> Dict[str, Any]:
+    """
+    分析查询并评估候选索引
+
+    evaluate 为 True 时会在 conn 对应的数据库上创建候选索引，应传入工作副本的连接；
+    无效的候选索引会被删除，保留的索引留在副本上。
+
+    Args:
+        conn: 数据库连接
+        queries: collect_workload 的结果
+        evaluate: 是否创建候选索引并重新计时
+        repeat: 每条查询计时的次数
+        min_gain: 保留索引要求的最小加速比例
+
+    Returns:
+        Dict[str, Any]: 报告
+            - queries: 每条查询的 endpoints、sql、parameters、before（plan/issues/ms）、candidate，评估时还有 after
+            - indexes: 每个候选索引的 name、ddl、queries、existing、accepted、reason、create_seconds
+            - regressions: 评估时，保留的索引创建后变慢的查询id
+    """
+    conn.row_factory = None
+    tables = _tables(conn)
+    report = {'queries': [], 'indexes': []}
+    candidates = {}
+
+    for number, query in enumerate(queries, 1):
+        entry = {
+            'id': number,
+            'endpoints': query['endpoints'],
+            'sql': _summary(query['sql']),
+            'parameters': list(query['parameters']) if isinstance(query['parameters'], (list, tuple))
+            else query['parameters'],
+            'before': _measure(conn, query, tables, repeat),
+            'candidate': None,
+        }
+        if entry['before']['issues']:
+            candidate = propose_index(conn, query['sql'], tables)
+            if candidate:
+                entry['candidate'] = candidate['name']
+                candidates.setdefault(candidate['name'], {**candidate, 'queries': []})['queries'].append(number)
+        report['queries'].append(entry)
+
+    by_id = {entry['id']: entry for entry in report['queries']}
+    for candidate in candidates.values():
+        result = {
+            'name': candidate['name'], 'table': candidate['table'], 'ddl': candidate['ddl'],
+            'queries': candidate['queries'], 'existing': _existing_index(conn, candidate),
+            'accepted': False, 'reason': None, 'create_seconds': None,
+        }
+        report['indexes'].append(result)
+        if result['existing']:
+            result['reason'] = f"已有相同的索引 {result['existing']}"
+            continue
+        if not evaluate:
+            result['reason'] = '未评估'
+            continue
+        try:
+            started = time.perf_counter()
+            conn.execute(candidate['ddl'])
+            conn.commit()
+            result['create_seconds'] = round(time.perf_counter() - started, 3)
+        except sqlite3.Error as e:
+            result['reason'] = f"创建失败: {e}"
+            continue
+
+        gains = []
+        for number in candidate['queries']:
+            measured = _measure(conn, queries[number - 1], tables, repeat)
+            gains.append(_improved(by_id[number]['before'], measured, min_gain))
+        if any(gains):
+            result['accepted'] = True
+            result['reason'] = f"{sum(gains)}/{len(gains)} 条查询变快或查询计划改善"
+        else:
+            conn.execute(f'DROP INDEX IF EXISTS "{candidate["name"]}"')
+            conn.commit()
+            result['reason'] = '查询计划和耗时没有改善'
+
+    if evaluate:
+        # 保留的索引全部创建后重新测量每条查询（同时检查有没有查询变慢）
+        for entry, query in zip(report['queries'], queries):
+            entry['after'] = _measure(conn, query, tables, repeat)
+        report['regressions'] = [
+            entry['id'] for entry in report['queries']
+            if entry['before']['ms'] is not None and entry['after']['ms'] is not None
+            and entry['after']['ms'] > entry['before']['ms'] * (1 + min_gain)
+        ]
+    return report
+
+
+def apply_indexes(db_path: str, report: Dict[str, Any]) -> List[str]:
+    """
+    在正式数据库上创建报告中保留的索引（创建失败的跳过）
+
+    Returns:
+        List[str]: 已创建的索引名
+    """
+    created = []
+    conn = sqlite3.connect(db_path)
+    try:
+        for index in report['indexes']:
+            if not index['accepted']:
+                continue
+            try:
+                conn.execute(index['ddl'])
+                created.append(index['name'])
+            except sqlite3.Error as e:
+                # 例如表是回放接口时在副本上才创建的
+                logger.warning(f"创建索引 {index['name']} 失败: {str(e)}")
+        conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"已在 {db_path} 上创建 {len(created)} 个索引")
+    return created
+
+
+def analyze_database(
+    db_path: str = None,
+    paths: Optional[Iterable[str]] = None,
+    evaluate: bool = True,
+    apply: bool = False,
+    repeat: int = DEFAULT_REPEAT,
+    min_gain: float = MIN_GAIN
+) -> Dict[str, Any]:
+    """
+    在数据库副本上回放接口查询并生成索引建议
+
+    会把环境变量 DATABASE_PATH 临时指向副本并导入 app，应在独立进程（命令行工具/检查脚本）中调用。
+
+    Args:
+        db_path: 数据库文件路径，默认读取环境变量 DATABASE_PATH
+        paths: 要回放的接口路径，默认 default_workload
+        evaluate: 是否评估候选索引
+        apply: 是否把保留的索引创建到 db_path
+        repeat: 每条查询计时的次数
+        min_gain: 保留索引要求的最小加速比例
+
+    Returns:
+        Dict[str, Any]: advise 的报告，另有 db_path、generated_at、seconds、applied
+    """
+    db_path = db_path or os.environ.get('DATABASE_PATH', DEFAULT_DB_PATH)
+    started = time.perf_counter()
+    workdir = tempfile.mkdtemp(prefix='index_advisor_')
+    workspace = os.path.join(workdir, os.path.basename(db_path))
+    previous_path = os.environ.get('DATABASE_PATH')
+    try:
+        online_backup(db_path, workspace, pages=-1, step_sleep=0)
+        os.environ['DATABASE_PATH'] = workspace
+        from app import app
+        from .db_utils import close_shared_connection
+
+        paths = list(paths) if paths is not None else default_workload(workspace)
+        queries = collect_workload(app.test_client(), paths)
+        close_shared_connection(workspace)
+        logger.info(f"回放 {len(paths)} 个接口，收集到 {len(queries)} 条查询")
+
+        conn = sqlite3.connect(workspace)
+        try:
+            report = advise(conn, queries, evaluate, repeat, min_gain)
+        finally:
+            conn.close()
+    finally:
+        if previous_path is None:
+            os.environ.pop('DATABASE_PATH', None)
+        else:
+            os.environ['DATABASE_PATH'] = previous_path
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report['applied'] = apply_indexes(db_path, report) if apply and evaluate else []
+    report['db_path'] = db_path
+    report['generated_at'] = datetime.now().isoformat(timespec='seconds')
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """把报告格式化为文本: 有问题的查询、前后耗时和索引建议"""
+    flagged = [entry for entry in report['queries'] if entry['before']['issues']]
+    lines = [f"共 {len(report['queries'])} 条查询，{len(flagged)} 条有全表扫描或临时B树排序"]
+    for entry in flagged:
+        after = entry.get('after')
+        timing = f"{entry['before']['ms']} ms"
+        if after:
+            timing += f" -> {after['ms']} ms"
+        lines.append(f"\n#{entry['id']} {timing}  {entry['endpoints'][0]}")
+        lines.append(f"  {entry['sql'][:160]}")
+        for issue in entry['before']['issues']:
+            lines.append(f"  - {issue['detail']}")
+        if after and after['issues'] != entry['before']['issues']:
+            lines.append(f"  之后: {'; '.join(after['plan']) or '-'}")
+        if entry['candidate']:
+            lines.append(f"  候选索引: {entry['candidate']}")
+
+    lines.append("\n索引建议:")
+    for index in report['indexes']:
+        mark = '保留' if index['accepted'] else '不采用'
+        lines.append(f"  [{mark}] {index['ddl']}")
+        lines.append(f"      查询 {', '.join(f'#{n}' for n in index['queries'])}: {index['reason']}")
+    if not report['indexes']:
+        lines.append("  无")
+    regressions = [entry for entry in report['queries'] if entry['id'] in report.get('regressions', [])]
+    if regressions:
+        lines.append("\n变慢的查询:")
+        for entry in regressions:
+            lines.append(f"  #{entry['id']} {entry['before']['ms']} ms -> {entry['after']['ms']} ms  {entry['sql'][:120]}")
+    if report.get('applied'):
+        lines.append(f"\n已创建到 {report['db_path']}: {', '.join(report['applied'])}")
+    return '\n'.join(lines)
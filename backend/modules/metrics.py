@@ -0,0 +1,307 @@
+"""
+请求和SQL性能统计模块
+
+- get_db_connection 返回的连接会对每条SQL计时，计入当前请求的语句数和SQLite耗时
+- 超过 SLOW_QUERY_MS 的查询记录 EXPLAIN QUERY PLAN，保留最近 MAX_SLOW_QUERIES 条
+- 每个接口累计请求耗时和SQL耗时的直方图，由 /api/metrics 返回
+- 响应头 Server-Timing 带有本次请求的总耗时和SQL耗时，便于在浏览器开发者工具中查看
+
+统计保存在进程内存中，gunicorn 多进程时每个工作进程各自统计（返回结果带有pid）。
+capture_queries() 可以收集当前线程执行的全部SQL和参数（索引分析工具用来回放接口的实际查询）。
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# 设置日志
+logger = logging.getLogger("metrics")
+
+# 慢查询阈值（毫秒）
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+
+# 保留的慢查询条数
+MAX_SLOW_QUERIES = 50
+
+# 直方图桶的上界（毫秒），最后一个桶为 +Inf
+HISTOGRAM_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# 当前线程正在处理的请求
+_local = threading.local()
+
+
+class _RequestStats:
+    __slots__ = ('started', 'sql_count', 'sql_seconds', 'endpoint', 'recorded')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.endpoint = None
+        self.recorded = False
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total', 'maximum')
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, value_ms: float):
+        index = len(HISTOGRAM_BUCKETS_MS)
+        for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if value_ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.total += value_ms
+        self.maximum = max(self.maximum, value_ms)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """按直方图估算分位数（返回所在桶的上界，最后一个桶返回最大值）"""
+        count = sum(self.counts)
+        if count == 0:
+            return None
+        target = fraction * count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return HISTOGRAM_BUCKETS_MS[i] if i < len(HISTOGRAM_BUCKETS_MS) else round(self.maximum, 2)
+        return round(self.maximum, 2)
+
+
+class _EndpointStats:
+    __slots__ = ('count', 'errors', 'sql_count', 'latency', 'sql_time')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.sql_count = 0
+        self.latency = _Histogram()
+        self.sql_time = _Histogram()
+
+
+_lock = threading.Lock()
+_endpoints: Dict[str, _EndpointStats] = {}
+_slow_queries = deque(maxlen=MAX_SLOW_QUERIES)
+_started_at = datetime.now()
+
+
+def _explain(conn: sqlite3.Connection, sql: str, parameters) -> List[str]:
+    """获取查询计划（使用未计时的游标，避免递归统计）"""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return []
+    cursor = sqlite3.Connection.cursor(conn)
+    cursor.row_factory = None
+    try:
+        return [row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()]
+    except sqlite3.Error as e:
+        return [f"无法获取查询计划: {e}"]
+    finally:
+        cursor.close()
+
+
+@contextmanager
+def capture_queries():
+    """
+    收集 with 块中当前线程通过计时连接执行的SQL
+
+    Yields:
+        List[Dict[str, Any]]: 执行过的语句，每项包含 sql、parameters 和 ms
+    """
+    previous = getattr(_local, 'captured', None)
+    captured = []
+    _local.captured = captured
+    try:
+        yield captured
+    finally:
+        _local.captured = previous
+
+
+def record_query(conn: sqlite3.Connection, sql: str, parameters, seconds: float):
+    """记录一条SQL的耗时；超过阈值时记录查询计划"""
+    stats = getattr(_local, 'request', None)
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_seconds += seconds
+
+    captured = getattr(_local, 'captured', None)
+    if captured is not None:
+        captured.append({
+            'sql': sql,
+            'parameters': parameters,
+            'ms': round(seconds * 1000, 3),
+        })
+
+    elapsed_ms = seconds * 1000
+    if elapsed_ms < SLOW_QUERY_MS:
+        return
+    plan = _explain(conn, sql, parameters)
+    entry = {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'endpoint': stats.endpoint if stats is not None else None,
+        'ms': round(elapsed_ms, 2),
+        'sql': ' '.join(sql.split()),
+        'plan': plan,
+    }
+    with _lock:
+        _slow_queries.append(entry)
+    logger.warning(f"慢查询 {entry['ms']} ms: {entry['sql'][:500]} | 查询计划: {'; '.join(plan)}")
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """对 execute/executemany 和取结果计时的游标"""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_query(self.connection, sql, parameters, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_query(self.connection, sql, (), time.perf_counter() - started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            _add_fetch_time(time.perf_counter() - started)
+
+
+def _add_fetch_time(seconds: float):
+    """取结果的耗时计入SQLite耗时，但不计为一条语句"""
+    stats = getattr(_local, 'request', None)
+    if stats is not None:
+        stats.sql_seconds += seconds
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """默认创建 InstrumentedCursor 的连接，作为 sqlite3.connect 的 factory 使用"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def begin_request(endpoint: str = None):
+    """开始统计当前线程的请求"""
+    stats = _RequestStats()
+    stats.endpoint = endpoint
+    _local.request = stats
+    return stats
+
+
+def end_request(status_code: int) -> Optional[Dict[str, float]]:
+    """
+    结束当前请求的统计并计入接口直方图
+
+    Returns:
+        Optional[Dict[str, float]]: {'total_ms', 'sql_ms', 'sql_count'}，没有进行中的请求时返回None
+    """
+    stats = getattr(_local, 'request', None)
+    _local.request = None
+    if stats is None or stats.recorded:
+        return None
+    stats.recorded = True
+
+    total_ms = (time.perf_counter() - stats.started) * 1000
+    sql_ms = stats.sql_seconds * 1000
+    key = stats.endpoint or 'unmatched'
+    with _lock:
+        endpoint = _endpoints.get(key)
+        if endpoint is None:
+            endpoint = _endpoints[key] = _EndpointStats()
+        endpoint.count += 1
+        endpoint.sql_count += stats.sql_count
+        if status_code >= 500:
+            endpoint.errors += 1
+        endpoint.latency.add(total_ms)
+        endpoint.sql_time.add(sql_ms)
+    return {'total_ms': total_ms, 'sql_ms': sql_ms, 'sql_count': stats.sql_count}
+
+
+def _histogram_summary(histogram: _Histogram, count: int) -> Dict[str, Any]:
+    return {
+        'avg_ms': round(histogram.total / count, 2) if count else 0,
+        'max_ms': round(histogram.maximum, 2),
+        'p50_ms': histogram.percentile(0.5),
+        'p90_ms': histogram.percentile(0.9),
+        'p99_ms': histogram.percentile(0.99),
+        'histogram': histogram.counts[:],
+    }
+
+
+def get_metrics() -> Dict[str, Any]:
+    """汇总当前进程的统计数据"""
+    with _lock:
+        endpoints = {}
+        for key, stats in sorted(_endpoints.items()):
+            endpoints[key] = {
+                'count': stats.count,
+                'errors': stats.errors,
+                'avg_sql_count': round(stats.sql_count / stats.count, 2) if stats.count else 0,
+                'latency': _histogram_summary(stats.latency, stats.count),
+                'sql_time': _histogram_summary(stats.sql_time, stats.count),
+            }
+        slow_queries = list(_slow_queries)
+    return {
+        'pid': os.getpid(),
+        'started_at': _started_at.isoformat(timespec='seconds'),
+        'uptime_seconds': round((datetime.now() - _started_at).total_seconds(), 1),
+        'slow_query_ms': SLOW_QUERY_MS,
+        'buckets_ms': list(HISTOGRAM_BUCKETS_MS) + ['+Inf'],
+        'endpoints': endpoints,
+        'slow_queries': slow_queries,
+    }
+
+
+def reset_metrics():
+    """清空统计数据"""
+    with _lock:
+        _endpoints.clear()
+        _slow_queries.clear()
+
+
+def init_app(app):
+    """在Flask应用上注册请求统计"""
+    from flask import request
+
+    @app.before_request
+    def _start_metrics():
+        rule = request.url_rule.rule if request.url_rule is not None else None
+        begin_request(f"{request.method} {rule}" if rule else None)
+
+    @app.after_request
+    def _record_metrics(response):
+        timing = end_request(response.status_code)
+        if timing is not None:
+            response.headers['Server-Timing'] = (
+                f"app;dur={timing['total_ms']:.1f}, db;dur={timing['sql_ms']:.1f};desc=\"{timing['sql_count']} queries\""
+            )
+        return response
+
+    @app.teardown_request
+    def _record_failed_request(exc):
+        # 未处理的异常不会经过 after_request
+        if exc is not None:
+            end_request(500)
@@ -0,0 +1,290 @@
+"""
+按月分区和快照降采样模块
+
+list 表每15分钟为每个帖子保存一行快照，历史越长，按时间聚合和 MAX(scraping_time_R) 之类的查询越慢。
+导入后按保留策略拆分:
+
+- 最近 raw_days 天的快照留在原表（list），保持15分钟粒度，写入和现有查询不变
+- 更早的行按月移到分区表（list_p202502 ...），并降采样: hourly_days 天以内每个帖子每小时保留最后一次快照，
+  更早的每天保留最后一次；带有更新原因（update_reason）的行是事件，全部保留。
+  降采样同时按 list_time 的日期区分并保留 read_count 最大的一行，generate_statistics.py 的更新统计和浏览统计不变
+- {table}_all 视图按列名 UNION ALL 原表和全部分区，查询全部历史时使用；
+  每个分区都有时间列索引，带时间范围的条件会下推到每个分区，不相交的分区只做一次索引查找
+- table_partitions 表记录每个分区的月份、时间范围和行数，pruned_source() 据此只拼接与时间范围相交的分区
+
+所有操作在调用方的事务中执行，重复执行时只处理新过期的行。
+"""
+
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from .db_copy import quote_identifier
+from .db_utils import plain_cursor, table_columns
+
+# 设置日志
+logger = logging.getLogger("partitions")
+
+# 分区元信息表
+PARTITION_META_TABLE = 'table_partitions'
+
+# 各表的分区设置: 时间列（'YYYY-MM-DD HH:MM:SS' 文本）、降采样时区分帖子的列、事件列（非空的行不降采样）、
+# 降采样时额外区分的表达式、另外保留最大值所在行的列、分区上的索引列
+PARTITION_CONFIG = {
+    'list': {
+        'time_column': 'scraping_time_R',
+        'key_column': 'thread_key',
+        'event_column': 'update_reason',
+        # 统计按 list_time 的日期取 MAX(read_count)（generate_statistics.py），降采样时不同 list_time 日期的快照分别保留，
+        # 并另外保留 read_count 最大的一行（read_count 是文本，按与统计相同的比较规则）
+        'detail_expression': 'DATE(list_time)',
+        'peak_column': 'read_count',
+        'index_columns': ('scraping_time_R', 'thread_key'),
+    },
+}
+
+# 默认保留策略: 7天内保留15分钟快照，30天内按小时，更早按天
+DEFAULT_RAW_DAYS = 7
+DEFAULT_HOURLY_DAYS = 30
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+PARTITION_META_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {PARTITION_META_TABLE} (
+        name TEXT PRIMARY KEY,
+        parent TEXT NOT NULL,
+        month TEXT NOT NULL,
+        first_time TEXT,
+        last_time TEXT,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def _exists(cursor: sqlite3.Cursor, name: str, kind: str = 'table') -> bool:
+    return cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (kind, name)
+    ).fetchone() is not None
+
+
+def partition_name(table: str, month: str) -> str:
+    """分区表名，month 为 'YYYY-MM'，例如 list_p202502"""
+    return f"{table}_p{month.replace('-', '')}"
+
+
+def view_name(table: str) -> str:
+    return f"{table}_all"
+
+
+def partition_names(conn: sqlite3.Connection, table: str) -> List[str]:
+    """按月份排序的分区表名（没有分区时返回空列表）"""
+    cursor = plain_cursor(conn)
+    if not _exists(cursor, PARTITION_META_TABLE):
+        return []
+    return [row[0] for row in cursor.execute(
+        f"SELECT name FROM {PARTITION_META_TABLE} WHERE parent = ? ORDER BY month", (table,)
+    ).fetchall()]
+
+
+def _select_columns(cursor: sqlite3.Cursor, source: str, columns: List[str]) -> str:
+    """按原表的列顺序选择分区的列，分区缺少的列（原表后来新增的列）补NULL"""
+    available = set(table_columns(cursor, source))
+    return ', '.join(quote_identifier(column) if column in available else f"NULL AS {quote_identifier(column)}" for column in columns)
+
+
+def _union_sql(cursor: sqlite3.Cursor, table: str, partitions: List[str]) -> str:
+    columns = table_columns(cursor, table)
+    return '\nUNION ALL\n'.join(
+        f"SELECT {_select_columns(cursor, source, columns)} FROM {quote_identifier(source)}"
+        for source in [table] + partitions
+    )
+
+
+def refresh_view(conn: sqlite3.Connection, table: str) -> str:
+    """重建 {table}_all 视图（原表加全部分区），返回视图名"""
+    cursor = plain_cursor(conn)
+    name = view_name(table)
+    cursor.execute(f"DROP VIEW IF EXISTS {quote_identifier(name)}")
+    cursor.execute(f"CREATE VIEW {quote_identifier(name)} AS\n{_union_sql(cursor, table, partition_names(conn, table))}")
+    return name
+
+
+def history_source(conn: sqlite3.Connection, table: str) -> str:
+    """
+    查询全部历史时放在 FROM 中的数据来源: {table}_all 视图存在时用视图，否则用原表
+
+    update_db.py 每次导入都会重建视图；视图还不存在的旧数据库（从未分区）中原表就是全部历史。
+    """
+    name = view_name(table)
+    return quote_identifier(name if _exists(plain_cursor(conn), name, 'view') else table)
+
+
+def pruned_source(conn: sqlite3.Connection, table: str, start: Optional[str] = None,
+                  end: Optional[str] = None) -> str:
+    """
+    返回可放在 FROM 中的数据来源，只包含与 [start, end] 相交的分区（以及原表）
+
+    没有相交的分区时直接返回原表名；否则返回带括号的 UNION ALL 子查询。
+
+    Args:
+        conn: 数据库连接
+        table: 原表名
+        start: 开始时间（含），为空表示不限
+        end: 结束时间（含），为空表示不限
+    """
+    cursor = plain_cursor(conn)
+    partitions = []
+    if _exists(cursor, PARTITION_META_TABLE):
+        partitions = [row[0] for row in cursor.execute(f"""
+            SELECT name FROM {PARTITION_META_TABLE}
+            WHERE parent = ? AND (? IS NULL OR last_time >= ?) AND (? IS NULL OR first_time <= ?)
+            ORDER BY month
+        """, (table, start, start, end, end)).fetchall()]
+    if not partitions:
+        return quote_identifier(table)
+    return f"({_union_sql(cursor, table, partitions)})"
+
+
+def latest_time(conn: sqlite3.Connection, table: str) -> Optional[str]:
+    """原表和全部分区中最新的时间（原表走时间列索引，分区读元信息）"""
+    cursor = plain_cursor(conn)
+    time_column = quote_identifier(PARTITION_CONFIG[table]['time_column'])
+    values = [cursor.execute(f"SELECT MAX({time_column}) FROM {quote_identifier(table)}").fetchone()[0]]
+    if _exists(cursor, PARTITION_META_TABLE):
+        values.append(cursor.execute(
+            f"SELECT MAX(last_time) FROM {PARTITION_META_TABLE} WHERE parent = ?", (table,)
+        ).fetchone()[0])
+    values = [value for value in values if value]
+    return max(values) if values else None
+
+
+def _next_month(month: str) -> str:
+    """'2025-02' -> '2025-03-01'"""
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12}-{number % 12 + 1:02d}-01"
+
+
+def _create_indexes(cursor: sqlite3.Cursor, table: str, columns):
+    available = set(table_columns(cursor, table))
+    for column in columns:
+        if column in available:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {quote_identifier(f'idx_{table}_{column}')} "
+                           f"ON {quote_identifier(table)}({quote_identifier(column)})")
+
+
+def _downsample(cursor: sqlite3.Cursor, table: str, config: Dict[str, str], hourly_cutoff: str) -> int:
+    """每个帖子在每小时（hourly_cutoff 之前为每天）只保留最后一次快照（和 peak_column 最大的一行），事件行全部保留，返回删除的行数"""
+    time_column = quote_identifier(config['time_column'])
+    key_column = quote_identifier(config['key_column'])
+    detail = f", {config['detail_expression']}" if config.get('detail_expression') else ''
+    bucket = f"""PARTITION BY {key_column}{detail},
+                            CASE WHEN {time_column} >= ? THEN SUBSTR({time_column}, 1, 13)
+                                 ELSE SUBSTR({time_column}, 1, 10) END"""
+    peak = '1'
+    params = (hourly_cutoff,)
+    if config.get('peak_column'):
+        peak = f"ROW_NUMBER() OVER ({bucket} ORDER BY {quote_identifier(config['peak_column'])} DESC, {time_column} DESC, rowid DESC)"
+        params = (hourly_cutoff, hourly_cutoff)
+    event_column = quote_identifier(config['event_column'])
+    before = cursor.connection.total_changes
+    cursor.execute(f"""
+        DELETE FROM {quote_identifier(table)}
+        WHERE NULLIF({event_column}, '') IS NULL
+            AND rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid,
+                        ROW_NUMBER() OVER ({bucket} ORDER BY {time_column} DESC, rowid DESC) AS position,
+                        {peak} AS peak_position
+                    FROM {quote_identifier(table)}
+                )
+                WHERE position > 1 AND peak_position > 1
+            )
+    """, params)
+    return cursor.connection.total_changes - before
+
+
+def partition_table(conn: sqlite3.Connection, table: str = 'list', raw_days: int = DEFAULT_RAW_DAYS,
+                    hourly_days: int = DEFAULT_HOURLY_DAYS, now: Optional[str] = None) -> Dict[str, object]:
+    """
+    按保留策略把原表中过期的行移到月分区并降采样，重建 {table}_all 视图
+
+    调用方负责提交事务。
+
+    Args:
+        conn: 数据库连接
+        table: 原表名（PARTITION_CONFIG 中的表）
+        raw_days: 保留15分钟快照的天数，这之前的行移到分区
+        hourly_days: 按小时降采样的天数，这之前按天降采样
+        now: 计算保留期的基准时间，默认为数据中最新的时间（而不是当前时间，补导旧数据时结果不变）
+
+    Returns:
+        Dict: 移动和删除的行数、分区数、各时间边界；原表不存在或缺少必要的列时返回空字典
+    """
+    if hourly_days < raw_days:
+        raise ValueError("hourly_days 不能小于 raw_days")
+    config = PARTITION_CONFIG[table]
+    cursor = plain_cursor(conn)
+    columns = table_columns(cursor, table)
+    missing = {config['time_column'], config['key_column'], config['event_column']} - set(columns)
+    if not columns or missing:
+        logger.warning(f"{table}表不存在或缺少列 {sorted(missing)}，跳过分区")
+        return {}
+
+    cursor.execute(PARTITION_META_DDL)
+    _create_indexes(cursor, table, [config['time_column']])
+    now = now or latest_time(conn, table)
+    if now is None:
+        refresh_view(conn, table)
+        return {'moved': 0, 'removed': 0, 'partitions': len(partition_names(conn, table))}
+
+    base = datetime.strptime(now[:19], TIME_FORMAT)
+    raw_cutoff = (base - timedelta(days=raw_days)).strftime(TIME_FORMAT)
+    hourly_cutoff = (base - timedelta(days=hourly_days)).strftime(TIME_FORMAT)
+    time_column = quote_identifier(config['time_column'])
+    column_list = ', '.join(quote_identifier(column) for column in columns)
+
+    # 1. 原表中过期的行按月移到分区
+    months = [row[0] for row in cursor.execute(f"""
+        SELECT DISTINCT SUBSTR({time_column}, 1, 7) FROM {quote_identifier(table)}
+        WHERE {time_column} < ? AND {time_column} <> ''
+    """, (raw_cutoff,)).fetchall()]
+    moved = 0
+    for month in months:
+        name = partition_name(table, month)
+        if not _exists(cursor, name):
+            # 复制原表的列定义（不含索引和数据）
+            cursor.execute(f"CREATE TABLE {quote_identifier(name)} AS SELECT {column_list} FROM {quote_identifier(table)} WHERE 0")
+            cursor.execute(f"INSERT INTO {PARTITION_META_TABLE} (name, parent, month) VALUES (?, ?, ?)",
+                           (name, table, month))
+        target_columns = ', '.join(quote_identifier(column) for column in table_columns(cursor, name) if column in columns)
+        condition = f"{time_column} >= ? AND {time_column} < ? AND {time_column} < ?"
+        params = (f"{month}-01", _next_month(month), raw_cutoff)
+        cursor.execute(f"INSERT INTO {quote_identifier(name)} ({target_columns}) "
+                       f"SELECT {target_columns} FROM {quote_identifier(table)} WHERE {condition}", params)
+        moved += cursor.rowcount
+        cursor.execute(f"DELETE FROM {quote_identifier(table)} WHERE {condition}", params)
+
+    # 2. 分区降采样（已经是小时/天粒度的行不受影响，重复执行只处理新过期的行）
+    removed = 0
+    partitions = partition_names(conn, table)
+    for name in partitions:
+        removed += _downsample(cursor, name, config, hourly_cutoff)
+        _create_indexes(cursor, name, config['index_columns'])
+        cursor.execute(f"""
+            UPDATE {PARTITION_META_TABLE}
+            SET (first_time, last_time, row_count) = (
+                    SELECT MIN({time_column}), MAX({time_column}), COUNT(*) FROM {quote_identifier(name)}),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE name = ?
+        """, (name,))
+
+    refresh_view(conn, table)
+    result = {
+        'moved': moved, 'removed': removed, 'partitions': len(partitions),
+        'now': now, 'raw_cutoff': raw_cutoff, 'hourly_cutoff': hourly_cutoff,
+    }
+    logger.info(f"{table}分区完成: 移出 {moved} 行到 {len(partitions)} 个月分区，降采样删除 {removed} 行，"
+                f"15分钟快照保留到 {raw_cutoff}，按小时保留到 {hourly_cutoff}")
+    return result
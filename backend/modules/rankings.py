@@ -6,13 +6,10 @@ import logging
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
-from .db_utils import execute_query, table_exists
+from .db_utils import execute_query, table_exists, get_shared_connection
+from .thread_ids import canonical_thread_id, thread_key_expr
 
 # 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-)
 logger = logging.getLogger("rankings")
 
 # 排序字段映射 - 帖子排行
@@ -60,7 +57,7 @@ def get_post_ranking(
     """
     try:
         # 输出请求的参数进行调试
-        logger.info(f"请求参数: page={page}, limit={limit}, sort_field={sort_field}, sort_order={sort_order}")
+        logger.debug(f"请求参数: page={page}, limit={limit}, sort_field={sort_field}, sort_order={sort_order}")
         
         # 计算偏移量
         offset = (page - 1) * limit
@@ -68,7 +65,7 @@ def get_post_ranking(
         # 验证排序参数
         sort_info = POST_SORT_FIELDS.get(sort_field, ('repost_count', True))
         db_sort_field, is_numeric = sort_info
-        logger.info(f"映射后的排序字段: {db_sort_field}, 是否为数值: {is_numeric}")
+        logger.debug(f"映射后的排序字段: {db_sort_field}, 是否为数值: {is_numeric}")
         
         # 验证排序顺序
         if sort_order.upper() not in ['ASC', 'DESC']:
@@ -93,7 +90,7 @@ def get_post_ranking(
         count_query = "SELECT COUNT(*) as total FROM post_ranking"
         count_result = execute_query(count_query)
         total_count = count_result[0]['total'] if count_result else 0
-        logger.info(f"post_ranking表总数: {total_count}")
+        logger.debug(f"post_ranking表总数: {total_count}")
         
         # 如果没有数据，返回空结果
         if total_count == 0:
@@ -122,9 +119,9 @@ def get_post_ranking(
         LIMIT ? OFFSET ?
         """
         
-        logger.info(f"执行查询: {query}")
+        logger.debug(f"执行查询: {query}")
         result = execute_query(query, (limit, offset))
-        logger.info(f"从post_ranking表查询到{len(result)}条记录")
+        logger.debug(f"从post_ranking表查询到{len(result)}条记录")
         
         # 验证返回的记录数
         if not result:
@@ -167,7 +164,7 @@ def get_author_ranking(
     """
     try:
         # 输出请求的参数进行调试
-        logger.info(f"请求作者排行参数: page={page}, limit={limit}, sort_field={sort_field}, sort_order={sort_order}")
+        logger.debug(f"请求作者排行参数: page={page}, limit={limit}, sort_field={sort_field}, sort_order={sort_order}")
         
         # 计算偏移量
         offset = (page - 1) * limit
@@ -175,7 +172,7 @@ def get_author_ranking(
         # 验证排序参数
         sort_info = AUTHOR_SORT_FIELDS.get(sort_field, ('repost_count', True))
         db_sort_field, is_numeric = sort_info
-        logger.info(f"映射后的排序字段: {db_sort_field}, 是否为数值: {is_numeric}")
+        logger.debug(f"映射后的排序字段: {db_sort_field}, 是否为数值: {is_numeric}")
         
         # 验证排序顺序
         if sort_order.upper() not in ['ASC', 'DESC']:
@@ -200,7 +197,7 @@ def get_author_ranking(
         count_query = "SELECT COUNT(*) as total FROM author_ranking"
         count_result = execute_query(count_query)
         total_count = count_result[0]['total'] if count_result else 0
-        logger.info(f"author_ranking表总数: {total_count}")
+        logger.debug(f"author_ranking表总数: {total_count}")
         
         # 如果没有数据，返回空结果
         if total_count == 0:
@@ -227,9 +224,9 @@ def get_author_ranking(
         LIMIT ? OFFSET ?
         """
         
-        logger.info(f"执行查询: {query}")
+        logger.debug(f"执行查询: {query}")
         result = execute_query(query, (limit, offset))
-        logger.info(f"从author_ranking表查询到{len(result)}条记录")
+        logger.debug(f"从author_ranking表查询到{len(result)}条记录")
         
         # 验证返回的记录数
         if not result:
@@ -282,14 +279,18 @@ def get_thread_history(thread_id: str) -> List[Dict[str, Any]]:
             # 如果都不存在，返回空列表
             return []
         
-        # 从post_history表查询数据
-        query = """
+        # 从post_history表查询数据，按整数thread_key走索引
+        thread_key = canonical_thread_id(thread_id)
+        if thread_key is None:
+            logger.warning(f"无效的帖子ID: {thread_id}")
+            return []
+        query = f"""
         SELECT *
         FROM post_history
-        WHERE thread_id = ?
+        WHERE {thread_key_expr(get_shared_connection(), 'post_history')} = ?
         ORDER BY action_time DESC
         """
-        return execute_query(query, (thread_id,))
+        return execute_query(query, (thread_key,))
     except Exception as e:
         logger.error(f"获取帖子历史数据出错: {str(e)}")
         return []
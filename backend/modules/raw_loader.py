@@ -0,0 +1,217 @@
+"""
+原始抓取文件读取模块
+
+data/raw 下每天的 bbs_post_list_*.xlsx、bbs_update_list_*.xlsx、bbs_update_detail_*.xlsx 每个文件有几十个工作表，
+逐个用 pd.read_excel 读取时 openpyxl 的解析占了大部分时间。这里:
+
+- 安装了 python-calamine（pandas>=2.2）时用 pd.read_excel 的 calamine 引擎（Rust实现，比 openpyxl 快得多）；
+  否则用 openpyxl 只读流式模式（read_only=True），一次打开文件读取全部工作表
+- 读取时按 RAW_SCHEMAS 统一列和类型（文本列为字符串，计数列为整数）
+- 多个文件用进程池并行解析，每读完一个文件就返回
+"""
+
+import glob
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+# 设置日志
+logger = logging.getLogger("raw_loader")
+
+# 原始文件目录
+RAW_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'raw')
+
+# 各类原始文件的文件名模式和列类型
+RAW_SCHEMAS = {
+    'post_list': {
+        'pattern': 'bbs_post_list_*.xlsx',
+        'text': ('scraping_time', 'title', 'author', 'author_link', 'list_time', 'url'),
+        'integer': ('page', 'num', 'read_count', 'reply_count'),
+    },
+    'update_list': {
+        'pattern': 'bbs_update_list_*.xlsx',
+        'text': ('scraping_time', 'title', 'author', 'author_link', 'list_time', 'url'),
+        'integer': ('page', 'num', 'read_count', 'reply_count'),
+    },
+    'update_detail': {
+        'pattern': 'bbs_update_detail_*.xlsx',
+        'text': ('scraping_time', 'title', 'author', 'author_link', 'list_time', 'post_date', 'update_date',
+                 'latest_reply_date', 'reply_user', 'reply_content', 'url', 'tags', 'related_tags', 'content'),
+        'integer': ('page', 'num', 'read_count', 'reply_count'),
+    },
+}
+
+try:
+    import python_calamine  # noqa: F401 -- 可选依赖，只用于判断 pandas 能否使用 calamine 引擎
+    CALAMINE_AVAILABLE = tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2)
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+
+ENGINES = ('calamine', 'openpyxl')
+
+
+def default_engine() -> str:
+    """可用的最快引擎: 安装了 python-calamine 时为 'calamine'，否则为 'openpyxl'"""
+    return 'calamine' if CALAMINE_AVAILABLE else 'openpyxl'
+
+
+def raw_files(kind: str, raw_dir: str = None) -> List[str]:
+    """按文件名（即日期）排序的某类原始文件"""
+    pattern = RAW_SCHEMAS[kind]['pattern']
+    return sorted(glob.glob(os.path.join(raw_dir or RAW_DIR, pattern)))
+
+
+def _apply_schema(df: pd.DataFrame, kind: Optional[str]) -> pd.DataFrame:
+    """补齐缺少的列，文本列转为字符串（空值保留），计数列转为整数（有空值时为浮点）"""
+    schema = RAW_SCHEMAS.get(kind)
+    if schema is None:
+        return df
+    for column in schema['text']:
+        if column not in df.columns:
+            df[column] = None
+        values = df[column]
+        df[column] = values.where(values.isna(), values.astype(str))
+    for column in schema['integer']:
+        if column not in df.columns:
+            df[column] = None
+        values = pd.to_numeric(df[column], errors='coerce')
+        df[column] = values.astype('int64') if values.notna().all() else values
+    return df
+
+
+def _read_sheets_openpyxl(path: str, first_sheet_only: bool) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """用 openpyxl 只读模式逐行读取工作表"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets[:1] if first_sheet_only else workbook.worksheets:
+            rows = worksheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            # 去掉表头末尾的空列
+            width = len(header)
+            while width and header[width - 1] is None:
+                width -= 1
+            columns = [str(name) for name in header[:width]]
+            data = [row[:width] for row in rows if any(value is not None for value in row[:width])]
+            yield worksheet.title, pd.DataFrame(data, columns=columns)
+    finally:
+        workbook.close()
+
+
+def _read_sheets_calamine(path: str, first_sheet_only: bool) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """用 calamine 引擎读取工作表（只打开一次文件）"""
+    with pd.ExcelFile(path, engine='calamine') as workbook:
+        names = workbook.sheet_names[:1] if first_sheet_only else workbook.sheet_names
+        for sheet_name in names:
+            yield sheet_name, workbook.parse(sheet_name)
+
+
+def read_raw_file(
+    path: str,
+    kind: Optional[str] = None,
+    engine: Optional[str] = None,
+    first_sheet_only: bool = False
+) -> pd.DataFrame:
+    """
+    读取一个原始文件的所有工作表并合并
+
+    Args:
+        path: 文件路径
+        kind: RAW_SCHEMAS 中的文件类型，用于统一列类型；None 表示不处理
+        engine: 'calamine' 或 'openpyxl'，默认使用 default_engine()
+        first_sheet_only: 只读取第一个工作表
+
+    Returns:
+        pd.DataFrame: 合并后的数据，另有 source_file（文件名）和 sheet_name 两列
+    """
+    engine = engine or default_engine()
+    readers = {'calamine': _read_sheets_calamine, 'openpyxl': _read_sheets_openpyxl}
+    sheets = list(readers[engine](path, first_sheet_only))
+
+    source_file = os.path.basename(path)
+    frames = []
+    for sheet_name, df in sheets:
+        df['source_file'] = source_file
+        df['sheet_name'] = sheet_name
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return _apply_schema(df, kind)
+
+
+def iter_raw_files(
+    files: List[str],
+    kind: Optional[str] = None,
+    workers: Optional[int] = None,
+    engine: Optional[str] = None,
+    first_sheet_only: bool = False
+) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    用进程池并行读取原始文件，按完成顺序逐个返回
+
+    Args:
+        files: 文件路径列表
+        kind/engine/first_sheet_only: 同 read_raw_file
+        workers: 进程数，默认为CPU核数（不超过文件数）；为1时在当前进程中依次读取
+
+    Yields:
+        Tuple[str, pd.DataFrame]: (文件路径, 数据)；读取失败的文件记录日志后跳过
+    """
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    if workers <= 1:
+        for path in files:
+            try:
+                yield path, read_raw_file(path, kind, engine, first_sheet_only)
+            except Exception as e:
+                logger.error(f"读取文件 {path} 时出错: {e}")
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(read_raw_file, path, kind, engine, first_sheet_only): path for path in files
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                yield path, future.result()
+            except Exception as e:
+                logger.error(f"读取文件 {path} 时出错: {e}")
+
+
+def load_raw_files(
+    files: List[str],
+    kind: Optional[str] = None,
+    workers: Optional[int] = None,
+    engine: Optional[str] = None,
+    first_sheet_only: bool = False,
+    progress=None,
+    strict: bool = False
+) -> Dict[str, pd.DataFrame]:
+    """
+    并行读取原始文件，结果按传入的文件顺序排列
+
+    Args:
+        progress: 每读完一个文件调用一次 progress(path)，可传入 tqdm 的 update
+        strict: 为 True 时有文件读取失败就抛出异常，而不是跳过该文件
+
+    Returns:
+        Dict[str, pd.DataFrame]: {文件路径: 数据}，不含读取失败的文件
+
+    Raises:
+        ValueError: strict 为 True 且有文件读取失败（错误信息列出这些文件）
+    """
+    loaded = {}
+    for path, df in iter_raw_files(files, kind, workers, engine, first_sheet_only):
+        loaded[path] = df
+        if progress:
+            progress(path)
+    failed = [path for path in files if path not in loaded]
+    if strict and failed:
+        raise ValueError(f"{len(failed)} 个文件读取失败: {', '.join(os.path.basename(path) for path in failed)}")
+    return {path: loaded[path] for path in files if path in loaded}
@@ -0,0 +1,164 @@
+"""
+API响应模块: 更快的JSON序列化、gzip/brotli压缩、字段投影
+
+- jsonify: 与 flask.jsonify 用法相同，有 orjson 时用 orjson 序列化（UTF-8直接输出，不转义中文）
+- fields 参数: 客户端可以用 ?fields=id,title 只取需要的字段；
+  列表接口在SQL中只查询这些列，其余接口在序列化前裁剪 data 中的字典
+- compress_response: 注册为 after_request，按 Accept-Encoding 压缩较大的JSON响应
+"""
+
+import gzip
+import json
+import logging
+from typing import Any, List, Optional
+
+from flask import Response, has_request_context, request
+
+# orjson 和 brotli 是可选依赖，未安装时使用标准库 json 和 gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 设置日志
+logger = logging.getLogger("responses")
+
+# 小于该字节数的响应不压缩
+COMPRESS_MIN_SIZE = 1024
+
+# 压缩级别（gzip 1-9, brotli 0-11），取压缩率和CPU的折中
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# 字段投影最多的字段数
+MAX_FIELDS = 100
+
+JSON_MIMETYPE = 'application/json'
+
+
+def _default(value: Any) -> Any:
+    """序列化 orjson/json 不支持的类型（如 Decimal、bytes），与 flask.jsonify 一样转为字符串"""
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+def dumps(payload: Any) -> bytes:
+    """把数据序列化为UTF-8编码的JSON"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        except (TypeError, orjson.JSONEncodeError):
+            # 超过64位的整数等 orjson 不支持的值，退回标准库
+            pass
+    return json.dumps(payload, ensure_ascii=False, default=_default).encode('utf-8')
+
+
+def parse_fields(value: Optional[str]) -> Optional[List[str]]:
+    """
+    解析 fields 参数（逗号分隔），去重并保持顺序
+
+    Returns:
+        Optional[List[str]]: 字段列表，未指定时返回None（返回全部字段）
+    """
+    if not value:
+        return None
+    fields = []
+    for field in value.split(','):
+        field = field.strip()
+        if field and field not in fields:
+            fields.append(field)
+    return fields[:MAX_FIELDS] or None
+
+
+def request_fields() -> Optional[List[str]]:
+    """当前请求的 fields 参数"""
+    if not has_request_context():
+        return None
+    return parse_fields(request.args.get('fields'))
+
+
+def project_fields(payload: Any, fields: Optional[List[str]]) -> Any:
+    """裁剪字典列表（或 data 字段中的字典列表）中的字段"""
+    if not fields:
+        return payload
+    rows = payload.get('data') if isinstance(payload, dict) else payload
+    if not isinstance(rows, list) or not rows or not isinstance(rows[0], dict):
+        return payload
+    projected = [{field: row[field] for field in fields if field in row} for row in rows]
+    if isinstance(payload, dict):
+        return {**payload, 'data': projected}
+    return projected
+
+
+def jsonify(*args, **kwargs) -> Response:
+    """
+    替代 flask.jsonify，参数形式相同；当前请求带有 fields 参数时同时裁剪字段
+    """
+    if args and kwargs:
+        raise TypeError("jsonify() 不能同时接受位置参数和关键字参数")
+    if len(args) == 1:
+        payload = args[0]
+    else:
+        payload = list(args) if args else kwargs
+    payload = project_fields(payload, request_fields())
+    return Response(dumps(payload), mimetype=JSON_MIMETYPE)
+
+
+def _accepted_encoding() -> Optional[str]:
+    """根据 Accept-Encoding 选择压缩方式，优先 brotli"""
+    accept = request.headers.get('Accept-Encoding', '')
+    encodings = {}
+    for part in accept.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name.strip().lower()] = quality
+    if brotli is not None and encodings.get('br', 0) > 0:
+        return 'br'
+    if encodings.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress_response(response: Response) -> Response:
+    """after_request: 压缩JSON响应"""
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype != JSON_MIMETYPE):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return response
+
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(data, compresslevel=GZIP_LEVEL)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    response.headers['Content-Length'] = str(len(compressed))
+    return response
+
+
+def init_app(app):
+    """在Flask应用上注册响应压缩"""
+    app.after_request(compress_response)
+    logger.info(f"响应层已启用: 序列化={'orjson' if orjson else 'json'}, "
+                f"压缩={'brotli/gzip' if brotli else 'gzip'}")
@@ -0,0 +1,377 @@
+"""
+list 表的增量快照存储
+
+list 表（update.xlsx）每15分钟抓取一次，每个帖子每次抓取都保存一整行，url、标题、作者、作者链接、原始文件名等文本
+在每一行重复。这里按帖子拆成一张维度表和几张只在值变化时写入的窄表:
+
+- list_scrapes: 每次抓取一行（scrape_id 按 scraping_time_R 递增，抓取开始时间、原始文件和工作表、帖子数）
+- list_threads: 每个帖子一行（url、作者、作者链接、最新标题、首次和最后一次出现的 scrape_id）
+- list_presence: 帖子连续出现在抓取结果中的区间 [first_scrape_id, last_scrape_id]
+- list_changes: (thread_key, scrape_id, page, num, reply_count, read_count)，帖子首次出现或这几个值改变时写入
+- list_activity: (thread_key, scrape_id, list_time, list_time_R, update_reason)，首次出现、最后回复时间改变或有更新原因时写入
+- list_titles: 标题的历史版本（首次出现和标题改变时写入）
+
+state_at() 重建任意时间点（之前最近一次抓取）的列表，thread_history() 返回单个帖子的变化记录和出现区间。
+build_snapshot_store() 从现有 list 表整体迁移，重建结果与 list 表逐行一致，只是每行的原始 scraping_time
+统一为该次抓取的开始时间，source_file/sheet_name 按抓取记录。
+
+快照存储是附加的: 统计、趋势和作者发帖历史仍然读取 list 的全部历史（list_all 视图），所以 list 表（及其月分区）照常保留，
+发布的数据库比只有 list 表时略大，快照存储相对 list 表的空间节省目前不会体现在数据库文件上。
+"""
+
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .data_meta import set_meta
+from .db_utils import plain_cursor, table_columns
+from .partitions import history_source, partition_names
+
+# 设置日志
+logger = logging.getLogger("snapshot_store")
+
+# 快照存储的表（按删除顺序）
+SNAPSHOT_TABLES = ('list_titles', 'list_activity', 'list_changes', 'list_presence', 'list_threads', 'list_scrapes')
+
+# data_meta 中记录快照存储对应的 list 最新抓取时间
+SNAPSHOT_STORE_KEY = 'snapshot_store_scraping_time'
+
+# 重建后与 list 表对应的列
+STATE_COLUMNS = ('url', 'title', 'scraping_time_R', 'list_time_R', 'update_reason', 'page', 'num', 'author',
+                 'author_link', 'read_count', 'reply_count', 'scraping_time', 'list_time', 'thread_key')
+
+SCHEMA = """
+CREATE TABLE list_scrapes (
+    scrape_id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL UNIQUE,
+    scraping_time TEXT,
+    source_file TEXT,
+    sheet_name TEXT,
+    thread_count INTEGER NOT NULL
+);
+CREATE TABLE list_threads (
+    thread_key INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    title TEXT,
+    author TEXT,
+    author_link TEXT,
+    first_scrape_id INTEGER NOT NULL,
+    last_scrape_id INTEGER NOT NULL
+);
+CREATE TABLE list_presence (
+    thread_key INTEGER NOT NULL,
+    first_scrape_id INTEGER NOT NULL,
+    last_scrape_id INTEGER NOT NULL,
+    PRIMARY KEY (thread_key, first_scrape_id)
+) WITHOUT ROWID;
+CREATE TABLE list_changes (
+    thread_key INTEGER NOT NULL,
+    scrape_id INTEGER NOT NULL,
+    page INTEGER,
+    num INTEGER,
+    reply_count INTEGER,
+    read_count INTEGER,
+    PRIMARY KEY (thread_key, scrape_id)
+) WITHOUT ROWID;
+CREATE TABLE list_activity (
+    thread_key INTEGER NOT NULL,
+    scrape_id INTEGER NOT NULL,
+    list_time TEXT,
+    list_time_R TEXT,
+    update_reason TEXT,
+    PRIMARY KEY (thread_key, scrape_id)
+) WITHOUT ROWID;
+CREATE TABLE list_titles (
+    thread_key INTEGER NOT NULL,
+    scrape_id INTEGER NOT NULL,
+    title TEXT,
+    PRIMARY KEY (thread_key, scrape_id)
+) WITHOUT ROWID;
+"""
+
+# 每个 (帖子, 抓取) 只保留排在最前面的一行，并计算与该帖子上一次出现时的差异
+# （{source} 是全部历史: list_all 视图或 list 表，视图没有 rowid，所以按位置而不是插入顺序去重）
+STEPS_SQL = """
+CREATE TEMP TABLE snapshot_steps AS
+WITH rows AS (
+    SELECT l.thread_key, s.scrape_id,
+           CAST(NULLIF(l.page, '') AS INTEGER) AS page,
+           CAST(NULLIF(l.num, '') AS INTEGER) AS num,
+           CAST(NULLIF(l.reply_count, '') AS INTEGER) AS reply_count,
+           CAST(NULLIF(l.read_count, '') AS INTEGER) AS read_count,
+           NULLIF(l.list_time, '') AS list_time,
+           NULLIF(l.list_time_R, '') AS list_time_R,
+           NULLIF(l.update_reason, '') AS update_reason,
+           l.title, l.url, l.author, l.author_link
+    FROM (
+        SELECT *, ROW_NUMBER() OVER (
+            PARTITION BY thread_key, scraping_time_R
+            ORDER BY CAST(page AS INTEGER), CAST(num AS INTEGER), scraping_time
+        ) AS duplicate
+        FROM {source} WHERE thread_key IS NOT NULL
+    ) l
+    JOIN list_scrapes s ON s.ts = l.scraping_time_R
+    WHERE l.duplicate = 1
+)
+SELECT rows.*,
+       LAG(scrape_id) OVER w AS prev_scrape_id,
+       LAG(page) OVER w AS prev_page,
+       LAG(num) OVER w AS prev_num,
+       LAG(reply_count) OVER w AS prev_reply_count,
+       LAG(read_count) OVER w AS prev_read_count,
+       LAG(list_time) OVER w AS prev_list_time,
+       LAG(list_time_R) OVER w AS prev_list_time_R,
+       LAG(title) OVER w AS prev_title,
+       ROW_NUMBER() OVER (PARTITION BY thread_key ORDER BY scrape_id DESC) AS latest,
+       ROW_NUMBER() OVER w AS position,
+       MIN(scrape_id) OVER (PARTITION BY thread_key) AS first_scrape_id,
+       MAX(scrape_id) OVER (PARTITION BY thread_key) AS last_scrape_id
+FROM rows
+WINDOW w AS (PARTITION BY thread_key ORDER BY scrape_id)
+"""
+
+# 按 scrape_id 重建列表: 取这次抓取所在区间的帖子，每张变化表取该帖子在这次抓取之前（含）的最后一条记录
+STATE_SQL = """
+SELECT t.url, ti.title, s.ts AS scraping_time_R, a.list_time_R,
+       CASE WHEN a.scrape_id = s.scrape_id THEN a.update_reason END AS update_reason,
+       c.page, c.num, t.author, t.author_link, c.read_count, c.reply_count,
+       s.scraping_time, a.list_time, t.thread_key
+FROM list_scrapes s
+JOIN list_presence p ON p.first_scrape_id <= s.scrape_id AND p.last_scrape_id >= s.scrape_id
+JOIN list_threads t ON t.thread_key = p.thread_key
+JOIN list_changes c ON c.thread_key = t.thread_key AND c.scrape_id = (
+    SELECT MAX(scrape_id) FROM list_changes WHERE thread_key = t.thread_key AND scrape_id <= s.scrape_id)
+JOIN list_activity a ON a.thread_key = t.thread_key AND a.scrape_id = (
+    SELECT MAX(scrape_id) FROM list_activity WHERE thread_key = t.thread_key AND scrape_id <= s.scrape_id)
+JOIN list_titles ti ON ti.thread_key = t.thread_key AND ti.scrape_id = (
+    SELECT MAX(scrape_id) FROM list_titles WHERE thread_key = t.thread_key AND scrape_id <= s.scrape_id)
+WHERE s.scrape_id = ?
+ORDER BY c.page, c.num
+"""
+
+
+def has_snapshot_store(conn: sqlite3.Connection) -> bool:
+    """检查数据库中是否已有快照存储"""
+    count = plain_cursor(conn).execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({', '.join('?' * len(SNAPSHOT_TABLES))})",
+        SNAPSHOT_TABLES
+    ).fetchone()[0]
+    return count == len(SNAPSHOT_TABLES)
+
+
+def build_snapshot_store(conn: sqlite3.Connection) -> Dict[str, int]:
+    """
+    从 list 的全部历史（list_all 视图，没有视图时为 list 表）重建快照存储（迁移），list 表本身不变
+
+    在导入 list 之后调用，调用方负责提交事务。没有 thread_key 的行（url中没有帖子ID）不进入快照存储。
+
+    Args:
+        conn: 数据库连接
+
+    Returns:
+        Dict[str, int]: list 的行数和各表写入的行数，list 表不存在或缺少必要的列时返回空字典
+    """
+    cursor = plain_cursor(conn)
+    required = {'url', 'title', 'scraping_time_R', 'list_time_R', 'update_reason', 'page', 'num', 'author',
+                'author_link', 'read_count', 'reply_count', 'scraping_time', 'list_time', 'source_file',
+                'sheet_name', 'thread_key'}
+    missing = required - set(table_columns(cursor, 'list'))
+    if missing:
+        logger.warning(f"list表不存在或缺少列 {sorted(missing)}，跳过快照存储")
+        return {}
+    source = history_source(conn, 'list')
+
+    for table in SNAPSHOT_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    for statement in SCHEMA.split(';'):
+        if statement.strip():
+            cursor.execute(statement)
+
+    cursor.execute(f"""
+        INSERT INTO list_scrapes (scrape_id, ts, scraping_time, source_file, sheet_name, thread_count)
+        SELECT ROW_NUMBER() OVER (ORDER BY scraping_time_R), scraping_time_R,
+               MIN(NULLIF(scraping_time, '')), MIN(source_file), MIN(sheet_name), COUNT(DISTINCT thread_key)
+        FROM {source}
+        WHERE thread_key IS NOT NULL AND NULLIF(scraping_time_R, '') IS NOT NULL
+        GROUP BY scraping_time_R
+    """)
+    cursor.execute("DROP TABLE IF EXISTS temp.snapshot_steps")
+    cursor.execute(STEPS_SQL.format(source=source))
+
+    cursor.execute("""
+        INSERT INTO list_threads (thread_key, url, title, author, author_link, first_scrape_id, last_scrape_id)
+        SELECT thread_key, url, title, author, author_link, first_scrape_id, last_scrape_id
+        FROM temp.snapshot_steps WHERE latest = 1
+    """)
+    # 连续出现的抓取中 scrape_id - position 相同，按它分组得到出现区间
+    cursor.execute("""
+        INSERT INTO list_presence (thread_key, first_scrape_id, last_scrape_id)
+        SELECT thread_key, MIN(scrape_id), MAX(scrape_id)
+        FROM temp.snapshot_steps
+        GROUP BY thread_key, scrape_id - position
+    """)
+    cursor.execute("""
+        INSERT INTO list_changes (thread_key, scrape_id, page, num, reply_count, read_count)
+        SELECT thread_key, scrape_id, page, num, reply_count, read_count
+        FROM temp.snapshot_steps
+        WHERE prev_scrape_id IS NULL
+            OR page IS NOT prev_page OR num IS NOT prev_num
+            OR reply_count IS NOT prev_reply_count OR read_count IS NOT prev_read_count
+    """)
+    cursor.execute("""
+        INSERT INTO list_activity (thread_key, scrape_id, list_time, list_time_R, update_reason)
+        SELECT thread_key, scrape_id, list_time, list_time_R, update_reason
+        FROM temp.snapshot_steps
+        WHERE prev_scrape_id IS NULL OR update_reason IS NOT NULL
+            OR list_time IS NOT prev_list_time OR list_time_R IS NOT prev_list_time_R
+    """)
+    cursor.execute("""
+        INSERT INTO list_titles (thread_key, scrape_id, title)
+        SELECT thread_key, scrape_id, title
+        FROM temp.snapshot_steps
+        WHERE prev_scrape_id IS NULL OR title IS NOT prev_title
+    """)
+    cursor.execute("DROP TABLE temp.snapshot_steps")
+
+    counts = {'list': cursor.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0]}
+    for table in reversed(SNAPSHOT_TABLES):
+        counts[table] = cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    set_meta(conn, SNAPSHOT_STORE_KEY, cursor.execute("SELECT MAX(ts) FROM list_scrapes").fetchone()[0])
+    logger.info(f"已生成快照存储: list {counts['list']} 行 -> 抓取 {counts['list_scrapes']} 次, "
+                f"帖子 {counts['list_threads']} 个, 出现区间 {counts['list_presence']} 个, 变化记录 {counts['list_changes']} 条, "
+                f"活动记录 {counts['list_activity']} 条, 标题 {counts['list_titles']} 条")
+    return counts
+
+
+def resolve_scrape(conn: sqlite3.Connection, at: Union[str, datetime, None] = None) -> Optional[Tuple[int, str]]:
+    """
+    返回 at 之前（含）最近一次抓取的 (scrape_id, scraping_time_R)，at 为空时返回最新一次抓取
+
+    Args:
+        conn: 数据库连接
+        at: 时间点，datetime 或 'YYYY-MM-DD HH:MM:SS' 格式的字符串
+
+    Returns:
+        Optional[Tuple[int, str]]: 没有更早的抓取时返回None
+    """
+    cursor = plain_cursor(conn)
+    if at is None:
+        row = cursor.execute("SELECT scrape_id, ts FROM list_scrapes ORDER BY scrape_id DESC LIMIT 1").fetchone()
+    else:
+        if isinstance(at, datetime):
+            at = at.strftime('%Y-%m-%d %H:%M:%S')
+        row = cursor.execute(
+            "SELECT scrape_id, ts FROM list_scrapes WHERE ts <= ? ORDER BY ts DESC LIMIT 1", (at,)
+        ).fetchone()
+    return tuple(row) if row else None
+
+
+def state_at(conn: sqlite3.Connection, at: Union[str, datetime, None] = None) -> List[Dict[str, Any]]:
+    """
+    重建 at 时刻（之前最近一次抓取）的帖子列表，按 page、num 排序
+
+    每行的列与 list 表相同（STATE_COLUMNS），数值列为整数，空值为None。
+
+    Args:
+        conn: 数据库连接
+        at: 时间点，为空时返回最新一次抓取
+
+    Returns:
+        List[Dict[str, Any]]: 没有更早的抓取时返回空列表
+    """
+    scrape = resolve_scrape(conn, at)
+    if scrape is None:
+        return []
+    rows = plain_cursor(conn).execute(STATE_SQL, (scrape[0],)).fetchall()
+    return [dict(zip(STATE_COLUMNS, row)) for row in rows]
+
+
+def thread_history(conn: sqlite3.Connection, thread_key: int,
+                   start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    返回单个帖子在 [start, end] 之间的变化记录和出现区间，按抓取时间排序
+
+    Args:
+        conn: 数据库连接
+        thread_key: 规范的帖子ID
+        start: 开始时间（含），为空表示不限
+        end: 结束时间（含），为空表示不限
+
+    Returns:
+        Dict: changes 为变化记录（scraping_time_R、page、num、reply_count、read_count），
+              presence 为与时间范围相交的出现区间（first/last 为首次和最后一次出现的 scraping_time_R）
+    """
+    cursor = plain_cursor(conn)
+    changes = cursor.execute("""
+        SELECT s.ts, c.page, c.num, c.reply_count, c.read_count
+        FROM list_changes c
+        JOIN list_scrapes s ON s.scrape_id = c.scrape_id
+        WHERE c.thread_key = ? AND (? IS NULL OR s.ts >= ?) AND (? IS NULL OR s.ts <= ?)
+        ORDER BY c.scrape_id
+    """, (thread_key, start, start, end, end)).fetchall()
+    presence = cursor.execute("""
+        SELECT f.ts, l.ts
+        FROM list_presence p
+        JOIN list_scrapes f ON f.scrape_id = p.first_scrape_id
+        JOIN list_scrapes l ON l.scrape_id = p.last_scrape_id
+        WHERE p.thread_key = ? AND (? IS NULL OR l.ts >= ?) AND (? IS NULL OR f.ts <= ?)
+        ORDER BY p.first_scrape_id
+    """, (thread_key, start, start, end, end)).fetchall()
+    return {
+        'changes': [
+            {'scraping_time_R': ts, 'page': page, 'num': num, 'reply_count': reply_count, 'read_count': read_count}
+            for ts, page, num, reply_count, read_count in changes
+        ],
+        'presence': [{'first': first, 'last': last} for first, last in presence],
+    }
+
+
+def _list_rows_at(cursor: sqlite3.Cursor, source: str, ts: str) -> List[Tuple]:
+    """list 全部历史中一次抓取的行，转换为与 state_at 相同的类型（每个帖子只取排在最前面的一行）"""
+    integer_columns = {'page', 'num', 'read_count', 'reply_count'}
+    select = ', '.join(
+        f"CAST(NULLIF({column}, '') AS INTEGER)" if column in integer_columns
+        else column if column == 'thread_key'
+        else f"NULLIF({column}, '')"
+        for column in STATE_COLUMNS if column != 'scraping_time'
+    )
+    return cursor.execute(f"""
+        SELECT {select} FROM (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY thread_key ORDER BY CAST(page AS INTEGER), CAST(num AS INTEGER), scraping_time
+            ) AS duplicate
+            FROM {source} WHERE scraping_time_R = ? AND thread_key IS NOT NULL
+        )
+        WHERE duplicate = 1
+        ORDER BY CAST(page AS INTEGER), CAST(num AS INTEGER)
+    """, (ts,)).fetchall()
+
+
+def verify_snapshot_store(conn: sqlite3.Connection, samples: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    抽查快照存储重建的列表与 list 表是否一致（不比较每行原始的 scraping_time）
+
+    Args:
+        conn: 数据库连接
+        samples: 要检查的 scraping_time_R，默认检查第一次、中间和最后一次抓取
+            （list 分区降采样后，分区中的抓取不完整，默认只从原表保留的抓取中选择）
+
+    Returns:
+        Dict[str, Any]: checked 检查的抓取数，mismatched 不一致的抓取时间列表
+    """
+    cursor = plain_cursor(conn)
+    source = history_source(conn, 'list')
+    if samples is None:
+        start = cursor.execute("SELECT MIN(scraping_time_R) FROM list").fetchone()[0] if partition_names(conn, 'list') else None
+        times = [row[0] for row in cursor.execute(
+            "SELECT ts FROM list_scrapes WHERE ? IS NULL OR ts >= ? ORDER BY scrape_id", (start, start)
+        ).fetchall()]
+        samples = sorted({times[0], times[len(times) // 2], times[-1]}) if times else []
+    columns = [column for column in STATE_COLUMNS if column != 'scraping_time']
+    mismatched = []
+    for ts in samples:
+        rebuilt = [tuple(row[column] for column in columns) for row in state_at(conn, ts)]
+        if rebuilt != _list_rows_at(cursor, source, ts):
+            mismatched.append(ts)
+    return {'checked': len(samples), 'mismatched': mismatched}
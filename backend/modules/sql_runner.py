@@ -0,0 +1,182 @@
+"""
+SQL脚本执行模块
+
+- 用 sqlite3.complete_statement 拆分语句: 注释和字符串中的分号不会截断语句
+- 每个文件在一个显式事务中执行，每条语句一个保存点；语句失败时只回滚该语句
+- 运行报告记录每条语句的耗时和影响行数，可选记录访问大表（如 post/list）的语句的 EXPLAIN QUERY PLAN
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+# 设置日志
+logger = logging.getLogger("sql_runner")
+
+# 默认记录查询计划的大表
+DEFAULT_EXPLAIN_TABLES = ('post', 'list', 'list_all')
+
+# 报告中保存的语句长度
+MAX_SQL_LENGTH = 300
+
+# 由执行器管理事务，脚本中的事务控制语句跳过
+_TRANSACTION_STATEMENT = re.compile(r'^\s*(BEGIN|COMMIT|END|ROLLBACK)\b(\s+(DEFERRED|IMMEDIATE|EXCLUSIVE))?(\s+TRANSACTION)?\s*;?\s*$',
+                                    re.IGNORECASE)
+
+# 去掉语句中的注释，用于判断是否为空语句和匹配表名
+_COMMENT = re.compile(r'--[^\n]*|/\*.*?\*/', re.DOTALL)
+
+
+def split_sql_statements(sql_text: str) -> List[str]:
+    """
+    拆分SQL脚本为完整的语句
+
+    在每个分号处用 sqlite3.complete_statement 判断语句是否完整（会正确处理字符串、注释和触发器中的分号）。
+    只有注释或空白的片段被忽略；末尾缺少分号的语句也会返回。
+    """
+    statements = []
+    start = 0
+    position = sql_text.find(';')
+    while position != -1:
+        candidate = sql_text[start:position + 1]
+        if sqlite3.complete_statement(candidate):
+            if _COMMENT.sub('', candidate).strip().strip(';').strip():
+                statements.append(candidate.strip())
+            start = position + 1
+        position = sql_text.find(';', position + 1)
+    rest = sql_text[start:]
+    if _COMMENT.sub('', rest).strip():
+        statements.append(rest.strip())
+    return statements
+
+
+def _referenced_tables(statement: str, tables: Iterable[str]) -> List[str]:
+    """语句 FROM/JOIN 中引用的表（忽略注释）"""
+    text = _COMMENT.sub(' ', statement)
+    return [
+        table for table in tables
+        if re.search(rf'\b(FROM|JOIN)\s+["`\[]?{re.escape(table)}\b', text, re.IGNORECASE)
+    ]
+
+
+def _explain(cursor: sqlite3.Cursor, statement: str) -> List[str]:
+    try:
+        return [row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {statement.rstrip().rstrip(';')}").fetchall()]
+    except sqlite3.Error as e:
+        return [f"无法获取查询计划: {e}"]
+
+
+def _summary(statement: str) -> str:
+    text = ' '.join(statement.split())
+    return text if len(text) <= MAX_SQL_LENGTH else text[:MAX_SQL_LENGTH] + '...'
+
+
+def run_sql_script(
+    conn: sqlite3.Connection,
+    sql_text: str,
+    name: str = '<sql>',
+    stop_on_error: bool = False,
+    explain_tables: Optional[Iterable[str]] = None
+) -> Dict[str, Any]:
+    """
+    在一个事务中执行SQL脚本
+
+    Args:
+        conn: 数据库连接（不能有未提交的事务）
+        sql_text: SQL脚本内容
+        name: 报告中显示的脚本名
+        stop_on_error: 出错时回滚整个脚本并停止；默认只回滚出错的语句并继续
+        explain_tables: 语句引用这些表时记录查询计划，None 表示不记录
+
+    Returns:
+        Dict[str, Any]: 运行报告
+            - statements: 每条语句的 index、sql、seconds、rows、error，以及可选的 plan
+            - seconds: 总耗时
+            - failed: 失败的语句数
+            - committed: 事务是否已提交
+    """
+    statements = split_sql_statements(sql_text)
+    explain_tables = list(explain_tables or [])
+    report = {'name': name, 'statements': [], 'seconds': 0.0, 'failed': 0, 'committed': False}
+
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # 由这里显式控制事务
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    started = time.perf_counter()
+    try:
+        cursor.execute("BEGIN")
+        for index, statement in enumerate(statements, 1):
+            if _TRANSACTION_STATEMENT.match(_COMMENT.sub('', statement)):
+                logger.debug(f"{name} 语句 #{index}: 跳过事务控制语句 {statement}")
+                continue
+
+            entry = {'index': index, 'sql': _summary(statement), 'seconds': 0.0, 'rows': 0, 'error': None}
+            scanned = _referenced_tables(statement, explain_tables) if explain_tables else []
+            if scanned:
+                entry['plan'] = _explain(cursor, statement)
+
+            changes_before = conn.total_changes
+            statement_started = time.perf_counter()
+            cursor.execute("SAVEPOINT sql_runner_statement")
+            try:
+                cursor.execute(statement)
+                cursor.fetchall()
+                rowcount = cursor.rowcount
+                cursor.execute("RELEASE sql_runner_statement")
+                entry['rows'] = rowcount if rowcount >= 0 else conn.total_changes - changes_before
+            except sqlite3.Error as e:
+                cursor.execute("ROLLBACK TO sql_runner_statement")
+                cursor.execute("RELEASE sql_runner_statement")
+                entry['error'] = str(e)
+                report['failed'] += 1
+                logger.error(f"{name} 语句 #{index} 执行出错: {str(e)}")
+                logger.error(f"问题语句: {statement}")
+            entry['seconds'] = round(time.perf_counter() - statement_started, 4)
+            report['statements'].append(entry)
+
+            if entry['error'] and stop_on_error:
+                cursor.execute("ROLLBACK")
+                logger.error(f"{name} 已回滚")
+                return report
+
+        cursor.execute("COMMIT")
+        report['committed'] = True
+        return report
+    except Exception:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    finally:
+        report['seconds'] = round(time.perf_counter() - started, 4)
+        cursor.close()
+        conn.isolation_level = isolation_level
+
+
+def run_sql_file(
+    conn: sqlite3.Connection,
+    sql_file_path: str,
+    stop_on_error: bool = False,
+    explain_tables: Optional[Iterable[str]] = None
+) -> Dict[str, Any]:
+    """读取并执行SQL文件，参数和返回值同 run_sql_script"""
+    with open(sql_file_path, 'r', encoding='utf-8') as f:
+        sql_text = f.read()
+    return run_sql_script(conn, sql_text, os.path.basename(sql_file_path), stop_on_error, explain_tables)
+
+
+def format_report(report: Dict[str, Any], top: int = 5) -> str:
+    """把运行报告格式化为日志文本: 总体情况和最慢的几条语句"""
+    executed = report['statements']
+    lines = [
+        f"{report['name']}: {len(executed)} 条语句, 失败 {report['failed']} 条, 耗时 {report['seconds']:.3f} 秒"
+        f"{'' if report['committed'] else ', 未提交'}"
+    ]
+    for entry in sorted(executed, key=lambda item: item['seconds'], reverse=True)[:top]:
+        lines.append(f"  #{entry['index']} {entry['seconds']:.3f} 秒, {entry['rows']} 行: {entry['sql'][:120]}")
+        for step in entry.get('plan', []):
+            lines.append(f"      {step}")
+    return '\n'.join(lines)
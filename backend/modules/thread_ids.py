@@ -0,0 +1,244 @@
+"""
+帖子ID工具模块，统一从各种写法中提取规范的thread_id
+
+论坛帖子URL形如 https://www.chineseinla.com/f/page_viewtopic/t_2871467.html，
+规范的thread_id就是 t_ 后面的数字（2871467）。
+
+各表原有的 thread_id 列是TEXT，写法不一（"2871467"、"t_2871467"、"2871467.0"），
+因此在导入时另外计算 INTEGER 类型的 thread_key 列并建立索引，API统一按 thread_key 查询。
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from .db_swap import read_version_id
+from .db_utils import main_db_file, plain_cursor, table_columns
+
+# 设置日志
+logger = logging.getLogger("thread_ids")
+
+# 规范帖子ID列名
+THREAD_KEY_COLUMN = 'thread_key'
+
+# 需要 thread_key 列的表（都带有url或thread_id列）
+THREAD_KEY_TABLES = ['list', 'posts', 'post_history', 'post_ranking', 'car_info', 'thread_follow']
+
+# 由thread_id生成的规范帖子URL
+THREAD_URL_PREFIX = 'https://www.chineseinla.com/f/page_viewtopic/t_'
+THREAD_URL_SUFFIX = '.html'
+
+# URL或 "t_2871467" 形式中的帖子ID
+_THREAD_URL_PATTERN = re.compile(r't_(\d+)')
+
+# 纯数字形式（允许 "2871467.0" 这种被pandas读成浮点数的写法）
+_THREAD_NUMBER_PATTERN = re.compile(r'^\s*(\d+)(?:\.0+)?\s*$')
+
+
+def canonical_thread_id(value: Any) -> Optional[int]:
+    """
+    提取规范的thread_id
+
+    支持整数、数字字符串、"t_2871467"、帖子URL，无法识别时返回None。
+
+    Args:
+        value: 原始的thread_id或URL
+
+    Returns:
+        Optional[int]: 规范的thread_id
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value if value > 0 else None
+    if isinstance(value, float):
+        return int(value) if value.is_integer() and value > 0 else None
+
+    text = str(value)
+    if text.isascii() and text.isdigit():
+        number = int(text)
+        return number if number > 0 else None
+    match = _THREAD_NUMBER_PATTERN.match(text)
+    if match:
+        number = int(match.group(1))
+        return number if number > 0 else None
+
+    match = _THREAD_URL_PATTERN.search(text)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def thread_key_sql(url_column: str) -> str:
+    """
+    返回从URL列计算thread_key的SQL表达式，供SQL脚本和不便注册Python函数的场景使用
+
+    例如 thread_key_sql('p.url') 用于替代 SUBSTR(p.url, -10, 7)，后者在帖子ID不是7位时出错。
+    """
+    return (f"CASE WHEN INSTR({url_column}, '/t_') > 0 "
+            f"THEN CAST(SUBSTR({url_column}, INSTR({url_column}, '/t_') + 3) AS INTEGER) END")
+
+
+def thread_url(thread_id: int) -> str:
+    """由规范的thread_id生成帖子URL"""
+    return f"{THREAD_URL_PREFIX}{thread_id}{THREAD_URL_SUFFIX}"
+
+
+def thread_url_sql(key_column: str) -> str:
+    """返回由thread_key列生成帖子URL的SQL表达式（与 thread_url 相同）"""
+    return f"'{THREAD_URL_PREFIX}' || {key_column} || '{THREAD_URL_SUFFIX}'"
+
+
+def extract_thread_keys(frame):
+    """
+    向量化计算DataFrame每行的thread_key，优先使用thread_id列，其次url列
+
+    Args:
+        frame: pandas.DataFrame
+
+    Returns:
+        pandas.Series: Int64类型（缺失为<NA>），两列都不存在时返回None
+    """
+    keys = None
+    for column in ('thread_id', 'url'):
+        if column not in frame.columns:
+            continue
+        text = frame[column].astype('string')
+        values = text.str.extract(_THREAD_NUMBER_PATTERN.pattern, expand=False)
+        values = values.fillna(text.str.extract(_THREAD_URL_PATTERN.pattern, expand=False))
+        keys = values if keys is None else keys.fillna(values)
+    if keys is None:
+        return None
+    return keys.astype('Int64')
+
+
+def create_thread_key_index(conn: sqlite3.Connection, table: str):
+    """在表的thread_key列上建立索引"""
+    plain_cursor(conn).execute(
+        f'CREATE INDEX IF NOT EXISTS "idx_{table}_{THREAD_KEY_COLUMN}" ON "{table}"({THREAD_KEY_COLUMN})'
+    )
+
+
+def backfill_thread_keys(conn: sqlite3.Connection, tables: Iterable[str] = None) -> Dict[str, int]:
+    """
+    为已有的表补充thread_key列（迁移）: 添加列、回填空值、建立索引
+
+    只处理存在且带有thread_id或url列的表，重复执行时只回填仍为NULL的行。
+    调用方负责提交事务。
+
+    Args:
+        conn: 数据库连接
+        tables: 要处理的表，默认 THREAD_KEY_TABLES
+
+    Returns:
+        Dict[str, int]: 每个表回填的行数
+    """
+    conn.create_function('canonical_thread_id', 1, canonical_thread_id, deterministic=True)
+    cursor = plain_cursor(conn)
+    results = {}
+    for table in tables or THREAD_KEY_TABLES:
+        columns = set(table_columns(cursor, table))
+        sources = [c for c in ('thread_id', 'url') if c in columns]
+        if not sources:
+            continue
+        if THREAD_KEY_COLUMN not in columns:
+            cursor.execute(f'ALTER TABLE "{table}" ADD COLUMN {THREAD_KEY_COLUMN} INTEGER')
+        expression = ', '.join(f'canonical_thread_id("{c}")' for c in sources)
+        if len(sources) > 1:
+            expression = f'COALESCE({expression})'
+        cursor.execute(
+            f'UPDATE "{table}" SET {THREAD_KEY_COLUMN} = {expression} WHERE {THREAD_KEY_COLUMN} IS NULL'
+        )
+        results[table] = max(cursor.rowcount, 0)
+        create_thread_key_index(conn, table)
+        logger.info(f"表 {table} 的thread_key已回填 {results[table]} 行")
+    return results
+
+
+# 已确认包含thread_key的数据库: {(db_file, version_id)}
+_checked_databases = set()
+# 各表是否有thread_key列: {(db_file, version_id, table): bool}
+_column_state: Dict[tuple, bool] = {}
+_checked_lock = threading.Lock()
+
+
+def ensure_thread_keys(conn: sqlite3.Connection):
+    """
+    确保数据库中的表都有thread_key列和索引，缺少时执行一次迁移
+
+    迁移会修改表结构并更新整表，只在服务启动（bootstrap）时调用，接口请求通过
+    table_has_thread_key / thread_key_expr 只读检查。检查结果按数据库文件和版本缓存。
+    """
+    db_file = main_db_file(conn)
+    key = (db_file, read_version_id(db_file))
+    with _checked_lock:
+        if key in _checked_databases:
+            return
+
+    cursor = plain_cursor(conn)
+    missing = []
+    for table in THREAD_KEY_TABLES:
+        columns = set(table_columns(cursor, table))
+        if not columns or not ({'thread_id', 'url'} & columns):
+            continue
+        index_name = f"idx_{table}_{THREAD_KEY_COLUMN}"
+        has_index = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='index' AND name=?", (index_name,)
+        ).fetchone()
+        if THREAD_KEY_COLUMN not in columns or not has_index:
+            missing.append(table)
+
+    if missing:
+        logger.info(f"以下表缺少thread_key，开始迁移: {missing}")
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            backfill_thread_keys(conn, missing)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    with _checked_lock:
+        _checked_databases.add(key)
+        for cached in [cached for cached in _column_state if cached[:2] == key]:
+            del _column_state[cached]
+
+
+def table_has_thread_key(conn: sqlite3.Connection, table: str) -> bool:
+    """检查表是否有thread_key列（只读，结果按数据库文件和版本缓存）"""
+    db_file = main_db_file(conn)
+    key = (db_file, read_version_id(db_file), table)
+    with _checked_lock:
+        if key in _column_state:
+            return _column_state[key]
+    exists = THREAD_KEY_COLUMN in table_columns(conn, table)
+    if not exists:
+        logger.warning(f"表 {table} 还没有thread_key列，查询按url计算帖子ID（请运行 migrate_thread_keys.py）")
+    with _checked_lock:
+        _column_state[key] = exists
+    return exists
+
+
+def thread_key_expr(conn: sqlite3.Connection, table: str, alias: str = None) -> str:
+    """
+    返回表中帖子ID的SQL表达式，用于按thread_key等值查询
+
+    表有thread_key列时返回该列（走索引）；尚未迁移的数据库按url列计算（thread_key_sql），
+    结果相同但需要全表扫描。
+
+    Args:
+        conn: 数据库连接
+        table: 表名
+        alias: 查询中表的别名
+
+    Returns:
+        str: SQL表达式
+    """
+    prefix = f"{alias}." if alias else ''
+    if table_has_thread_key(conn, table):
+        return f"{prefix}{THREAD_KEY_COLUMN}"
+    return thread_key_sql(f"{prefix}url")
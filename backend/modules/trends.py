@@ -9,10 +9,6 @@ from datetime import datetime, timedelta
 from .db_utils import execute_query, table_exists
 
 # 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-)
 logger = logging.getLogger("trends")
 
 def get_formatted_date(date_str: str, time_type: str) -> str:
@@ -362,4 +358,34 @@ def get_new_posts(date=None, page=1, limit=10) -> Dict[str, Any]:
             'limit': limit,
             'date': date,
             'error': str(e)
-        } 
\ No newline at end of file
+        } 
+def get_post_date_range() -> Dict[str, Any]:
+    """
+    获取帖子的日期范围
+    
+    Returns:
+        Dict[str, Any]: start_date/end_date 以及前端使用的 min_date/max_date，没有数据时为None
+    """
+    date_range = {
+        'start_date': None,
+        'end_date': None,
+        'min_date': None,
+        'max_date': None
+    }
+    
+    # 检查posts表是否存在
+    if not table_exists('posts'):
+        logger.warning("posts表不存在，返回空日期范围")
+        return date_range
+    
+    # 获取最早和最晚的帖子日期
+    result = execute_query("""
+        SELECT MIN(post_time) as start_date, MAX(post_time) as end_date 
+        FROM posts 
+        WHERE post_time IS NOT NULL
+    """)
+    
+    if result and result[0]['start_date'] and result[0]['end_date']:
+        date_range['start_date'] = date_range['min_date'] = result[0]['start_date']
+        date_range['end_date'] = date_range['max_date'] = result[0]['end_date']
+    return date_range
@@ -11,13 +11,10 @@ from collections import Counter
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
-from .db_utils import execute_query, execute_update, table_exists
+from .db_utils import execute_query, execute_update, table_exists, get_shared_connection
+from .partitions import history_source
 
 # 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-)
 logger = logging.getLogger("wordcloud")
 
 # 词云版本号 - 当算法或数据结构变化时递增此值
@@ -109,7 +106,9 @@ def generate_wordcloud_from_titles() -> List[Dict[str, Any]]:
     tables_to_check = ['posts', 'list', 'detail']
     for table in tables_to_check:
         if table_exists(table):
-            query = f"SELECT title FROM {table} WHERE title IS NOT NULL"
+            # list 的全部历史在 list_all 视图中（list 分区后原表只有最近几天）
+            source = history_source(get_shared_connection(), table) if table == 'list' else table
+            query = f"SELECT title FROM {source} WHERE title IS NOT NULL"
             result = execute_query(query)
             titles.extend([row['title'] for row in result if row['title']])
     
@@ -270,7 +269,7 @@ def get_cached_wordcloud() -> Optional[List[Dict[str, Any]]]:
             try:
                 wordcloud_data = json.loads(result[0]['data'])
                 if isinstance(wordcloud_data, list) and len(wordcloud_data) > 0:
-                    logger.info(f"从缓存获取到词云数据，共 {len(wordcloud_data)} 个词")
+                    logger.debug(f"从缓存获取到词云数据，共 {len(wordcloud_data)} 个词")
                     return wordcloud_data
             except Exception as e:
                 logger.error(f"解析缓存词云数据出错: {str(e)}")
@@ -13,13 +13,17 @@ import os
 import sys
 import sqlite3
 import logging
-import shutil
-import time
 import json
-import gc
+import gzip
+import shutil
+import hashlib
 from pathlib import Path
 from datetime import datetime
-import threading
+
+# 数据库热替换模块位于backend/modules
+sys.path.append(str(Path(__file__).parent.parent.absolute()))
+from modules.db_swap import online_backup, publish_database
+from modules.db_copy import copy_tables_attached, get_table_ddl, get_table_objects_ddl, quote_identifier
 
 # 配置日志
 logging.basicConfig(
@@ -32,6 +36,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger('db_manager')
 
+# 增量备份的表哈希算法版本（清单中记录；与上一次不同时重新生成全量基准）和每块的行数
+TABLE_CHECKSUM_VERSION = 'sql-chunks-1'
+CHECKSUM_CHUNK_ROWS = 5000
+
 class DBManager:
     """数据库管理类，提供增强的数据库管理功能"""
     
@@ -57,17 +65,31 @@ class DBManager:
         # 设置保护表列表
         self.protected_tables = ['wordcloud_cache', 'user_data', 'db_maintenance_log']
         
-        # 设置待删除文件列表，用于延迟删除
-        self._pending_delete_files = []
-        
-        # 待删除文件的清理线程
-        self._cleaner_thread = None
+        # 增量备份目录及策略：每个全量基准之后最多跟随 full_every 个增量，保留最近 max_chains 条备份链
+        self.incremental_dir = os.path.join(self.backup_dir, "incremental")
+        self.incremental_full_every = 7
+        self.incremental_max_chains = 3
     
-    def backup_database(self, backup_path=None):
-        """备份数据库"""
+    @property
+    def live_db_path(self):
+        """API读取的正式数据库文件（发布和恢复都把新库写入 db_path 本身，不会换成其他文件）"""
+        return self.db_path
+    
+    def backup_database(self, backup_path=None, mode='full', compress=False):
+        """备份数据库
+        
+        Args:
+            backup_path: 全量备份文件路径，默认按时间戳生成
+            mode: 'full' 全量备份，'incremental' 只保存变化的表
+            compress: 增量模式下是否使用gzip压缩备份文件
+        """
+        if mode == 'incremental':
+            return self.backup_database_incremental(compress=compress)
+        
         # 如果没有指定备份路径，使用时间戳生成
         if not backup_path:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            # 精确到微秒，恢复前的自动备份不会覆盖同一秒内创建的备份
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
             backup_path = os.path.join(self.backup_dir, f"forum_data_backup_{timestamp}.db")
         
         try:
@@ -76,12 +98,17 @@ class DBManager:
                 logger.error(f"数据库文件不存在，无法备份: {self.db_path}")
                 return False
             
-            # 复制数据库文件
-            shutil.copy2(self.db_path, backup_path)
+            # 使用在线备份API复制数据库，备份期间API仍可正常读取
+            report = online_backup(self.db_path, backup_path, probe_readers=True)
             logger.info(f"数据库备份成功: {backup_path}")
             
             # 记录备份操作
-            self._log_maintenance_action('备份数据库', '完成', f'备份文件: {backup_path}')
+            self._log_maintenance_action('备份数据库', '完成', json.dumps({
+                'backup_path': backup_path,
+                'seconds': report['seconds'],
+                'bytes': report['bytes'],
+                'reader_stall': report.get('reader_stall')
+            }, ensure_ascii=False))
             
             # 清理旧备份
             self._cleanup_old_backups()
@@ -113,9 +140,336 @@ class DBManager:
             logger.error(f"清理旧备份时出错: {str(e)}")
             return False
     
-    def restore_database(self, backup_path=None):
-        """从备份恢复数据库"""
+    def _table_hashes(self, conn, schema='main'):
+        """计算每个表的内容哈希（表结构、索引、触发器和全部行）
+        
+        行在SQLite内按 rowid 分块用 quote() 拼接成文本，Python 只对每块的结果计算一次sha1，
+        不逐行取回。在调用方的读事务中执行时，各表哈希对应同一时刻的数据。
+        
+        Returns:
+            dict: {表名: sha1十六进制字符串}
+        """
+        hashes = {}
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        # sqlite_stat* 是 ANALYZE 的统计信息，不能按普通表复制
+        tables = cursor.execute(
+            f"SELECT name, sql FROM {schema}.sqlite_master "
+            f"WHERE type='table' AND name NOT LIKE 'sqlite_stat%' ORDER BY name"
+        ).fetchall()
+        for table, table_sql in tables:
+            digest = hashlib.sha1((table_sql or '').encode('utf-8'))
+            for ddl in get_table_objects_ddl(conn, table, schema):
+                digest.update(ddl.encode('utf-8'))
+            
+            name = f"{schema}.{quote_identifier(table)}"
+            columns = cursor.execute(f"PRAGMA {schema}.table_info({quote_identifier(table)})").fetchall()
+            row_text = " || ',' || ".join(f"quote({quote_identifier(column[1])})" for column in columns) or "''"
+            try:
+                cursor.execute(f"SELECT rowid FROM {name} LIMIT 0")
+                has_rowid = True
+            except sqlite3.OperationalError:
+                # WITHOUT ROWID 表没有rowid
+                has_rowid = False
+            if has_rowid:
+                last_rowid = None
+                while True:
+                    condition = "" if last_rowid is None else "WHERE rowid > ?"
+                    params = () if last_rowid is None else (last_rowid,)
+                    chunk_last, text = cursor.execute(f"""
+                        SELECT MAX(r), group_concat(t, char(10)) FROM (
+                            SELECT rowid AS r, rowid || ':' || {row_text} AS t FROM {name}
+                            {condition} ORDER BY rowid LIMIT {CHECKSUM_CHUNK_ROWS}
+                        )
+                    """, params).fetchone()
+                    if chunk_last is None:
+                        break
+                    digest.update(text.encode('utf-8'))
+                    last_rowid = chunk_last
+            else:
+                # WITHOUT ROWID 表按主键顺序一次拼接
+                order_by = ', '.join(quote_identifier(column[1]) for column in columns)
+                (text,) = cursor.execute(f"""
+                    SELECT group_concat(t, char(10)) FROM (
+                        SELECT {row_text} AS t FROM {name} ORDER BY {order_by}
+                    )
+                """).fetchone()
+                digest.update((text or '').encode('utf-8'))
+            hashes[table] = digest.hexdigest()
+        return hashes
+    
+    def _load_backup_manifest(self):
+        """读取增量备份清单"""
+        manifest_path = os.path.join(self.incremental_dir, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return {'entries': []}
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _save_backup_manifest(self, manifest):
+        """原子地写入增量备份清单"""
+        manifest_path = os.path.join(self.incremental_dir, "manifest.json")
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+    
+    def _copy_attached_tables(self, conn, tables):
+        """把 src 库中的指定表（含原始DDL、索引和触发器）复制到当前连接的 main 库，在调用方的事务中执行"""
+        for table in tables:
+            if table == 'sqlite_sequence':
+                conn.execute("CREATE TABLE _backup_sqlite_sequence AS SELECT * FROM src.sqlite_sequence")
+                continue
+            conn.execute(get_table_ddl(conn, table, 'src'))
+            name = quote_identifier(table)
+            conn.execute(f"INSERT INTO main.{name} SELECT * FROM src.{name}")
+            # 数据导入后再建索引
+            for ddl in get_table_objects_ddl(conn, table, 'src'):
+                conn.execute(ddl)
+    
+    def _compress_file(self, path):
+        """gzip压缩文件并删除原文件，返回压缩后的路径"""
+        gz_path = f"{path}.gz"
+        with open(path, 'rb') as src, gzip.open(gz_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.remove(path)
+        return gz_path
+    
+    def _open_backup_file(self, file_name, work_dir):
+        """返回备份文件可直接打开的SQLite路径，压缩文件会先解压到 work_dir"""
+        path = os.path.join(self.incremental_dir, file_name)
+        if not file_name.endswith('.gz'):
+            return path
+        plain_path = os.path.join(work_dir, file_name[:-3])
+        with gzip.open(path, 'rb') as src, open(plain_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        return plain_path
+    
+    def backup_database_incremental(self, compress=False, full_every=None):
+        """增量备份数据库
+        
+        通过每个表的内容哈希判断变化：没有备份链、增量数量达到 full_every 或上次的哈希算法不同时，
+        用在线备份API生成全量基准；否则在一个读事务中计算正在使用的数据库各表的哈希，
+        只把变化的表写入增量文件，并记录被删除的表（不再先复制整个数据库）。
+        
+        Args:
+            compress: 是否gzip压缩备份文件
+            full_every: 每条备份链最多包含的增量数，默认使用 self.incremental_full_every
+            
+        Returns:
+            dict: 本次备份的清单条目，失败返回False
+        """
+        full_every = full_every or self.incremental_full_every
+        file_path = None
+        try:
+            if not os.path.exists(self.db_path):
+                logger.error(f"数据库文件不存在，无法备份: {self.db_path}")
+                return False
+            
+            os.makedirs(self.incremental_dir, exist_ok=True)
+            manifest = self._load_backup_manifest()
+            entries = manifest['entries']
+            
+            entry_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            last = entries[-1] if entries else None
+            deltas_in_chain = sum(1 for e in entries if last and e['chain'] == last['chain'] and e['type'] == 'delta')
+            
+            if last is None or deltas_in_chain >= full_every or last.get('checksum') != TABLE_CHECKSUM_VERSION:
+                entry_type = 'base'
+                chain = entry_id
+                dropped_tables = []
+                file_name = f"base_{entry_id}.db"
+                file_path = os.path.join(self.incremental_dir, file_name)
+                online_backup(self.db_path, file_path)
+                # 哈希基于备份文件计算，与基准内容一致
+                conn = sqlite3.connect(file_path)
+                try:
+                    # 备份文件不使用WAL，之后只读打开（重建时）不会留下 -wal/-shm 文件
+                    conn.execute("PRAGMA journal_mode=DELETE")
+                    table_hashes = self._table_hashes(conn)
+                finally:
+                    conn.close()
+                changed_tables = sorted(table_hashes)
+            else:
+                entry_type = 'delta'
+                chain = last['chain']
+                previous = last['table_hashes']
+                file_name = f"delta_{entry_id}.db"
+                file_path = os.path.join(self.incremental_dir, file_name)
+                conn = sqlite3.connect(file_path, isolation_level=None)
+                try:
+                    conn.execute("ATTACH DATABASE ? AS src", (self.db_path,))
+                    # 计算哈希和复制变化的表在同一个事务中，读取的是正在使用的数据库的同一时刻
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        table_hashes = self._table_hashes(conn, 'src')
+                        changed_tables = sorted(t for t, h in table_hashes.items() if previous.get(t) != h)
+                        dropped_tables = sorted(t for t in previous if t not in table_hashes)
+                        self._copy_attached_tables(conn, changed_tables)
+                        conn.execute("COMMIT")
+                    except Exception:
+                        conn.execute("ROLLBACK")
+                        raise
+                    conn.execute("DETACH DATABASE src")
+                finally:
+                    conn.close()
+            
+            if compress:
+                file_name = os.path.basename(self._compress_file(file_path))
+            
+            entry = {
+                'id': entry_id,
+                'type': entry_type,
+                'chain': chain,
+                'file': file_name,
+                'created_at': datetime.now().isoformat(),
+                'changed_tables': changed_tables,
+                'dropped_tables': dropped_tables,
+                'checksum': TABLE_CHECKSUM_VERSION,
+                'table_hashes': table_hashes,
+                'bytes': os.path.getsize(os.path.join(self.incremental_dir, file_name))
+            }
+            entries.append(entry)
+            self._cleanup_old_chains(manifest)
+            self._save_backup_manifest(manifest)
+            
+            logger.info(f"增量备份完成({entry_type}): {file_name}, 变化的表 {len(changed_tables)} 个, "
+                        f"大小 {entry['bytes'] / (1024 * 1024):.2f} MB")
+            self._log_maintenance_action('增量备份数据库', '完成', json.dumps({
+                'id': entry_id,
+                'type': entry_type,
+                'file': file_name,
+                'changed_tables': changed_tables,
+                'dropped_tables': dropped_tables
+            }, ensure_ascii=False))
+            return entry
+        except Exception as e:
+            logger.error(f"增量备份数据库时出错: {str(e)}")
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
+            self._log_maintenance_action('增量备份数据库', '失败', error_message=str(e))
+            return False
+    
+    def _cleanup_old_chains(self, manifest, max_chains=None):
+        """只保留最近的若干条备份链（全量基准及其增量）"""
+        max_chains = max_chains or self.incremental_max_chains
+        chains = []
+        for entry in manifest['entries']:
+            if entry['chain'] not in chains:
+                chains.append(entry['chain'])
+        expired = set(chains[:-max_chains])
+        if not expired:
+            return
+        
+        kept = []
+        for entry in manifest['entries']:
+            if entry['chain'] in expired:
+                path = os.path.join(self.incremental_dir, entry['file'])
+                if os.path.exists(path):
+                    os.remove(path)
+                    logger.info(f"删除过期的增量备份: {path}")
+            else:
+                kept.append(entry)
+        manifest['entries'] = kept
+    
+    def list_restore_points(self):
+        """列出可以恢复到的时间点（增量备份清单条目）"""
+        return [
+            {'id': e['id'], 'type': e['type'], 'created_at': e['created_at'], 'changed_tables': e['changed_tables']}
+            for e in self._load_backup_manifest()['entries']
+        ]
+    
+    def rebuild_from_incremental(self, point_in_time, output_path):
+        """根据增量备份链重建某一时间点的数据库
+        
+        Args:
+            point_in_time: 清单条目ID，或 datetime / ISO 时间字符串（取不晚于该时间的最近一次备份）
+            output_path: 重建后的数据库文件路径
+            
+        Returns:
+            dict: 使用的清单条目
+        """
+        entries = self._load_backup_manifest()['entries']
+        target = None
+        if isinstance(point_in_time, str) and any(e['id'] == point_in_time for e in entries):
+            target = next(e for e in entries if e['id'] == point_in_time)
+        else:
+            if isinstance(point_in_time, str):
+                point_in_time = datetime.fromisoformat(point_in_time)
+            for entry in entries:
+                if datetime.fromisoformat(entry['created_at']) <= point_in_time:
+                    target = entry
+        if target is None:
+            raise ValueError(f"没有找到 {point_in_time} 之前的增量备份")
+        
+        chain = [e for e in entries if e['chain'] == target['chain'] and e['id'] <= target['id']]
+        work_dir = os.path.join(self.incremental_dir, f"rebuild_{target['id']}")
+        os.makedirs(work_dir, exist_ok=True)
         try:
+            base_path = self._open_backup_file(chain[0]['file'], work_dir)
+            online_backup(base_path, output_path)
+            
+            conn = sqlite3.connect(output_path)
+            try:
+                for delta in chain[1:]:
+                    delta_path = self._open_backup_file(delta['file'], work_dir)
+                    conn.execute("ATTACH DATABASE ? AS delta", (delta_path,))
+                    conn.execute("BEGIN")
+                    # DROP TABLE 会删除 sqlite_sequence 中对应的行，先保存下来
+                    has_sequence = conn.execute(
+                        "SELECT 1 FROM main.sqlite_master WHERE name='sqlite_sequence'"
+                    ).fetchone()
+                    saved_sequence = conn.execute("SELECT name, seq FROM main.sqlite_sequence").fetchall() if has_sequence else []
+                    for table in delta['dropped_tables'] + delta['changed_tables']:
+                        if table != 'sqlite_sequence':
+                            conn.execute(f'DROP TABLE IF EXISTS main."{table}"')
+                    for table in delta['changed_tables']:
+                        if table == 'sqlite_sequence':
+                            continue
+                        table_sql = conn.execute(
+                            "SELECT sql FROM delta.sqlite_master WHERE type='table' AND name=?", (table,)
+                        ).fetchone()[0]
+                        conn.execute(table_sql)
+                        conn.execute(f'INSERT INTO main."{table}" SELECT * FROM delta."{table}"')
+                        for (ddl,) in conn.execute(
+                            "SELECT sql FROM delta.sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name=? AND sql IS NOT NULL",
+                            (table,)
+                        ).fetchall():
+                            conn.execute(ddl)
+                    if conn.execute("SELECT 1 FROM main.sqlite_master WHERE name='sqlite_sequence'").fetchone():
+                        conn.execute("DELETE FROM main.sqlite_sequence")
+                        if 'sqlite_sequence' in delta['changed_tables']:
+                            conn.execute("INSERT INTO main.sqlite_sequence SELECT * FROM delta._backup_sqlite_sequence")
+                        else:
+                            conn.executemany("INSERT INTO main.sqlite_sequence (name, seq) VALUES (?, ?)", saved_sequence)
+                    conn.commit()
+                    conn.execute("DETACH DATABASE delta")
+            finally:
+                conn.close()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        logger.info(f"已根据增量备份链重建数据库: {target['id']} ({len(chain) - 1} 个增量)")
+        return target
+    
+    def restore_database(self, backup_path=None, point_in_time=None):
+        """从备份恢复数据库
+        
+        Args:
+            backup_path: 全量备份文件路径，默认使用最新的全量备份
+            point_in_time: 增量备份条目ID或时间点，指定时从增量备份链重建
+        """
+        try:
+            if point_in_time is not None:
+                temp_restore_path = f"{self.db_path}.restore_temp"
+                entry = self.rebuild_from_incremental(point_in_time, temp_restore_path)
+                self.backup_database()
+                publish_database(temp_restore_path, self.db_path,
+                                 f"restore_{entry['id']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+                logger.info(f"数据库已恢复到增量备份时间点: {entry['id']}")
+                self._log_maintenance_action('恢复数据库', '完成', f"使用增量备份: {entry['id']}")
+                return True
+            
             # 如果没有指定备份路径，使用最新的备份
             if not backup_path:
                 backup_files = [f for f in os.listdir(self.backup_dir) 
@@ -137,20 +491,14 @@ class DBManager:
             # 备份当前数据库（防止恢复操作出错）
             current_backup = self.backup_database()
             
-            # 使用安全的替换方式
-            # 先复制到临时位置
+            # 先用在线备份API还原到临时文件，再原子替换当前数据库
             temp_restore_path = f"{self.db_path}.restore_temp"
-            shutil.copy2(backup_path, temp_restore_path)
-            
-            # 替换当前数据库
-            try:
-                os.replace(temp_restore_path, self.db_path)
-            except PermissionError:
-                # 如果出现权限错误，可能是文件正在使用中
-                # 尝试先关闭所有可能的连接
-                gc.collect()  # 尝试回收未关闭的连接
-                time.sleep(1)  # 等待1秒
-                os.replace(temp_restore_path, self.db_path)
+            online_backup(backup_path, temp_restore_path)
+            publish_database(
+                temp_restore_path,
+                self.db_path,
+                f"restore_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            )
             
             logger.info(f"数据库从备份恢复成功: {backup_path}")
             self._log_maintenance_action('恢复数据库', '完成', f'使用备份: {backup_path}')
@@ -161,7 +509,11 @@ class DBManager:
             return False
     
     def migrate_protected_tables(self, source_db, target_db):
-        """迁移保护表数据"""
+        """迁移保护表数据
+        
+        通过ATTACH源数据库执行 INSERT INTO ... SELECT，所有保护表在同一事务中复制，
+        表结构和索引取自源库 sqlite_master。
+        """
         try:
             # 确保源数据库和目标数据库都存在
             if not os.path.exists(source_db):
@@ -172,86 +524,22 @@ class DBManager:
                 logger.error(f"目标数据库不存在: {target_db}")
                 return False
             
-            # 连接数据库
-            src_conn = sqlite3.connect(source_db)
-            src_cursor = src_conn.cursor()
+            copy_results = copy_tables_attached(source_db, target_db, self.protected_tables)
             
-            target_conn = sqlite3.connect(target_db)
-            target_cursor = target_conn.cursor()
-            
-            # 对每个保护表进行迁移
             migration_results = {}
-            
-            for table in self.protected_tables:
-                try:
-                    # 检查源数据库是否存在该表
-                    src_cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table}'")
-                    if not src_cursor.fetchone():
-                        logger.warning(f"源数据库中不存在表 {table}，跳过")
-                        migration_results[table] = {'status': '警告', 'message': '源表不存在'}
-                        continue
-                    
-                    # 检查目标数据库是否存在该表
-                    target_cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table}'")
-                    if not target_cursor.fetchone():
-                        # 如果目标数据库不存在该表，则创建
-                        logger.info(f"目标数据库中不存在表 {table}，创建结构")
-                        
-                        # 获取表结构
-                        src_cursor.execute(f"SELECT sql FROM sqlite_master WHERE type='table' AND name='{table}'")
-                        create_table_sql = src_cursor.fetchone()[0]
-                        
-                        # 在目标数据库创建表
-                        target_cursor.execute(create_table_sql)
-                        target_conn.commit()
-                        
-                        # 获取表上的索引
-                        src_cursor.execute(f"SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name='{table}'")
-                        index_sql_list = src_cursor.fetchall()
-                        
-                        # 在目标数据库创建索引
-                        for index_sql in index_sql_list:
-                            if index_sql[0] and 'AUTOINDEX' not in index_sql[0]:
-                                target_cursor.execute(index_sql[0])
-                        
-                        target_conn.commit()
-                    
-                    # 获取源表中的所有数据
-                    src_cursor.execute(f"SELECT * FROM {table}")
-                    rows = src_cursor.fetchall()
-                    
-                    if not rows:
-                        logger.info(f"表 {table} 中没有数据，跳过迁移")
-                        migration_results[table] = {'status': '完成', 'message': '无数据需要迁移'}
-                        continue
-                    
-                    # 获取列名
-                    src_cursor.execute(f"PRAGMA table_info({table})")
-                    columns = [col[1] for col in src_cursor.fetchall()]
-                    
-                    # 先清空目标表数据
-                    target_cursor.execute(f"DELETE FROM {table}")
-                    
-                    # 构建插入语句
-                    placeholders = ', '.join(['?' for _ in columns])
-                    insert_sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
-                    
-                    # 批量插入数据
-                    target_cursor.executemany(insert_sql, rows)
-                    target_conn.commit()
-                    
-                    logger.info(f"表 {table} 数据迁移成功，共 {len(rows)} 条记录")
-                    migration_results[table] = {'status': '完成', 'message': f'迁移 {len(rows)} 条记录'}
-                except Exception as e:
-                    logger.error(f"迁移表 {table} 时出错: {str(e)}")
-                    migration_results[table] = {'status': '失败', 'message': str(e)}
-            
-            # 关闭连接
-            src_conn.close()
-            target_conn.close()
+            for table, result in copy_results.items():
+                if result['status'] == 'missing':
+                    migration_results[table] = {'status': '警告', 'message': '源表不存在'}
+                else:
+                    logger.info(f"表 {table} 数据迁移成功，共 {result['rows']} 条记录")
+                    migration_results[table] = {
+                        'status': '完成',
+                        'message': f"迁移 {result['rows']} 条记录",
+                        'seconds': result['seconds']
+                    }
             
             # 记录迁移结果
-            self._log_maintenance_action('迁移保护表', '完成', f'迁移结果: {json.dumps(migration_results)}')
+            self._log_maintenance_action('迁移保护表', '完成', f'迁移结果: {json.dumps(migration_results, ensure_ascii=False)}')
             
             return migration_results
         except Exception as e:
@@ -260,13 +548,10 @@ class DBManager:
             return False
     
     def replace_database(self):
-        """使用临时数据库替换当前数据库，增强的容错版本"""
-        # 先备份当前数据库
-        backup_path = self.backup_database()
-        if not backup_path:
-            logger.error("备份当前数据库失败，取消替换操作")
-            return False
+        """使用临时数据库替换当前数据库
         
+        先在线备份当前数据库，再迁移保护表，最后原子重命名发布临时数据库并更新版本指针。
+        """
         # 检查临时数据库是否存在
         if not os.path.exists(self.temp_db_path):
             logger.error(f"临时数据库不存在: {self.temp_db_path}")
@@ -278,98 +563,33 @@ class DBManager:
             logger.error("迁移保护表失败，取消替换操作")
             return False
         
-        # 尝试最多5次替换数据库
-        max_attempts = 5
-        attempt = 0
-        while attempt < max_attempts:
-            attempt += 1
-            try:
-                # 替换前确保数据库连接关闭
-                try:
-                    # 强制关闭所有可能的连接
-                    gc.collect()  # 尝试回收未关闭的连接
-                    time.sleep(1)  # 等待1秒
-                except:
-                    pass
-                
-                temp_db_copy = f"{self.temp_db_path}.copy"
-                # 先创建临时数据库的副本，以防原始副本被锁定
-                shutil.copy2(self.temp_db_path, temp_db_copy)
-                
-                if os.path.exists(self.db_path):
-                    # 使用新文件替换旧文件的方式，可能更容易绕过文件锁
-                    os.replace(temp_db_copy, self.db_path)
-                else:
-                    shutil.copy2(temp_db_copy, self.db_path)
-                
-                logger.info(f"数据库替换完成")
-                self._log_maintenance_action('替换数据库', '完成', f'使用临时数据库: {self.temp_db_path}')
-                
-                # 安排延迟删除临时文件
-                self._schedule_delayed_delete(temp_db_copy)
-                self._schedule_delayed_delete(self.temp_db_path)
-                
-                return True
-            except (IOError, PermissionError) as e:
-                error_msg = f"尝试 {attempt}/{max_attempts} 替换数据库时出现IO错误: {str(e)}"
-                logger.warning(error_msg)
-                
-                if attempt == max_attempts:
-                    logger.error(f"替换数据库失败，达到最大尝试次数: {str(e)}")
-                    logger.info("尝试恢复原始数据库...")
-                    
-                    # 尝试恢复原始数据库
-                    restore_result = self.restore_database(backup_path)
-                    if restore_result:
-                        logger.info("成功恢复到原始数据库")
-                    else:
-                        logger.error("恢复原始数据库失败")
-                    
-                    self._log_maintenance_action('替换数据库', '失败', error_message=error_msg)
-                    return False
-                
-                # 等待一段时间后重试
-                time.sleep(2 * attempt)  # 递增等待时间
-            except Exception as e:
-                error_msg = f"替换数据库时出现未知错误: {str(e)}"
-                logger.error(error_msg)
-                self._log_maintenance_action('替换数据库', '失败', error_message=error_msg)
-                
-                # 尝试恢复原始数据库
-                logger.info("尝试恢复原始数据库...")
-                restore_result = self.restore_database(backup_path)
-                if restore_result:
-                    logger.info("成功恢复到原始数据库")
-                else:
-                    logger.error("恢复原始数据库失败")
-                
-                return False
-    
-    def _schedule_delayed_delete(self, file_path):
-        """安排延迟删除文件，避免文件锁定问题"""
-        self._pending_delete_files.append(file_path)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        backup_path = os.path.join(self.backup_dir, f"forum_data_backup_{timestamp}.db")
         
-        # 如果清理线程不存在或已经结束，创建新线程
-        if not self._cleaner_thread or not self._cleaner_thread.is_alive():
-            self._cleaner_thread = threading.Thread(target=self._delayed_delete_worker)
-            self._cleaner_thread.daemon = True
-            self._cleaner_thread.start()
-    
-    def _delayed_delete_worker(self):
-        """执行延迟删除任务的工作线程"""
-        # 等待一段时间，确保文件不再被使用
-        time.sleep(10)
+        try:
+            report = publish_database(
+                self.temp_db_path,
+                self.db_path,
+                timestamp,
+                backup_path=backup_path if os.path.exists(self.db_path) else None
+            )
+        except Exception as e:
+            error_msg = f"替换数据库时出错: {str(e)}"
+            logger.error(error_msg)
+            self._log_maintenance_action('替换数据库', '失败', error_message=error_msg)
+            return False
         
-        files_to_delete = self._pending_delete_files.copy()
-        self._pending_delete_files.clear()
+        logger.info("数据库替换完成")
+        self._log_maintenance_action('替换数据库', '完成', json.dumps({
+            'temp_db_path': self.temp_db_path,
+            'backup_path': backup_path if report['backup'] else None,
+            'backup_seconds': report['backup']['seconds'] if report['backup'] else 0,
+            'swap_seconds': report['swap_seconds'],
+            'reader_stall': report.get('reader_stall')
+        }, ensure_ascii=False))
         
-        for file_path in files_to_delete:
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    logger.info(f"延迟删除文件成功: {file_path}")
-            except Exception as e:
-                logger.warning(f"延迟删除文件失败: {file_path}, 错误: {str(e)}")
+        self._cleanup_old_backups()
+        return True
     
     def _log_maintenance_action(self, operation_type, status, details=None, error_message=None):
         """记录维护操作到数据库日志表"""
@@ -10,6 +10,7 @@ import sys
 import logging
 import sqlite3
 import time
+import shutil
 import argparse
 from pathlib import Path
 from db_manager import DBManager
@@ -29,7 +30,7 @@ def parse_args():
     """解析命令行参数"""
     parser = argparse.ArgumentParser(description='容错机制测试工具')
     parser.add_argument('--test-case', type=str, default='all', 
-                      choices=['all', 'backup', 'restore', 'migrate', 'replace', 'integrity'],
+                      choices=['all', 'backup', 'restore', 'incremental', 'migrate', 'replace', 'integrity'],
                       help='要执行的测试用例')
     parser.add_argument('--setup-only', action='store_true', help='仅设置测试环境，不执行测试')
     return parser.parse_args()
@@ -43,6 +44,13 @@ def setup_test_environment():
     test_temp_db_path = os.path.join(project_root, "db/test_temp_forum_data.db")
     test_backup_dir = os.path.join(project_root, "db/test_backups")
     
+    # 清除上一次运行留下的测试数据库和备份，每次都从相同的数据开始
+    for path in (test_db_path, test_temp_db_path):
+        for suffix in ('', '-wal', '-shm', '.version'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    shutil.rmtree(test_backup_dir, ignore_errors=True)
+    
     # 确保目录存在
     os.makedirs(os.path.dirname(test_db_path), exist_ok=True)
     os.makedirs(test_backup_dir, exist_ok=True)
@@ -187,7 +195,7 @@ def test_restore(db_manager):
             return False
         
         # 修改当前数据库
-        conn = sqlite3.connect(db_manager.db_path)
+        conn = sqlite3.connect(db_manager.live_db_path)
         cursor = conn.cursor()
         
         # 删除一些数据
@@ -204,7 +212,7 @@ def test_restore(db_manager):
             return False
         
         # 验证恢复后的数据
-        conn = sqlite3.connect(db_manager.db_path)
+        conn = sqlite3.connect(db_manager.live_db_path)
         cursor = conn.cursor()
         
         cursor.execute("SELECT COUNT(*) FROM test_data")
@@ -230,6 +238,84 @@ def test_restore(db_manager):
         logger.error(f"恢复测试时出错：{str(e)}")
         return False
 
+def test_incremental_backup(db_manager):
+    """测试增量备份及按时间点恢复功能"""
+    logger.info("开始测试增量备份功能")
+    
+    try:
+        # 第一次增量备份会生成全量基准
+        base_entry = db_manager.backup_database(mode='incremental')
+        if not base_entry or base_entry['type'] != 'base':
+            logger.error(f"增量备份测试失败：第一次备份应为全量基准 {base_entry}")
+            return False
+        
+        conn = sqlite3.connect(db_manager.live_db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM test_data")
+        count_at_base = cursor.fetchone()[0]
+        cursor.execute("INSERT INTO test_data (name, value) VALUES ('incremental1', 'delta1')")
+        conn.commit()
+        conn.close()
+        
+        # 第二次只应包含变化的表
+        delta_entry = db_manager.backup_database(mode='incremental')
+        if not delta_entry or delta_entry['type'] != 'delta':
+            logger.error(f"增量备份测试失败：第二次备份应为增量 {delta_entry}")
+            return False
+        if 'test_data' not in delta_entry['changed_tables'] or 'user_data' in delta_entry['changed_tables']:
+            logger.error(f"增量备份测试失败：变化的表不正确 {delta_entry['changed_tables']}")
+            return False
+        
+        # 第三次使用压缩存储
+        conn = sqlite3.connect(db_manager.live_db_path)
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM test_data")
+        conn.commit()
+        conn.close()
+        
+        compressed_entry = db_manager.backup_database(mode='incremental', compress=True)
+        if not compressed_entry or not compressed_entry['file'].endswith('.gz'):
+            logger.error(f"增量备份测试失败：压缩备份未生成 {compressed_entry}")
+            return False
+        
+        # 恢复到第二次备份的时间点
+        if not db_manager.restore_database(point_in_time=delta_entry['id']):
+            logger.error("增量备份测试失败：按时间点恢复返回失败")
+            return False
+        
+        conn = sqlite3.connect(db_manager.live_db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM test_data")
+        count = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM test_data WHERE name='incremental1'")
+        restored = cursor.fetchone()[0]
+        conn.close()
+        
+        if count != count_at_base + 1 or restored != 1:
+            logger.error(f"增量恢复验证失败：test_data表应有{count_at_base + 1}条记录，实际有{count}条")
+            return False
+        
+        # 恢复到最新时间点（经过压缩的增量）
+        if not db_manager.restore_database(point_in_time=compressed_entry['id']):
+            logger.error("增量备份测试失败：从压缩增量恢复返回失败")
+            return False
+        
+        conn = sqlite3.connect(db_manager.live_db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM test_data")
+        count = cursor.fetchone()[0]
+        conn.close()
+        
+        if count != 0:
+            logger.error(f"增量恢复验证失败：test_data表应为空，实际有{count}条")
+            return False
+        
+        logger.info("增量备份测试成功")
+        return True
+    except Exception as e:
+        logger.error(f"增量备份测试时出错：{str(e)}")
+        return False
+
 def test_migrate_protected_tables(db_manager):
     """测试保护表迁移功能"""
     logger.info("开始测试保护表迁移功能")
@@ -241,7 +327,7 @@ def test_migrate_protected_tables(db_manager):
             return False
         
         # 向主数据库的保护表添加一些数据
-        conn = sqlite3.connect(db_manager.db_path)
+        conn = sqlite3.connect(db_manager.live_db_path)
         cursor = conn.cursor()
         
         # 添加一些词云缓存数据
@@ -255,7 +341,7 @@ def test_migrate_protected_tables(db_manager):
         conn.close()
         
         # 执行迁移
-        migration_result = db_manager.migrate_protected_tables(db_manager.db_path, db_manager.temp_db_path)
+        migration_result = db_manager.migrate_protected_tables(db_manager.live_db_path, db_manager.temp_db_path)
         
         if not migration_result:
             logger.error("迁移测试失败：迁移操作返回失败")
@@ -320,7 +406,7 @@ def test_replace_database(db_manager):
             return False
         
         # 验证替换后的数据库
-        conn = sqlite3.connect(db_manager.db_path)
+        conn = sqlite3.connect(db_manager.live_db_path)
         cursor = conn.cursor()
         
         # 检查常规表数据是否已替换
@@ -375,7 +461,7 @@ def test_database_integrity(db_manager):
             return False
         
         # 故意破坏数据库完整性进行测试
-        conn = sqlite3.connect(db_manager.db_path)
+        conn = sqlite3.connect(db_manager.live_db_path)
         cursor = conn.cursor()
         
         # 删除一个保护表
@@ -415,6 +501,7 @@ def run_all_tests():
     
     results['backup'] = test_backup(db_manager)
     results['restore'] = test_restore(db_manager)
+    results['incremental'] = test_incremental_backup(db_manager)
     results['migrate'] = test_migrate_protected_tables(db_manager)
     results['replace'] = test_replace_database(db_manager)
     results['integrity'] = test_database_integrity(db_manager)
@@ -460,6 +547,8 @@ def main():
         success = test_backup(db_manager)
     elif args.test_case == 'restore':
         success = test_restore(db_manager)
+    elif args.test_case == 'incremental':
+        success = test_incremental_backup(db_manager)
     elif args.test_case == 'migrate':
         success = test_migrate_protected_tables(db_manager)
     elif args.test_case == 'replace':
@@ -0,0 +1,110 @@
+"""
+生产环境启动脚本
+
+- Linux/macOS: gunicorn 多进程 x 多线程（gthread），preload_app 在主进程中加载应用并初始化数据库一次，
+  工作进程由主进程fork，异常退出时自动重启
+- Windows: gunicorn 不可用，使用 waitress 单进程多线程
+
+用法: python serve.py [--host 0.0.0.0] [--port 5000] [--workers 4] [--threads 8] [--server auto]
+环境变量: API_HOST, API_PORT, API_WORKERS, API_THREADS, API_TIMEOUT, LOG_LEVEL, DATABASE_PATH
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+# 设置日志
+logger = logging.getLogger("serve")
+
+
+def default_workers() -> int:
+    """默认工作进程数: CPU核数（SQLite读为主，进程数再多收益不大）"""
+    return max(os.cpu_count() or 1, 1)
+
+
+def run_gunicorn(app, args):
+    """用 gunicorn 运行（应用已在主进程中加载，等同于 --preload）"""
+    from gunicorn.app.base import BaseApplication
+
+    class GunicornServer(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    options = {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': args.timeout,
+        'graceful_timeout': args.timeout,
+        'keepalive': 5,
+        'accesslog': '-' if args.access_log else None,
+        'loglevel': os.environ.get('LOG_LEVEL', 'info').lower(),
+    }
+    logger.info(f"gunicorn 启动: {options['bind']}, {args.workers} 个进程 x {args.threads} 个线程")
+    GunicornServer(app, options).run()
+
+
+def run_waitress(app, args):
+    """用 waitress 运行（Windows，单进程多线程）"""
+    from waitress import serve
+
+    threads = args.workers * args.threads
+    logger.info(f"waitress 启动: {args.host}:{args.port}, {threads} 个线程")
+    serve(app, host=args.host, port=args.port, threads=threads, channel_timeout=args.timeout)
+
+
+def choose_server(name: str) -> str:
+    if name != 'auto':
+        return name
+    if sys.platform == 'win32':
+        return 'waitress'
+    try:
+        import gunicorn  # noqa: F401
+        return 'gunicorn'
+    except ImportError:
+        return 'waitress'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生产环境启动API服务')
+    parser.add_argument('--host', default=os.environ.get('API_HOST', '0.0.0.0'), help='监听地址')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('API_PORT', 5000)), help='监听端口')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('API_WORKERS', default_workers())),
+                        help='工作进程数（waitress 下与线程数相乘作为总线程数）')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('API_THREADS', 8)),
+                        help='每个进程的线程数')
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('API_TIMEOUT', 60)),
+                        help='请求超时秒数')
+    parser.add_argument('--server', choices=['auto', 'gunicorn', 'waitress'], default='auto',
+                        help='服务器: auto 在 Windows 上用 waitress，其余用 gunicorn')
+    parser.add_argument('--access-log', action='store_true', help='输出访问日志')
+    parser.add_argument('--db-path', default=None, help='数据库文件路径（默认 DATABASE_PATH 或 backend/db/forum_data.db）')
+    args = parser.parse_args()
+
+    if args.db_path:
+        os.environ['DATABASE_PATH'] = args.db_path
+
+    # 在主进程中完成日志配置、应用加载和数据库初始化，工作进程不再重复
+    from wsgi import app
+
+    server = choose_server(args.server)
+    if server == 'gunicorn':
+        run_gunicorn(app, args)
+    else:
+        run_waitress(app, args)
+
+
+if __name__ == '__main__':
+    main()
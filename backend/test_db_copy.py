@@ -0,0 +1,96 @@
+"""
+分批复制（db_copy.copy_table_keyset）测试
+
+thread_follow 的主键是自增 id，thread_id 另有唯一索引。目标库中同一帖子的行 id 不同时（例如目标库
+重新关注过），按主键 upsert 会违反 thread_id 唯一约束；检查这种情况下复制成功且结果与源表相同。
+
+用法: python -m pytest backend/test_db_copy.py  或  python test_db_copy.py
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from modules.db_copy import copy_table_keyset
+
+THREAD_FOLLOW_DDL = """
+    CREATE TABLE thread_follow (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        thread_id TEXT NOT NULL,
+        url TEXT NOT NULL,
+        follow_status TEXT
+    )
+"""
+UNIQUE_INDEX_DDL = "CREATE UNIQUE INDEX idx_thread_follow_thread_id_unique ON thread_follow(thread_id)"
+
+
+def _create_source(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(THREAD_FOLLOW_DDL)
+    conn.execute(UNIQUE_INDEX_DDL)
+    conn.executemany("INSERT INTO thread_follow (thread_id, url, follow_status) VALUES (?, ?, 'followed')",
+                     [(str(thread_id), f"t_{thread_id}") for thread_id in rows])
+    conn.commit()
+    conn.close()
+
+
+def _rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT id, thread_id, url, follow_status FROM thread_follow ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_copy_with_secondary_unique_conflict():
+    """目标行 id 与源表不同但 thread_id 相同: 用源表的行替换，不抛出唯一约束错误"""
+    workdir = tempfile.mkdtemp(prefix='db_copy_')
+    try:
+        source = os.path.join(workdir, 'source.db')
+        target = os.path.join(workdir, 'target.db')
+        _create_source(source, range(1, 8))
+
+        result = copy_table_keyset(source, target, 'thread_follow', batch_size=3)
+        assert result['rows'] == 7 and result['conflicts'] == 0
+        assert _rows(target) == _rows(source)
+
+        # 目标库中把一行的 id 改掉，再次复制
+        conn = sqlite3.connect(target)
+        conn.execute("UPDATE thread_follow SET id = 100, follow_status = 'my_thread' WHERE thread_id = '2'")
+        conn.commit()
+        conn.close()
+
+        result = copy_table_keyset(source, target, 'thread_follow', batch_size=3)
+        assert result['status'] == 'copied'
+        assert result['conflicts'] == 1
+        assert _rows(target) == _rows(source)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_copy_before_unique_index_exists():
+    """目标表还没有唯一索引时也按源表的唯一键清理，复制完成后补建唯一索引不会失败"""
+    workdir = tempfile.mkdtemp(prefix='db_copy_')
+    try:
+        source = os.path.join(workdir, 'source.db')
+        target = os.path.join(workdir, 'target.db')
+        _create_source(source, range(1, 5))
+
+        conn = sqlite3.connect(target)
+        conn.execute(THREAD_FOLLOW_DDL)
+        conn.execute("INSERT INTO thread_follow (id, thread_id, url) VALUES (50, '3', 't_3')")
+        conn.commit()
+        conn.close()
+
+        result = copy_table_keyset(source, target, 'thread_follow')
+        assert result['conflicts'] == 1
+        assert _rows(target) == _rows(source)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test_copy_with_secondary_unique_conflict()
+    test_copy_before_unique_index_exists()
+    print("测试通过")
@@ -0,0 +1,119 @@
+"""
+帖子关注批量接口测试
+
+使用 init_db 建立的 thread_follow 表（url 为 NOT NULL），并像服务启动时一样执行 bootstrap 迁移，检查 post_ranking 中不存在的帖子也能关注，
+并且同一批中的已知帖子不受影响。
+
+用法: python -m pytest backend/test_thread_follows.py  或  python test_thread_follows.py
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from modules.bootstrap import bootstrap_database
+from modules.db_utils import get_db_connection
+from modules.follows import follow_threads, list_follows, migrate_thread_follow, unfollow_threads
+from modules.thread_ids import thread_url
+
+KNOWN_ID = 2871467
+UNKNOWN_ID = 9999991
+
+
+def _create_database(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE post_ranking (
+            thread_id TEXT, url TEXT, title TEXT, author TEXT, author_link TEXT,
+            repost_count INTEGER, reply_count INTEGER, delete_reply_count INTEGER,
+            daysold INTEGER, last_active INTEGER
+        )
+    """)
+    conn.execute("INSERT INTO post_ranking VALUES (?, ?, ?, ?, ?, 3, 5, 0, 10, 1)",
+                 (str(KNOWN_ID), thread_url(KNOWN_ID), '已知帖子', '作者', 'https://www.chineseinla.com/user/id_1.html'))
+    conn.commit()
+    conn.close()
+    # 建表并回填 thread_key（接口请求不会执行迁移）
+    assert bootstrap_database(db_path)
+
+
+def test_follow_unknown_thread_id():
+    """post_ranking 中没有的帖子: 用thread_id生成URL，整批不回滚"""
+    workdir = tempfile.mkdtemp(prefix='thread_follows_')
+    previous = os.environ.get('DATABASE_PATH')
+    try:
+        db_path = os.path.join(workdir, 'forum_data.db')
+        _create_database(db_path)
+
+        conn = get_db_connection(db_path)
+        try:
+            result = follow_threads(conn, [KNOWN_ID, f"t_{UNKNOWN_ID}"], 'followed')
+            assert result['requested'] == 2
+            assert result['affected_rows'] == 2
+            assert result['invalid'] == []
+
+            follows = {row['thread_id']: row for row in list_follows(conn, 'followed')}
+            assert set(follows) == {str(KNOWN_ID), str(UNKNOWN_ID)}
+            assert follows[str(KNOWN_ID)]['title'] == '已知帖子'
+            assert follows[str(KNOWN_ID)]['repost_count'] == 3
+            assert follows[str(UNKNOWN_ID)]['url'] == thread_url(UNKNOWN_ID)
+            assert follows[str(UNKNOWN_ID)]['title'] is None
+
+            # 重复关注只更新状态
+            result = follow_threads(conn, [UNKNOWN_ID], 'my_thread')
+            assert result['affected_rows'] == 1
+            assert [row['thread_id'] for row in list_follows(conn, 'my_thread')] == [str(UNKNOWN_ID)]
+
+            result = unfollow_threads(conn, [UNKNOWN_ID], 'my_thread')
+            assert result['affected_rows'] == 1
+        finally:
+            conn.close()
+    finally:
+        if previous is None:
+            os.environ.pop('DATABASE_PATH', None)
+        else:
+            os.environ['DATABASE_PATH'] = previous
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_migrate_duplicate_follows():
+    """旧关注表中同一帖子有多种写法: 迁移先备份整表，只保留最近更新的一条，之后才能批量关注"""
+    workdir = tempfile.mkdtemp(prefix='thread_follows_')
+    try:
+        db_path = os.path.join(workdir, 'forum_data.db')
+        backup_dir = os.path.join(workdir, 'backups')
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE thread_follow (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, thread_id TEXT NOT NULL, url TEXT NOT NULL,
+                title TEXT, follow_status TEXT, created_at TEXT NOT NULL, updated_at TEXT NOT NULL
+            )
+        """)
+        conn.executemany(
+            "INSERT INTO thread_follow (thread_id, url, title, follow_status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [(str(KNOWN_ID), thread_url(KNOWN_ID), '旧记录', 'followed', '2024-01-01', '2024-01-01'),
+             (f"t_{KNOWN_ID}", thread_url(KNOWN_ID), '新记录', 'my_thread', '2024-01-02', '2024-01-02'),
+             (str(UNKNOWN_ID), thread_url(UNKNOWN_ID), None, 'followed', '2024-01-01', '2024-01-01')]
+        )
+        conn.commit()
+
+        result = migrate_thread_follow(conn, backup_dir=backup_dir)
+        assert result['normalized'] == 1 and result['deleted'] == 1
+        with open(result['backup'], encoding='utf-8') as f:
+            assert len(json.load(f)) == 3
+        rows = conn.execute("SELECT thread_id, title FROM thread_follow ORDER BY thread_id").fetchall()
+        assert rows == [(str(KNOWN_ID), '新记录'), (str(UNKNOWN_ID), None)]
+
+        # 已迁移的表再次执行不做任何修改
+        assert migrate_thread_follow(conn, backup_dir=backup_dir) == {'normalized': 0, 'deleted': 0, 'backup': None}
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test_follow_unknown_thread_id()
+    test_migrate_duplicate_follows()
+    print("测试通过")
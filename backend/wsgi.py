@@ -0,0 +1,16 @@
+"""
+WSGI入口: 配置日志、初始化数据库结构后导出 app
+
+例如: gunicorn --preload -w 4 --threads 8 -k gthread -b 0.0.0.0:5000 wsgi:app
+（使用 --preload 时初始化只在主进程中执行一次；一般直接运行 serve.py 即可）
+"""
+
+from modules.bootstrap import configure_logging, bootstrap_database
+
+configure_logging()
+
+from app import app  # noqa: E402
+
+bootstrap_database()
+
+application = app
@@ -3,6 +3,10 @@ import pandas as pd
 import os
 from datetime import datetime
 import traceback
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from modules.partitions import history_source
 
 def safe_cast(val, to_type, default=None):
     try:
@@ -133,8 +137,9 @@ class DatabaseChecker:
                 'scraping_time': {'earliest': earliest_scrape, 'latest': latest_scrape}
             }
             
-            # list表时间范围
-            self.cursor.execute('SELECT MIN(list_time), MAX(list_time), MIN(scraping_time), MAX(scraping_time) FROM list')
+            # list表时间范围（全部历史，包括已移到月分区的行）
+            source = history_source(self.conn, 'list')
+            self.cursor.execute(f'SELECT MIN(list_time), MAX(list_time), MIN(scraping_time), MAX(scraping_time) FROM {source}')
             earliest_list, latest_list, earliest_scrape, latest_scrape = self.cursor.fetchone()
             time_ranges['list'] = {
                 'list_time': {'earliest': earliest_list, 'latest': latest_list},
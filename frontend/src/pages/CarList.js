@@ -29,21 +29,28 @@ const CarListPage = () => {
   const [tradeTypeFilter, setTradeTypeFilter] = useState('all');
   const [isSearchFocused, setIsSearchFocused] = useState(false);
   const [sortField, setSortField] = useState('post_time');
-  const [sortOrder, setSortOrder] = useState('asc');
+  const [sortOrder, setSortOrder] = useState('desc');
+  const [searchQuery, setSearchQuery] = useState('');
+  const [tradeTypes, setTradeTypes] = useState([]);
+  const [pagination, setPagination] = useState({ current: 1, pageSize: 20 });
 
-  // 获取汽车数据
+  // 获取汽车数据（服务端分页、搜索和筛选）
   const fetchCars = async () => {
     setLoading(true);
     try {
       const response = await axios.get(`${API_BASE_URL}/cars`, { 
         params: { 
-          limit: 5000, // 增加数据获取上限，足够获取所有数据
+          page: pagination.current,
+          limit: pagination.pageSize,
+          q: searchQuery || undefined,
+          trade_type: tradeTypeFilter !== 'all' ? tradeTypeFilter : undefined,
           sort_field: sortField,
           sort_order: sortOrder
         } 
       });
       
       const carData = response.data.data || [];
+      const meta = response.data.meta || {};
       
       // 处理未知数据
       const processedData = carData.map(car => ({
@@ -52,7 +59,9 @@ const CarListPage = () => {
       }));
       
       setCars(processedData);
-      filterCars(processedData, searchText, tradeTypeFilter);
+      setFilteredCars(processedData);
+      setTotal(meta.total || 0);
+      setTradeTypes(meta.trade_types || []);
     } catch (err) {
       console.error('获取汽车数据失败:', err);
       // 出错时显示空数据
@@ -67,31 +76,7 @@ const CarListPage = () => {
   // 初始加载数据
   useEffect(() => {
     fetchCars();
-  }, [sortField, sortOrder]);
-
-  // 筛选数据的通用函数
-  const filterCars = (data, text, tradeType) => {
-    let filtered = [...data];
-    
-    // 搜索过滤
-    if (text) {
-      const searchValue = text.toLowerCase();
-      filtered = filtered.filter(car => 
-        (car.year && car.year.toString().toLowerCase().includes(searchValue)) ||
-        (car.make && car.make.toLowerCase().includes(searchValue)) ||
-        (car.model && car.model.toLowerCase().includes(searchValue)) ||
-        (car.title && car.title.toLowerCase().includes(searchValue))
-      );
-    }
-    
-    // 交易类型过滤
-    if (tradeType !== 'all') {
-      filtered = filtered.filter(car => car.trade_type === tradeType);
-    }
-    
-    setFilteredCars(filtered);
-    setTotal(filtered.length);
-  };
+  }, [sortField, sortOrder, searchQuery, tradeTypeFilter, pagination.current, pagination.pageSize]);
 
   // 计算距离现在的天数
   const getDaysFromNow = (dateStr) => {
@@ -106,20 +91,22 @@ const CarListPage = () => {
   // 搜索处理
   const handleSearch = (value) => {
     setSearchText(value);
-    filterCars(cars, value, tradeTypeFilter);
+    setSearchQuery(value.trim());
+    setPagination(prev => ({ ...prev, current: 1 }));
   };
 
   // 清除搜索
   const handleClearSearch = () => {
     setSearchText('');
-    filterCars(cars, '', tradeTypeFilter);
+    setSearchQuery('');
+    setPagination(prev => ({ ...prev, current: 1 }));
   };
   
   // 交易类型筛选处理
   const handleTradeTypeChange = (e) => {
     const value = e.target.value;
     setTradeTypeFilter(value);
-    filterCars(cars, searchText, value);
+    setPagination(prev => ({ ...prev, current: 1 }));
   };
   
   // 处理排序变化
@@ -129,21 +116,26 @@ const CarListPage = () => {
     setSortOrder(newOrder);
   };
 
-  // 获取所有唯一的交易类型
-  const getUniqueTradeTypes = () => {
-    const types = new Set(cars.map(car => car.trade_type).filter(type => type));
-    return Array.from(types);
-  };
+  // 获取所有交易类型（来自服务端分面列表）
+  const getUniqueTradeTypes = () => tradeTypes;
 
   // 修复表格的onChange处理
-  const handleTableChange = (pagination, filters, sorter) => {
-    if (sorter && sorter.field) {
-      const field = sorter.field === 'post_time' ? 'post_time' : 
-                    sorter.field === 'scraping_time_R' ? 'scraping_time_R' : 
-                    sorter.field;
-      setSortField(field);
-      setSortOrder(sorter.order === 'ascend' ? 'asc' : 'desc');
+  const handleTableChange = (newPagination, filters, sorter) => {
+    const tradeType = filters && filters.trade_type && filters.trade_type.length ? filters.trade_type[0] : 'all';
+    if (tradeType !== tradeTypeFilter) {
+      setTradeTypeFilter(tradeType);
     }
+    if (sorter && sorter.field && sorter.order) {
+      // 帖龄和活跃按天数显示，天数升序即时间降序
+      const isDaysColumn = sorter.field === 'post_time' || sorter.field === 'scraping_time_R';
+      const ascending = sorter.order === 'ascend';
+      setSortField(sorter.field);
+      setSortOrder(ascending !== isDaysColumn ? 'asc' : 'desc');
+    }
+    setPagination({
+      current: tradeType !== tradeTypeFilter ? 1 : newPagination.current,
+      pageSize: newPagination.pageSize
+    });
   };
 
   // 表格列定义
@@ -152,11 +144,7 @@ const CarListPage = () => {
       title: '年份',
       dataIndex: 'year',
       key: 'year',
-      sorter: (a, b) => {
-        const yearA = parseInt(a.year) || 0;
-        const yearB = parseInt(b.year) || 0;
-        return yearA - yearB;
-      },
+      sorter: true,
       render: (text) => text && text !== '-' ? text : '-',
     },
     {
@@ -195,7 +183,7 @@ const CarListPage = () => {
         return <Tag color={tradeTypeColors[text] || 'blue'}>{text}</Tag>;
       },
       filters: getUniqueTradeTypes().map(type => ({ text: type, value: type })),
-      onFilter: (value, record) => record.trade_type === value,
+      filterMultiple: false,
     },
     {
       title: '地点',
@@ -241,12 +229,7 @@ const CarListPage = () => {
         const days = getDaysFromNow(text);
         return days !== '-' ? `${days}天` : '-';
       },
-      sorter: (a, b) => {
-        const daysA = getDaysFromNow(a.post_time);
-        const daysB = getDaysFromNow(b.post_time);
-        if (daysA === '-' || daysB === '-') return 0;
-        return daysA - daysB;
-      },
+      sorter: true,
       defaultSortOrder: 'ascend',
     },
     {
@@ -257,12 +240,7 @@ const CarListPage = () => {
         const days = getDaysFromNow(text);
         return days !== '-' ? `${days}天前` : '-';
       },
-      sorter: (a, b) => {
-        const daysA = getDaysFromNow(a.scraping_time_R);
-        const daysB = getDaysFromNow(b.scraping_time_R);
-        if (daysA === '-' || daysB === '-') return 0;
-        return daysA - daysB;
-      },
+      sorter: true,
     },
   ];
 
@@ -374,7 +352,9 @@ const CarListPage = () => {
           rowKey="id"
           loading={loading}
           pagination={{ 
-            pageSize: 20, 
+            current: pagination.current,
+            pageSize: pagination.pageSize,
+            total: total,
             showSizeChanger: true, 
             pageSizeOptions: ['10', '20', '50', '100', '200', '500', '1000'],
             showTotal: (total) => `共 ${total} 条记录`,
@@ -1,128 +1,250 @@
+"""
+生成 import 表中的统计数据（更新统计、浏览统计、作者排名）
+
+默认增量执行: 只处理 scraping_time 晚于上次处理位置（保存在 data_meta 表）的新快照，
+只重新计算这些快照涉及的日期（浏览增量依赖前一天的数据，帖子下一个有数据的日期也一并重新计算）。
+所有结果用 INSERT ... SELECT 在一个事务中写入，失败时整体回滚，处理位置不变。
+从 list_all 视图读取全部历史（list 可能已按月分区，见 backend/modules/partitions.py）。
+
+用法: python generate_statistics.py [--db-path backend/db/forum_data.db] [--full]
+  --full  清空三类统计后全部重新计算（用于补数据或修改统计口径后）
+"""
+
+import argparse
+import os
 import sqlite3
-from datetime import datetime, timedelta
-import pandas as pd
+import sys
+import time
 
-def generate_statistics():
-    conn = sqlite3.connect('backend/db/forum_data.db')
-    cursor = conn.cursor()
-    
-    # 清空import表中的统计数据
-    cursor.execute("""
-        DELETE FROM import 
-        WHERE data_category IN ('update_statistics', 'view_statistics', 'author_ranking')
-    """)
-    
-    # 生成更新统计数据
-    cursor.execute("""
-        WITH daily_stats AS (
-            SELECT 
-                DATE(list_time) as date,
-                update_reason,
-                COUNT(*) as count
-            FROM list
-            WHERE list_time IS NOT NULL
-                AND update_reason IS NOT NULL
-                AND update_reason IN ('重发', '回帖', '删回帖')
-            GROUP BY DATE(list_time), update_reason
-            ORDER BY date
-        )
-        SELECT * FROM daily_stats
-    """)
-    update_stats = cursor.fetchall()
-    
-    # 插入更新统计数据
-    for stat in update_stats:
-        date, update_type, count = stat
-        date_str = f"{date}T00:00:00"
-        
-        # 插入更新统计
-        cursor.execute("""
-            INSERT INTO import (type, datetime, count, data_category)
-            VALUES (?, ?, ?, ?)
-        """, (update_type, date_str, count, 'update_statistics'))
-    
-    # 生成浏览统计数据
-    cursor.execute("""
-        WITH daily_views AS (
-            SELECT 
-                DATE(list_time) as date,
-                url,
-                MAX(read_count) as max_views
-            FROM list
-            WHERE list_time IS NOT NULL
-            GROUP BY DATE(list_time), url
-        ),
-        prev_day_views AS (
-            SELECT 
-                date,
-                url,
-                max_views,
-                LAG(max_views) OVER (PARTITION BY url ORDER BY date) as prev_views
-            FROM daily_views
-        )
-        SELECT 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from modules.data_meta import get_meta, set_meta
+from modules.partitions import history_source, partition_names
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'db', 'forum_data.db')
+
+# data_meta 中保存已处理到的 list.scraping_time
+STATISTICS_HIGH_WATER_KEY = 'statistics_scraping_time'
+
+# 作者排名保留的作者数
+AUTHOR_RANK_LIMIT = 100
+
+# 按日期重新计算用到的索引（list 已分区时在原表和每个月分区上分别建立）
+STATISTICS_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_{table}_scraping_time ON {table}(scraping_time)",
+    "CREATE INDEX IF NOT EXISTS idx_{table}_list_date ON {table}(DATE(list_time))",
+    "CREATE INDEX IF NOT EXISTS idx_{table}_url_list_time ON {table}(url, list_time)",
+]
+
+# 更新统计: 每天各更新原因的次数
+UPDATE_STATISTICS_SQL = """
+    INSERT INTO import (type, datetime, count, data_category)
+    SELECT update_reason, DATE(list_time) || 'T00:00:00', COUNT(*), 'update_statistics'
+    FROM {source}
+    WHERE list_time IS NOT NULL
+        AND update_reason IN ('重发', '回帖', '删回帖')
+        {date_filter}
+    GROUP BY DATE(list_time), update_reason
+"""
+
+# 浏览统计: 每天的总浏览量和较该帖子上一个有数据日期的增量
+VIEW_STATISTICS_SQL = """
+    WITH daily_views AS (
+        SELECT
+            DATE(list_time) as date,
+            url,
+            MAX(read_count) as max_views
+        FROM {source}
+        WHERE list_time IS NOT NULL
+            {url_filter}
+        GROUP BY DATE(list_time), url
+    ),
+    prev_day_views AS (
+        SELECT
+            date,
+            url,
+            max_views,
+            LAG(max_views) OVER (PARTITION BY url ORDER BY date) as prev_views
+        FROM daily_views
+    ),
+    view_stats AS (
+        SELECT
             date,
             SUM(max_views) as total_views,
-            SUM(CASE 
-                WHEN prev_views IS NULL THEN max_views 
-                ELSE max_views - prev_views 
+            SUM(CASE
+                WHEN prev_views IS NULL THEN max_views
+                ELSE max_views - prev_views
             END) as view_increase
         FROM prev_day_views
+        WHERE 1 = 1 {date_filter}
         GROUP BY date
-        ORDER BY date
-    """)
-    view_stats = cursor.fetchall()
-    
-    # 插入浏览统计数据
-    for stat in view_stats:
-        date, total_views, view_increase = stat
-        date_str = f"{date}T00:00:00"
-        
-        # 插入总浏览量
-        cursor.execute("""
-            INSERT INTO import (type, datetime, count, data_category)
-            VALUES (?, ?, ?, ?)
-        """, ('total_view', date_str, total_views, 'view_statistics'))
-        
-        # 插入浏览增量
-        cursor.execute("""
-            INSERT INTO import (type, datetime, count, data_category)
-            VALUES (?, ?, ?, ?)
-        """, ('view', date_str, view_increase, 'view_statistics'))
-    
-    # 生成作者排名数据
-    cursor.execute("""
-        WITH author_stats AS (
-            SELECT 
-                author,
-                COUNT(*) as total_posts,
-                SUM(reply_count) as total_replies,
-                SUM(read_count) as total_views
-            FROM list
-            WHERE author IS NOT NULL
-            GROUP BY author
-        )
-        SELECT * FROM author_stats
+    )
+    INSERT INTO import (type, datetime, count, data_category)
+    SELECT 'total_view', date || 'T00:00:00', total_views, 'view_statistics' FROM view_stats
+    UNION ALL
+    SELECT 'view', date || 'T00:00:00', view_increase, 'view_statistics' FROM view_stats
+"""
+
+# 作者排名: 全表前100名（没有按日期的分桶，有新快照时整体重新计算）
+AUTHOR_RANKING_SQL = f"""
+    INSERT INTO import (type, datetime, author, total_posts, reply_count, view_count, data_category)
+    SELECT 'author_rank', STRFTIME('%Y-%m-%dT%H:%M:%S', 'now', 'localtime'), author, total_posts, total_replies,
+           total_views, 'author_ranking'
+    FROM (
+        SELECT
+            author,
+            COUNT(*) as total_posts,
+            SUM(reply_count) as total_replies,
+            SUM(read_count) as total_views
+        FROM {{source}}
+        WHERE author IS NOT NULL
+        GROUP BY author
         ORDER BY total_posts DESC, total_replies DESC, total_views DESC
-        LIMIT 100
+        LIMIT {AUTHOR_RANK_LIMIT}
+    )
+"""
+
+# 新快照涉及的日期，以及这些帖子之后第一个有数据的日期（其浏览增量以新快照为基准）
+AFFECTED_DATES_SQL = """
+    CREATE TEMP TABLE affected_dates AS
+    WITH new_url_dates AS (
+        SELECT DISTINCT url, DATE(list_time) as date
+        FROM {source}
+        WHERE scraping_time > ? AND list_time IS NOT NULL
+    )
+    SELECT date FROM new_url_dates
+    UNION
+    SELECT (
+        SELECT MIN(DATE(l.list_time)) FROM {source} l
+        WHERE l.url = n.url AND l.list_time >= DATE(n.date, '+1 day')
+    ) FROM new_url_dates n
+"""
+
+
+def _execute(cursor, sql, params=()):
+    """执行一条语句，返回写入的行数（WITH 开头的语句 rowcount 为 -1，用 total_changes 计算）"""
+    before = cursor.connection.total_changes
+    cursor.execute(sql, params)
+    return cursor.connection.total_changes - before
+
+
+def _list_source(cursor):
+    """读取包含全部历史的 list_all 视图（没有视图时为 list 表），并在原表和每个分区上建立索引"""
+    for table in ['list'] + partition_names(cursor.connection, 'list'):
+        for sql in STATISTICS_INDEXES:
+            cursor.execute(sql.format(table=table))
+    return history_source(cursor.connection, 'list')
+
+
+def _latest_scraping_time(cursor):
+    """原表和各分区分别按 scraping_time 索引取最大值（对视图做 MAX 会扫描全部历史）"""
+    values = [cursor.execute(f"SELECT MAX(scraping_time) FROM {table}").fetchone()[0]
+              for table in ['list'] + partition_names(cursor.connection, 'list')]
+    values = [value for value in values if value]
+    return max(values) if values else None
+
+
+def _full_refresh(cursor, source):
+    """清空三类统计并全部重新计算"""
+    cursor.execute("""
+        DELETE FROM import
+        WHERE data_category IN ('update_statistics', 'view_statistics', 'author_ranking')
+    """)
+    return {
+        'update_statistics': _execute(cursor, UPDATE_STATISTICS_SQL.format(source=source, date_filter='')),
+        'view_statistics': _execute(cursor, VIEW_STATISTICS_SQL.format(source=source, url_filter='', date_filter='')),
+        'author_ranking': _execute(cursor, AUTHOR_RANKING_SQL.format(source=source)),
+    }
+
+
+def _incremental_refresh(cursor, high_water, source):
+    """只重新计算 scraping_time 晚于 high_water 的快照涉及的日期"""
+    cursor.execute("DROP TABLE IF EXISTS temp.affected_dates")
+    cursor.execute(AFFECTED_DATES_SQL.format(source=source), (high_water,))
+    cursor.execute("DELETE FROM temp.affected_dates WHERE date IS NULL")
+    dates = cursor.execute("SELECT COUNT(*) FROM temp.affected_dates").fetchone()[0]
+    if dates == 0:
+        return {'dates': 0, 'update_statistics': 0, 'view_statistics': 0, 'author_ranking': 0}
+
+    affected = "(SELECT date FROM temp.affected_dates)"
+    cursor.execute(f"""
+        DELETE FROM import
+        WHERE data_category IN ('update_statistics', 'view_statistics')
+            AND SUBSTR(datetime, 1, 10) IN {affected}
     """)
-    author_stats = cursor.fetchall()
-    
-    # 插入作者排名数据
-    current_time = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
-    for rank, (author, posts, replies, views) in enumerate(author_stats, 1):
-        cursor.execute("""
-            INSERT INTO import (
-                type, datetime, author, total_posts, reply_count, 
-                view_count, data_category
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, ('author_rank', current_time, author, posts, replies, 
-              views, 'author_ranking'))
-    
-    conn.commit()
-    conn.close()
+    cursor.execute("DELETE FROM import WHERE data_category = 'author_ranking'")
+    counts = {
+        'dates': dates,
+        'update_statistics': _execute(cursor, UPDATE_STATISTICS_SQL.format(
+            source=source, date_filter=f"AND DATE(list_time) IN {affected}")),
+        # LAG 需要帖子在这些日期之前的数据，所以取这些日期出现过的帖子的全部历史
+        'view_statistics': _execute(cursor, VIEW_STATISTICS_SQL.format(
+            source=source,
+            url_filter=f"AND url IN (SELECT url FROM {source} WHERE DATE(list_time) IN {affected})",
+            date_filter=f"AND date IN {affected}")),
+        'author_ranking': _execute(cursor, AUTHOR_RANKING_SQL.format(source=source)),
+    }
+    cursor.execute("DROP TABLE IF EXISTS temp.affected_dates")
+    return counts
+
+
+def generate_statistics(db_path=None, full=False):
+    """
+    生成统计数据
+
+    Args:
+        db_path: 数据库文件路径，默认使用 backend/db/forum_data.db
+        full: 是否全部重新计算；没有处理位置（首次运行）时也会全部重新计算
+
+    Returns:
+        dict: 各类统计写入的行数、处理位置和耗时
+    """
+    conn = sqlite3.connect(db_path or DEFAULT_DB_PATH)
+    conn.isolation_level = None  # 显式控制事务
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    try:
+        source = _list_source(cursor)
+
+        cursor.execute("BEGIN IMMEDIATE")
+        high_water = get_meta(conn, STATISTICS_HIGH_WATER_KEY)
+        new_high_water = _latest_scraping_time(cursor)
+
+        if full or high_water is None:
+            counts = _full_refresh(cursor, source)
+            counts['mode'] = 'full'
+        elif new_high_water is None or new_high_water <= high_water:
+            counts = {'mode': 'incremental', 'dates': 0}
+        else:
+            counts = _incremental_refresh(cursor, high_water, source)
+            counts['mode'] = 'incremental'
+
+        if new_high_water is not None:
+            set_meta(conn, STATISTICS_HIGH_WATER_KEY, new_high_water)
+        cursor.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    counts['high_water'] = new_high_water
+    counts['seconds'] = round(time.perf_counter() - started, 3)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成统计数据')
+    parser.add_argument('--db-path', default=DEFAULT_DB_PATH, help='数据库文件路径')
+    parser.add_argument('--full', action='store_true', help='全部重新计算（补数据）')
+    args = parser.parse_args()
+
+    result = generate_statistics(args.db_path, args.full)
+    mode = '全量' if result['mode'] == 'full' else f"增量（{result.get('dates', 0)} 个日期）"
+    print(f"{mode}: 更新统计 {result.get('update_statistics', 0)} 行, 浏览统计 {result.get('view_statistics', 0)} 行, "
+          f"作者排名 {result.get('author_ranking', 0)} 行, 处理到 {result['high_water']}, 耗时 {result['seconds']} 秒")
     print("统计数据生成完成！")
 
+
 if __name__ == "__main__":
-    generate_statistics() 
\ No newline at end of file
+    main()
@@ -9,6 +9,9 @@ import time
 from colorama import init, Fore, Style
 import sys
 
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+from modules.thread_ids import canonical_thread_id
+
 # 设置控制台输出编码
 if sys.stdout.encoding != 'utf-8':
     sys.stdout.reconfigure(encoding='utf-8')
@@ -34,12 +37,9 @@ def show_progress(message, delay=0.1):
     print(" 完成！")
 
 def extract_thread_id_from_url(url):
-    """从URL中提取thread_id"""
-    try:
-        # 从URL中提取，格式通常是 page_viewtopic/t_123456.html
-        return url.split('t_')[-1].replace('.html', '')
-    except:
-        return None
+    """从URL中提取thread_id（与后端统一的规范写法，例如 page_viewtopic/t_123456.html -> "123456"）"""
+    thread_id = canonical_thread_id(url)
+    return str(thread_id) if thread_id is not None else None
 
 def get_thread_info_from_db(conn, url):
     """从数据库获取URL对应的thread信息"""
@@ -5,8 +5,12 @@ from pathlib import Path
 import warnings
 import os
 import traceback
+import sys
 warnings.filterwarnings('ignore')
 
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+from modules.thread_ids import extract_thread_keys
+
 # 设置数据路径
 DATA_DIR = Path(__file__).parent.parent / 'data'
 PROCESSED_DIR = DATA_DIR / 'processed'
@@ -1071,9 +1075,7 @@ def analyze_car_detail(list_df, post_df, create_datetime):
     car_detail = car_posts.merge(latest_posts[['url', 'scraping_time']], on='url', how='left')
     
     # 提取thread_id（从url中）
-    car_detail['thread_id'] = car_detail['url'].apply(
-        lambda x: x.split('/')[-1].split('.')[0] if pd.notna(x) else None
-    )
+    car_detail['thread_id'] = extract_thread_keys(car_detail[['url']])
     
     # 计算帖子年龄（daysold）
     car_detail['post_time'] = pd.to_datetime(car_detail['post_time'])
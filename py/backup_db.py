@@ -1,10 +1,14 @@
 import os
-import shutil
+import sys
 import datetime
 import sqlite3
 import logging
 import argparse
 
+# 数据库热替换模块位于backend/modules
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+from modules.db_swap import online_backup
+
 # 设置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -55,13 +59,14 @@ def create_backup(before_update=False):
         conn.close()
         db_size = os.path.getsize(db_path) / (1024 * 1024)  # 转换为MB
         
-        # 复制文件
-        shutil.copy2(db_path, backup_file)
+        # 使用在线备份API复制，备份期间不阻塞API读取
+        report = online_backup(db_path, backup_file, probe_readers=True)
+        stall_ms = report['reader_stall']['max_stall_ms']
         
         if before_update:
-            logger.info(f"更新前备份成功: {backup_file} ({db_size:.2f} MB)")
+            logger.info(f"更新前备份成功: {backup_file} ({db_size:.2f} MB, 耗时 {report['seconds']} 秒, 读取最长停顿 {stall_ms} 毫秒)")
         else:
-            logger.info(f"数据库备份成功: {backup_file} ({db_size:.2f} MB)")
+            logger.info(f"数据库备份成功: {backup_file} ({db_size:.2f} MB, 耗时 {report['seconds']} 秒, 读取最长停顿 {stall_ms} 毫秒)")
         
         # 清理旧备份 (保留最近30个普通备份)
         regular_backups = sorted([f for f in os.listdir(backup_dir) 
@@ -0,0 +1,72 @@
+"""
+list 表增量快照存储迁移工具
+
+从现有数据库的 list 表生成快照存储（list_scrapes、list_threads、list_presence、list_changes、list_activity、
+list_titles），list 表本身保持不变。update_db.py 每次导入 list 后会自动重建，这里用于已有的数据库。
+
+用法: python py/build_list_snapshots.py [--db-path backend/db/forum_data.db] [--verify-all]
+  --verify-all  逐次抓取检查重建的列表与 list 表一致（默认抽查第一次、中间和最后一次抓取）
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 快照存储模块位于backend/modules
+sys.path.append(os.path.join(BASE_DIR, 'backend'))
+from modules.snapshot_store import build_snapshot_store, verify_snapshot_store
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("build_list_snapshots")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从list表生成增量快照存储')
+    parser.add_argument('--db-path', default=os.path.join(BASE_DIR, 'backend', 'db', 'forum_data.db'),
+                        help='数据库文件路径')
+    parser.add_argument('--verify-all', action='store_true', help='检查每一次抓取的重建结果')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_path):
+        logger.error(f"数据库文件不存在: {args.db_path}")
+        return 1
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        counts = build_snapshot_store(conn)
+        if not counts:
+            conn.rollback()
+            return 1
+        conn.commit()
+        logger.info(f"快照存储生成完成，耗时 {time.perf_counter() - started:.2f} 秒")
+
+        samples = None
+        if args.verify_all:
+            samples = [row[0] for row in conn.execute("SELECT ts FROM list_scrapes ORDER BY scrape_id").fetchall()]
+        result = verify_snapshot_store(conn, samples)
+        if result['mismatched']:
+            logger.error(f"重建的列表与list表不一致: {', '.join(result['mismatched'][:10])}")
+            return 1
+        logger.info(f"已检查 {result['checked']} 次抓取，重建的列表与list表一致")
+        return 0
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
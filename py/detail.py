@@ -2,8 +2,13 @@ import pandas as pd
 import os
 import glob
 import re
+import sys
 import tqdm  # 导入tqdm用于显示进度条
 
+# 原始文件读取模块位于backend/modules
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+from modules.raw_loader import load_raw_files
+
 def main():
     # 获取脚本所在目录的父目录作为项目根目录
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -21,18 +26,19 @@ def main():
     
     print(f"找到以下文件: {', '.join(excel_files)}")
     
-    # 读取所有文件并合并
+    # 用进程池并行读取所有文件（与原来的 pd.read_excel(file) 一样只读第一个工作表），读取出错的文件会记录日志后跳过
+    with tqdm.tqdm(total=len(excel_files), desc="读取文件") as progress_bar:
+        loaded = load_raw_files(excel_files, 'update_detail', first_sheet_only=True,
+                                progress=lambda path: progress_bar.update())
+    
     df_list = []
-    for file in tqdm.tqdm(excel_files, desc="读取文件"):
-        try:
-            df = pd.read_excel(file)
-            # 确保所有字段都是字符串类型
-            for col in ['title', 'tags', 'related_tags', 'content']:
-                if col in df.columns:
-                    df[col] = df[col].astype(str)
-            df_list.append(df)
-        except Exception as e:
-            print(f"  - 读取文件 {file} 时出错: {e}")
+    for df in loaded.values():
+        df = df.drop(columns=['source_file', 'sheet_name'])
+        # 确保所有字段都是字符串类型
+        for col in ['title', 'tags', 'related_tags', 'content']:
+            if col in df.columns:
+                df[col] = df[col].astype(str)
+        df_list.append(df)
     
     if not df_list:
         print("错误: 未能成功读取任何文件")
@@ -0,0 +1,79 @@
+"""
+索引分析工具
+
+在数据库副本上回放后端接口的实际查询，标记全表扫描和临时B树排序，评估候选（覆盖）索引，
+输出每条查询建索引前后的查询计划和耗时。
+
+用法: python py/index_advisor.py [--db-path backend/db/forum_data.db] [--repeat 5] [--no-evaluate]
+                                  [--apply] [--sql-out sql/advised_indexes.sql]
+  --no-evaluate  只分析查询计划，不创建候选索引
+  --apply        把有效的索引创建到正式数据库
+  --sql-out      把有效的索引写成SQL文件（可在 update_db 的SQL步骤或 execute_sql.py 中执行）
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 索引分析模块位于backend/modules，回放接口需要导入backend/app.py
+sys.path.append(os.path.join(BASE_DIR, 'backend'))
+from modules.index_advisor import DEFAULT_REPEAT, MIN_GAIN, analyze_database, format_report
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("index_advisor")
+
+
+def write_sql(report, sql_path):
+    """把有效的索引写成SQL文件"""
+    lines = [f"-- 由 py/index_advisor.py 生成于 {report['generated_at']}，数据库 {report['db_path']}"]
+    for index in report['indexes']:
+        if index['accepted']:
+            lines.append(f"-- 查询 {', '.join(f'#{n}' for n in index['queries'])}: {index['reason']}")
+            lines.append(f"{index['ddl']};")
+    with open(sql_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='根据接口实际查询分析并建议索引')
+    parser.add_argument('--db-path', default=os.path.join(BASE_DIR, 'backend', 'db', 'forum_data.db'),
+                        help='数据库文件路径')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='每条查询计时的次数')
+    parser.add_argument('--min-gain', type=float, default=MIN_GAIN, help='保留索引要求的最小加速比例')
+    parser.add_argument('--no-evaluate', action='store_true', help='只分析查询计划，不评估候选索引')
+    parser.add_argument('--apply', action='store_true', help='把有效的索引创建到正式数据库')
+    parser.add_argument('--sql-out', help='把有效的索引写入该SQL文件')
+    parser.add_argument('--report-dir', default=os.path.join(BASE_DIR, 'data', 'reports'), help='JSON报告目录')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_path):
+        logger.error(f"数据库文件不存在: {args.db_path}")
+        return 1
+
+    report = analyze_database(args.db_path, evaluate=not args.no_evaluate, apply=args.apply,
+                              repeat=args.repeat, min_gain=args.min_gain)
+    print(format_report(report))
+
+    os.makedirs(args.report_dir, exist_ok=True)
+    report_file = os.path.join(args.report_dir, f"index_advice_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    print(f"\n报告已保存: {report_file}（耗时 {report['seconds']} 秒）")
+
+    if args.sql_out:
+        write_sql(report, args.sql_out)
+        print(f"索引SQL已保存: {args.sql_out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,10 +4,14 @@ from datetime import datetime, timedelta
 from tqdm import tqdm
 from colorama import init, Fore
 import glob
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-from openpyxl.utils import get_column_letter
+import sys
 from pathlib import Path
 
+# 原始文件读取和Excel导出模块位于backend/modules
+sys.path.append(str(Path(__file__).parent.parent / 'backend'))
+from modules.excel_export import export_styled_excel
+from modules.raw_loader import load_raw_files
+
 # 初始化colorama
 init()
 
@@ -44,72 +48,6 @@ def round_time_to_15min(dt):
     else:
         return dt.replace(minute=rounded_minutes, second=0, microsecond=0)
 
-def apply_excel_styles(file_path):
-    """应用Excel样式：自适应列宽、表头黄色背景和加粗、苹果平方字体、黑色边框"""
-    print(f"{Fore.CYAN}正在应用Excel样式，这可能需要一些时间...{Fore.RESET}")
-    
-    # 加载工作簿
-    from openpyxl import load_workbook
-    wb = load_workbook(file_path)
-    ws = wb.active
-    
-    # 定义样式
-    header_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-    header_font = Font(name="PingFang SC", bold=True, size=11)
-    cell_font = Font(name="PingFang SC", size=11)
-    thin_border = Border(
-        left=Side(style='thin', color='000000'),
-        right=Side(style='thin', color='000000'),
-        top=Side(style='thin', color='000000'),
-        bottom=Side(style='thin', color='000000')
-    )
-    
-    # 获取数据范围
-    data_rows = min(ws.max_row, 10000)  # 限制最大处理行数为10000行
-    data_cols = ws.max_column
-    
-    # 应用表头样式（只处理第一行）
-    print(f"{Fore.CYAN}应用表头样式...{Fore.RESET}")
-    for col in range(1, data_cols + 1):
-        cell = ws.cell(row=1, column=col)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = thin_border
-        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    
-    # 批量设置字体和边框（跳过表头）
-    print(f"{Fore.CYAN}应用数据单元格样式...{Fore.RESET}")
-    for row in tqdm(range(2, data_rows + 1), desc="应用样式"):
-        for col in range(1, data_cols + 1):
-            cell = ws.cell(row=row, column=col)
-            cell.font = cell_font
-            cell.border = thin_border
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # 自适应列宽
-    print(f"{Fore.CYAN}调整列宽...{Fore.RESET}")
-    for col in range(1, data_cols + 1):
-        max_length = 0
-        column = get_column_letter(col)
-        
-        # 只检查前100行来确定列宽
-        for row in range(1, min(100, data_rows + 1)):
-            cell_value = ws.cell(row=row, column=col).value
-            if cell_value:
-                try:
-                    if len(str(cell_value)) > max_length:
-                        max_length = len(str(cell_value))
-                except:
-                    pass
-        
-        adjusted_width = (max_length + 2) * 1.2
-        ws.column_dimensions[column].width = min(adjusted_width, 50)  # 限制最大宽度为50
-    
-    # 保存修改后的工作簿
-    print(f"{Fore.CYAN}保存样式化的Excel文件...{Fore.RESET}")
-    wb.save(file_path)
-    print(f"{Fore.GREEN}已应用Excel样式美化到：{file_path}{Fore.RESET}")
-
 def process_post_list():
     print(f"{Fore.CYAN}开始处理发帖列表数据...{Fore.RESET}")
     
@@ -119,29 +57,25 @@ def process_post_list():
         print(f"{Fore.RED}错误：未找到发帖列表数据文件！{Fore.RESET}")
         return
     
-    all_data = []
+    # 用进程池并行读取所有文件的全部工作表（已带有source_file和sheet_name字段）
+    # 任何一天的文件读取失败都不生成 post.xlsx，否则会缺少那一天的数据却不报错
+    try:
+        with tqdm(total=len(files), desc="处理文件") as progress_bar:
+            loaded = load_raw_files(files, 'post_list', progress=lambda path: progress_bar.update(), strict=True)
+    except ValueError as e:
+        print(f"{Fore.RED}错误：{e}，未生成 post.xlsx{Fore.RESET}")
+        sys.exit(1)
     
-    # 处理每个文件
-    for file in tqdm(files, desc="处理文件"):
-        # 读取所有工作表
-        excel_file = pd.ExcelFile(file)
-        source_file = os.path.basename(file)
+    all_data = []
+    for df in loaded.values():
+        # 计算scraping_time_R
+        # 确保 scraping_time 为 datetime 类型
+        df['scraping_time'] = pd.to_datetime(df['scraping_time'])
+        # 对每个抓取时间都应用 round_time_to_15min 函数
+        # 特别处理接近午夜的情况
+        df['scraping_time_R'] = df['scraping_time'].apply(round_time_to_15min)
         
-        for sheet_name in excel_file.sheet_names:
-            df = pd.read_excel(excel_file, sheet_name=sheet_name)
-            
-            # 添加source_file和sheet_name字段
-            df['source_file'] = source_file
-            df['sheet_name'] = sheet_name
-            
-            # 计算scraping_time_R
-            # 确保 scraping_time 为 datetime 类型
-            df['scraping_time'] = pd.to_datetime(df['scraping_time'])
-            # 对每个工作表中的每个抓取时间都应用 round_time_to_15min 函数
-            # 特别处理接近午夜的情况
-            df['scraping_time_R'] = df['scraping_time'].apply(round_time_to_15min)
-            
-            all_data.append(df)
+        all_data.append(df)
     
     # 合并所有数据
     df_combined = pd.concat(all_data, ignore_index=True)
@@ -207,12 +141,9 @@ def process_post_list():
     # 创建输出目录
     PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
     
-    # 保存结果
+    # 保存结果（一次写出表头样式、列格式和列宽）
     output_file = PROCESSED_DIR / 'post.xlsx'
-    df_result.to_excel(output_file, index=False)
-    
-    # 应用Excel样式美化
-    apply_excel_styles(output_file)
+    export_styled_excel(df_result, output_file)
     
     print(f"{Fore.GREEN}处理完成！结果已保存至：{output_file}{Fore.RESET}")
 
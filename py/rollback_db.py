@@ -16,15 +16,17 @@
 
 import os
 import sys
-import time
 import sqlite3
-import shutil
 import glob
 import json
 import argparse
 import logging
 from datetime import datetime
 
+# 数据库热替换模块位于backend/modules
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+from modules.db_swap import online_backup, publish_database
+
 # 配置日志记录
 log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
 os.makedirs(log_dir, exist_ok=True)
@@ -144,41 +146,22 @@ def rollback_database(force=False):
         logging.error("备份文件完整性检查失败，不执行回滚")
         return False
     
-    # 创建当前数据库的备份，以防需要恢复
-    if os.path.exists(DB_FILE):
-        rollback_backup = os.path.join(BACKUP_DIR, f"before_rollback_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
-        try:
-            shutil.copy2(DB_FILE, rollback_backup)
-            logging.info(f"已创建回滚前的备份: {rollback_backup}")
-        except Exception as e:
-            logging.warning(f"创建回滚前备份失败: {str(e)}")
-    
-    # 执行回滚
+    # 把备份复制为待发布文件，再通过在线备份API写入正式库（API进程持有连接时也能回滚），
+    # 同时创建当前数据库的备份，以防需要恢复
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    staged_path = f"{DB_FILE}.rollback_temp"
+    rollback_backup = os.path.join(BACKUP_DIR, f"before_rollback_{timestamp}.db")
     try:
-        # 如果数据库文件正在使用，可能需要等待
-        max_attempts = 3
-        attempts = 0
-        success = False
-        
-        while attempts < max_attempts and not success:
-            try:
-                if os.path.exists(DB_FILE):
-                    os.remove(DB_FILE)
-                shutil.copy2(latest_backup, DB_FILE)
-                success = True
-            except Exception as e:
-                attempts += 1
-                logging.warning(f"回滚尝试 {attempts}/{max_attempts} 失败: {str(e)}")
-                time.sleep(2)  # 等待2秒后重试
-        
-        if success:
-            logging.info(f"数据库已成功回滚到: {latest_backup}")
-            return True
-        else:
-            logging.error(f"在 {max_attempts} 次尝试后回滚失败")
-            return False
+        online_backup(latest_backup, staged_path)
+        report = publish_database(staged_path, DB_FILE, f"rollback_{timestamp}", backup_path=rollback_backup)
+        if report['backup']:
+            logging.info(f"已创建回滚前的备份: {rollback_backup}")
+        logging.info(f"数据库已成功回滚到: {latest_backup}")
+        return True
     except Exception as e:
         logging.error(f"执行回滚时发生错误: {str(e)}")
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
         return False
 
 def main():
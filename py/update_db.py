@@ -6,7 +6,6 @@ from datetime import datetime
 import time
 import logging
 import sys
-import shutil
 import random
 from typing import Dict, List, Any, Tuple
 import msvcrt
@@ -14,7 +13,6 @@ import argparse
 import traceback
 import csv
 import re
-import gc
 
 # 导入词云生成模块
 try:
@@ -29,6 +27,22 @@ except ImportError:
             logging.warning("词云生成模块导入失败")
             return 0
 
+# 导入数据库热替换模块（位于backend/modules）
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+from modules.db_swap import publish_database
+from modules.db_copy import copy_tables_attached, copy_table_keyset, DEFAULT_COPY_BATCH_SIZE
+from modules.car_search import ensure_car_search, rebuild_car_search
+from modules.action_logs import refresh_action_log_counts
+from modules.author_posts import rebuild_author_posts
+from modules.snapshot_store import build_snapshot_store
+from modules.partitions import partition_table, refresh_view, DEFAULT_RAW_DAYS, DEFAULT_HOURLY_DAYS
+from modules.dashboard import build_dashboard_bundle
+from modules.sql_runner import run_sql_script, format_report, DEFAULT_EXPLAIN_TABLES
+from modules.thread_ids import (
+    THREAD_KEY_COLUMN, THREAD_KEY_TABLES, backfill_thread_keys, canonical_thread_id, extract_thread_keys,
+    create_thread_key_index
+)
+
 # 设置日志
 # 确保日志目录存在
 os.makedirs(os.path.join(os.path.dirname(__file__), "logs"), exist_ok=True)
@@ -43,6 +57,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger("update_db")
 
+# SQL脚本（sql/incremental_update.sql、sql/process_import_data.sql）会插入行但不写thread_key的表
+SCRIPT_THREAD_KEY_TABLES = ['post_ranking', 'post_history']
+
 class DatabaseUpdater:
     def __init__(self, db_path=None):
         """初始化数据库更新器
@@ -84,6 +101,15 @@ class DatabaseUpdater:
             'post_history',        # 帖子历史
             'author_history'       # 作者历史
         ]
+        
+        # 最近一次发布数据库的报告（备份耗时、替换耗时、读取停顿）
+        self.swap_report = None
+        
+        # 最近一次车辆信息导入的统计（行数、耗时、行/秒）
+        self.car_info_import_stats = None
+        
+        # 本次更新执行的SQL文件的运行报告（每条语句的耗时、影响行数、查询计划）
+        self.sql_reports = []
     
     def start_update_process(self, update_type="incremental"):
         """开始更新过程，记录版本信息"""
@@ -146,73 +172,21 @@ class DatabaseUpdater:
                     self.temp_db_path = f"{self.db_path}.temp_{self.version_id}_{random_suffix}_alt"
                     logger.info(f"旧临时数据库被占用，使用新路径: {self.temp_db_path}")
             
-            # 如果存在原数据库，则复制保护表
+            # 创建空的临时数据库
+            with sqlite3.connect(self.temp_db_path) as temp_conn:
+                # 仅创建连接以初始化数据库文件
+                pass
+            
+            # 如果存在原数据库，则通过ATTACH在同一事务中复制保护表（保留原始表结构和索引）
             if os.path.exists(self.db_path):
-                # 创建空的临时数据库
-                with sqlite3.connect(self.temp_db_path) as temp_conn:
-                    # 仅创建连接以初始化数据库文件
-                    pass
-                
-                # 从原数据库复制保护表
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    
-                    # 获取所有表
-                    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-                    all_tables = [row[0] for row in cursor.fetchall()]
-                    
-                    # 检查保护表是否存在并复制
-                    for table in self.protected_tables:
-                        if table in all_tables:
-                            try:
-                                # 获取表结构
-                                cursor.execute(f"PRAGMA table_info({table})")
-                                columns = [row[1] for row in cursor.fetchall()]
-                                columns_str = ", ".join(columns)
-                                
-                                # 获取数据
-                                cursor.execute(f"SELECT {columns_str} FROM {table}")
-                                rows = cursor.fetchall()
-                                
-                                if rows:
-                                    # 将数据复制到临时数据库
-                                    with sqlite3.connect(self.temp_db_path) as temp_conn:
-                                        temp_cursor = temp_conn.cursor()
-                                        
-                                        # 创建表
-                                        cursor.execute(f"PRAGMA table_info({table})")
-                                        columns_info = cursor.fetchall()
-                                        create_table_sql = f"CREATE TABLE IF NOT EXISTS {table} ("
-                                        for i, col_info in enumerate(columns_info):
-                                            name = col_info[1]
-                                            type_name = col_info[2]
-                                            not_null = "NOT NULL" if col_info[3] else ""
-                                            default = f"DEFAULT {col_info[4]}" if col_info[4] is not None else ""
-                                            pk = "PRIMARY KEY" if col_info[5] else ""
-                                            create_table_sql += f"{name} {type_name} {not_null} {default} {pk}"
-                                            if i < len(columns_info) - 1:
-                                                create_table_sql += ", "
-                                        create_table_sql += ")"
-                                        temp_cursor.execute(create_table_sql)
-                                        
-                                        # 插入数据
-                                        placeholders = ", ".join(["?" for _ in columns])
-                                        insert_sql = f"INSERT INTO {table} ({columns_str}) VALUES ({placeholders})"
-                                        temp_cursor.executemany(insert_sql, rows)
-                                        temp_conn.commit()
-                                    
-                                    logger.info(f"复制保护表 {table} 的 {len(rows)} 行数据到临时数据库")
-                                else:
-                                    logger.warning(f"保护表 {table} 无数据")
-                            except Exception as e:
-                                logger.warning(f"复制保护表 {table} 时出错: {str(e)}")
-                        else:
-                            logger.warning(f"复制保护表 {table} 时出错: no such table: {table}")
+                try:
+                    results = copy_tables_attached(self.db_path, self.temp_db_path, self.protected_tables)
+                    for table, result in results.items():
+                        if result['status'] == 'copied':
+                            logger.info(f"复制保护表 {table} 的 {result['rows']} 行数据到临时数据库")
+                except sqlite3.Error as e:
+                    logger.warning(f"复制保护表时出错: {str(e)}")
             else:
-                # 如果原数据库不存在，直接创建空的临时数据库
-                with sqlite3.connect(self.temp_db_path) as temp_conn:
-                    # 仅创建连接以初始化数据库文件
-                    pass
                 logger.warning(f"原数据库不存在，已创建空的临时数据库: {self.temp_db_path}")
             
             logger.info(f"临时数据库创建完成: {self.temp_db_path}")
@@ -249,7 +223,9 @@ class DatabaseUpdater:
                 # 将数据转换为文本并写入数据库
                 df = df.astype(str)
                 df.replace('nan', '', inplace=True)
+                df = self._add_thread_key_column(df, table_name)
                 df.to_sql(table_name, conn, if_exists='replace', index=False)
+                self._create_import_indexes(conn, df, table_name)
                 
                 # 验证导入结果
                 cursor = conn.cursor()
@@ -262,6 +238,22 @@ class DatabaseUpdater:
             logger.error(f"导入Excel文件失败 {file_path} -> {table_name}: {str(e)}")
             return False
 
+    def _add_thread_key_column(self, df, table_name):
+        """为带有帖子URL的表计算整数thread_key列（优先thread_id列，其次url列）"""
+        if table_name in THREAD_KEY_TABLES:
+            keys = extract_thread_keys(df)
+            if keys is not None:
+                df[THREAD_KEY_COLUMN] = keys
+        return df
+
+    def _create_import_indexes(self, conn, df, table_name):
+        """导入后建立thread_key索引；post_history 另外建立组合索引并汇总每个帖子的日志条数"""
+        if THREAD_KEY_COLUMN not in df.columns:
+            return
+        create_thread_key_index(conn, table_name)
+        if table_name == 'post_history':
+            refresh_action_log_counts(conn)
+
     def import_csv_to_temp(self, file_path, table_name):
         """将CSV文件数据导入到临时数据库的指定表中"""
         try:
@@ -290,7 +282,9 @@ class DatabaseUpdater:
                 # 将数据转换为文本并写入数据库
                 df = df.astype(str)
                 df.replace('nan', '', inplace=True)
+                df = self._add_thread_key_column(df, table_name)
                 df.to_sql(table_name, conn, if_exists='replace', index=False)
+                self._create_import_indexes(conn, df, table_name)
                 
                 # 验证导入结果
                 cursor = conn.cursor()
@@ -303,6 +297,76 @@ class DatabaseUpdater:
             logger.error(f"导入CSV文件失败 {file_path} -> {table_name}: {str(e)}")
             return False
     
+    def backfill_script_thread_keys(self):
+        """SQL脚本向post_ranking、post_history插入的行没有thread_key，执行脚本后回填（并重新汇总操作日志条数）"""
+        try:
+            with sqlite3.connect(self.temp_db_path) as conn:
+                counts = backfill_thread_keys(conn, SCRIPT_THREAD_KEY_TABLES)
+                if 'post_history' in counts:
+                    refresh_action_log_counts(conn)
+            return True
+        except Exception as e:
+            logger.error(f"回填thread_key失败: {str(e)}")
+            return False
+    
+    def build_author_posts(self):
+        """在临时数据库中生成作者发帖历史表（依赖已导入的posts和list表）"""
+        try:
+            with sqlite3.connect(self.temp_db_path) as conn:
+                rows = rebuild_author_posts(conn)
+            return rows >= 0
+        except Exception as e:
+            logger.error(f"生成作者发帖历史失败: {str(e)}")
+            return False
+    
+    def build_list_snapshots(self):
+        """在临时数据库中从list表生成增量快照存储（每个帖子一行维度加只在值变化时写入的记录）"""
+        try:
+            with sqlite3.connect(self.temp_db_path) as conn:
+                counts = build_snapshot_store(conn)
+            return bool(counts)
+        except Exception as e:
+            logger.error(f"生成list快照存储失败: {str(e)}")
+            return False
+    
+    def partition_list(self, enabled=False, raw_days=DEFAULT_RAW_DAYS, hourly_days=DEFAULT_HOURLY_DAYS):
+        """
+        在临时数据库中建立list_all视图（list的全部历史，读取方都通过它查询）
+
+        enabled为True时（--partition-list）先把list表过期的快照按月移到分区并降采样: 原表保留最近raw_days天，
+        更早的快照被删除大部分，不可恢复，所以默认不执行，只建立视图（此时视图就是list表）。
+        """
+        try:
+            with sqlite3.connect(self.temp_db_path) as conn:
+                if not enabled:
+                    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'list'").fetchone():
+                        refresh_view(conn, 'list')
+                    return True
+                result = partition_table(conn, 'list', raw_days=raw_days, hourly_days=hourly_days)
+            return bool(result)
+        except Exception as e:
+            logger.error(f"list表分区失败: {str(e)}")
+            return False
+    
+    def build_car_search(self):
+        """发布后检查汽车搜索派生表，新库中有 car_info 但还没有搜索索引时构建（接口请求不会构建）"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                ensure_car_search(conn)
+            finally:
+                conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"构建汽车搜索索引失败: {str(e)}")
+            return False
+    
+    def build_dashboard(self):
+        """数据发布后预先计算仪表盘数据包（排行榜第一页、各粒度趋势、词云、日期范围），保存到正式数据库"""
+        # 仪表盘各模块通过环境变量 DATABASE_PATH 定位数据库
+        os.environ['DATABASE_PATH'] = self.db_path
+        return build_dashboard_bundle(self.db_path)
+    
     def execute_sql_on_temp(self, sql_file_path):
         """在临时数据库上执行SQL文件
         
@@ -328,51 +392,13 @@ class DatabaseUpdater:
                 logger.warning(f"SQL文件为空: {sql_file_path}")
                 return True
                 
-            # 拆分SQL语句（考虑存储过程和触发器等多行语句）
-            statements = []
-            current_statement = []
-            delimiter = ';'
-            
-            for line in sql_content.split('\n'):
-                # 忽略注释行
-                stripped_line = line.strip()
-                if stripped_line.startswith('--') or stripped_line.startswith('#'):
-                    continue
-                    
-                # 检查是否更改了分隔符（如DELIMITER //）
-                if stripped_line.upper().startswith('DELIMITER '):
-                    if current_statement:
-                        statements.append('\n'.join(current_statement))
-                        current_statement = []
-                    delimiter = stripped_line.split()[1]
-                    continue
-                
-                # 添加当前行到语句
-                current_statement.append(line)
-                
-                # 检查是否到达语句结束
-                if stripped_line.endswith(delimiter):
-                    statements.append('\n'.join(current_statement))
-                    current_statement = []
-            
-            # 添加最后一个语句（如果有）
-            if current_statement:
-                statements.append('\n'.join(current_statement))
-            
-            # 连接到临时数据库并执行SQL语句
+            # 在一个事务中逐条执行（每条语句一个保存点），记录耗时、影响行数和大表的查询计划
             with sqlite3.connect(self.temp_db_path) as conn:
-                cursor = conn.cursor()
-                
-                for i, statement in enumerate(statements):
-                    if statement.strip():
-                        try:
-                            cursor.execute(statement)
-                        except sqlite3.Error as e:
-                            logger.error(f"执行SQL语句 #{i+1} 时出错: {str(e)}")
-                            logger.error(f"问题语句: {statement}")
-                            # 继续执行其他语句，不中断整个执行过程
-                
-                conn.commit()
+                report = run_sql_script(conn, sql_content, os.path.basename(sql_file_path),
+                                        explain_tables=DEFAULT_EXPLAIN_TABLES)
+            self.sql_reports.append(report)
+            logger.info(format_report(report))
+            self._save_sql_reports()
             
             logger.info(f"成功执行SQL文件: {sql_file_path}")
             return True
@@ -380,6 +406,16 @@ class DatabaseUpdater:
             logger.error(f"执行SQL文件时出错: {str(e)}")
             return False
     
+    def _save_sql_reports(self):
+        """把本次更新的SQL运行报告写入 logs/sql_report_<版本号>.json"""
+        try:
+            report_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs",
+                                       f"sql_report_{self.version_id}.json")
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(self.sql_reports, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.warning(f"保存SQL运行报告失败: {str(e)}")
+    
     def generate_change_log(self, main_tables):
         """生成变更日志，比较临时数据库和主数据库中指定表的差异"""
         try:
@@ -735,6 +771,7 @@ class DatabaseUpdater:
             # 执行SQL文件
             for sql_file in sql_files:
                 self.execute_sql_on_temp(sql_file)
+            self.backfill_script_thread_keys()
             
             # 生成变更日志
             self.generate_change_log(main_tables)
@@ -767,6 +804,7 @@ class DatabaseUpdater:
             # 执行SQL文件
             for sql_file in sql_files:
                 self.execute_sql_on_temp(sql_file)
+            self.backfill_script_thread_keys()
             
             # 生成变更日志
             self.generate_change_log(main_tables)
@@ -793,178 +831,56 @@ class DatabaseUpdater:
         return name
 
     def replace_database(self):
-        """将临时数据库替换为正式数据库"""
+        """将临时数据库发布为正式数据库
+        
+        使用SQLite在线备份API备份当前数据库（不阻塞API读取），然后通过原子重命名
+        发布临时数据库并更新版本指针，后端连接检测到版本变化后会重新打开。
+        """
         try:
             if not os.path.exists(self.temp_db_path):
                 logger.error(f"临时数据库不存在，无法替换: {self.temp_db_path}")
                 return False
-                
-            # 检查临时数据库是否有效
-            try:
-                with sqlite3.connect(self.temp_db_path) as conn:
-                    cursor = conn.cursor()
-                    # 检查是否至少包含一个表
-                    cursor.execute("SELECT count(*) FROM sqlite_master WHERE type='table'")
-                    table_count = cursor.fetchone()[0]
-                    if table_count == 0:
-                        logger.error("临时数据库无效，不包含任何表")
-                        return False
-            except sqlite3.Error as e:
-                logger.error(f"临时数据库无效，无法连接或查询: {str(e)}")
-                return False
-                
-            # 创建备份
-            backup_path = f"{self.db_path}.bak_{self.version_id}"
-            backup_created = False
             
-            if os.path.exists(self.db_path):
-                # 尝试最多5次创建备份
-                max_attempts = 5
-                attempt = 0
-                while attempt < max_attempts:
-                    attempt += 1
-                    try:
-                        # 创建备份前确保数据库连接关闭
-                        try:
-                            # 强制关闭所有可能的连接
-                            gc.collect()  # 尝试回收未关闭的连接
-                            time.sleep(1)  # 等待1秒
-                        except:
-                            pass
-                        
-                        # 创建备份
-                        shutil.copy2(self.db_path, backup_path)
-                        backup_created = True
-                        logger.info(f"已创建数据库备份: {backup_path}")
-                        break
-                    except (IOError, PermissionError) as e:
-                        logger.warning(f"尝试第 {attempt} 次创建备份时遇到文件锁定: {str(e)}")
-                        if attempt < max_attempts:
-                            time.sleep(2)  # 等待2秒后重试
-                        else:
-                            logger.error(f"创建数据库备份失败，文件被锁定: {str(e)}")
-                            return False
-                    except Exception as e:
-                        logger.error(f"创建数据库备份时出错: {str(e)}")
-                        return False
-            
-            # 替换数据库
-            # 尝试最多5次替换数据库
-            max_attempts = 5
-            attempt = 0
-            while attempt < max_attempts:
-                attempt += 1
-                try:
-                    # 替换前确保数据库连接关闭
-                    try:
-                        # 强制关闭所有可能的连接
-                        gc.collect()  # 尝试回收未关闭的连接
-                        time.sleep(1)  # 等待1秒
-                    except:
-                        pass
-                    
-                    temp_db_copy = f"{self.temp_db_path}.copy"
-                    # 先创建临时数据库的副本，以防原始副本被锁定
-                    shutil.copy2(self.temp_db_path, temp_db_copy)
-                    
-                    if os.path.exists(self.db_path):
-                        # 使用新文件替换旧文件的方式，可能更容易绕过文件锁
-                        os.replace(temp_db_copy, self.db_path)
-                    else:
-                        shutil.copy2(temp_db_copy, self.db_path)
-                    
-                    logger.info(f"数据库替换完成")
-                    
-                    # 删除临时文件
-                    if os.path.exists(temp_db_copy):
-                        try:
-                            os.remove(temp_db_copy)
-                        except:
-                            pass
-                    
-                    # 尝试删除原始临时数据库
-                    try:
-                        if os.path.exists(self.temp_db_path):
-                            os.remove(self.temp_db_path)
-                            logger.info(f"临时数据库已删除: {self.temp_db_path}")
-                    except Exception as e:
-                        logger.warning(f"无法立即删除临时数据库: {str(e)}")
-                        # 使用延迟删除策略
-                        self._schedule_delayed_delete(self.temp_db_path)
-                    
-                    return True
-                    
-                except (IOError, PermissionError) as e:
-                    logger.warning(f"尝试第 {attempt} 次替换数据库时遇到文件锁定: {str(e)}")
-                    # 如果数据库已备份但替换失败，尝试从备份恢复
-                    if backup_created and attempt == max_attempts:
-                        try:
-                            logger.warning("尝试从备份恢复数据库...")
-                            shutil.copy2(backup_path, self.db_path)
-                            logger.info("已从备份恢复数据库")
-                        except Exception as restore_error:
-                            logger.error(f"恢复数据库失败: {str(restore_error)}")
-                    
-                    if attempt < max_attempts:
-                        time.sleep(2)  # 等待2秒后重试
-                    else:
-                        logger.error(f"替换数据库失败，文件被锁定: {str(e)}")
-                        return False
-                except Exception as e:
-                    logger.error(f"替换数据库时出错: {str(e)}")
-                    # 如果数据库已备份但替换失败，尝试从备份恢复
-                    if backup_created:
-                        try:
-                            logger.warning("尝试从备份恢复数据库...")
-                            shutil.copy2(backup_path, self.db_path)
-                            logger.info("已从备份恢复数据库")
-                        except Exception as restore_error:
-                            logger.error(f"恢复数据库失败: {str(restore_error)}")
-                    return False
+            backup_path = f"{self.db_path}.bak_{self.version_id}"
+            report = publish_database(
+                self.temp_db_path,
+                self.db_path,
+                self.version_id,
+                backup_path=backup_path
+            )
+            
+            stall = report.get('reader_stall', {})
+            backup_seconds = report['backup']['seconds'] if report['backup'] else 0
+            logger.info(f"数据库替换完成: 备份耗时 {backup_seconds} 秒, 替换耗时 {report['swap_seconds']} 秒, "
+                        f"读取最长停顿 {stall.get('max_stall_ms', 0)} 毫秒")
+            self.swap_report = report
+            return True
+        except ValueError as e:
+            logger.error(str(e))
+            return False
         except Exception as e:
-            logger.error(f"替换数据库时发生未预期错误: {str(e)}")
+            logger.error(f"替换数据库时出错: {str(e)}")
             return False
     
-    def _schedule_delayed_delete(self, file_path):
-        """安排延迟删除文件"""
-        try:
-            # 如果还是不能删除，尝试重命名
-            temp_rename = f"{file_path}.to_delete"
-            try:
-                if os.path.exists(temp_rename):
-                    os.remove(temp_rename)
-            except:
-                pass
-                
-            try:
-                os.rename(file_path, temp_rename)
-                logger.info(f"文件已重命名为待删除状态: {temp_rename}")
-            except Exception as e:
-                logger.warning(f"重命名文件失败: {str(e)}")
-                return
-            
-            # 使用系统任务启动延迟删除（仅Windows系统）
+    def import_car_info(self, mode='bulk'):
+        """导入车辆信息
+        
+        Args:
+            mode: 'bulk' 使用批量导入，'row' 使用逐行导入
+        """
+        if mode == 'row':
+            success = self.import_car_info_data()
+        else:
+            success = self.import_car_info_bulk()
+        
+        # 车辆数据变化后刷新搜索索引和分面列表
+        if success:
             try:
-                # 创建一个批处理文件来延迟删除
-                bat_path = os.path.join(os.path.dirname(self.db_path), f"delete_temp_{int(time.time())}.bat")
-                with open(bat_path, 'w') as f:
-                    f.write(f"@echo off\n")
-                    f.write(f"timeout /t 10 /nobreak >nul\n")  # 等待10秒
-                    f.write(f"del /q /f \"{temp_rename}\"\n")
-                    f.write(f"if exist \"{temp_rename}\" (\n")
-                    f.write(f"  timeout /t 30 /nobreak >nul\n")  # 如果第一次删除失败，再等待30秒
-                    f.write(f"  del /q /f \"{temp_rename}\"\n")
-                    f.write(f")\n")
-                    f.write(f"del /q /f \"{bat_path}\"\n")  # 自删除
-                
-                # 使用无窗口启动批处理
-                os.system(f"start /b cmd /c \"{bat_path}\"")
-                logger.info(f"已创建延迟删除任务")
+                rebuild_car_search(self.db_path)
             except Exception as e:
-                logger.warning(f"创建延迟删除任务失败: {str(e)}")
-        except Exception as e:
-            logger.warning(f"安排延迟删除失败: {str(e)}")
-
+                logger.error(f"构建汽车搜索索引失败: {str(e)}")
+        return success
+    
     def import_car_info_data(self):
         """导入车辆信息到car_info表，不影响其他表"""
         try:
@@ -1006,39 +922,18 @@ class DatabaseUpdater:
                     cursor.execute(f"ALTER TABLE car_info RENAME TO car_info_bak_{timestamp}")
                     logger.info(f"已将原car_info表重命名为car_info_bak_{timestamp}")
                 
+                # 旧的备份表上保留着同名索引，删除后才能在新表上创建
+                self._drop_car_info_backup_indexes(cursor)
+                
                 # 创建car_info表结构
-                cursor.execute('''
-                CREATE TABLE car_info (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    url TEXT,
-                    year TEXT,
-                    make TEXT,
-                    model TEXT,
-                    miles TEXT,
-                    price TEXT,
-                    trade_type TEXT,
-                    location TEXT,
-                    post_time TEXT,
-                    scraping_time_R TEXT,
-                    title TEXT,
-                    author TEXT,
-                    author_link TEXT,
-                    thread_id TEXT,
-                    daysold INTEGER DEFAULT 999,
-                    last_active INTEGER DEFAULT 999,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                ''')
+                self._create_car_info_table(cursor, 'car_info')
                 
                 # 创建索引
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_car_info_url ON car_info(url)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_car_info_make ON car_info(make)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_car_info_model ON car_info(model)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_car_info_title ON car_info(title)")
+                self._create_car_info_indexes(cursor)
                 
                 # 准备插入数据的SQL语句
                 # 动态构建SQL插入语句，只包含df中存在的列
+                df[THREAD_KEY_COLUMN] = None
                 columns = [col for col in df.columns if col != 'id']
                 placeholders = ', '.join(['?' for _ in columns])
                 columns_str = ', '.join(columns)
@@ -1056,6 +951,7 @@ class DatabaseUpdater:
                 errors = 0
                 
                 # 逐行插入数据
+                started = time.perf_counter()
                 for index, row in df.iterrows():
                     try:
                         url = row.get('url')
@@ -1083,8 +979,11 @@ class DatabaseUpdater:
                                     thread_id = thread_id_match.group(1)
                             row['thread_id'] = thread_id
                         
+                        # 规范的整数帖子ID
+                        thread_key = canonical_thread_id(row.get('thread_id')) or canonical_thread_id(url)
+                        
                         # 准备插入的数据
-                        values = [row.get(col) for col in columns]
+                        values = [thread_key if col == THREAD_KEY_COLUMN else row.get(col) for col in columns]
                         
                         # 插入数据
                         cursor.execute(insert_sql, values)
@@ -1098,8 +997,17 @@ class DatabaseUpdater:
                         logger.warning(f"插入记录 #{index+1} 时出错 [URL: {url}]: {str(e)}")
                         errors += 1
                 
+                self._prune_car_info_backups(cursor)
                 conn.commit()
+                elapsed = time.perf_counter() - started
                 logger.info(f"车辆信息导入完成: 总数据量 {total_records}, 成功导入 {rows_inserted}, 跳过 {rows_skipped}, 错误 {errors}")
+                logger.info(f"逐行导入耗时 {elapsed:.3f} 秒, {rows_inserted / elapsed if elapsed > 0 else 0:.0f} 行/秒")
+                self.car_info_import_stats = {
+                    'mode': 'row',
+                    'rows': rows_inserted,
+                    'seconds': round(elapsed, 3),
+                    'rows_per_second': round(rows_inserted / elapsed) if elapsed > 0 else 0
+                }
                 
                 # 验证导入结果
                 cursor.execute("SELECT COUNT(*) FROM car_info")
@@ -1124,6 +1032,178 @@ class DatabaseUpdater:
             logger.error(f"导入车辆信息过程中出错: {str(e)}\n{traceback.format_exc()}")
             return False
 
+    # car_info表保留的历史备份数量（car_info_bak_<时间戳>）
+    CAR_INFO_BACKUP_KEEP = 3
+    
+    def _create_car_info_table(self, cursor, table_name):
+        """创建car_info表结构"""
+        cursor.execute(f'''
+        CREATE TABLE {table_name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT,
+            year TEXT,
+            make TEXT,
+            model TEXT,
+            miles TEXT,
+            price TEXT,
+            trade_type TEXT,
+            location TEXT,
+            post_time TEXT,
+            scraping_time_R TEXT,
+            title TEXT,
+            author TEXT,
+            author_link TEXT,
+            thread_id TEXT,
+            thread_key INTEGER,
+            daysold INTEGER DEFAULT 999,
+            last_active INTEGER DEFAULT 999,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+    
+    def _create_car_info_indexes(self, cursor):
+        """在car_info表上创建索引"""
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_car_info_url ON car_info(url)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_car_info_make ON car_info(make)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_car_info_model ON car_info(model)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_car_info_title ON car_info(title)")
+        create_thread_key_index(cursor.connection, 'car_info')
+    
+    def _drop_car_info_backup_indexes(self, cursor):
+        """删除car_info备份表上的索引（备份表只用于回滚，不需要索引）"""
+        cursor.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type='index' AND tbl_name LIKE 'car\\_info\\_bak\\_%' ESCAPE '\\' AND sql IS NOT NULL
+        """)
+        for (index_name,) in cursor.fetchall():
+            cursor.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+    
+    def _prune_car_info_backups(self, cursor, keep=None):
+        """只保留最近的若干个car_info备份表"""
+        keep = self.CAR_INFO_BACKUP_KEEP if keep is None else keep
+        cursor.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type='table' AND name LIKE 'car\\_info\\_bak\\_%' ESCAPE '\\'
+            ORDER BY name DESC
+        """)
+        for (table_name,) in cursor.fetchall()[keep:]:
+            cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+            logger.info(f"已删除过期的car_info备份表: {table_name}")
+    
+    def _normalize_car_info_frame(self, df):
+        """向量化整理车辆信息: 格式化时间列、补全thread_id、NaN转为None"""
+        df = df.copy()
+        for column in ('post_time', 'scraping_time_R'):
+            if column in df.columns:
+                parsed = pd.to_datetime(df[column], errors='coerce')
+                df[column] = parsed.dt.strftime('%Y-%m-%d %H:%M:%S').where(parsed.notna(), None)
+        
+        if 'url' in df.columns:
+            extracted = df['url'].astype('string').str.extract(r't_(\d+)\.html', expand=False)
+            if 'thread_id' in df.columns:
+                df['thread_id'] = df['thread_id'].where(df['thread_id'].notna(), extracted)
+            else:
+                df['thread_id'] = extracted
+        
+        keys = extract_thread_keys(df)
+        if keys is not None:
+            df[THREAD_KEY_COLUMN] = keys
+        
+        return df.astype(object).where(df.notna(), None)
+    
+    def import_car_info_bulk(self, chunk_size=5000):
+        """批量导入车辆信息到car_info表
+        
+        向量化整理数据后，在单个事务中分块 executemany 写入 car_info_new，
+        导入完成后再建索引，并与旧表原子交换；旧表改名为 car_info_bak_<时间戳>，
+        只保留最近 CAR_INFO_BACKUP_KEEP 个。
+        
+        Args:
+            chunk_size: 每次 executemany 写入的行数
+            
+        Returns:
+            bool: 导入是否成功
+        """
+        try:
+            car_info_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data/processed/car_info.csv")
+            if not os.path.exists(car_info_path):
+                logger.warning(f"车辆信息文件不存在: {car_info_path}")
+                return False
+            
+            try:
+                df = pd.read_csv(car_info_path, encoding='utf-8-sig')
+                logger.info(f"成功读取车辆信息CSV文件: {car_info_path}, 共 {len(df)} 行")
+            except Exception as e:
+                logger.error(f"读取车辆信息文件时出错: {str(e)}")
+                return False
+            
+            invalid_records = self.validate_car_info_data(df, skip_invalid=False)
+            if invalid_records:
+                logger.warning(f"发现 {invalid_records} 条不完整记录，但仍将继续导入")
+            
+            started = time.perf_counter()
+            df = self._normalize_car_info_frame(df)
+            
+            with sqlite3.connect(self.db_path, isolation_level=None) as conn:
+                cursor = conn.cursor()
+                
+                # 只写入car_info表中存在的列
+                cursor.execute("DROP TABLE IF EXISTS car_info_new")
+                self._create_car_info_table(cursor, 'car_info_new')
+                cursor.execute("PRAGMA table_info(car_info_new)")
+                table_columns = {row[1] for row in cursor.fetchall()}
+                columns = [col for col in df.columns if col in table_columns and col != 'id']
+                ignored = [col for col in df.columns if col not in table_columns]
+                if ignored:
+                    logger.warning(f"car_info表中不存在以下列，已忽略: {ignored}")
+                
+                columns_str = ', '.join(columns)
+                placeholders = ', '.join(['?' for _ in columns])
+                insert_sql = f"INSERT INTO car_info_new ({columns_str}) VALUES ({placeholders})"
+                records = df[columns].itertuples(index=False, name=None)
+                
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    rows_inserted = 0
+                    while True:
+                        chunk = [record for _, record in zip(range(chunk_size), records)]
+                        if not chunk:
+                            break
+                        cursor.executemany(insert_sql, chunk)
+                        rows_inserted += len(chunk)
+                    load_seconds = time.perf_counter() - started
+                    
+                    # 原子交换: 旧表改名为备份表，新表改名为car_info，然后建索引
+                    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='car_info'")
+                    if cursor.fetchone():
+                        backup_table = f"car_info_bak_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+                        cursor.execute(f"ALTER TABLE car_info RENAME TO {backup_table}")
+                        logger.info(f"已将原car_info表重命名为{backup_table}")
+                    self._drop_car_info_backup_indexes(cursor)
+                    cursor.execute("ALTER TABLE car_info_new RENAME TO car_info")
+                    self._create_car_info_indexes(cursor)
+                    self._prune_car_info_backups(cursor)
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+                
+                elapsed = time.perf_counter() - started
+                rate = rows_inserted / elapsed if elapsed > 0 else 0
+                logger.info(f"车辆信息批量导入完成: {rows_inserted} 行, 写入耗时 {load_seconds:.3f} 秒, "
+                            f"总耗时(含建索引) {elapsed:.3f} 秒, {rate:.0f} 行/秒")
+                self.car_info_import_stats = {
+                    'mode': 'bulk',
+                    'rows': rows_inserted,
+                    'seconds': round(elapsed, 3),
+                    'rows_per_second': round(rate)
+                }
+                return True
+        except Exception as e:
+            logger.error(f"批量导入车辆信息过程中出错: {str(e)}\n{traceback.format_exc()}")
+            return False
+    
     def validate_car_info_data(self, df, skip_invalid=False):
         """验证车辆信息数据，返回无效记录数量"""
         invalid_count = 0
@@ -1147,8 +1227,11 @@ class DatabaseUpdater:
         
         return invalid_count
 
-    def backup_protected_tables(self, tables=None):
-        """备份保护表到临时数据库"""
+    def backup_protected_tables(self, tables=None, batch_size=DEFAULT_COPY_BATCH_SIZE):
+        """备份保护表到临时数据库
+        
+        按 rowid/主键分批读取源库（只读），按表的真实主键合并写入；中断后再次调用会从上次的位置继续。
+        """
         if tables is None:
             tables = self.protected_tables
         
@@ -1164,158 +1247,21 @@ class DatabaseUpdater:
             logger.warning("源数据库不存在，跳过保护表备份")
             return True  # 返回True因为这不是致命错误
         
-        try:
-            # 关闭所有可能的连接
-            if hasattr(self, '_close_all_connections'):
-                self._close_all_connections()
-            
-            # 创建源数据库连接
-            src_conn = None
-            dst_conn = None
-            
+        success = True
+        for table in tables:
             try:
-                # 使用URI模式连接源数据库（只读模式）
-                src_conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
-                src_conn.row_factory = sqlite3.Row
-                
-                # 连接目标数据库（临时数据库）
-                dst_conn = sqlite3.connect(self.temp_db_path)
-                
-                # 对每个保护表，尝试复制
-                for table in tables:
-                    try:
-                        # 检查源表是否存在
-                        src_cursor = src_conn.cursor()
-                        src_cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
-                        if not src_cursor.fetchone():
-                            logger.warning(f"源数据库中不存在表 {table}，跳过")
-                            continue
-                        
-                        # 获取表结构
-                        src_cursor.execute(f"PRAGMA table_info({table})")
-                        columns = src_cursor.fetchall()
-                        
-                        if not columns:
-                            logger.warning(f"无法获取表 {table} 的结构，跳过")
-                            continue
-                        
-                        # 获取所有列名
-                        column_names = [column["name"] for column in columns]
-                        columns_str = ', '.join(column_names)
-                        
-                        # 检查目标表是否存在，如果存在则先删除
-                        dst_cursor = dst_conn.cursor()
-                        dst_cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
-                        if dst_cursor.fetchone():
-                            dst_cursor.execute(f"DROP TABLE {table}")
-                            logger.info(f"已删除目标数据库中的表 {table}，准备重新创建")
-                        
-                        # 创建表结构
-                        create_table_sql = f"CREATE TABLE {table} ("
-                        for i, column in enumerate(columns):
-                            create_table_sql += f"\n    {column['name']} {column['type']}"
-                            if column['notnull']:
-                                create_table_sql += " NOT NULL"
-                            if column['pk']:
-                                create_table_sql += " PRIMARY KEY"
-                            if column['dflt_value'] is not None:
-                                create_table_sql += f" DEFAULT {column['dflt_value']}"
-                            if i < len(columns) - 1:
-                                create_table_sql += ","
-                        create_table_sql += "\n)"
-                        
-                        dst_cursor.execute(create_table_sql)
-                        logger.info(f"已在目标数据库中创建表 {table}")
-                        
-                        # 复制表数据
-                        try:
-                            # 分批获取数据，避免一次性读取过多
-                            batch_size = 1000
-                            offset = 0
-                            
-                            while True:
-                                src_cursor.execute(f"SELECT {columns_str} FROM {table} LIMIT {batch_size} OFFSET {offset}")
-                                rows = src_cursor.fetchall()
-                                
-                                if not rows:
-                                    break
-                                
-                                # 构建INSERT语句
-                                placeholders = ', '.join(['?'] * len(column_names))
-                                insert_sql = f"INSERT INTO {table} ({columns_str}) VALUES ({placeholders})"
-                                
-                                # 准备数据
-                                for row in rows:
-                                    values = [row[col] for col in column_names]
-                                    try:
-                                        dst_cursor.execute(insert_sql, values)
-                                    except sqlite3.IntegrityError as e:
-                                        logger.warning(f"插入数据到表 {table} 时出现完整性错误: {str(e)}")
-                                        # 如果是主键冲突，尝试更新而不是插入
-                                        if "UNIQUE constraint failed" in str(e):
-                                            # 假设第一列是主键
-                                            pk_col = column_names[0]
-                                            update_cols = [col for col in column_names if col != pk_col]
-                                            if update_cols:
-                                                update_sql = f"UPDATE {table} SET "
-                                                update_sql += ", ".join([f"{col} = ?" for col in update_cols])
-                                                update_sql += f" WHERE {pk_col} = ?"
-                                                
-                                                # 准备更新值（不包括主键）+ 主键作为WHERE条件
-                                                update_values = [row[col] for col in update_cols]
-                                                update_values.append(row[pk_col])
-                                                
-                                                dst_cursor.execute(update_sql, update_values)
-                                    except Exception as e:
-                                        logger.error(f"插入数据到表 {table} 时出错: {str(e)}")
-                                
-                                # 提交每一批
-                                dst_conn.commit()
-                                
-                                # 更新偏移量
-                                offset += batch_size
-                                logger.info(f"已复制表 {table} 的 {offset} 行数据")
-                                
-                                # 如果读取的行数小于批量大小，说明已经复制完所有数据
-                                if len(rows) < batch_size:
-                                    break
-                        
-                            # 创建索引（如果有）
-                            src_cursor.execute(f"SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL", (table,))
-                            indexes = src_cursor.fetchall()
-                            
-                            for index in indexes:
-                                try:
-                                    # 跳过与主键相关的自动索引
-                                    if "sqlite_autoindex" not in index['sql']:
-                                        dst_cursor.execute(index['sql'])
-                                        logger.info(f"已创建索引: {index['sql']}")
-                                except Exception as e:
-                                    logger.warning(f"创建索引时出错: {str(e)}")
-                            
-                            logger.info(f"成功完整复制表 {table} 数据({len(rows)}行)")
-                        
-                        except Exception as e:
-                            logger.warning(f"复制保护表 {table} 时出错: {str(e)}")
-                        else:
-                            logger.warning(f"复制保护表 {table} 时出错: no such table: {table}")
-                    
-                    except Exception as e:
-                        logger.error(f"处理表 {table} 时出错: {str(e)}")
-                        # 继续处理其他表
-                
-                # 最终提交
-                dst_conn.commit()
-                logger.info("所有保护表备份完成")
-                return True
-                
+                result = copy_table_keyset(self.db_path, self.temp_db_path, table, batch_size=batch_size)
+                if result['status'] == 'copied':
+                    logger.info(f"成功复制保护表 {table}: {result['rows']} 行, 耗时 {result['seconds']} 秒"
+                                f"{'（断点续传）' if result['resumed'] else ''}")
             except Exception as e:
-                logger.error(f"备份保护表过程中出错: {str(e)}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"备份保护表过程中发生未预期错误: {str(e)}")
-            return False
+                # 继续处理其他表，再次调用时从中断的位置继续
+                success = False
+                logger.error(f"复制保护表 {table} 时出错: {str(e)}")
+        
+        if success:
+            logger.info("所有保护表备份完成")
+        return success
 
     def create_post_ranking_table(self, conn):
         """创建帖子排行表"""
@@ -1424,6 +1370,14 @@ def main():
         parser.add_argument('--sql-dir', type=str, help='SQL脚本目录', default=default_sql_dir)
         parser.add_argument('--import-car-info', action='store_true', help='导入车辆信息数据')
         parser.add_argument('--only-car-info', action='store_true', help='只导入车辆信息数据而不更新其他表')
+        parser.add_argument('--car-info-mode', choices=['bulk', 'row'], default='bulk',
+                            help='车辆信息导入方式: bulk 批量导入（默认）, row 逐行导入')
+        parser.add_argument('--partition-list', action='store_true',
+                            help='把list表过期的快照移到月分区并降采样（会删除大部分旧快照，默认不执行）')
+        parser.add_argument('--list-raw-days', type=int, default=DEFAULT_RAW_DAYS,
+                            help=f'--partition-list时list表保留15分钟快照的天数，更早的移到月分区（默认{DEFAULT_RAW_DAYS}）')
+        parser.add_argument('--list-hourly-days', type=int, default=DEFAULT_HOURLY_DAYS,
+                            help=f'--partition-list时list分区按小时降采样的天数，更早的按天（默认{DEFAULT_HOURLY_DAYS}）')
         args = parser.parse_args()
         
         # 允许从环境变量设置数据库路径
@@ -1436,7 +1390,7 @@ def main():
         # 如果只需要导入车辆信息
         if args.only_car_info:
             logger.info("只导入车辆信息数据")
-            if updater.import_car_info_data():
+            if updater.import_car_info(args.car_info_mode):
                 logger.info("车辆信息导入完成")
                 return 0
             else:
@@ -1490,17 +1444,41 @@ def main():
             if not updater.import_csv_to_temp(file_path, table):
                 logger.warning(f"导入CSV失败: {file_path} -> {table}")
         
+        # SQL脚本写入的行（以及没有CSV覆盖的表）回填thread_key
+        if not updater.backfill_script_thread_keys():
+            logger.warning("回填thread_key失败，这些帖子在关注、操作日志和批量查询中不可见")
+        
+        # 生成作者发帖历史（is_active 标记和最新抓取时间在导入时计算）
+        if not updater.build_author_posts():
+            logger.warning("生成作者发帖历史失败，服务启动时构建，在此之前API按posts/list表直接查询")
+        
+        # 生成list表的增量快照存储
+        if not updater.build_list_snapshots():
+            logger.warning("生成list快照存储失败")
+        
+        # 建立list_all视图；指定--partition-list时先把过期的快照移到月分区并降采样（快照存储需要完整的list表，所以在其后执行）
+        if not updater.partition_list(args.partition_list, args.list_raw_days, args.list_hourly_days):
+            logger.warning("list表分区失败，list表保持完整")
+        
         # 替换数据库
         if not updater.replace_database():
             logger.error("替换数据库失败，更新终止")
             return 1
         
-        # 最后导入car_info数据，这样可以确保不会影响其他表
+        # 预先计算仪表盘数据包，首页首次加载只需读取一次
+        if not updater.build_dashboard():
+            logger.warning("生成仪表盘数据包失败，API将在首次访问时生成")
+        
+        # 最后导入car_info数据，这样可以确保不会影响其他表（导入后重建汽车搜索索引）
         if args.import_car_info or os.path.exists(os.path.join(project_root, "data/processed/car_info.csv")):
             logger.info("导入车辆信息数据")
-            if not updater.import_car_info_data():
+            if not updater.import_car_info(args.car_info_mode):
                 logger.warning("导入车辆信息数据失败")
         
+        # 没有重新导入车辆数据时，确保新发布的数据库中有汽车搜索索引
+        if not updater.build_car_search():
+            logger.warning("构建汽车搜索索引失败，汽车搜索在下次导入或服务启动前返回空结果")
+        
         logger.info("数据库更新完成")
         return 0
     except Exception as e:
@@ -9,7 +9,7 @@ INSERT INTO car_detail (
     days_old, last_active
 )
 SELECT 
-    SUBSTR(p.url, -10, 7) as thread_id,
+    CASE WHEN INSTR(p.url, '/t_') > 0 THEN CAST(SUBSTR(p.url, INSTR(p.url, '/t_') + 3) AS INTEGER) END as thread_id,
     p.url, 
     COALESCE(d.title, p.title, '无标题') as title,
     p.author, p.author_link,
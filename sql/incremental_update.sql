@@ -1,6 +1,28 @@
 -- 增量数据处理脚本
 -- 该脚本仅处理需要更新的数据，不会影响用户相关表
 
+-- 0. 记录本次有新帖或新快照的作者（必须在第1步更新post_ranking之前），第3步只重新计算这些作者
+CREATE INDEX IF NOT EXISTS idx_post_author ON post(author);
+CREATE INDEX IF NOT EXISTS idx_post_ranking_author_last_active ON post_ranking(author, last_active);
+CREATE INDEX IF NOT EXISTS idx_author_ranking_author ON author_ranking(author);
+
+DROP TABLE IF EXISTS temp.touched_authors;
+CREATE TEMP TABLE touched_authors (author TEXT PRIMARY KEY) WITHOUT ROWID;
+
+-- 新帖子或抓取时间比排名记录新的帖子的作者（与第1步的条件相同）
+INSERT OR IGNORE INTO touched_authors (author)
+SELECT p.author
+FROM post p
+LEFT JOIN post_ranking pr ON p.url = pr.url
+WHERE (pr.url IS NULL OR p.scraping_time > pr.updated_at) AND p.author IS NOT NULL;
+
+-- 还没有作者排名记录的作者
+INSERT OR IGNORE INTO touched_authors (author)
+SELECT DISTINCT p.author
+FROM post p
+WHERE p.author IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM author_ranking ar WHERE ar.author = p.author);
+
 -- 1. 更新帖子排名表 (post_ranking)
 INSERT OR REPLACE INTO post_ranking (
     url, title, author, author_link, thread_id, days_old, last_active,
@@ -12,7 +34,7 @@ SELECT
     COALESCE(d.title, p.title, '无标题') as title, 
     p.author, 
     p.author_link,
-    SUBSTR(p.url, -10, 7) as thread_id,
+    CASE WHEN INSTR(p.url, '/t_') > 0 THEN CAST(SUBSTR(p.url, INSTR(p.url, '/t_') + 3) AS INTEGER) END as thread_id,
     CAST(JULIANDAY('now') - JULIANDAY(p.post_time) AS INTEGER) as days_old,
     CAST(JULIANDAY(p.scraping_time) - JULIANDAY('1970-01-01') AS INTEGER) as last_active,
     p.read_count, 
@@ -33,7 +55,7 @@ INSERT OR REPLACE INTO car_detail (
     created_at, updated_at
 )
 SELECT 
-    SUBSTR(p.url, -10, 7) as thread_id,
+    CASE WHEN INSTR(p.url, '/t_') > 0 THEN CAST(SUBSTR(p.url, INSTR(p.url, '/t_') + 3) AS INTEGER) END as thread_id,
     p.url, 
     COALESCE(d.title, p.title, '无标题') as title,
     p.author, 
@@ -53,27 +75,84 @@ LEFT JOIN car_detail cd ON p.url = cd.url
 WHERE cd.url IS NULL OR p.scraping_time > cd.updated_at;
 
 -- 3. 更新作者排名表 (author_ranking)
-INSERT OR REPLACE INTO author_ranking (
-    author, author_link, url, title, days_old, last_active,
-    active_posts, repost_count, reply_count, delete_count,
-    created_at, updated_at
+-- 只处理第0步记录的作者；每个作者的最新帖子用窗口函数一次选出，不再对每个作者执行两次相关子查询
+
+-- 3a. 每个作者最近活跃的帖子
+DROP TABLE IF EXISTS temp.author_latest_post;
+CREATE TEMP TABLE author_latest_post AS
+SELECT author, url, title
+FROM (
+    SELECT 
+        pr.author, 
+        pr.url, 
+        pr.title,
+        ROW_NUMBER() OVER (PARTITION BY pr.author ORDER BY pr.last_active DESC) as rn
+    FROM touched_authors t
+    CROSS JOIN post_ranking pr ON pr.author = t.author  -- CROSS JOIN 固定由 touched_authors 驱动
 )
+WHERE rn = 1;
+
+-- 3b. 作者统计（只扫描有变化的作者的帖子）
+DROP TABLE IF EXISTS temp.author_stats;
+CREATE TEMP TABLE author_stats AS
 SELECT 
-    p.author, 
-    p.author_link,
-    (SELECT url FROM post_ranking WHERE author = p.author ORDER BY last_active DESC LIMIT 1),
-    (SELECT title FROM post_ranking WHERE author = p.author ORDER BY last_active DESC LIMIT 1),
-    MIN(CAST(JULIANDAY('now') - JULIANDAY(p.post_time) AS INTEGER)) as days_old,
-    MAX(CAST(JULIANDAY(p.scraping_time) - JULIANDAY('1970-01-01') AS INTEGER)) as last_active,
+    p.author,
+    MAX(p.author_link) as author_link,
+    CAST(JULIANDAY('now') - MAX(JULIANDAY(p.post_time)) AS INTEGER) as days_old,
+    CAST(MAX(JULIANDAY(p.scraping_time)) - JULIANDAY('1970-01-01') AS INTEGER) as last_active,
     COUNT(DISTINCT p.url) as active_posts,
+    SUM(p.reply_count) as reply_count
+FROM touched_authors t
+CROSS JOIN post p ON p.author = t.author
+GROUP BY p.author;
+
+-- 3c. 新的排名记录（保留原有的转帖数、删除数和创建时间）
+DROP TABLE IF EXISTS temp.author_ranking_refresh;
+CREATE TEMP TABLE author_ranking_refresh AS
+SELECT 
+    s.author, 
+    s.author_link,
+    l.url,
+    l.title,
+    s.days_old,
+    s.last_active,
+    s.active_posts,
     COALESCE(ar.repost_count, 0) as repost_count,
-    SUM(p.reply_count) as reply_count,
+    s.reply_count,
     COALESCE(ar.delete_count, 0) as delete_count,
     COALESCE(ar.created_at, DATETIME('now')) as created_at,
     DATETIME('now') as updated_at
-FROM post p
-LEFT JOIN author_ranking ar ON p.author = ar.author
-GROUP BY p.author, p.author_link;
+FROM author_stats s
+LEFT JOIN author_latest_post l ON l.author = s.author
+LEFT JOIN (
+    SELECT 
+        author, 
+        MAX(repost_count) as repost_count, 
+        MAX(delete_count) as delete_count, 
+        MIN(created_at) as created_at
+    FROM author_ranking
+    WHERE author IN (SELECT author FROM touched_authors)
+    GROUP BY author
+) ar ON ar.author = s.author;
+
+-- 3d. 替换这些作者的记录（author_ranking 的 author 没有唯一约束，先删除再插入，避免重复行）
+DELETE FROM author_ranking WHERE author IN (SELECT author FROM touched_authors);
+
+INSERT INTO author_ranking (
+    author, author_link, url, title, days_old, last_active,
+    active_posts, repost_count, reply_count, delete_count,
+    created_at, updated_at
+)
+SELECT 
+    author, author_link, url, title, days_old, last_active,
+    active_posts, repost_count, reply_count, delete_count,
+    created_at, updated_at
+FROM author_ranking_refresh;
+
+DROP TABLE IF EXISTS temp.author_latest_post;
+DROP TABLE IF EXISTS temp.author_stats;
+DROP TABLE IF EXISTS temp.author_ranking_refresh;
+DROP TABLE IF EXISTS temp.touched_authors;
 
 -- 4. 记录帖子历史数据 (post_history)
 INSERT INTO post_history (
@@ -81,7 +160,7 @@ INSERT INTO post_history (
     read_count, reply_count, created_at, updated_at
 )
 SELECT 
-    SUBSTR(p.url, -10, 7) as thread_id,
+    CASE WHEN INSTR(p.url, '/t_') > 0 THEN CAST(SUBSTR(p.url, INSTR(p.url, '/t_') + 3) AS INTEGER) END as thread_id,
     p.url, 
     COALESCE(d.title, p.title, '无标题') as title,
     p.author, 
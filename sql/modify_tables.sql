@@ -4,7 +4,7 @@
 ALTER TABLE post_ranking ADD COLUMN thread_id TEXT;
 
 -- 更新thread_id值
-UPDATE post_ranking SET thread_id = SUBSTR(url, -10, 7);
+UPDATE post_ranking SET thread_id = CASE WHEN INSTR(url, '/t_') > 0 THEN CAST(SUBSTR(url, INSTR(url, '/t_') + 3) AS INTEGER) END;
 
 -- 为thread_id创建索引
 CREATE INDEX IF NOT EXISTS idx_post_ranking_thread_id ON post_ranking(thread_id); 
\ No newline at end of file
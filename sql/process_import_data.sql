@@ -6,7 +6,7 @@ INSERT OR REPLACE INTO post_ranking (
     created_at, updated_at
 )
 SELECT 
-    SUBSTR(p.url, -10, 7) as thread_id,
+    CASE WHEN INSTR(p.url, '/t_') > 0 THEN CAST(SUBSTR(p.url, INSTR(p.url, '/t_') + 3) AS INTEGER) END as thread_id,
     p.url, 
     COALESCE(d.title, p.title, '无标题') as title,
     p.author_link as author_id,
@@ -31,7 +31,7 @@ INSERT OR REPLACE INTO car_detail (
     created_at, updated_at
 )
 SELECT 
-    SUBSTR(p.url, -10, 7) as thread_id,
+    CASE WHEN INSTR(p.url, '/t_') > 0 THEN CAST(SUBSTR(p.url, INSTR(p.url, '/t_') + 3) AS INTEGER) END as thread_id,
     p.author_link as author_id,
     CASE WHEN ci.year < 1900 OR ci.year > 2100 THEN NULL ELSE CAST(ci.year AS INTEGER) END as year,
     ci.model,
@@ -44,7 +44,7 @@ SELECT
 FROM post p
 LEFT JOIN detail d ON p.url = d.url
 -- LEFT JOIN car_info ci ON p.url = ci.url -- 已由清理脚本注释
-LEFT JOIN car_detail cd ON SUBSTR(p.url, -10, 7) = cd.thread_id
+LEFT JOIN car_detail cd ON CASE WHEN INSTR(p.url, '/t_') > 0 THEN CAST(SUBSTR(p.url, INSTR(p.url, '/t_') + 3) AS INTEGER) END = cd.thread_id
 WHERE cd.thread_id IS NULL OR p.scraping_time > cd.updated_at;
 
 -- 处理author_ranking表
@@ -74,7 +74,7 @@ INSERT INTO post_history (
     read_count, reply_count, created_at, updated_at
 )
 SELECT 
-    SUBSTR(p.url, -10, 7) as thread_id,
+    CASE WHEN INSTR(p.url, '/t_') > 0 THEN CAST(SUBSTR(p.url, INSTR(p.url, '/t_') + 3) AS INTEGER) END as thread_id,
     p.url, 
     COALESCE(d.title, p.title, '无标题') as title,
     p.author,
@@ -103,7 +103,7 @@ INSERT INTO author_history (
 )
 SELECT 
     p.author_link as author_id,
-    SUBSTR(p.url, -10, 7) as thread_id,
+    CASE WHEN INSTR(p.url, '/t_') > 0 THEN CAST(SUBSTR(p.url, INSTR(p.url, '/t_') + 3) AS INTEGER) END as thread_id,
     p.url,
     COALESCE(d.title, p.title, '无标题') as title,
     p.scraping_time as action_time,